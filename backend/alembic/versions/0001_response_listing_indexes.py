@@ -0,0 +1,42 @@
+"""Composite indexes for keyset pagination of responses and surveys
+
+Tables are still created by ``create_all`` at startup, so fresh databases
+already have these indexes; ``if_not_exists`` keeps the upgrade a no-op there.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_survey_responses_survey_submitted_id", "survey_responses",
+        ["survey_id", "submitted_at", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_survey_responses_survey_id_id", "survey_responses",
+        ["survey_id", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_surveys_is_active_id", "surveys",
+        ["is_active", "id"], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_surveys_is_active_id", table_name="surveys")
+    op.drop_index("ix_survey_responses_survey_id_id", table_name="survey_responses")
+    op.drop_index("ix_survey_responses_survey_submitted_id", table_name="survey_responses")
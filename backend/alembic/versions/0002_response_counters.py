@@ -0,0 +1,69 @@
+"""Denormalized response counters on surveys and hourly response buckets
+
+Fresh databases get the new table from ``create_all`` at startup, but the
+new ``surveys`` columns only arrive through this migration. Counters are
+backfilled from the responses already stored.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {column["name"] for column in inspector.get_columns("surveys")}
+    with op.batch_alter_table("surveys") as batch:
+        if "response_count" not in columns:
+            batch.add_column(sa.Column("response_count", sa.Integer(), nullable=False, server_default="0"))
+        if "last_response_at" not in columns:
+            batch.add_column(sa.Column("last_response_at", sa.DateTime(), nullable=True))
+
+    if not inspector.has_table("response_count_buckets"):
+        op.create_table(
+            "response_count_buckets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("bucket_start", sa.DateTime(), nullable=False),
+            sa.Column("response_count", sa.Integer(), nullable=False),
+            sa.UniqueConstraint("survey_id", "bucket_start", name="uq_response_count_buckets_survey_bucket"),
+        )
+        op.create_index("ix_response_count_buckets_id", "response_count_buckets", ["id"])
+
+    op.execute(
+        "UPDATE surveys SET "
+        "response_count = (SELECT COUNT(*) FROM survey_responses r WHERE r.survey_id = surveys.id), "
+        "last_response_at = (SELECT MAX(r.submitted_at) FROM survey_responses r WHERE r.survey_id = surveys.id)"
+    )
+    if bind.dialect.name == "postgresql":
+        hour = "date_trunc('hour', submitted_at)"
+    else:
+        # Same text layout SQLAlchemy uses for DateTime on SQLite
+        hour = "strftime('%Y-%m-%d %H:00:00.000000', submitted_at)"
+    op.execute("DELETE FROM response_count_buckets")
+    op.execute(
+        "INSERT INTO response_count_buckets (survey_id, bucket_start, response_count) "
+        f"SELECT survey_id, {hour}, COUNT(*) FROM survey_responses "
+        f"WHERE submitted_at IS NOT NULL GROUP BY survey_id, {hour}"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_response_count_buckets_id", table_name="response_count_buckets")
+    op.drop_table("response_count_buckets")
+    with op.batch_alter_table("surveys") as batch:
+        batch.drop_column("last_response_at")
+        batch.drop_column("response_count")
@@ -0,0 +1,47 @@
+"""Audio blob references
+
+Audio answers move out of ``survey_responses.audio_data`` into the audio
+store; this table records where each one lives. Existing inline base64
+payloads are moved with ``python -m app.cli migrate-audio``.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("audio_blobs"):
+        return
+    op.create_table(
+        "audio_blobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+        sa.Column("response_id", sa.Integer(), sa.ForeignKey("survey_responses.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("question_key", sa.Text(), nullable=False),
+        sa.Column("storage_key", sa.String(512), nullable=False, unique=True),
+        sa.Column("content_type", sa.String(100), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=True),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_audio_blobs_id", "audio_blobs", ["id"])
+    op.create_index("ix_audio_blobs_response_id", "audio_blobs", ["response_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_audio_blobs_response_id", table_name="audio_blobs")
+    op.drop_index("ix_audio_blobs_id", table_name="audio_blobs")
+    op.drop_table("audio_blobs")
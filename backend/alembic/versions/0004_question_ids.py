@@ -0,0 +1,89 @@
+"""Stable question ids and id-keyed response answers
+
+Every question gets an ``id`` and stored answers are re-keyed from question
+text to that id, with multiple choice answers stored as option indices
+(``survey_responses.answer_encoding`` = 1). Rows are converted survey by
+survey in keyset batches; rows already converted are skipped, so an
+interrupted upgrade can simply be re-run.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.survey_schema import (
+    ENCODING_QUESTION_IDS, ENCODING_TEXT_KEYS, SurveySchema, assign_question_ids
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+surveys = sa.table("surveys", sa.column("id", sa.Integer), sa.column("questions", sa.JSON))
+responses = sa.table(
+    "survey_responses",
+    sa.column("id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+    sa.column("responses", sa.JSON),
+    sa.column("answer_encoding", sa.SmallInteger),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("survey_responses")}
+    if "answer_encoding" not in columns:
+        with op.batch_alter_table("survey_responses") as batch:
+            batch.add_column(sa.Column("answer_encoding", sa.SmallInteger(), nullable=False, server_default="0"))
+
+    for survey_id, questions in bind.execute(sa.select(surveys.c.id, surveys.c.questions)).all():
+        questions = questions or []
+        if questions and not all(q.get("id") for q in questions):
+            questions = assign_question_ids(questions, [q for q in questions if q.get("id")])
+            bind.execute(surveys.update().where(surveys.c.id == survey_id).values(questions=questions))
+        schema = SurveySchema(questions)
+        if schema.keyed:
+            _convert(bind, survey_id, ENCODING_TEXT_KEYS, schema.encode)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for survey_id, questions in bind.execute(sa.select(surveys.c.id, surveys.c.questions)).all():
+        schema = SurveySchema(questions or [])
+        _convert(bind, survey_id, ENCODING_QUESTION_IDS,
+                 lambda stored: (schema.decode(stored, ENCODING_QUESTION_IDS), ENCODING_TEXT_KEYS))
+    with op.batch_alter_table("survey_responses") as batch:
+        batch.drop_column("answer_encoding")
+
+
+def _convert(bind, survey_id: int, source: int, recode) -> None:
+    statement = responses.update().where(responses.c.id == sa.bindparam("response_id")).values(
+        responses=sa.bindparam("converted"), answer_encoding=sa.bindparam("encoding")
+    )
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(responses.c.id, responses.c.responses).where(
+                responses.c.survey_id == survey_id,
+                responses.c.answer_encoding == source,
+                responses.c.id > last_id
+            ).order_by(responses.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        rows = []
+        for response_id, stored in batch:
+            converted, encoding = recode(stored or {})
+            rows.append({"response_id": response_id, "converted": converted, "encoding": encoding})
+        bind.execute(statement, rows)
@@ -0,0 +1,75 @@
+"""Immutable survey versions
+
+Each survey's current questions become its version 1, and every existing
+response is stamped with it (the only snapshot known for them).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 21:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("survey_versions"):
+        op.create_table(
+            "survey_versions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("version_number", sa.Integer(), nullable=False),
+            sa.Column("questions", sa.JSON(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("survey_id", "version_number", name="uq_survey_versions_survey_number"),
+        )
+        op.create_index("ix_survey_versions_id", "survey_versions", ["id"])
+
+    if "current_version_id" not in {column["name"] for column in inspector.get_columns("surveys")}:
+        with op.batch_alter_table("surveys") as batch:
+            batch.add_column(sa.Column("current_version_id", sa.Integer(), nullable=True))
+    if "survey_version_id" not in {column["name"] for column in inspector.get_columns("survey_responses")}:
+        with op.batch_alter_table("survey_responses") as batch:
+            batch.add_column(sa.Column("survey_version_id", sa.Integer(), nullable=True))
+            batch.create_foreign_key(
+                "fk_survey_responses_survey_version_id", "survey_versions", ["survey_version_id"], ["id"]
+            )
+            batch.create_index("ix_survey_responses_survey_version_id_id", ["survey_version_id", "id"])
+
+    op.execute(
+        "INSERT INTO survey_versions (survey_id, version_number, questions, created_at) "
+        "SELECT id, 1, questions, COALESCE(updated_at, created_at) FROM surveys s "
+        "WHERE NOT EXISTS (SELECT 1 FROM survey_versions v WHERE v.survey_id = s.id)"
+    )
+    op.execute(
+        "UPDATE surveys SET current_version_id = ("
+        "SELECT MAX(v.id) FROM survey_versions v WHERE v.survey_id = surveys.id"
+        ") WHERE current_version_id IS NULL"
+    )
+    op.execute(
+        "UPDATE survey_responses SET survey_version_id = ("
+        "SELECT s.current_version_id FROM surveys s WHERE s.id = survey_responses.survey_id"
+        ") WHERE survey_version_id IS NULL"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("survey_responses") as batch:
+        batch.drop_index("ix_survey_responses_survey_version_id_id")
+        batch.drop_constraint("fk_survey_responses_survey_version_id", type_="foreignkey")
+        batch.drop_column("survey_version_id")
+    with op.batch_alter_table("surveys") as batch:
+        batch.drop_column("current_version_id")
+    op.drop_index("ix_survey_versions_id", table_name="survey_versions")
+    op.drop_table("survey_versions")
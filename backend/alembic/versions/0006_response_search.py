@@ -0,0 +1,105 @@
+"""Full-text search over free-text answers
+
+Adds the search documents table, plus its FTS5 index and triggers on
+SQLite (PostgreSQL gets a GIN index over the tsvector). Answers already
+stored are indexed here, survey by survey in keyset batches, skipping
+responses that have documents (the table may predate this revision when the
+app created it at startup); later ones are indexed as they arrive.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 23:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.search_service import search_service, FTS_TABLE
+from app.services.survey_schema import SurveySchema
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+surveys = sa.table("surveys", sa.column("id", sa.Integer), sa.column("questions", sa.JSON))
+responses = sa.table(
+    "survey_responses",
+    sa.column("id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+    sa.column("responses", sa.JSON),
+    sa.column("answer_encoding", sa.SmallInteger),
+)
+documents = sa.table(
+    "response_search_documents",
+    sa.column("survey_id", sa.Integer),
+    sa.column("response_id", sa.Integer),
+    sa.column("question_key", sa.Text),
+    sa.column("body", sa.Text),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("response_search_documents"):
+        op.create_table(
+            "response_search_documents",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column(
+                "response_id", sa.Integer(), sa.ForeignKey("survey_responses.id", ondelete="CASCADE"), nullable=False
+            ),
+            sa.Column("question_key", sa.Text(), nullable=False),
+            sa.Column("body", sa.Text(), nullable=False),
+        )
+        op.create_index("ix_response_search_documents_survey_id", "response_search_documents", ["survey_id"])
+        op.create_index("ix_response_search_documents_response_id", "response_search_documents", ["response_id"])
+        if bind.dialect.name == "postgresql":
+            op.create_index(
+                "ix_response_search_documents_body_tsv",
+                "response_search_documents",
+                [sa.text("to_tsvector('simple', body)")],
+                postgresql_using="gin",
+            )
+    # The FTS5 triggers, or creating the FTS5 table, pick these documents up
+    _index_stored_answers(bind)
+    search_service.ensure_index(bind)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS response_search_documents_ai")
+        op.execute("DROP TRIGGER IF EXISTS response_search_documents_ad")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    op.drop_table("response_search_documents")
+
+
+def _index_stored_answers(bind) -> None:
+    for survey_id, questions in bind.execute(sa.select(surveys.c.id, surveys.c.questions)).all():
+        schema = SurveySchema(questions or [])
+        last_id = 0
+        while True:
+            batch = bind.execute(
+                sa.select(responses.c.id, responses.c.responses, responses.c.answer_encoding).where(
+                    responses.c.survey_id == survey_id,
+                    responses.c.id > last_id
+                ).order_by(responses.c.id).limit(BATCH_SIZE)
+            ).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            indexed = set(bind.execute(sa.select(documents.c.response_id).where(
+                documents.c.response_id.in_([r.id for r in batch])
+            )).scalars())
+            batch = [r for r in batch if r.id not in indexed]
+            rows = search_service.documents(
+                survey_id, schema, [(r.id, schema.decode(r.responses, r.answer_encoding)) for r in batch]
+            )
+            if rows:
+                bind.execute(documents.insert(), rows)
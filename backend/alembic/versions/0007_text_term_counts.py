@@ -0,0 +1,53 @@
+"""Incremental term counts for text answers
+
+Counts start empty; the first analytics read (or
+``python -m app.cli refresh-text-analytics``) counts every stored response.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 01:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("text_analytics_state"):
+        op.create_table(
+            "text_analytics_state",
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), primary_key=True),
+            sa.Column("last_response_id", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+    if not inspector.has_table("text_term_counts"):
+        op.create_table(
+            "text_term_counts",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("question_key", sa.Text(), nullable=False),
+            sa.Column("kind", sa.String(16), nullable=False),
+            sa.Column("language", sa.String(8), nullable=False, server_default=""),
+            sa.Column("term", sa.Text(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+            sa.UniqueConstraint("survey_id", "question_key", "kind", "language", "term", name="uq_text_term_counts_term"),
+        )
+        op.create_index(
+            "ix_text_term_counts_top", "text_term_counts", ["survey_id", "question_key", "kind", "language", "count"]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_text_term_counts_top", table_name="text_term_counts")
+    op.drop_table("text_term_counts")
+    op.drop_table("text_analytics_state")
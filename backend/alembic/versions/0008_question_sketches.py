@@ -0,0 +1,52 @@
+"""Streaming sketches per question and day
+
+Sketches start empty; the first analytics read (or
+``python -m app.cli refresh-sketches``) sketches every stored response.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 03:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("question_sketches"):
+        op.create_table(
+            "question_sketches",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("question_key", sa.Text(), nullable=False),
+            sa.Column("kind", sa.String(8), nullable=False),
+            sa.Column("bucket_start", sa.DateTime(), nullable=False),
+            sa.Column("item_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("payload", sa.LargeBinary(), nullable=False),
+            sa.Column("is_stale", sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.UniqueConstraint("survey_id", "question_key", "kind", "bucket_start", name="uq_question_sketches_bucket"),
+        )
+        op.create_index("ix_question_sketches_survey_id", "question_sketches", ["survey_id"])
+    if not inspector.has_table("sketch_state"):
+        op.create_table(
+            "sketch_state",
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), primary_key=True),
+            sa.Column("last_response_id", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("sketch_state")
+    op.drop_index("ix_question_sketches_survey_id", table_name="question_sketches")
+    op.drop_table("question_sketches")
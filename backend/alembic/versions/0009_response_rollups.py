@@ -0,0 +1,69 @@
+"""Minute and day response count buckets next to the hourly ones
+
+Day buckets are backfilled from every response, minute buckets from the
+last 48 hours (the default ROLLUP_MINUTE_RETENTION_HOURS).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 04:00:00
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {column["name"] for column in inspector.get_columns("response_count_buckets")}
+    constraints = {constraint["name"] for constraint in inspector.get_unique_constraints("response_count_buckets")}
+    with op.batch_alter_table("response_count_buckets") as batch:
+        if "granularity" not in columns:
+            batch.add_column(sa.Column("granularity", sa.String(8), nullable=False, server_default="hour"))
+        if "uq_response_count_buckets_survey_bucket" in constraints:
+            batch.drop_constraint("uq_response_count_buckets_survey_bucket", type_="unique")
+        if "uq_response_count_buckets_survey_granularity_bucket" not in constraints:
+            batch.create_unique_constraint(
+                "uq_response_count_buckets_survey_granularity_bucket",
+                ["survey_id", "granularity", "bucket_start"]
+            )
+
+    if bind.dialect.name == "postgresql":
+        minute = "date_trunc('minute', submitted_at)"
+        day = "date_trunc('day', submitted_at)"
+    else:
+        # Same text layout SQLAlchemy uses for DateTime on SQLite
+        minute = "strftime('%Y-%m-%d %H:%M:00.000000', submitted_at)"
+        day = "strftime('%Y-%m-%d 00:00:00.000000', submitted_at)"
+    op.execute("DELETE FROM response_count_buckets WHERE granularity IN ('minute', 'day')")
+    op.execute(
+        "INSERT INTO response_count_buckets (survey_id, granularity, bucket_start, response_count) "
+        f"SELECT survey_id, 'day', {day}, COUNT(*) FROM survey_responses "
+        f"WHERE submitted_at IS NOT NULL GROUP BY survey_id, {day}"
+    )
+    bind.execute(
+        sa.text(
+            "INSERT INTO response_count_buckets (survey_id, granularity, bucket_start, response_count) "
+            f"SELECT survey_id, 'minute', {minute}, COUNT(*) FROM survey_responses "
+            f"WHERE submitted_at >= :cutoff GROUP BY survey_id, {minute}"
+        ).bindparams(sa.bindparam("cutoff", type_=sa.DateTime())),
+        {"cutoff": (datetime.utcnow() - timedelta(hours=48)).replace(second=0, microsecond=0)}
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM response_count_buckets WHERE granularity <> 'hour'")
+    with op.batch_alter_table("response_count_buckets") as batch:
+        batch.drop_constraint("uq_response_count_buckets_survey_granularity_bucket", type_="unique")
+        batch.create_unique_constraint("uq_response_count_buckets_survey_bucket", ["survey_id", "bucket_start"])
+        batch.drop_column("granularity")
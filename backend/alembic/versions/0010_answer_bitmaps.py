@@ -0,0 +1,63 @@
+"""Bitmap indexes of categorical answers for cross-tabulation
+
+The index starts empty; the first crosstab request (or
+``python -m app.cli refresh-answer-index``) indexes every stored response.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 05:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("answer_bitmaps"):
+        op.create_table(
+            "answer_bitmaps",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("question_key", sa.Text(), nullable=False),
+            sa.Column("value", sa.Text(), nullable=False),
+            sa.Column("segment", sa.Integer(), nullable=False),
+            sa.Column("bitmap", sa.LargeBinary(), nullable=False),
+            sa.UniqueConstraint("survey_id", "question_key", "value", "segment", name="uq_answer_bitmaps_segment"),
+        )
+    if not inspector.has_table("answer_bitmap_segments"):
+        op.create_table(
+            "answer_bitmap_segments",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("segment", sa.Integer(), nullable=False),
+            sa.Column("first_response_id", sa.Integer(), nullable=False),
+            sa.Column("last_response_id", sa.Integer(), nullable=False),
+            sa.Column("response_count", sa.Integer(), nullable=False),
+            sa.Column("response_ids", sa.LargeBinary(), nullable=False),
+            sa.Column("deleted", sa.LargeBinary(), nullable=True),
+            sa.UniqueConstraint("survey_id", "segment", name="uq_answer_bitmap_segments_segment"),
+        )
+    if not inspector.has_table("answer_bitmap_state"):
+        op.create_table(
+            "answer_bitmap_state",
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), primary_key=True),
+            sa.Column("last_response_id", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("response_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("answer_bitmap_state")
+    op.drop_table("answer_bitmap_segments")
+    op.drop_table("answer_bitmaps")
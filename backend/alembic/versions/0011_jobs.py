@@ -0,0 +1,49 @@
+"""Background jobs for heavy analytics, exports and question generation
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 06:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("jobs"):
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.String(32), primary_key=True),
+            sa.Column("job_type", sa.String(32), nullable=False),
+            sa.Column("status", sa.String(16), nullable=False, server_default="queued"),
+            sa.Column("params", sa.JSON(), nullable=False),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id", ondelete="CASCADE"), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("result", sa.JSON(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("artifact_key", sa.String(512), nullable=True),
+            sa.Column("artifact_content_type", sa.String(100), nullable=True),
+            sa.Column("artifact_size", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("started_at", sa.DateTime(), nullable=True),
+            sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+            sa.Column("finished_at", sa.DateTime(), nullable=True),
+        )
+    op.create_index("ix_jobs_status_created_at", "jobs", ["status", "created_at"], if_not_exists=True)
+    op.create_index("ix_jobs_survey_id", "jobs", ["survey_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_survey_id", table_name="jobs")
+    op.drop_index("ix_jobs_status_created_at", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,69 @@
+"""Question aggregates table, keyed by question id
+
+The table used to arrive only through ``create_all``. Rows written before
+aggregates were keyed by question id are keyed by question text; those are
+dropped and rebuilt from the stored responses on the next read.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+surveys = sa.table("surveys", sa.column("id", sa.Integer), sa.column("questions", sa.JSON))
+aggregates = sa.table(
+    "question_aggregates",
+    sa.column("survey_id", sa.Integer),
+    sa.column("question_key", sa.Text),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("question_aggregates"):
+        op.create_table(
+            "question_aggregates",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("question_key", sa.Text(), nullable=False),
+            sa.Column("question_type", sa.String(50), nullable=False),
+            sa.Column("response_count", sa.Integer(), nullable=False),
+            sa.Column("value_counts", sa.JSON(), nullable=False),
+            sa.Column("num_count", sa.Integer(), nullable=False),
+            sa.Column("num_sum", sa.Float(), nullable=False),
+            sa.Column("num_sumsq", sa.Float(), nullable=False),
+            sa.Column("text_count", sa.Integer(), nullable=False),
+            sa.Column("text_word_count", sa.Integer(), nullable=False),
+            sa.Column("text_samples", sa.JSON(), nullable=False),
+            sa.Column("text_longest", sa.Text(), nullable=True),
+            sa.Column("text_shortest", sa.Text(), nullable=True),
+            sa.Column("is_stale", sa.Boolean(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("survey_id", "question_key", name="uq_question_aggregates_survey_question"),
+        )
+    op.create_index("ix_question_aggregates_id", "question_aggregates", ["id"], if_not_exists=True)
+    op.create_index("ix_question_aggregates_survey_id", "question_aggregates", ["survey_id"], if_not_exists=True)
+
+    for survey_id, questions in bind.execute(sa.select(surveys.c.id, surveys.c.questions)).all():
+        ids = [q["id"] for q in questions or [] if q.get("id")]
+        if ids:
+            bind.execute(aggregates.delete().where(
+                aggregates.c.survey_id == survey_id, aggregates.c.question_key.not_in(ids)
+            ))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_question_aggregates_survey_id", table_name="question_aggregates")
+    op.drop_index("ix_question_aggregates_id", table_name="question_aggregates")
+    op.drop_table("question_aggregates")
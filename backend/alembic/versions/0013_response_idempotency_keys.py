@@ -0,0 +1,41 @@
+"""Idempotency keys of uploaded and queued responses
+
+The table used to arrive only through ``create_all``.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("response_idempotency_keys"):
+        op.create_table(
+            "response_idempotency_keys",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("idempotency_key", sa.String(255), nullable=False),
+            sa.Column(
+                "response_id", sa.Integer(), sa.ForeignKey("survey_responses.id", ondelete="CASCADE"), nullable=False
+            ),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("survey_id", "idempotency_key", name="uq_response_idempotency_keys_survey_key"),
+        )
+    op.create_index("ix_response_idempotency_keys_id", "response_idempotency_keys", ["id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_response_idempotency_keys_id", table_name="response_idempotency_keys")
+    op.drop_table("response_idempotency_keys")
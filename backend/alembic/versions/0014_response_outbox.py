@@ -0,0 +1,58 @@
+"""Response outbox for the text term counts
+
+Responses past a survey's old watermark are queued; the watermark column
+goes away. A response the watermark skipped because its transaction
+committed late stays uncounted until
+``python -m app.cli refresh-text-analytics --rebuild``.
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0014"
+down_revision: Union[str, None] = "0013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("response_outbox"):
+        op.create_table(
+            "response_outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("consumer", sa.String(16), nullable=False),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("response_id", sa.Integer(), nullable=False),
+            sa.UniqueConstraint("consumer", "response_id", name="uq_response_outbox_consumer_response"),
+        )
+    op.create_index(
+        "ix_response_outbox_pending", "response_outbox", ["consumer", "survey_id", "response_id"], if_not_exists=True
+    )
+    if "last_response_id" in {column["name"] for column in inspector.get_columns("text_analytics_state")}:
+        op.execute(
+            "INSERT INTO response_outbox (consumer, survey_id, response_id) "
+            "SELECT 'text_terms', r.survey_id, r.id FROM survey_responses r "
+            "JOIN text_analytics_state s ON s.survey_id = r.survey_id "
+            "WHERE r.id > s.last_response_id"
+        )
+        with op.batch_alter_table("text_analytics_state") as batch:
+            batch.drop_column("last_response_id")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("text_analytics_state") as batch:
+        batch.add_column(sa.Column("last_response_id", sa.Integer(), nullable=False, server_default="0"))
+    # Counted responses are not ordered by id, so the first read after downgrading recounts everything
+    op.execute("DELETE FROM text_term_counts")
+    op.execute("DELETE FROM text_analytics_state")
+    op.drop_index("ix_response_outbox_pending", table_name="response_outbox")
+    op.drop_table("response_outbox")
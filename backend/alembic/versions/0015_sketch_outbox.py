@@ -0,0 +1,44 @@
+"""Response outbox for the question sketches
+
+Responses past a survey's old watermark are queued; the watermark column
+goes away. A response the watermark skipped because its transaction
+committed late stays unsketched until
+``python -m app.cli refresh-sketches --rebuild``.
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-19 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0015"
+down_revision: Union[str, None] = "0014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "last_response_id" in {column["name"] for column in sa.inspect(op.get_bind()).get_columns("sketch_state")}:
+        op.execute(
+            "INSERT INTO response_outbox (consumer, survey_id, response_id) "
+            "SELECT 'sketches', r.survey_id, r.id FROM survey_responses r "
+            "JOIN sketch_state s ON s.survey_id = r.survey_id "
+            "WHERE r.id > s.last_response_id"
+        )
+        with op.batch_alter_table("sketch_state") as batch:
+            batch.drop_column("last_response_id")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("sketch_state") as batch:
+        batch.add_column(sa.Column("last_response_id", sa.Integer(), nullable=False, server_default="0"))
+    # Sketched responses are not ordered by id, so the first read after downgrading rebuilds the sketches
+    op.execute("DELETE FROM question_sketches")
+    op.execute("DELETE FROM sketch_state")
+    op.execute("DELETE FROM response_outbox WHERE consumer = 'sketches'")
@@ -0,0 +1,45 @@
+"""Response outbox for the answer bitmaps
+
+Responses past a survey's old watermark are queued; the watermark column
+goes away. A response the watermark skipped because its transaction
+committed late stays unindexed until
+``python -m app.cli refresh-answer-index --rebuild``.
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0016"
+down_revision: Union[str, None] = "0015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "last_response_id" in {column["name"] for column in sa.inspect(op.get_bind()).get_columns("answer_bitmap_state")}:
+        op.execute(
+            "INSERT INTO response_outbox (consumer, survey_id, response_id) "
+            "SELECT 'answer_bitmaps', r.survey_id, r.id FROM survey_responses r "
+            "JOIN answer_bitmap_state s ON s.survey_id = r.survey_id "
+            "WHERE r.id > s.last_response_id"
+        )
+        with op.batch_alter_table("answer_bitmap_state") as batch:
+            batch.drop_column("last_response_id")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("answer_bitmap_state") as batch:
+        batch.add_column(sa.Column("last_response_id", sa.Integer(), nullable=False, server_default="0"))
+    # Indexed responses are not ordered by id, so the first read after downgrading rebuilds the index
+    op.execute("DELETE FROM answer_bitmaps")
+    op.execute("DELETE FROM answer_bitmap_segments")
+    op.execute("DELETE FROM answer_bitmap_state")
+    op.execute("DELETE FROM response_outbox WHERE consumer = 'answer_bitmaps'")
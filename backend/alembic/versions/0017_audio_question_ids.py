@@ -0,0 +1,91 @@
+"""Key stored audio answers by question id
+
+``audio_blobs.question_key`` and the keys of ``survey_responses.audio_data``
+move from question text to question id, so an answer stays attached to its
+question when the question is renamed. Texts are matched against the
+survey's current questions and every earlier version, newest first; keys
+that match no audio question are left as they are.
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-19 14:00:00
+
+"""
+from typing import Dict, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0017"
+down_revision: Union[str, None] = "0016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+surveys = sa.table("surveys", sa.column("id", sa.Integer), sa.column("questions", sa.JSON))
+versions = sa.table(
+    "survey_versions",
+    sa.column("survey_id", sa.Integer),
+    sa.column("version_number", sa.Integer),
+    sa.column("questions", sa.JSON),
+)
+blobs = sa.table(
+    "audio_blobs",
+    sa.column("id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+    sa.column("response_id", sa.Integer),
+    sa.column("question_key", sa.Text),
+)
+responses = sa.table("survey_responses", sa.column("id", sa.Integer), sa.column("audio_data", sa.JSON))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for survey_id in _surveys_with_audio(bind):
+        ids_by_text: Dict[str, str] = {}
+        # Oldest first, so the newest question with a text wins
+        for questions in _question_history(bind, survey_id):
+            ids_by_text.update(
+                (q.get("text", ""), q["id"]) for q in questions if q.get("type") == "audio" and q.get("id")
+            )
+        current_ids = set(ids_by_text.values())
+        _rekey(bind, survey_id, lambda key: key if key in current_ids else ids_by_text.get(key, key))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for survey_id in _surveys_with_audio(bind):
+        texts_by_id: Dict[str, str] = {}
+        for questions in _question_history(bind, survey_id):
+            texts_by_id.update((q["id"], q.get("text", "")) for q in questions if q.get("id"))
+        _rekey(bind, survey_id, lambda key: texts_by_id.get(key, key))
+
+
+def _surveys_with_audio(bind):
+    return bind.execute(sa.select(blobs.c.survey_id).distinct().order_by(blobs.c.survey_id)).scalars().all()
+
+
+def _question_history(bind, survey_id: int):
+    """Question lists of every version, oldest first, then the current questions"""
+    history = bind.execute(
+        sa.select(versions.c.questions).where(versions.c.survey_id == survey_id).order_by(versions.c.version_number)
+    ).scalars().all()
+    current = bind.execute(sa.select(surveys.c.questions).where(surveys.c.id == survey_id)).scalar()
+    return [questions or [] for questions in history] + [current or []]
+
+
+def _rekey(bind, survey_id: int, new_key) -> None:
+    response_ids = set()
+    for blob_id, response_id, key in bind.execute(
+        sa.select(blobs.c.id, blobs.c.response_id, blobs.c.question_key).where(blobs.c.survey_id == survey_id)
+    ).all():
+        response_ids.add(response_id)
+        if new_key(key) != key:
+            bind.execute(blobs.update().where(blobs.c.id == blob_id).values(question_key=new_key(key)))
+    for response_id in sorted(response_ids):
+        audio_data = bind.execute(sa.select(responses.c.audio_data).where(responses.c.id == response_id)).scalar()
+        if audio_data:
+            rekeyed = {new_key(key): value for key, value in audio_data.items()}
+            if rekeyed != audio_data:
+                bind.execute(responses.update().where(responses.c.id == response_id).values(audio_data=rekeyed))
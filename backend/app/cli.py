@@ -0,0 +1,351 @@
+"""Maintenance commands, e.g. ``python -m app.cli rebuild-aggregates``"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Any, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+
+from app.core.database import SessionLocal, AsyncSessionLocal, engine
+from app.models import survey as survey_models, analytics, job
+from app.models.survey import Survey, SurveyResponse, SurveyVersion
+from app.services.aggregate_service import aggregate_service
+from app.services.counter_service import counter_service
+from app.services.analytics_service import analytics_service
+from app.services.audio_service import audio_service
+from app.services.sql_analytics_service import sql_analytics_service
+from app.services.columnar_analytics_service import columnar_analytics_service
+from app.services.survey_schema import survey_schemas, ENCODING_QUESTION_IDS
+from app.services.search_service import search_service
+from app.services.text_analytics_service import text_analytics_service
+from app.services.sketch_service import sketch_service
+from app.services.crosstab_service import crosstab_service
+from app.services.job_service import job_service
+
+logger = logging.getLogger(__name__)
+
+def rebuild_aggregates(args: argparse.Namespace) -> None:
+    """Recompute question aggregates and response counters from stored responses"""
+    survey_models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        query = db.query(Survey)
+        if args.survey_id is not None:
+            query = query.filter(Survey.id == args.survey_id)
+        surveys = query.order_by(Survey.id).all()
+        for survey in surveys:
+            aggregate_service.rebuild_survey(db, survey)
+            counter_service.rebuild_survey(db, survey)
+            db.commit()
+        logger.info(f"Rebuilt aggregates and counters for {len(surveys)} survey(s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def rebuild_search_index(args: argparse.Namespace) -> None:
+    """Re-index free-text answers for response search from stored responses"""
+    survey_models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        search_service.ensure_index(connection)
+    db = SessionLocal()
+    try:
+        query = db.query(Survey)
+        if args.survey_id is not None:
+            query = query.filter(Survey.id == args.survey_id)
+        surveys = query.order_by(Survey.id).all()
+        indexed = 0
+        for survey in surveys:
+            indexed += search_service.rebuild_survey(db, survey)
+            db.commit()
+        logger.info(f"Re-indexed {indexed} responses of {len(surveys)} survey(s) for search")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def refresh_text_analytics(args: argparse.Namespace) -> None:
+    """Count terms of text answers not counted yet (all of them with --rebuild)"""
+    survey_models.Base.metadata.create_all(bind=engine)
+
+    async def run() -> None:
+        async with AsyncSessionLocal() as db:
+            query = select(Survey).order_by(Survey.id)
+            if args.survey_id is not None:
+                query = query.where(Survey.id == args.survey_id)
+            surveys = (await db.scalars(query)).all()
+            counted = 0
+            for survey in surveys:
+                if args.rebuild:
+                    await db.run_sync(lambda session: text_analytics_service.reset_survey(session, survey.id))
+                    await db.commit()
+                counted += await text_analytics_service.refresh(db, survey)
+        logger.info(f"Counted text answers of {counted} responses in {len(surveys)} survey(s)")
+
+    try:
+        asyncio.run(run())
+    finally:
+        text_analytics_service.shutdown()
+
+def refresh_sketches(args: argparse.Namespace) -> None:
+    """Sketch responses not sketched yet (all of them with --rebuild)"""
+    survey_models.Base.metadata.create_all(bind=engine)
+
+    async def run() -> None:
+        async with AsyncSessionLocal() as db:
+            query = select(Survey).order_by(Survey.id)
+            if args.survey_id is not None:
+                query = query.where(Survey.id == args.survey_id)
+            surveys = (await db.scalars(query)).all()
+            sketched = 0
+            for survey in surveys:
+                if args.rebuild:
+                    await db.run_sync(lambda session: sketch_service.reset_survey(session, survey.id))
+                    await db.commit()
+                sketched += await sketch_service.refresh(db, survey)
+        logger.info(f"Sketched {sketched} responses in {len(surveys)} survey(s)")
+
+    asyncio.run(run())
+
+def refresh_answer_index(args: argparse.Namespace) -> None:
+    """Index answers for cross-tabulation not indexed yet (all of them with --rebuild)"""
+    survey_models.Base.metadata.create_all(bind=engine)
+
+    async def run() -> None:
+        async with AsyncSessionLocal() as db:
+            query = select(Survey).order_by(Survey.id)
+            if args.survey_id is not None:
+                query = query.where(Survey.id == args.survey_id)
+            surveys = (await db.scalars(query)).all()
+            indexed = 0
+            for survey in surveys:
+                if args.rebuild:
+                    await db.run_sync(lambda session: crosstab_service.reset_survey(session, survey.id))
+                    await db.commit()
+                indexed += await crosstab_service.refresh(db, survey)
+        logger.info(f"Indexed answers of {indexed} responses in {len(surveys)} survey(s)")
+
+    asyncio.run(run())
+
+def compact_rollups(args: argparse.Namespace) -> None:
+    """Prune minute and hour response count buckets past their retention"""
+    survey_models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        removed = counter_service.compact(db)
+        db.commit()
+        logger.info(f"Removed response count buckets: {removed}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def run_jobs(args: argparse.Namespace) -> None:
+    """Run queued background jobs without serving the API (set JOB_RUNNER_ENABLED=false on API processes to leave jobs to these)"""
+    survey_models.Base.metadata.create_all(bind=engine)
+
+    async def run() -> None:
+        await job_service.start()
+        logger.info("Running background jobs; stop with Ctrl+C")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await job_service.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def migrate_audio(args: argparse.Namespace) -> None:
+    """Move inline base64 audio answers into the audio store, leaving references behind.
+
+    Covers both ``audio_data`` and answers to audio questions stored among the
+    response's answers, as the web client submitted them.
+    """
+    survey_models.Base.metadata.create_all(bind=engine)
+
+    async def run() -> set:
+        moved = failed = 0
+        last_id = 0
+        surveys = {}
+        # survey id -> [(question id, question text)] of its audio questions
+        audio_questions = {}
+        changed_answers = set()
+        async with AsyncSessionLocal() as db:
+            while True:
+                responses = (await db.scalars(
+                    select(SurveyResponse).options(undefer(SurveyResponse.audio_data))
+                    .where(SurveyResponse.id > last_id).order_by(SurveyResponse.id).limit(args.batch_size)
+                )).all()
+                if not responses:
+                    break
+                for response in responses:
+                    last_id = response.id
+                    if response.survey_id not in audio_questions:
+                        survey = surveys[response.survey_id] = await db.get(Survey, response.survey_id)
+                        audio_questions[response.survey_id] = [
+                            (q.get("id"), q.get("text", "")) for q in audio_service.audio_questions(survey)
+                        ] if survey else []
+                    inline = {k: v for k, v in (response.audio_data or {}).items() if isinstance(v, str)}
+                    stored = dict(response.responses or {})
+                    for qid, text in audio_questions[response.survey_id]:
+                        key = qid if response.answer_encoding == ENCODING_QUESTION_IDS else text
+                        if isinstance(stored.get(key), str) and stored[key] and text not in inline:
+                            inline[text] = stored.pop(key)
+                    if not inline:
+                        continue
+                    # Checked up front so a response is moved entirely or not at all
+                    error = audio_service.validate_inline(inline)
+                    if error:
+                        failed += len(inline)
+                        logger.error(f"Response {response.id}: {error}")
+                        continue
+                    await audio_service.save_inline(db, surveys[response.survey_id], response, inline)
+                    if stored != response.responses:
+                        response.responses = stored
+                        changed_answers.add(response.survey_id)
+                    moved += len(inline)
+                await db.commit()
+        logger.info(f"Moved {moved} audio answer(s) into the store, {failed} could not be decoded")
+        return changed_answers
+
+    changed_answers = asyncio.run(run())
+    # Aggregates still count the answers moved out of the rows
+    db = SessionLocal()
+    try:
+        for survey in db.query(Survey).filter(Survey.id.in_(changed_answers)).order_by(Survey.id).all():
+            aggregate_service.rebuild_survey(db, survey)
+            db.commit()
+    finally:
+        db.close()
+
+def _diff(expected: Any, actual: Any, path: str, problems: List[str]) -> None:
+    """Record where ``actual`` disagrees with ``expected``; extra keys in ``actual`` are allowed"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key, value in expected.items():
+            if key not in actual:
+                problems.append(f"{path}.{key}: missing")
+            else:
+                _diff(value, actual[key], f"{path}.{key}", problems)
+    elif isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        if len(expected) != len(actual):
+            problems.append(f"{path}: {expected!r} != {actual!r}")
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            _diff(left, right, f"{path}[{index}]", problems)
+    elif isinstance(expected, float) or isinstance(actual, float):
+        if not isinstance(actual, (int, float)) or abs(expected - actual) > 0.011:
+            problems.append(f"{path}: {expected!r} != {actual!r}")
+    elif expected != actual:
+        problems.append(f"{path}: {expected!r} != {actual!r}")
+
+def check_analytics_parity(args: argparse.Namespace) -> None:
+    """Compare the aggregate, SQL and columnar analytics backends against the Python implementation"""
+    survey_models.Base.metadata.create_all(bind=engine)
+
+    async def sql_results(targets: List[tuple]) -> dict:
+        """(survey id, version id or None) -> SQL analytics"""
+        results = {}
+        async with AsyncSessionLocal() as adb:
+            for survey_id, version_id in targets:
+                survey = await adb.get(Survey, survey_id)
+                version = await adb.get(SurveyVersion, version_id) if version_id else None
+                results[survey_id, version_id] = await sql_analytics_service.compute_survey_analytics(adb, survey, version)
+        return results
+
+    db = SessionLocal()
+    failures = 0
+    try:
+        query = db.query(Survey)
+        if args.survey_id is not None:
+            query = query.filter(Survey.id == args.survey_id)
+        surveys = query.order_by(Survey.id).all()
+        versions = {survey.id: db.query(SurveyVersion).filter(
+            SurveyVersion.survey_id == survey.id
+        ).order_by(SurveyVersion.version_number).all() for survey in surveys}
+        sql = asyncio.run(sql_results([(survey.id, None) for survey in surveys] + [
+            (survey.id, version.id) for survey in surveys for version in versions[survey.id]
+        ]))
+        for survey in surveys:
+            responses = db.query(SurveyResponse).filter(
+                SurveyResponse.survey_id == survey.id
+            ).order_by(SurveyResponse.id).all()
+            schema = survey_schemas.get(survey)
+            # The cross-version view, then each version on its own
+            for version in [None] + versions[survey.id]:
+                scoped = [r for r in responses if version is None or r.survey_version_id == version.id]
+                names = survey_schemas.get(version) if version else None
+                expected = analytics_service.compute_survey_analytics(survey, scoped, version)
+                backends = {
+                    "sql": sql[survey.id, version.id if version else None],
+                    "columnar": columnar_analytics_service.compute_survey_analytics(
+                        survey, [schema.decode(r.responses, r.answer_encoding, names) for r in scoped], version
+                    ),
+                }
+                if version is None:
+                    backends["aggregates"] = aggregate_service.compute_survey_analytics(db, survey)
+                label = f"Survey {survey.id} v{version.version_number}" if version else f"Survey {survey.id}"
+                for name, actual in backends.items():
+                    problems: List[str] = []
+                    _diff(expected, actual, "analytics", problems)
+                    for problem in problems:
+                        logger.error(f"{label} [{name}] {problem}")
+                    failures += bool(problems)
+        logger.info(f"Checked {len(surveys)} survey(s): {failures} backend mismatch(es)")
+    finally:
+        db.close()
+    if failures:
+        sys.exit(1)
+
+def main(argv=None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-aggregates", help=rebuild_aggregates.__doc__)
+    rebuild.add_argument("--survey-id", type=int, default=None, help="Only rebuild this survey")
+    rebuild.set_defaults(func=rebuild_aggregates)
+
+    search = commands.add_parser("rebuild-search-index", help=rebuild_search_index.__doc__)
+    search.add_argument("--survey-id", type=int, default=None, help="Only re-index this survey")
+    search.set_defaults(func=rebuild_search_index)
+
+    text = commands.add_parser("refresh-text-analytics", help=refresh_text_analytics.__doc__)
+    text.add_argument("--survey-id", type=int, default=None, help="Only refresh this survey")
+    text.add_argument("--rebuild", action="store_true", help="Discard the stored counts and recount every response")
+    text.set_defaults(func=refresh_text_analytics)
+
+    sketches = commands.add_parser("refresh-sketches", help=refresh_sketches.__doc__)
+    sketches.add_argument("--survey-id", type=int, default=None, help="Only refresh this survey")
+    sketches.add_argument("--rebuild", action="store_true", help="Discard the stored sketches and rebuild them")
+    sketches.set_defaults(func=refresh_sketches)
+
+    index = commands.add_parser("refresh-answer-index", help=refresh_answer_index.__doc__)
+    index.add_argument("--survey-id", type=int, default=None, help="Only refresh this survey")
+    index.add_argument("--rebuild", action="store_true", help="Discard the index and rebuild it, dropping deleted responses")
+    index.set_defaults(func=refresh_answer_index)
+
+    rollups = commands.add_parser("compact-rollups", help=compact_rollups.__doc__)
+    rollups.set_defaults(func=compact_rollups)
+
+    jobs = commands.add_parser("run-jobs", help=run_jobs.__doc__)
+    jobs.set_defaults(func=run_jobs)
+
+    audio = commands.add_parser("migrate-audio", help=migrate_audio.__doc__)
+    audio.add_argument("--batch-size", type=int, default=100, help="Responses per transaction")
+    audio.set_defaults(func=migrate_audio)
+
+    parity = commands.add_parser("check-analytics-parity", help=check_analytics_parity.__doc__)
+    parity.add_argument("--survey-id", type=int, default=None, help="Only check this survey")
+    parity.set_defaults(func=check_analytics_parity)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
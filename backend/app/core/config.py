@@ -5,8 +5,76 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./surveys.db")
+    # Derived from DATABASE_URL (aiosqlite / asyncpg) unless set explicitly
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Analytics: "aggregates" (materialized counters), "sql" (computed in the database),
+    # "columnar" (NumPy over the answer column) or "python" (reference implementation)
+    ANALYTICS_BACKEND: str = os.getenv("ANALYTICS_BACKEND", "aggregates")
+    # Read cache: "memory" (per-process LRU), "redis" (shared, needs the redis package) or "none"
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_URL: str = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+    CACHE_TTL_SECONDS: float = float(os.getenv("CACHE_TTL_SECONDS", 30))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+    # Check submitted answers against the survey's questions: "strict" rejects bad responses, "off" stores anything
+    RESPONSE_VALIDATION: str = os.getenv("RESPONSE_VALIDATION", "strict")
+    RESPONSE_TEXT_MAX_LENGTH: int = int(os.getenv("RESPONSE_TEXT_MAX_LENGTH", 10000))
+    SCHEMA_CACHE_SIZE: int = int(os.getenv("SCHEMA_CACHE_SIZE", 1024))
+    # Batch ingestion
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", 5000))
+    # "direct" commits each submission; "queued" acknowledges with 202 and group-commits in the background
+    INGEST_MODE: str = os.getenv("INGEST_MODE", "direct")
+    INGEST_QUEUE_MAXSIZE: int = int(os.getenv("INGEST_QUEUE_MAXSIZE", 10000))
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", 500))
+    INGEST_FLUSH_INTERVAL_MS: int = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", 50))
+    INGEST_DRAIN_TIMEOUT: float = float(os.getenv("INGEST_DRAIN_TIMEOUT", 30))
+    # Live dashboards: "memory" (single worker) or "redis" (pub/sub across workers, needs the redis package)
+    LIVE_BROKER: str = os.getenv("LIVE_BROKER", "memory")
+    LIVE_BROKER_URL: str = os.getenv("LIVE_BROKER_URL", os.getenv("CACHE_URL", "redis://localhost:6379/0"))
+    # Recompute a watched survey at most this often however fast responses arrive
+    LIVE_MIN_INTERVAL_MS: int = int(os.getenv("LIVE_MIN_INTERVAL_MS", 1000))
+    LIVE_HEARTBEAT_SECONDS: float = float(os.getenv("LIVE_HEARTBEAT_SECONDS", 15))
+    # Text analytics: answers are tokenized in a process pool (0 workers: in a thread) once a refresh has this many
+    TEXT_ANALYTICS_WORKERS: int = int(os.getenv("TEXT_ANALYTICS_WORKERS", os.cpu_count() or 1))
+    TEXT_ANALYTICS_PARALLEL_MIN: int = int(os.getenv("TEXT_ANALYTICS_PARALLEL_MIN", 5000))
+    TEXT_ANALYTICS_CHUNK_SIZE: int = int(os.getenv("TEXT_ANALYTICS_CHUNK_SIZE", 10000))
+    TEXT_ANALYTICS_TOP_TERMS: int = int(os.getenv("TEXT_ANALYTICS_TOP_TERMS", 10))
+    TEXT_ANALYTICS_TOP_LANGUAGES: int = int(os.getenv("TEXT_ANALYTICS_TOP_LANGUAGES", 5))
+    # Streaming sketches: KLL size (rank error ~1.65/k), HyperLogLog precision (error ~1.04/sqrt(2**p)),
+    # answers tracked per text question by Space-Saving and how many of them analytics report
+    SKETCH_KLL_K: int = int(os.getenv("SKETCH_KLL_K", 200))
+    SKETCH_HLL_PRECISION: int = int(os.getenv("SKETCH_HLL_PRECISION", 12))
+    SKETCH_TOPK_CAPACITY: int = int(os.getenv("SKETCH_TOPK_CAPACITY", 64))
+    SKETCH_TOP_ANSWERS: int = int(os.getenv("SKETCH_TOP_ANSWERS", 10))
+    # Response timelines: minute and hour buckets older than this are pruned (day buckets are kept);
+    # the summary's 7-day count needs at least 8 days of hours
+    ROLLUP_MINUTE_RETENTION_HOURS: int = int(os.getenv("ROLLUP_MINUTE_RETENTION_HOURS", 48))
+    ROLLUP_HOUR_RETENTION_DAYS: int = int(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", 90))
+    ROLLUP_COMPACT_INTERVAL_SECONDS: float = float(os.getenv("ROLLUP_COMPACT_INTERVAL_SECONDS", 600))
+    ROLLUP_MAX_POINTS: int = int(os.getenv("ROLLUP_MAX_POINTS", 5000))
+    # Audio answers: "filesystem" (under AUDIO_STORAGE_PATH) or "s3" (any S3-compatible endpoint, needs boto3)
+    AUDIO_STORAGE_BACKEND: str = os.getenv("AUDIO_STORAGE_BACKEND", "filesystem")
+    AUDIO_STORAGE_PATH: str = os.getenv("AUDIO_STORAGE_PATH", "./audio_store")
+    AUDIO_S3_BUCKET: str = os.getenv("AUDIO_S3_BUCKET", "survey-audio")
+    AUDIO_S3_PREFIX: str = os.getenv("AUDIO_S3_PREFIX", "")
+    AUDIO_S3_ENDPOINT_URL: str = os.getenv("AUDIO_S3_ENDPOINT_URL", "")
+    AUDIO_S3_PART_SIZE: int = int(os.getenv("AUDIO_S3_PART_SIZE", 8 * 1024 * 1024))
+    AUDIO_CHUNK_SIZE: int = int(os.getenv("AUDIO_CHUNK_SIZE", 256 * 1024))
+    AUDIO_MAX_BYTES: int = int(os.getenv("AUDIO_MAX_BYTES", 50 * 1024 * 1024))
     
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    # Point at an OpenAI-compatible server, e.g. benchmarks/stub_llm.py, instead of api.openai.com
+    OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "")
+    AI_PRIMARY_MODEL: str = os.getenv("AI_PRIMARY_MODEL", "gpt-4o-mini")
+    AI_FALLBACK_MODEL: str = os.getenv("AI_FALLBACK_MODEL", "gpt-4.1-nano")
+    AI_REQUEST_TIMEOUT: float = float(os.getenv("AI_REQUEST_TIMEOUT", 20))
+    # Start the fallback model if the primary has not answered after this many seconds (negative: only on failure)
+    AI_HEDGE_DELAY: float = float(os.getenv("AI_HEDGE_DELAY", 3))
+    AI_CACHE_TTL_SECONDS: float = float(os.getenv("AI_CACHE_TTL_SECONDS", 3600))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", 256))
 
     # Server
     PORT: int = int(os.getenv("PORT", 8000))
@@ -18,6 +86,27 @@ class Settings(BaseSettings):
         "https://shashankatmakur.github.io/survey-management-system",
         "*"
     ]
+    # Background jobs: persisted in the jobs table and claimed by every process running the dispatcher
+    # (the API unless JOB_RUNNER_ENABLED is false, and `python -m app.cli run-jobs`); analytics and exports
+    # run in a pool of JOB_WORKERS processes. Concurrency limits count running jobs across all processes.
+    JOB_RUNNER_ENABLED: bool = os.getenv("JOB_RUNNER_ENABLED", "true").lower() == "true"
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 2))
+    JOB_ANALYTICS_CONCURRENCY: int = int(os.getenv("JOB_ANALYTICS_CONCURRENCY", 2))
+    JOB_EXPORT_CONCURRENCY: int = int(os.getenv("JOB_EXPORT_CONCURRENCY", 2))
+    JOB_QUESTIONS_CONCURRENCY: int = int(os.getenv("JOB_QUESTIONS_CONCURRENCY", 4))
+    JOB_ARTIFACT_DIR: str = os.getenv("JOB_ARTIFACT_DIR", "./job_artifacts")
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1))
+    # Running jobs refresh a heartbeat; one silent for JOB_STALE_SECONDS lost its process and is retried
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", 10))
+    JOB_STALE_SECONDS: float = float(os.getenv("JOB_STALE_SECONDS", 60))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETENTION_HOURS: int = int(os.getenv("JOB_RETENTION_HOURS", 168))
+    # Observability: /metrics in Prometheus text format, and header-triggered request profiling
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2"))
     # Environment
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
 
@@ -0,0 +1,289 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms are kept per process (run one scrape
+target per uvicorn worker). Values that already live elsewhere, like pool
+usage or service stats, are read by collectors at scrape time instead of
+being mirrored on every change.
+"""
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = Tuple[str, Dict[str, str], float]     # (name suffix, labels, value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "_total", dict(zip(self.labelnames, key)), value
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "", dict(zip(self.labelnames, key)), value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), cumulated when rendered
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels: Any) -> "_Timer":
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = [(key, list(state[0]), state[1]) for key, state in self._values.items()]
+        for key, counts, total in values:
+            labels = dict(zip(self.labelnames, key))
+            seen = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                seen += count
+                yield "_bucket", {**labels, "le": _number(bound)}, seen
+            yield "_sum", labels, total
+            yield "_count", labels, seen
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+# A collector returns (name, type, help, samples) families computed at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def family(name: str, kind: str, documentation: str, samples: Iterable[Sample]) -> None:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_labels(labels)} {_number(value)}")
+
+        for metric in self._metrics:
+            family(metric.name, metric.kind, metric.documentation, metric.samples())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                family(name, kind, documentation, samples)
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent, by route template",
+    ("method", "route", "status")
+))
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "Requests being handled", ("method",)
+))
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Database statement execution time", ("engine", "operation")
+))
+DB_QUERY_ERRORS = REGISTRY.register(Counter(
+    "db_query_errors", "Database statements that raised", ("engine", "operation")
+))
+LLM_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "Chat completion calls, until the full answer (or the stream ended)",
+    ("model", "mode", "outcome"), buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens", "Tokens reported by the API; streamed completions count one per content chunk",
+    ("model", "kind")
+))
+ANALYTICS_COMPUTE_DURATION = REGISTRY.register(Histogram(
+    "analytics_compute_duration_seconds", "Time spent computing survey analytics", ("backend",)
+))
+JOB_DURATION = REGISTRY.register(Histogram(
+    "job_duration_seconds", "Background job run time, from claim to finish", ("job_type", "status"),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+))
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Time every statement run through ``engine`` (the sync engine behind an async one too)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, engine=name, operation=_operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def failed(context):
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        DB_QUERY_ERRORS.inc(engine=name, operation=_operation(context.statement or ""))
+
+def pool_collector(engines: Dict[str, Engine]) -> Collector:
+    """Connections in use, idle and allowed per engine pool; pools without a size (SQLite memory) are skipped"""
+
+    def collect():
+        families = {
+            "db_pool_checked_out": ("Connections currently checked out", []),
+            "db_pool_idle": ("Connections idle in the pool", []),
+            "db_pool_size": ("Configured pool size (overflow not included)", []),
+            "db_pool_overflow": ("Connections opened beyond the pool size", []),
+        }
+        for name, engine in engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            labels = {"engine": name}
+            families["db_pool_checked_out"][1].append(("", labels, pool.checkedout()))
+            families["db_pool_idle"][1].append(("", labels, pool.checkedin()))
+            families["db_pool_size"][1].append(("", labels, pool.size()))
+            families["db_pool_overflow"][1].append(("", labels, max(pool.overflow(), 0)))
+        return [(name, "gauge", documentation, samples) for name, (documentation, samples) in families.items()]
+
+    return collect
+
+def stats_collector(prefix: str, stats: Callable[[], Dict[str, Any]]) -> Collector:
+    """Numeric fields of a service's ``stats()`` as gauges named ``<prefix>_<field>``"""
+
+    def collect():
+        return [
+            (f"{prefix}_{field}", "gauge", f"{prefix} {field.replace('_', ' ')}", [("", {}, value)])
+            for field, value in stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        ]
+
+    return collect
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording HTTP_REQUEST_DURATION per route template.
+
+    Latency stops at the response start, so streamed exports and event
+    streams count their time to first byte rather than their whole life.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        started = time.perf_counter()
+        status: Optional[int] = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self._observe(scope, method, status, started)
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(method=method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if status is None:
+                self._observe(scope, method, 500, started)
+            raise
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec(method=method)
+
+    @staticmethod
+    def _observe(scope, method: str, status: int, started: float) -> None:
+        route = scope.get("route")
+        # Unmatched paths share one label so scanners cannot blow up the series count
+        path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method=method, route=path, status=status)
@@ -0,0 +1,25 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Any
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Opaque, URL-safe cursor for the last row of a page"""
+    raw = json.dumps(position, separators=(",", ":"), default=lambda v: v.isoformat()).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *fields: str) -> Dict[str, Any]:
+    """Decode a cursor made by encode_cursor; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if not isinstance(position, dict) or any(field not in position for field in fields):
+        raise ValueError("Invalid cursor")
+    return position
+
+def parse_cursor_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
@@ -0,0 +1,112 @@
+"""Opt-in profiling of single requests, with nothing but the standard library.
+
+With PROFILING_ENABLED set, a request sent with ``X-Profile: sample`` or
+``X-Profile: cprofile`` (plus ``X-Profile-Token`` when PROFILE_TOKEN is
+set) is profiled until its response has been sent. The result is written
+under PROFILE_DIR and the response names the file in ``X-Profile-File``:
+
+    sample    the event loop thread's stack, sampled every
+              PROFILE_SAMPLE_INTERVAL_MS, as collapsed stacks
+              (``frame;frame;frame count``) for flamegraph.pl or speedscope
+    cprofile  cProfile statistics, for ``python -m pstats`` or snakeviz
+
+Both watch the event loop thread, so other requests interleaved with the
+profiled one show up as well; profile on a quiet instance.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sample", "cprofile")
+MAX_DEPTH = 128
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling requests that ask for it (see module docstring)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.{'folded' if mode == 'sample' else 'prof'}"
+        path = os.path.join(settings.PROFILE_DIR, name)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-file", name.encode())])
+            await send(message)
+
+        sampler: Optional[StackSampler] = None
+        profiler: Optional[cProfile.Profile] = None
+        if mode == "sample":
+            sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+            sampler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+                with open(path, "w") as output:
+                    output.write(sampler.collapsed())
+            else:
+                profiler.disable()
+                profiler.dump_stats(path)
+            logger.info(f"Profiled {scope['method']} {scope['path']} ({mode}, {time.perf_counter() - started:.3f}s) into {path}")
+
+    @staticmethod
+    def _requested_mode(scope) -> Optional[str]:
+        headers = dict(scope.get("headers") or [])
+        mode = headers.get(b"x-profile", b"").decode("latin-1").strip().lower()
+        if mode not in MODES:
+            return None
+        if settings.PROFILE_TOKEN and headers.get(b"x-profile-token", b"").decode("latin-1") != settings.PROFILE_TOKEN:
+            return None
+        return mode
@@ -1,14 +1,25 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
 import sys
 from datetime import datetime
 
 from app.core.config import settings
-from app.core.database import engine
-from app.models import survey
-from app.routes import survey_routes, response_routes, analytics_routes, ai_routes
+from app.core.database import engine, async_engine
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware, instrument_engine, pool_collector, stats_collector
+from app.core.profiling import ProfilingMiddleware
+from app.models import survey, analytics, job
+from app.routes import survey_routes, response_routes, analytics_routes, ai_routes, audio_routes, job_routes
+from app.services.ingestion_service import ingestion_queue
+from app.services.counter_service import counter_service
+from app.services.cache_service import cache_service
+from app.services.ai_service import ai_service
+from app.services.live_service import live_service
+from app.services.job_service import job_service
+from app.services.search_service import search_service
+from app.services.text_analytics_service import text_analytics_service
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +35,8 @@ logger = logging.getLogger(__name__)
 
 # Create database tables
 survey.Base.metadata.create_all(bind=engine)
+with engine.begin() as connection:
+    search_service.ensure_index(connection)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -41,8 +54,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Content-Range", "Accept-Ranges", "X-Profile-File"],
 )
 
+# Metrics and opt-in request profiling
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+    REGISTRY.add_collector(pool_collector({"sync": engine, "async": async_engine.sync_engine}))
+    REGISTRY.add_collector(stats_collector("ingestion", ingestion_queue.stats))
+    REGISTRY.add_collector(stats_collector("cache", cache_service.stats))
+    REGISTRY.add_collector(stats_collector("ai", ai_service.stats))
+    REGISTRY.add_collector(stats_collector("live", live_service.stats))
+    REGISTRY.add_collector(stats_collector("jobs", job_service.stats))
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -59,25 +91,43 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "environment": settings.ENVIRONMENT,
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "ingestion": ingestion_queue.stats(),
+        "cache": cache_service.stats(),
+        "ai": ai_service.stats(),
+        "live": live_service.stats(),
+        "jobs": job_service.stats()
     }
 
 # API routes
 app.include_router(survey_routes.router, prefix="/api", tags=["surveys"])
 app.include_router(response_routes.router, prefix="/api", tags=["responses"])
+app.include_router(audio_routes.router, prefix="/api", tags=["audio"])
 app.include_router(analytics_routes.router, prefix="/api", tags=["analytics"])
 app.include_router(ai_routes.router, prefix="/api", tags=["ai"])
+app.include_router(job_routes.router, prefix="/api", tags=["jobs"])
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Survey Management System starting up in {settings.ENVIRONMENT} mode")
     logger.info(f"Database URL: {settings.DATABASE_URL[:20]}...")
+    if settings.INGEST_MODE == "queued":
+        await ingestion_queue.start()
+    await counter_service.start()
+    if settings.JOB_RUNNER_ENABLED:
+        await job_service.start()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Survey Management System shutting down")
+    await ingestion_queue.stop()
+    await counter_service.stop()
+    await job_service.stop()
+    await live_service.stop()
+    text_analytics_service.shutdown()
+    await async_engine.dispose()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,164 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, JSON, ForeignKey, UniqueConstraint, Index, LargeBinary, text
+from datetime import datetime
+from app.core.database import Base
+
+class QuestionAggregate(Base):
+    """Materialized running totals for one question of a survey"""
+    __tablename__ = "question_aggregates"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "question_key", name="uq_question_aggregates_survey_question"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
+    question_key = Column(Text, nullable=False)
+    question_type = Column(String(50), nullable=False)
+    response_count = Column(Integer, nullable=False, default=0)
+    # Histogram of normalized answer -> count (choices, ratings and numbers)
+    value_counts = Column(JSON, nullable=False, default=dict)
+    num_count = Column(Integer, nullable=False, default=0)
+    num_sum = Column(Float, nullable=False, default=0.0)
+    num_sumsq = Column(Float, nullable=False, default=0.0)
+    text_count = Column(Integer, nullable=False, default=0)
+    text_word_count = Column(Integer, nullable=False, default=0)
+    text_samples = Column(JSON, nullable=False, default=list)
+    text_longest = Column(Text)
+    text_shortest = Column(Text)
+    # Set when a delete removed a value we cannot un-apply (e.g. the longest text)
+    is_stale = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ResponseCountBucket(Base):
+    """Number of responses a survey received in one minute, hour or day"""
+    __tablename__ = "response_count_buckets"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "granularity", "bucket_start", name="uq_response_count_buckets_survey_granularity_bucket"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    granularity = Column(String(8), nullable=False, default="hour")
+    bucket_start = Column(DateTime, nullable=False)
+    response_count = Column(Integer, nullable=False, default=0)
+
+class ResponseSearchDocument(Base):
+    """One free-text answer, kept for full-text search (see SearchService).
+
+    SQLite indexes these rows with an FTS5 table maintained by triggers;
+    PostgreSQL with a GIN index over their tsvector.
+    """
+    __tablename__ = "response_search_documents"
+    __table_args__ = (
+        Index("ix_response_search_documents_survey_id", "survey_id"),
+        Index(
+            "ix_response_search_documents_body_tsv", text("to_tsvector('simple', body)"), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+    id = Column(Integer, primary_key=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    response_id = Column(Integer, ForeignKey("survey_responses.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Question id (question text for surveys without ids)
+    question_key = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+
+class ResponseOutboxEntry(Base):
+    """A stored response that one incremental index has not taken in yet (see ResponseOutbox)"""
+    __tablename__ = "response_outbox"
+    __table_args__ = (
+        UniqueConstraint("consumer", "response_id", name="uq_response_outbox_consumer_response"),
+        Index("ix_response_outbox_pending", "consumer", "survey_id", "response_id"),
+    )
+    id = Column(Integer, primary_key=True)
+    # The index waiting for the response: "text_terms", "sketches" or "answer_bitmaps"
+    consumer = Column(String(16), nullable=False)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    # No foreign key: deleting a response withdraws its entries after the row is gone
+    response_id = Column(Integer, nullable=False)
+
+class TextAnalyticsState(Base):
+    """A survey whose text term counts are kept; responses not counted yet wait in the response outbox"""
+    __tablename__ = "text_analytics_state"
+    survey_id = Column(Integer, ForeignKey("surveys.id"), primary_key=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TextTermCount(Base):
+    """Occurrences of one term in the answers to a text question (see TextAnalyticsService)"""
+    __tablename__ = "text_term_counts"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "question_key", "kind", "language", "term", name="uq_text_term_counts_term"),
+        Index("ix_text_term_counts_top", "survey_id", "question_key", "kind", "language", "count"),
+    )
+    id = Column(Integer, primary_key=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    # Question id (question text for surveys without ids)
+    question_key = Column(Text, nullable=False)
+    # "word", "bigram" or "language" (term is the language code, count the answers in it)
+    kind = Column(String(16), nullable=False)
+    # Language code for per-language word counts, "" for counts over every answer
+    language = Column(String(8), nullable=False, default="")
+    term = Column(Text, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+class QuestionSketch(Base):
+    """Serialized streaming sketch of one question's answers in one time bucket (see SketchService)"""
+    __tablename__ = "question_sketches"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "question_key", "kind", "bucket_start", name="uq_question_sketches_bucket"),
+    )
+    id = Column(Integer, primary_key=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
+    # Question id (question text for surveys without ids); "" for the survey as a whole
+    question_key = Column(Text, nullable=False)
+    # "kll" (quantiles), "hll" (distinct respondents) or "topk" (most frequent answers)
+    kind = Column(String(8), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    item_count = Column(Integer, nullable=False, default=0)
+    payload = Column(LargeBinary, nullable=False)
+    # Set when a counted response of the bucket was deleted; the bucket is recounted on next refresh
+    is_stale = Column(Boolean, nullable=False, default=False)
+
+class SketchState(Base):
+    """A survey whose sketches are kept; responses not sketched yet wait in the response outbox"""
+    __tablename__ = "sketch_state"
+    survey_id = Column(Integer, ForeignKey("surveys.id"), primary_key=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AnswerBitmap(Base):
+    """Ordinals of the responses in one segment that gave one answer to a question (see CrosstabService)"""
+    __tablename__ = "answer_bitmaps"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "question_key", "value", "segment", name="uq_answer_bitmaps_segment"),
+    )
+    id = Column(Integer, primary_key=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    # Question id (question text for surveys without ids)
+    question_key = Column(Text, nullable=False)
+    value = Column(Text, nullable=False)
+    segment = Column(Integer, nullable=False)
+    # zlib-compressed little-endian bitmap of SEGMENT_SIZE bits (see bitmaps)
+    bitmap = Column(LargeBinary, nullable=False)
+
+class AnswerBitmapSegment(Base):
+    """The response ids behind one segment of a survey's answer bitmaps"""
+    __tablename__ = "answer_bitmap_segments"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "segment", name="uq_answer_bitmap_segments_segment"),
+    )
+    id = Column(Integer, primary_key=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    segment = Column(Integer, nullable=False)
+    # Lowest and highest id in the segment; responses committing late can make ranges of segments overlap
+    first_response_id = Column(Integer, nullable=False)
+    last_response_id = Column(Integer, nullable=False)
+    # Ordinals segment * SEGMENT_SIZE up to this many are in use
+    response_count = Column(Integer, nullable=False)
+    # Delta-encoded ids, one per ordinal
+    response_ids = Column(LargeBinary, nullable=False)
+    # Bitmap of the ordinals whose response was deleted; only written when deleting
+    deleted = Column(LargeBinary, nullable=True)
+
+class AnswerBitmapState(Base):
+    """A survey whose answers are indexed; responses not indexed yet wait in the response outbox"""
+    __tablename__ = "answer_bitmap_state"
+    survey_id = Column(Integer, ForeignKey("surveys.id"), primary_key=True)
+    # Ordinals handed out so far
+    response_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
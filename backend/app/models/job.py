@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Index
+from datetime import datetime
+from app.core.database import Base
+
+class Job(Base):
+    """A queued, running or finished background job; its artifact is a file under JOB_ARTIFACT_DIR"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+    )
+    id = Column(String(32), primary_key=True)
+    job_type = Column(String(32), nullable=False)
+    # queued -> running -> succeeded | failed; queued jobs can be cancelled
+    status = Column(String(16), nullable=False, default="queued")
+    params = Column(JSON, nullable=False, default=dict)
+    survey_id = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"), index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Small summary of the outcome (e.g. rows exported); the full output is the artifact
+    result = Column(JSON)
+    error = Column(Text)
+    artifact_key = Column(String(512))
+    artifact_content_type = Column(String(100))
+    artifact_size = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    # Refreshed while running; a running job whose heartbeat stops lost its process and is retried
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, DateTime, Boolean, JSON, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from app.core.database import Base
 
 class Survey(Base):
     __tablename__ = "surveys"
+    __table_args__ = (
+        Index("ix_surveys_is_active_id", "is_active", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     description = Column(Text)
@@ -13,14 +16,67 @@ class Survey(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True)
     created_by = Column(String(100), default="user")
+    # Denormalized from survey_responses by CounterService
+    response_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_response_at = Column(DateTime)
+    # SurveyVersion holding the current ``questions``; a plain column to avoid a foreign key cycle
+    current_version_id = Column(Integer)
     responses = relationship("SurveyResponse", back_populates="survey")
 
+class SurveyVersion(Base):
+    """Immutable snapshot of a survey's questions; every question edit adds a new one"""
+    __tablename__ = "survey_versions"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "version_number", name="uq_survey_versions_survey_number"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    version_number = Column(Integer, nullable=False)
+    questions = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class SurveyResponse(Base):
     __tablename__ = "survey_responses"
+    __table_args__ = (
+        Index("ix_survey_responses_survey_submitted_id", "survey_id", "submitted_at", "id"),
+        Index("ix_survey_responses_survey_id_id", "survey_id", "id"),
+        Index("ix_survey_responses_survey_version_id_id", "survey_version_id", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
     responses = Column(JSON, nullable=False)
-    audio_data = Column(JSON)
+    # How ``responses`` is keyed; see app.services.survey_schema
+    answer_encoding = Column(SmallInteger, nullable=False, default=0, server_default="0")
+    # SurveyVersion the response was submitted against
+    survey_version_id = Column(Integer, ForeignKey("survey_versions.id"))
+    # Question id (text for surveys without ids) -> {"audio_id": AudioBlob.id}; deferred so listings never load it
+    audio_data = deferred(Column(JSON))
     submitted_at = Column(DateTime, default=datetime.utcnow)
     respondent_ip = Column(String(45))
     survey = relationship("Survey", back_populates="responses")
+
+class ResponseIdempotencyKey(Base):
+    """Client-supplied key -> response it created, so retried uploads are not stored twice"""
+    __tablename__ = "response_idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("survey_id", "idempotency_key", name="uq_response_idempotency_keys_survey_key"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    response_id = Column(Integer, ForeignKey("survey_responses.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AudioBlob(Base):
+    """One stored audio answer; the bytes live in the configured audio store"""
+    __tablename__ = "audio_blobs"
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    response_id = Column(Integer, ForeignKey("survey_responses.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Question id (question text for surveys without ids)
+    question_key = Column(Text, nullable=False)
+    storage_key = Column(String(512), nullable=False, unique=True)
+    content_type = Column(String(100), nullable=False)
+    filename = Column(String(255))
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.services.ai_service import ai_service
 from app.schemas.survey import AIGenerateRequest
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,7 +12,7 @@ router = APIRouter()
 async def generate_questions(request: AIGenerateRequest):
     """Generate survey questions using OpenAI"""
     try:
-        result = ai_service.generate_questions(request.prompt, request.question_count)
+        result = await ai_service.generate_questions(request.prompt, request.question_count)
         if result.get("success", False):
             return {
                 "success": True,
@@ -28,3 +30,25 @@ async def generate_questions(request: AIGenerateRequest):
     except Exception as e:
         logger.error(f"Error generating questions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
+
+def _question_events(prompt: str, question_count: int) -> StreamingResponse:
+    async def events():
+        async for event in ai_service.stream_questions(prompt, question_count):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies such as nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/generate-questions/stream")
+async def stream_questions(request: AIGenerateRequest):
+    """Stream generated questions as Server-Sent Events, one ``question`` event per question"""
+    return _question_events(request.prompt, request.question_count)
+
+@router.get("/generate-questions/stream")
+async def stream_questions_get(prompt: str = Query(..., min_length=1), question_count: int = Query(5, ge=1, le=20)):
+    """Same as the POST variant, for browsers' EventSource which can only GET"""
+    return _question_events(prompt, question_count)
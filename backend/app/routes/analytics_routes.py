@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import json
 import logging
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.models.survey import Survey, SurveyResponse
-from app.services.analytics_service import analytics_service
+from app.models.survey import Survey
+from app.models.analytics import ResponseCountBucket
+from app.services.counter_service import counter_service, STEPS, HOUR
+from app.services.cache_service import cache_service
+from app.services.live_service import live_service
+from app.services.version_service import version_service
+from app.services.report_service import report_service
+from app.services.crosstab_service import crosstab_service, MAX_DIMENSIONS
 from app.schemas.survey import AnalyticsOut
 
 logger = logging.getLogger(__name__)
@@ -12,37 +24,175 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/surveys/{survey_id}/analytics", response_model=AnalyticsOut)
-async def get_survey_analytics(survey_id: int, db: Session = Depends(get_db)):
-    """Get analytics for a survey"""
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
+async def get_survey_analytics(
+    survey_id: int,
+    request: Request,
+    version: Optional[int] = Query(None, ge=1, description="Only this version's responses, under its own questions"),
+    exact: bool = Query(False, description="Compute percentiles, distinct respondents and top answers from every response instead of sketches"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get analytics for a survey.
+
+    By default every response counts, with answers to questions that persist
+    across versions (same question id) pooled under the current questions.
+    """
+    # Older versions and exact statistics are rarely asked for, so only the default view is cached
+    cache_key = cache_service.survey_key(survey_id, "analytics") if version is None and not exact else None
+    cached = await cache_service.get(cache_key) if cache_key else None
+    if cached:
+        return cache_service.respond(request, cached)
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
-    responses = db.query(SurveyResponse).filter(SurveyResponse.survey_id == survey_id).all()
-    analytics_data = analytics_service.compute_survey_analytics(survey, responses)
-    return {
-        "survey_id": survey_id,
-        "title": survey.title,
-        "total_responses": analytics_data["total_responses"],
-        "analytics": analytics_data["analytics"]
-    }
+    snapshot = None
+    if version is not None:
+        snapshot = await version_service.get_version(db, survey_id, version)
+        if not snapshot:
+            raise HTTPException(status_code=404, detail="Survey version not found")
+    payload = await report_service.survey_analytics(db, survey, snapshot, exact)
+    return cache_service.respond(request, await cache_service.put(cache_key, payload))
+
+@router.get("/surveys/{survey_id}/analytics/filtered")
+async def get_filtered_analytics(
+    survey_id: int,
+    request: Request,
+    where: List[str] = Query([], description="question=value (question id or text); values of one question are alternatives"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Answer counts of every rating, multiple choice and yes/no question among
+    the responses matching the filters, e.g. ``?where=Region=EU&where=Plan=Pro``"""
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    try:
+        filters = crosstab_service.parse_filters(survey, where)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await crosstab_service.refresh(db, survey)
+    return cache_service.respond(request, await cache_service.put(
+        None, await crosstab_service.filtered_analytics(db, survey, filters)
+    ))
+
+@router.get("/surveys/{survey_id}/crosstab")
+async def get_survey_crosstab(
+    survey_id: int,
+    request: Request,
+    by: List[str] = Query([], description="Question id or text; repeat for up to four dimensions"),
+    where: List[str] = Query([], description="question=value (question id or text); values of one question are alternatives"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Contingency table: responses matching the filters counted by every
+    combination of answers to the ``by`` questions, e.g. rating by region.
+
+    Cells and filters are intersections of per-answer bitmaps, so the cost
+    depends on the number of answer values rather than of responses.
+    """
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    if not 1 <= len(by) <= MAX_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_DIMENSIONS} `by` questions are needed")
+    try:
+        dimensions = [crosstab_service.resolve(survey, reference) for reference in by]
+        filters = crosstab_service.parse_filters(survey, where)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len({key for _, key, _ in dimensions}) < len(dimensions):
+        raise HTTPException(status_code=400, detail="Each question can only be one dimension")
+    await crosstab_service.refresh(db, survey)
+    return cache_service.respond(request, await cache_service.put(
+        None, await crosstab_service.crosstab(db, survey, dimensions, filters)
+    ))
+
+@router.get("/surveys/{survey_id}/live")
+async def live_updates(survey_id: int, db: AsyncSession = Depends(get_db)):
+    """Server-Sent Events for dashboards: a ``snapshot`` event with counters and
+    analytics, then ``update`` events carrying only what changed"""
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+
+    async def events():
+        async for event in live_service.stream(survey_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/surveys/{survey_id}/summary")
-async def get_survey_summary(survey_id: int, db: Session = Depends(get_db)):
+async def get_survey_summary(survey_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Get dashboard summary for a survey"""
-    from datetime import datetime, timedelta
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
+    cache_key = cache_service.survey_key(survey_id, "summary")
+    cached = await cache_service.get(cache_key)
+    if cached:
+        return cache_service.respond(request, cached)
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
-    responses = db.query(SurveyResponse).filter(SurveyResponse.survey_id == survey_id).all()
     recent_cut = datetime.utcnow() - timedelta(days=7)
-    recent_responses = [r for r in responses if r.submitted_at and r.submitted_at >= recent_cut]
-    return {
+    # Whole hourly buckets, so the window may reach up to an hour further back
+    recent_responses = await db.scalar(
+        select(func.coalesce(func.sum(ResponseCountBucket.response_count), 0)).where(
+            ResponseCountBucket.survey_id == survey_id,
+            ResponseCountBucket.granularity == HOUR,
+            ResponseCountBucket.bucket_start >= counter_service.bucket_start(recent_cut)
+        )
+    )
+    return cache_service.respond(request, await cache_service.put(cache_key, {
         "survey_id": survey_id,
         "title": survey.title,
         "total_questions": len(survey.questions),
-        "total_responses": len(responses),
-        "recent_responses_7d": len(recent_responses),
+        "total_responses": survey.response_count,
+        "recent_responses_7d": recent_responses,
         "completion_rate": 100.0,  # adjust logic if you have partials
         "created_at": survey.created_at,
         "is_active": survey.is_active
-    }
+    }))
+
+@router.get("/surveys/{survey_id}/timeline")
+async def get_survey_timeline(
+    survey_id: int,
+    request: Request,
+    granularity: str = Query("day", pattern="^(minute|hour|day)$"),
+    start: Optional[datetime] = Query(None, alias="from", description="UTC; defaults to 120 buckets before `to`"),
+    end: Optional[datetime] = Query(None, alias="to", description="UTC, exclusive; defaults to now"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Responses received per minute, hour or day, for progress charts.
+
+    Buckets come from the rollups kept by the counter service, so this is one
+    range scan whatever the period. Minute and hour buckets are only kept for a
+    while; `retained_from` tells where the series may start running short.
+    """
+    survey = await db.scalar(select(Survey.id).where(Survey.id == survey_id))
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    start, end = (
+        moment.astimezone(timezone.utc).replace(tzinfo=None) if moment and moment.tzinfo else moment
+        for moment in (start, end)
+    )
+    end = end or datetime.utcnow()
+    start = counter_service.bucket_start(start or end - STEPS[granularity] * 119, granularity)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`from` must be before `to`")
+    if (end - start) / STEPS[granularity] > settings.ROLLUP_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ROLLUP_MAX_POINTS} {granularity} buckets per request; use a coarser granularity"
+        )
+    buckets = await db.run_sync(lambda session: counter_service.timeline(session, survey_id, granularity, start, end))
+    return cache_service.respond(request, await cache_service.put(None, {
+        "survey_id": survey_id,
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "retained_from": counter_service.retained_from(granularity),
+        "total": sum(bucket["count"] for bucket in buckets),
+        "buckets": buckets
+    }))
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+import logging
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.survey import Survey, SurveyResponse, AudioBlob
+from app.schemas.survey import AudioOut
+from app.services.audio_service import audio_service, AudioTooLarge
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single ``bytes=`` range; None serves the whole blob"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _content_disposition(filename: str) -> str:
+    """``inline`` with an ASCII fallback ``filename`` and the exact UTF-8 name as RFC 5987 ``filename*``"""
+    fallback = "".join(
+        "\\" + char if char in '"\\' else char if " " <= char <= "~" else "_" for char in filename
+    )
+    return f"inline; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@router.post("/surveys/{survey_id}/responses/{response_id}/audio", response_model=AudioOut, status_code=201)
+async def upload_audio(
+    survey_id: int,
+    response_id: int,
+    question: str = Form(..., description="Question id or text"),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Attach an audio answer to a response as a multipart upload, replacing any earlier one"""
+    response = await db.scalar(select(SurveyResponse).options(undefer(SurveyResponse.audio_data)).where(
+        SurveyResponse.id == response_id,
+        SurveyResponse.survey_id == survey_id
+    ))
+    if not response:
+        raise HTTPException(status_code=404, detail="Response not found")
+    survey = await db.get(Survey, survey_id)
+    question_key = audio_service.question_key(survey, question)
+    if question_key is None:
+        raise HTTPException(status_code=422, detail=f"Survey has no question '{question}'")
+
+    async def chunks():
+        while chunk := await file.read(settings.AUDIO_CHUNK_SIZE):
+            yield chunk
+
+    try:
+        previous = (await db.scalars(select(AudioBlob.id).where(
+            AudioBlob.response_id == response_id,
+            AudioBlob.question_key == question_key
+        ))).all()
+        replaced = await audio_service.delete_blobs(db, list(previous))
+        blob = await audio_service.save_stream(db, response, question_key, chunks(), file.content_type, file.filename)
+        await db.commit()
+    except AudioTooLarge as e:
+        await db.rollback()
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error storing audio for response {response_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to store audio")
+    await audio_service.discard(replaced)
+
+    logger.info(f"Stored {blob.size_bytes} bytes of audio for response {response_id}")
+    return blob
+
+@router.get("/surveys/{survey_id}/responses/{response_id}/audio", response_model=List[AudioOut])
+async def list_audio(survey_id: int, response_id: int, db: AsyncSession = Depends(get_db)):
+    """List the audio answers stored for a response"""
+    return (await db.scalars(select(AudioBlob).where(
+        AudioBlob.response_id == response_id,
+        AudioBlob.survey_id == survey_id
+    ).order_by(AudioBlob.id))).all()
+
+@router.get("/surveys/{survey_id}/responses/{response_id}/audio/{audio_id}")
+async def get_audio(survey_id: int, response_id: int, audio_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Stream an audio answer, honouring single-range ``Range`` requests for seeking"""
+    blob = await db.scalar(select(AudioBlob).where(
+        AudioBlob.id == audio_id,
+        AudioBlob.response_id == response_id,
+        AudioBlob.survey_id == survey_id
+    ))
+    if not blob:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    headers = {"Accept-Ranges": "bytes"}
+    if blob.filename:
+        headers["Content-Disposition"] = _content_disposition(blob.filename)
+    byte_range = _parse_range(request.headers.get("range"), blob.size_bytes)
+    if byte_range is None:
+        headers["Content-Length"] = str(blob.size_bytes)
+        return StreamingResponse(audio_service.read(blob), media_type=blob.content_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{blob.size_bytes}"
+    return StreamingResponse(
+        audio_service.read(blob, start, end - start + 1),
+        status_code=206,
+        media_type=blob.content_type,
+        headers=headers
+    )
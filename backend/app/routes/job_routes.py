@@ -0,0 +1,123 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import json
+import logging
+
+from app.core.database import get_db
+from app.models.job import Job
+from app.models.survey import Survey
+from app.schemas.survey import JobCreate, JobOut
+from app.services.job_service import job_service, JOB_TYPES, FINISHED, QUEUED, SUCCEEDED
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def _job_out(job: Job) -> JobOut:
+    return JobOut(
+        id=job.id,
+        type=job.job_type,
+        status=job.status,
+        survey_id=job.survey_id,
+        params=job.params,
+        attempts=job.attempts,
+        result=job.result,
+        error=job.error,
+        artifact_url=f"/api/jobs/{job.id}/artifact" if job.artifact_key else None,
+        artifact_content_type=job.artifact_content_type,
+        artifact_size=job.artifact_size,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+@router.post("/jobs", response_model=JobOut, status_code=202)
+async def create_job(body: JobCreate, db: AsyncSession = Depends(get_db)):
+    """Queue an analytics, export or question generation job; poll ``/jobs/{id}`` or
+    subscribe to ``/jobs/{id}/events`` and download the artifact when it succeeded"""
+    if body.survey_id is not None:
+        survey = await db.scalar(select(Survey).where(Survey.id == body.survey_id))
+        if not survey:
+            raise HTTPException(status_code=404, detail="Survey not found")
+    try:
+        job = await job_service.create(db, body.type, body.survey_id, body.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(_job_out(job)),
+        headers={"Location": f"/api/jobs/{job.id}"}
+    )
+
+@router.get("/jobs", response_model=List[JobOut])
+async def list_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$"),
+    type: Optional[str] = Query(None, pattern=f"^({'|'.join(JOB_TYPES)})$"),
+    survey_id: Optional[int] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """Most recent jobs first"""
+    jobs = await job_service.list_jobs(db, status, type, survey_id, limit)
+    return [_job_out(job) for job in jobs]
+
+@router.get("/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(job)
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Server-Sent Events: a ``status`` event with the job whenever its status
+    changes; the stream ends once the job has finished"""
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for update in job_service.watch(job_id):
+            if update is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(jsonable_encoder(_job_out(update)))}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/jobs/{job_id}/artifact")
+async def get_job_artifact(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Download what a succeeded job produced"""
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    path = job_service.artifact_path(job.artifact_key)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Job artifact is gone")
+    extension = job.artifact_key.rsplit(".", 1)[-1]
+    filename = f"survey_{job.survey_id}_{job.job_type}.{extension}" if job.survey_id else f"{job.job_type}.{extension}"
+    return FileResponse(path, media_type=job.artifact_content_type, filename=filename)
+
+@router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Cancel a queued job, or delete a finished one and its artifact"""
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == QUEUED and await job_service.cancel(db, job):
+        return {"message": "Job cancelled", "job_id": job_id}
+    await db.refresh(job)
+    if job.status not in FINISHED:
+        raise HTTPException(status_code=409, detail="Job is running; it can be deleted once it finished")
+    await job_service.delete(db, job)
+    return {"message": "Job deleted", "job_id": job_id}
@@ -1,162 +1,375 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, Response
+from fastapi.responses import StreamingResponse, JSONResponse
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
 from typing import List, Optional
+import asyncio
+import json
 import logging
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.models.survey import Survey, SurveyResponse
-from app.schemas.survey import SurveyResponseCreate, ResponseOut
+from app.core.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, parse_cursor_time
+from app.models.survey import Survey, SurveyResponse, ResponseIdempotencyKey
+from app.schemas.survey import SurveyResponseCreate, ResponseOut, BatchResponseItem, BatchResponseOut, SearchResultOut
+from app.services.aggregate_service import aggregate_service
+from app.services.cache_service import cache_service
+from app.services.live_service import live_service
+from app.services.counter_service import counter_service
+from app.services.audio_service import audio_service
+from app.services.validation_service import validation_service
+from app.services.search_service import search_service
+from app.services.text_analytics_service import text_analytics_service
+from app.services.sketch_service import sketch_service
+from app.services.crosstab_service import crosstab_service
+from app.services.response_outbox import ResponseOutbox
+from app.services.survey_schema import SurveySchema, survey_schemas
+from app.services.export_service import export_service, EXPORT_FORMATS
+from app.services.ingestion_service import ingestion_service, ingestion_queue
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def _client_ip(request: Request) -> str:
+    if request.client:
+        return request.client.host
+    if "x-forwarded-for" in request.headers:
+        return request.headers["x-forwarded-for"].split(",")[0].strip()
+    return "unknown"
+
+def _response_out(schema: SurveySchema, response: SurveyResponse) -> ResponseOut:
+    """API shape of a stored response, answers keyed by question text"""
+    return ResponseOut(
+        id=response.id,
+        survey_id=response.survey_id,
+        responses=schema.decode(response.responses, response.answer_encoding),
+        submitted_at=response.submitted_at,
+        survey_version_id=response.survey_version_id
+    )
+
 @router.post("/surveys/{survey_id}/responses", response_model=ResponseOut, status_code=201)
 async def submit_response(
     survey_id: int,
     response_data: SurveyResponseCreate,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Submit a response to a survey"""
     # Check if survey exists and is active
-    survey = db.query(Survey).filter(
+    survey = await db.scalar(select(Survey).where(
         Survey.id == survey_id, 
         Survey.is_active == True
-    ).first()
+    ))
     
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found or inactive")
     
+    response_data.responses, response_data.audio_data = audio_service.split_answers(
+        survey, response_data.responses, response_data.audio_data
+    )
+    errors = validation_service.validate(survey, response_data.responses, response_data.audio_data)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    # Checked before queueing too, so a queued submission is never accepted only to be dropped later
+    audio_error = audio_service.validate_inline(response_data.audio_data)
+    if audio_error:
+        raise HTTPException(status_code=422, detail=audio_error)
+    
+    if ingestion_queue.enabled:
+        item = BatchResponseItem(responses=response_data.responses, audio_data=response_data.audio_data)
+        try:
+            receipt_id = ingestion_queue.submit(survey_id, item, _client_ip(request))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later", headers={"Retry-After": "1"})
+        return JSONResponse(
+            status_code=202,
+            content={"survey_id": survey_id, "receipt_id": receipt_id, "status": "queued"}
+        )
+    
     try:
-        # Get client IP
-        client_ip = "unknown"
-        if request.client:
-            client_ip = request.client.host
-        elif "x-forwarded-for" in request.headers:
-            client_ip = request.headers["x-forwarded-for"].split(",")[0].strip()
-        
         # Create response record
+        schema = survey_schemas.get(survey)
+        stored, encoding = schema.encode(response_data.responses)
         db_response = SurveyResponse(
             survey_id=survey_id,
-            responses=response_data.responses,
-            audio_data=response_data.audio_data,
-            respondent_ip=client_ip
+            responses=stored,
+            answer_encoding=encoding,
+            survey_version_id=survey.current_version_id,
+            audio_data=None,
+            respondent_ip=_client_ip(request)
         )
         
         db.add(db_response)
-        db.commit()
-        db.refresh(db_response)
+        await db.flush()
+        await audio_service.save_inline(db, survey, db_response, response_data.audio_data)
+        await db.run_sync(aggregate_service.apply_response, survey, db_response)
+        await db.run_sync(counter_service.record, survey_id, [db_response.submitted_at])
+        await db.run_sync(ResponseOutbox.publish, survey_id, [db_response.id])
+        await db.run_sync(search_service.index_responses, survey, [(db_response.id, response_data.responses)])
+        await db.commit()
+        await cache_service.invalidate_responses(survey_id)
+        await live_service.notify(survey_id)
         
         logger.info(f"Response submitted for survey {survey_id} with ID: {db_response.id}")
-        return db_response
+        return _response_out(schema, db_response)
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error submitting response: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to submit response")
 
+@router.post("/surveys/{survey_id}/responses:batch", response_model=BatchResponseOut)
+async def submit_response_batch(
+    survey_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Submit many responses at once as a JSON array or NDJSON body"""
+    survey = await db.scalar(select(Survey).where(
+        Survey.id == survey_id, 
+        Survey.is_active == True
+    ))
+    
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found or inactive")
+    
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        if content_type in NDJSON_CONTENT_TYPES:
+            payload = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        else:
+            payload = json.loads(body or b"[]")
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed batch body: {str(e)}")
+    
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Batch body must be a JSON array or NDJSON")
+    if len(payload) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.BATCH_MAX_ITEMS} items")
+    
+    items = []
+    results = []
+    for index, raw in enumerate(payload):
+        result = {"index": index, "status": "invalid"}
+        try:
+            item = BatchResponseItem.model_validate(raw)
+            result["idempotency_key"] = item.idempotency_key
+            item.responses, item.audio_data = audio_service.split_answers(survey, item.responses, item.audio_data)
+            errors = validation_service.validate(survey, item.responses, item.audio_data)
+            if errors:
+                item = None
+                result["errors"] = errors
+        except ValidationError as e:
+            item = None
+            result["errors"] = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+        items.append(item)
+        results.append(result)
+    
+    try:
+        await ingestion_service.insert_batch(db, survey, items, [_client_ip(request)] * len(items), results)
+        await db.commit()
+        await cache_service.invalidate_responses(survey_id)
+        await live_service.notify(survey_id)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Concurrent upload with the same idempotency keys, retry the batch")
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error submitting response batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to submit responses")
+    
+    return {
+        "survey_id": survey_id,
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "failed": sum(1 for r in results if r["status"] == "invalid"),
+        "results": results
+    }
+
+@router.get("/surveys/{survey_id}/responses/receipts/{receipt_id}")
+async def get_receipt(
+    survey_id: int,
+    receipt_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Resolve a queued submission receipt to its stored response"""
+    response_id = await db.scalar(select(ResponseIdempotencyKey.response_id).where(
+        ResponseIdempotencyKey.survey_id == survey_id,
+        ResponseIdempotencyKey.idempotency_key == receipt_id
+    ))
+    if response_id is not None:
+        return {"receipt_id": receipt_id, "status": "stored", "response_id": response_id}
+    if ingestion_queue.is_pending(receipt_id):
+        return {"receipt_id": receipt_id, "status": "queued", "response_id": None}
+    raise HTTPException(status_code=404, detail="Receipt not found")
+
 @router.get("/surveys/{survey_id}/responses", response_model=List[ResponseOut])
 async def get_responses(
     survey_id: int,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db)
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all responses for a survey with pagination"""
+    """Get responses for a survey, oldest first, with keyset (after=) or offset (skip=) pagination"""
+    try:
+        position = decode_cursor(after, "submitted_at", "id") if after else None
+        after_time = parse_cursor_time(position["submitted_at"]) if position else None
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Verify survey exists
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
     
     try:
-        responses = db.query(SurveyResponse).filter(
+        query = select(SurveyResponse).where(
             SurveyResponse.survey_id == survey_id
-        ).offset(skip).limit(limit).all()
+        ).order_by(SurveyResponse.submitted_at, SurveyResponse.id)
+        if position:
+            query = query.where(
+                tuple_(SurveyResponse.submitted_at, SurveyResponse.id) > tuple_(after_time, position["id"])
+            )
+        else:
+            # OFFSET paging is kept for backward compatibility only
+            query = query.offset(skip)
         
-        return responses
+        responses = (await db.scalars(query.limit(limit))).all()
+        if len(responses) == limit:
+            last = responses[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"submitted_at": last.submitted_at, "id": last.id})
+        schema = survey_schemas.get(survey)
+        return [_response_out(schema, r) for r in responses]
         
     except Exception as e:
         logger.error(f"Error fetching responses: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch responses")
 
+# Registered before /responses/{response_id} so "export" is not parsed as an id
+@router.get("/surveys/{survey_id}/responses/export")
+async def export_responses(
+    survey_id: int,
+    format: str = Query("json", pattern="^(json|csv|ndjson|parquet)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream responses as JSON, CSV, NDJSON or Parquet"""
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    if format == "parquet" and not export_service.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+    
+    filename = f"survey_{survey_id}_responses.{format}"
+    return StreamingResponse(
+        export_service.stream(survey, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/surveys/{survey_id}/responses/search", response_model=List[SearchResultOut])
+async def search_responses(
+    survey_id: int,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find; end a word with * to match prefixes"),
+    question: Optional[str] = Query(None, description="Only search answers to this question (text or id)"),
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search over free-text answers, best matches first"""
+    try:
+        offset = decode_cursor(after, "offset")["offset"] if after else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not search_service.terms(q):
+        raise HTTPException(status_code=400, detail="Query has no searchable words")
+    
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    question_key = None
+    if question is not None:
+        schema = survey_schemas.get(survey)
+        if question in schema.text_by_id:
+            question_key = question
+        else:
+            question_key = schema.id_by_text.get(question) or question
+    
+    try:
+        results = await search_service.search(db, survey, q, question_key, offset, limit)
+    except Exception as e:
+        logger.error(f"Error searching responses for survey {survey_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search responses")
+    
+    if len(results) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"offset": offset + limit})
+    return results
+
 @router.get("/surveys/{survey_id}/responses/{response_id}", response_model=ResponseOut)
 async def get_response(
     survey_id: int, 
     response_id: int, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific response by ID"""
-    response = db.query(SurveyResponse).filter(
+    response = await db.scalar(select(SurveyResponse).where(
         SurveyResponse.id == response_id,
         SurveyResponse.survey_id == survey_id
-    ).first()
+    ))
     
     if not response:
         raise HTTPException(status_code=404, detail="Response not found")
     
-    return response
+    survey = await db.get(Survey, survey_id)
+    return _response_out(survey_schemas.get(survey), response)
 
 @router.delete("/surveys/{survey_id}/responses/{response_id}")
 async def delete_response(
     survey_id: int, 
     response_id: int, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a specific response"""
-    response = db.query(SurveyResponse).filter(
+    response = await db.scalar(select(SurveyResponse).where(
         SurveyResponse.id == response_id,
         SurveyResponse.survey_id == survey_id
-    ).first()
+    ))
     
     if not response:
         raise HTTPException(status_code=404, detail="Response not found")
     
     try:
-        db.delete(response)
-        db.commit()
+        survey = await db.get(Survey, survey_id)
+        await db.execute(delete(ResponseIdempotencyKey).where(ResponseIdempotencyKey.response_id == response_id))
+        audio_keys = await audio_service.delete_for_response(db, response_id)
+        await db.run_sync(search_service.remove_responses, [response_id])
+        await db.delete(response)
+        await db.flush()
+        await db.run_sync(aggregate_service.retract_response, survey, response)
+        await db.run_sync(text_analytics_service.retract_response, survey, response)
+        await db.run_sync(sketch_service.retract_response, survey, response)
+        await db.run_sync(crosstab_service.retract_response, survey, response)
+        await db.run_sync(counter_service.retract, survey.id, response.submitted_at)
+        await db.commit()
+        await cache_service.invalidate_responses(survey.id)
+        await live_service.notify(survey.id)
+        await audio_service.discard(audio_keys)
         
         logger.info(f"Deleted response ID: {response_id}")
         return {"message": "Response deleted successfully", "response_id": response_id}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting response {response_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to delete response")
-
-@router.get("/surveys/{survey_id}/responses/export")
-async def export_responses(survey_id: int, db: Session = Depends(get_db)):
-    """Export responses in a format suitable for CSV/Excel"""
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
-    if not survey:
-        raise HTTPException(status_code=404, detail="Survey not found")
-    
-    responses = db.query(SurveyResponse).filter(
-        SurveyResponse.survey_id == survey_id
-    ).all()
-    
-    if not responses:
-        return {"message": "No responses to export", "data": []}
-    
-    # Prepare export data
-    export_data = []
-    for response in responses:
-        row = {
-            "response_id": response.id,
-            "submitted_at": response.submitted_at.isoformat(),
-            "respondent_ip": response.respondent_ip
-        }
-        
-        # Add question responses
-        for question in survey.questions:
-            question_text = question.get("text", "")
-            answer = response.responses.get(question_text, "")
-            row[f"Q: {question_text}"] = answer
-        
-        export_data.append(row)
-    
-    return {
-        "survey_title": survey.title,
-        "export_timestamp": str(datetime.utcnow()),
-        "total_responses": len(export_data),
-        "data": export_data
-    }
@@ -1,78 +1,116 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 
 from app.core.database import get_db
+from app.core.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 from app.models.survey import Survey
-from app.schemas.survey import SurveyCreate, SurveyUpdate, SurveyOut
+from app.schemas.survey import SurveyCreate, SurveyUpdate, SurveyOut, SurveyVersionOut
+from app.services.aggregate_service import aggregate_service
+from app.services.cache_service import cache_service
+from app.services.live_service import live_service
+from app.services.survey_schema import assign_question_ids
+from app.services.version_service import version_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/surveys", response_model=SurveyOut, status_code=201)
-async def create_survey(survey: SurveyCreate, db: Session = Depends(get_db)):
+async def create_survey(survey: SurveyCreate, db: AsyncSession = Depends(get_db)):
     """Create a new survey"""
     try:
+        questions = assign_question_ids([q.dict(exclude_none=True) for q in survey.questions])
         db_survey = Survey(
             title=survey.title,
             description=survey.description,
-            questions=[q.dict() for q in survey.questions]
+            questions=questions
         )
         
         db.add(db_survey)
-        db.commit()
-        db.refresh(db_survey)
+        await db.flush()
+        await version_service.add_version(db, db_survey, questions)
+        await db.run_sync(aggregate_service.prepare_questions, db_survey, False)
+        await db.commit()
+        await db.refresh(db_survey)
+        await cache_service.invalidate_survey(db_survey.id)
         
         logger.info(f"Created survey with ID: {db_survey.id}")
         return db_survey
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating survey: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to create survey")
 
 @router.get("/surveys", response_model=List[SurveyOut])
 async def get_surveys(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     active_only: bool = Query(True),
-    db: Session = Depends(get_db)
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get list of surveys with pagination"""
+    """Get list of surveys with keyset (after=) or offset (skip=) pagination"""
     try:
-        query = db.query(Survey)
+        position = decode_cursor(after, "id") if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    cache_key = await cache_service.survey_list_key(skip, limit, active_only, after)
+    cached = await cache_service.get(cache_key)
+    if cached:
+        return cache_service.respond(request, cached)
+    
+    try:
+        query = select(Survey).order_by(Survey.id)
         if active_only:
-            query = query.filter(Survey.is_active == True)
+            query = query.where(Survey.is_active == True)
+        if position:
+            query = query.where(Survey.id > position["id"])
+        else:
+            # OFFSET paging is kept for backward compatibility only
+            query = query.offset(skip)
             
-        surveys = query.offset(skip).limit(limit).all()
-        return surveys
+        surveys = (await db.scalars(query.limit(limit))).all()
+        headers = {}
+        if len(surveys) == limit:
+            headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": surveys[-1].id})
+        payload = [SurveyOut.model_validate(s) for s in surveys]
+        return cache_service.respond(request, await cache_service.put(cache_key, payload, headers))
         
     except Exception as e:
         logger.error(f"Error fetching surveys: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch surveys")
 
 @router.get("/surveys/{survey_id}", response_model=SurveyOut)
-async def get_survey(survey_id: int, db: Session = Depends(get_db)):
+async def get_survey(survey_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Get a specific survey by ID"""
-    survey = db.query(Survey).filter(
+    cache_key = cache_service.survey_key(survey_id)
+    cached = await cache_service.get(cache_key)
+    if cached:
+        return cache_service.respond(request, cached)
+    
+    survey = await db.scalar(select(Survey).where(
         Survey.id == survey_id, 
         Survey.is_active == True
-    ).first()
+    ))
     
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
     
-    return survey
+    return cache_service.respond(request, await cache_service.put(cache_key, SurveyOut.model_validate(survey)))
 
 @router.put("/surveys/{survey_id}", response_model=SurveyOut)
 async def update_survey(
     survey_id: int, 
     survey_update: SurveyUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update an existing survey"""
-    db_survey = db.query(Survey).filter(Survey.id == survey_id).first()
+    db_survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
     
     if not db_survey:
         raise HTTPException(status_code=404, detail="Survey not found")
@@ -81,57 +119,86 @@ async def update_survey(
         update_data = survey_update.dict(exclude_unset=True)
         
         if "questions" in update_data:
-            update_data["questions"] = [q.dict() for q in survey_update.questions]
+            questions = assign_question_ids(
+                [q.dict(exclude_none=True) for q in survey_update.questions], db_survey.questions
+            )
+            del update_data["questions"]
+            if questions != db_survey.questions:
+                await version_service.add_version(db, db_survey, questions)
+                await db.run_sync(aggregate_service.prepare_questions, db_survey)
         
         for key, value in update_data.items():
             setattr(db_survey, key, value)
             
-        db.commit()
-        db.refresh(db_survey)
+        await db.commit()
+        await db.refresh(db_survey)
+        await cache_service.invalidate_survey(survey_id)
+        await live_service.notify(survey_id)
         
         logger.info(f"Updated survey ID: {survey_id}")
         return db_survey
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error updating survey {survey_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to update survey")
 
 @router.delete("/surveys/{survey_id}")
-async def delete_survey(survey_id: int, db: Session = Depends(get_db)):
+async def delete_survey(survey_id: int, db: AsyncSession = Depends(get_db)):
     """Soft delete a survey (set is_active to False)"""
-    db_survey = db.query(Survey).filter(Survey.id == survey_id).first()
+    db_survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
     
     if not db_survey:
         raise HTTPException(status_code=404, detail="Survey not found")
     
     try:
         db_survey.is_active = False
-        db.commit()
+        await db.commit()
+        await cache_service.invalidate_survey(survey_id)
+        await live_service.notify(survey_id)
         
         logger.info(f"Deleted survey ID: {survey_id}")
         return {"message": "Survey deleted successfully", "survey_id": survey_id}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting survey {survey_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to delete survey")
 
+@router.get("/surveys/{survey_id}/versions", response_model=List[SurveyVersionOut])
+async def get_survey_versions(survey_id: int, db: AsyncSession = Depends(get_db)):
+    """List every question snapshot of a survey, oldest first"""
+    versions = await version_service.list_versions(db, survey_id)
+    if not versions and not await db.get(Survey, survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return versions
+
+@router.get("/surveys/{survey_id}/versions/{version_number}", response_model=SurveyVersionOut)
+async def get_survey_version(survey_id: int, version_number: int, db: AsyncSession = Depends(get_db)):
+    """Get one question snapshot of a survey"""
+    version = await version_service.get_version(db, survey_id, version_number)
+    if not version:
+        raise HTTPException(status_code=404, detail="Survey version not found")
+    return version
+
 @router.get("/surveys/{survey_id}/stats")
-async def get_survey_stats(survey_id: int, db: Session = Depends(get_db)):
+async def get_survey_stats(survey_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Get basic stats for a survey"""
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
+    cache_key = cache_service.survey_key(survey_id, "stats")
+    cached = await cache_service.get(cache_key)
+    if cached:
+        return cache_service.respond(request, cached)
+    
+    survey = await db.scalar(select(Survey).where(Survey.id == survey_id))
     
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
     
-    response_count = len(survey.responses) if survey.responses else 0
-    
-    return {
+    return cache_service.respond(request, await cache_service.put(cache_key, {
         "survey_id": survey_id,
         "title": survey.title,
         "question_count": len(survey.questions),
-        "response_count": response_count,
+        "response_count": survey.response_count,
         "created_at": survey.created_at,
         "is_active": survey.is_active
-    }
+    }))
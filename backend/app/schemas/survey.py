@@ -3,10 +3,15 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 class QuestionCreate(BaseModel):
+    # Assigned by the server; send it back when updating so renamed questions keep their answers
+    id: Optional[str] = Field(None, max_length=64)
     text: str
     type: str = Field(..., pattern="^(text|multiple_choice|rating|yes_no|audio|number)$")
     options: Optional[List[str]] = []
     required: bool = True
+    # Accepted range for rating (default 0-10) and number questions
+    min: Optional[float] = None
+    max: Optional[float] = None
 
 class SurveyCreate(BaseModel):
     title: str
@@ -26,6 +31,20 @@ class SurveyOut(BaseModel):
     questions: List[Dict[str, Any]]
     created_at: datetime
     is_active: bool
+    response_count: int = 0
+    last_response_at: Optional[datetime] = None
+    current_version_id: Optional[int] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class SurveyVersionOut(BaseModel):
+    id: int
+    survey_id: int
+    version_number: int
+    questions: List[Dict[str, Any]]
+    created_at: datetime
 
     model_config = {
         "from_attributes": True
@@ -35,11 +54,51 @@ class SurveyResponseCreate(BaseModel):
     responses: Dict[str, Any]
     audio_data: Optional[Dict[str, str]] = None
 
+class BatchResponseItem(SurveyResponseCreate):
+    idempotency_key: Optional[str] = Field(None, max_length=255)
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    response_id: Optional[int] = None
+    idempotency_key: Optional[str] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+
+class BatchResponseOut(BaseModel):
+    survey_id: int
+    created: int
+    duplicates: int
+    failed: int
+    results: List[BatchItemResult]
+
 class ResponseOut(BaseModel):
     id: int
     survey_id: int
     responses: Dict[str, Any]
     submitted_at: datetime
+    survey_version_id: Optional[int] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class SearchResultOut(BaseModel):
+    response_id: int
+    question: str
+    question_id: Optional[str] = None
+    # Matched words wrapped in [ ]
+    snippet: str
+    score: float
+    submitted_at: datetime
+
+class AudioOut(BaseModel):
+    id: int
+    response_id: int
+    question_key: str
+    content_type: str
+    filename: Optional[str] = None
+    size_bytes: int
+    created_at: datetime
 
     model_config = {
         "from_attributes": True
@@ -52,5 +111,33 @@ class AIGenerateRequest(BaseModel):
 class AnalyticsOut(BaseModel):
     survey_id: int
     title: str
+    # Version number when restricted to one version; None aggregates across versions
+    version: Optional[int] = None
     total_responses: int
+    # Respondent IPs seen, from a HyperLogLog sketch unless approximate is False
+    distinct_respondents: Optional[int] = None
+    approximate: Optional[bool] = None
     analytics: Dict[str, Any]
+
+class JobCreate(BaseModel):
+    # analytics (params: version, exact), export (params: format) or generate_questions (params: prompt, question_count)
+    type: str
+    survey_id: Optional[int] = None
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class JobOut(BaseModel):
+    id: str
+    type: str
+    status: str
+    survey_id: Optional[int] = None
+    params: Dict[str, Any]
+    attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Set once the job succeeded
+    artifact_url: Optional[str] = None
+    artifact_content_type: Optional[str] = None
+    artifact_size: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
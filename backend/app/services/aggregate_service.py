@@ -0,0 +1,291 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.survey import Survey, SurveyResponse
+from app.models.analytics import QuestionAggregate
+from app.services.analytics_service import AnalyticsService
+from app.services.survey_schema import survey_schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_TYPES = ("rating", "number", "multiple_choice", "yes_no")
+TEXT_SAMPLE_SIZE = 3
+REBUILD_BATCH_SIZE = 1000
+
+class _Accumulator:
+    """In-memory working copy of a QuestionAggregate row"""
+
+    def __init__(self, q_type: str):
+        self.q_type = q_type
+        self.response_count = 0
+        self.value_counts: Counter = Counter()
+        self.num_count = 0
+        self.num_sum = 0.0
+        self.num_sumsq = 0.0
+        self.text_count = 0
+        self.text_word_count = 0
+        self.text_samples: List[str] = []
+        self.text_longest: Optional[str] = None
+        self.text_shortest: Optional[str] = None
+        self.is_stale = False
+
+    @classmethod
+    def from_row(cls, row: QuestionAggregate) -> "_Accumulator":
+        acc = cls(row.question_type)
+        acc.response_count = row.response_count or 0
+        acc.value_counts = Counter(row.value_counts or {})
+        acc.num_count = row.num_count or 0
+        acc.num_sum = row.num_sum or 0.0
+        acc.num_sumsq = row.num_sumsq or 0.0
+        acc.text_count = row.text_count or 0
+        acc.text_word_count = row.text_word_count or 0
+        acc.text_samples = list(row.text_samples or [])
+        acc.text_longest = row.text_longest
+        acc.text_shortest = row.text_shortest
+        acc.is_stale = bool(row.is_stale)
+        return acc
+
+    def to_row(self, row: QuestionAggregate) -> None:
+        row.question_type = self.q_type
+        row.response_count = self.response_count
+        # Assign fresh containers so SQLAlchemy notices the JSON change
+        row.value_counts = {k: v for k, v in self.value_counts.items() if v > 0}
+        row.num_count = self.num_count
+        row.num_sum = self.num_sum
+        row.num_sumsq = self.num_sumsq
+        row.text_count = self.text_count
+        row.text_word_count = self.text_word_count
+        row.text_samples = list(self.text_samples)
+        row.text_longest = self.text_longest
+        row.text_shortest = self.text_shortest
+        row.is_stale = self.is_stale
+        row.updated_at = datetime.utcnow()
+
+    def add(self, answer: Any, sign: int = 1) -> None:
+        if answer is None:
+            return
+        self.response_count += sign
+        if self.q_type in ("rating", "number"):
+            num = AnalyticsService._parse_number(answer)
+            if num is None:
+                return
+            self.value_counts[str(num)] += sign
+            self.num_count += sign
+            self.num_sum += sign * num
+            self.num_sumsq += sign * num * num
+        elif self.q_type in ("multiple_choice", "yes_no"):
+            if answer:
+                self.value_counts[str(answer).strip()] += sign
+        elif self.q_type == "text":
+            text = str(answer).strip()
+            if not text:
+                return
+            self.text_count += sign
+            self.text_word_count += sign * len(text.split())
+            if sign > 0:
+                if len(self.text_samples) < TEXT_SAMPLE_SIZE:
+                    self.text_samples.append(text)
+                if self.text_longest is None or len(text) > len(self.text_longest):
+                    self.text_longest = text
+                if self.text_shortest is None or len(text) < len(self.text_shortest):
+                    self.text_shortest = text
+            elif text in self.text_samples or text in (self.text_longest, self.text_shortest):
+                # Extremes and samples cannot be un-applied; recompute on next read
+                self.is_stale = True
+
+    def summarize(self) -> Dict[str, Any]:
+        if self.q_type == "rating":
+            data = self._numeric_summary("No valid ratings")
+            if isinstance(data, dict):
+                data = {
+                    "average": data["average"],
+                    "median": data["median"],
+                    "min": data["min"],
+                    "max": data["max"],
+                    "distribution": {float(k): v for k, v in self.value_counts.items() if v > 0},
+                    "valid_responses": data["valid_responses"],
+                }
+            return {"data": data}
+        if self.q_type == "number":
+            return {"data": self._numeric_summary("No valid numbers")}
+        if self.q_type in ("multiple_choice", "yes_no"):
+            counter = Counter({k: v for k, v in self.value_counts.items() if v > 0})
+            total = sum(counter.values())
+            return {"data": {
+                "responses": dict(counter),
+                "percentages": {k: round((v / total)*100, 1) for k, v in counter.items()},
+                "most_common": counter.most_common(1)[0] if counter else None
+            }}
+        if self.q_type == "text":
+            return {"data": {
+                "total_responses": self.text_count,
+                "average_word_count": round(self.text_word_count/self.text_count, 1) if self.text_count else 0,
+                "sample_responses": list(self.text_samples),
+                "longest_response": self.text_longest or "",
+                "shortest_response": self.text_shortest or ""
+            }}
+        return {"data": f"{self.response_count} answers"}
+
+    def _numeric_summary(self, empty_message: str) -> Any:
+        histogram = sorted((float(k), v) for k, v in self.value_counts.items() if v > 0)
+        if not histogram or self.num_count <= 0:
+            return empty_message
+        average = self.num_sum / self.num_count
+        variance = max(self.num_sumsq / self.num_count - average * average, 0.0)
+        low, high = histogram[0][0], histogram[-1][0]
+        return {
+            "average": round(average, 2),
+            "median": round(AnalyticsService._histogram_median(histogram, self.num_count), 2),
+            "min": low,
+            "max": high,
+            "range": high - low,
+            "std_dev": round(variance ** 0.5, 2),
+            "valid_responses": self.num_count,
+        }
+
+class AggregateService:
+    """Keeps question_aggregates in step with survey_responses.
+
+    Rows are keyed by question id (question text for surveys without ids), so
+    questions sharing a text and renamed questions keep their own totals.
+    """
+
+    def apply_response(self, db: Session, survey: Survey, response: SurveyResponse) -> None:
+        """Add a flushed response to the survey aggregates (caller commits)"""
+        self._update(db, survey, [(response.responses, response.answer_encoding)], 1)
+
+    def apply_responses(self, db: Session, survey: Survey, stored: List[Tuple[Dict[str, Any], int]]) -> None:
+        """Add several flushed (responses, answer_encoding) pairs, locking the aggregate rows a single time"""
+        if stored:
+            self._update(db, survey, stored, 1)
+
+    def retract_response(self, db: Session, survey: Survey, response: SurveyResponse) -> None:
+        """Remove a flushed-as-deleted response from the survey aggregates (caller commits)"""
+        self._update(db, survey, [(response.responses, response.answer_encoding)], -1)
+
+    def prepare_questions(self, db: Session, survey: Survey, stale: bool = True) -> None:
+        """Give every question of the survey an aggregate row (caller commits).
+
+        Rows of new and retyped questions are marked stale, and the next read
+        rebuilds them; submits never rescan responses. ``stale=False`` is for
+        a survey without responses, whose empty rows are already exact.
+        """
+        rows = self._load_rows(db, survey.id, lock=True)
+        for question in survey.questions:
+            key = self._question_key(question)
+            q_type = question.get("type", "text")
+            row = rows.get(key)
+            if row is None:
+                row = QuestionAggregate(survey_id=survey.id, question_key=key)
+                db.add(row)
+                acc = _Accumulator(q_type)
+                acc.is_stale = stale
+                acc.to_row(row)
+            elif row.question_type != q_type:
+                row.question_type = q_type
+                row.is_stale = True
+        db.flush()
+
+    def compute_survey_analytics(self, db: Session, survey: Survey) -> Dict[str, Any]:
+        """Read analytics from the materialized aggregates, rebuilding stale or missing rows"""
+        rows = self._load_rows(db, survey.id)
+        if any(self._needs_rebuild(q, rows) for q in survey.questions):
+            try:
+                # Locked as a submit locks them: a response either waits for this
+                # commit and is applied on top, or commits before the scan below
+                rows = self._load_rows(db, survey.id, lock=True)
+                pending = [q for q in survey.questions if self._needs_rebuild(q, rows)]
+                if pending:
+                    rows.update(self._rebuild_questions(db, survey, pending, rows))
+                db.commit()
+            except IntegrityError:
+                # A concurrent first read inserted the same rows; theirs are as good
+                db.rollback()
+                rows = self._load_rows(db, survey.id)
+        # Maintained by counter_service in the submit and delete transactions
+        total_responses = survey.response_count or 0
+        if not total_responses:
+            return {"total_responses": 0, "analytics": {}, "message": "No responses yet"}
+        analytics = {}
+        for question in survey.questions:
+            q_text = question.get("text", "")
+            q_type = question.get("type", "text")
+            acc = _Accumulator.from_row(rows[self._question_key(question)])
+            if not acc.response_count:
+                analytics[q_text] = {"type": q_type, "response_count": 0, "data": "No responses"}
+                continue
+            analytics[q_text] = acc.summarize()
+            analytics[q_text]["type"] = q_type
+            analytics[q_text]["response_count"] = acc.response_count
+        return {"total_responses": total_responses, "analytics": analytics}
+
+    def rebuild_survey(self, db: Session, survey: Survey) -> None:
+        """Recompute every aggregate of a survey from its stored responses (caller commits)"""
+        rows = self._load_rows(db, survey.id, lock=True)
+        current = {self._question_key(q) for q in survey.questions}
+        for key, row in list(rows.items()):
+            if key not in current:
+                db.delete(row)
+                del rows[key]
+        self._rebuild_questions(db, survey, survey.questions, rows)
+
+    def _update(self, db: Session, survey: Survey, stored: List[Tuple[Dict[str, Any], int]], sign: int) -> None:
+        schema = survey_schemas.get(survey)
+        answer_sets = [schema.decode_by_key(responses, encoding) for responses, encoding in stored]
+        rows = self._load_rows(db, survey.id, lock=True)
+        for question in survey.questions:
+            if self._needs_rebuild(question, rows):
+                # The read that rebuilds this row scans the response as well
+                continue
+            key = self._question_key(question)
+            row = rows[key]
+            acc = _Accumulator.from_row(row)
+            for answers in answer_sets:
+                acc.add(answers.get(key), sign)
+            acc.to_row(row)
+        db.flush()
+
+    def _rebuild_questions(
+        self, db: Session, survey: Survey, questions: List[Dict[str, Any]], rows: Dict[str, QuestionAggregate]
+    ) -> Dict[str, QuestionAggregate]:
+        accumulators = {self._question_key(q): _Accumulator(q.get("type", "text")) for q in questions}
+        schema = survey_schemas.get(survey)
+        batches = db.query(SurveyResponse.responses, SurveyResponse.answer_encoding).filter(
+            SurveyResponse.survey_id == survey.id
+        ).order_by(SurveyResponse.id).yield_per(REBUILD_BATCH_SIZE)
+        for stored, encoding in batches:
+            answers = schema.decode_by_key(stored, encoding)
+            for key, acc in accumulators.items():
+                acc.add(answers.get(key))
+        rebuilt = {}
+        for key, acc in accumulators.items():
+            row = rows.get(key)
+            if row is None:
+                row = QuestionAggregate(survey_id=survey.id, question_key=key)
+                db.add(row)
+            acc.to_row(row)
+            rebuilt[key] = row
+        db.flush()
+        logger.info(f"Rebuilt {len(rebuilt)} question aggregates for survey {survey.id}")
+        return rebuilt
+
+    @staticmethod
+    def _load_rows(db: Session, survey_id: int, lock: bool = False) -> Dict[str, QuestionAggregate]:
+        query = db.query(QuestionAggregate).filter(QuestionAggregate.survey_id == survey_id)
+        if lock:
+            query = query.with_for_update()
+        return {row.question_key: row for row in query.all()}
+
+    @staticmethod
+    def _question_key(question: Dict[str, Any]) -> str:
+        return question.get("id") or question.get("text", "")
+
+    @classmethod
+    def _needs_rebuild(cls, question: Dict[str, Any], rows: Dict[str, QuestionAggregate]) -> bool:
+        row = rows.get(cls._question_key(question))
+        return row is None or row.is_stale or row.question_type != question.get("type", "text")
+
+aggregate_service = AggregateService()
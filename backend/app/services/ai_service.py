@@ -1,20 +1,69 @@
-import os
+import asyncio
+import hashlib
 import json
 import re
+import time
 import logging
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional
 import openai
 from app.core.config import settings
+from app.core.metrics import LLM_REQUEST_DURATION, LLM_TOKENS
+from app.services.cache_service import MemoryCache
 
 logger = logging.getLogger(__name__)
 
+VALID_TYPES = ["text", "multiple_choice", "rating", "yes_no", "number", "audio"]
+
 class AIService:
+    """Survey question generation over the OpenAI chat API.
+
+    Calls are async with a per-call timeout. The fallback model is hedged:
+    it starts if the primary has not answered within ``AI_HEDGE_DELAY``
+    seconds (or as soon as the primary fails) and the first good answer wins.
+    Successful results are cached by (prompt, count, models), and identical
+    requests already in flight share one upstream call.
+    """
+
     def __init__(self):
         openai.api_key = settings.OPENAI_API_KEY
-        self.primary_model = "gpt-4o-mini"
-        self.fallback_model = "gpt-4.1-nano"
+        if settings.OPENAI_API_BASE:
+            openai.api_base = settings.OPENAI_API_BASE
+        self.primary_model = settings.AI_PRIMARY_MODEL
+        self.fallback_model = settings.AI_FALLBACK_MODEL
+        self.cache = MemoryCache(settings.AI_CACHE_MAX_ENTRIES, settings.AI_CACHE_TTL_SECONDS)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.cache_hits = 0
+        self.upstream_calls = 0
+
+    async def generate_questions(self, prompt: str, question_count: int = 5) -> Dict[str, Any]:
+        key = self._cache_key(prompt, question_count)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return json.loads(cached)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_and_cache(key, prompt, question_count))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller disconnecting does not cancel the call the others wait on
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cache_hits": self.cache_hits, "upstream_calls": self.upstream_calls, "in_flight": len(self._in_flight)}
+
+    def _cache_key(self, prompt: str, question_count: int) -> str:
+        material = json.dumps([prompt, question_count, self.primary_model, self.fallback_model])
+        return "ai:questions:" + hashlib.sha256(material.encode()).hexdigest()
 
-    def generate_questions(self, prompt: str, question_count: int = 5) -> Dict[str, Any]:
+    async def _generate_and_cache(self, key: str, prompt: str, question_count: int) -> Dict[str, Any]:
+        result = await self._generate(prompt, question_count)
+        if result.get("success"):
+            await self.cache.set(key, json.dumps(result))
+        return result
+
+    @staticmethod
+    def _messages(prompt: str, question_count: int) -> List[Dict[str, str]]:
         system_message = f"""You are an expert survey creator. Generate exactly {question_count} professional survey questions based ONLY on this prompt:
 {prompt}
 Respond ONLY with a valid JSON array of questions. Each question must have:
@@ -27,37 +76,85 @@ Example response:
   {{"text": "How satisfied are you with our service?", "type": "rating", "options": [], "required": true}},
   {{"text": "Which features do you use most?", "type": "multiple_choice", "options": ["Feature A", "Feature B", "Feature C"], "required": true}}
 ]"""
-
-        messages = [
+        return [
             {"role": "system", "content": system_message},
             {"role": "user", "content": "Generate the questions now."}
         ]
 
+    async def _call_model(self, model: str, messages: List[Dict[str, str]]):
+        self.upstream_calls += 1
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            # Try primary model first
-            response = openai.ChatCompletion.create(
-                model=self.primary_model,
-                messages=messages,
-                max_tokens=800,
-                temperature=0.3
-            )
-        except Exception as e:
-            logger.warning(f"Primary model failed: {e}, falling back to {self.fallback_model}")
-            try:
-                # fallback
-                response = openai.ChatCompletion.create(
-                    model=self.fallback_model,
+            response = await asyncio.wait_for(
+                openai.ChatCompletion.acreate(
+                    model=model,
                     messages=messages,
                     max_tokens=800,
-                    temperature=0.3
-                )
-            except Exception as e2:
-                logger.error(f"Fallback model also failed: {e2}")
-                return {
-                    "success": False,
-                    "questions": [],
-                    "error": f"Both primary and fallback model calls failed: {e}, {e2}"
-                }
+                    temperature=0.3,
+                    request_timeout=settings.AI_REQUEST_TIMEOUT
+                ),
+                timeout=settings.AI_REQUEST_TIMEOUT
+            )
+            outcome = "ok"
+        except (asyncio.TimeoutError, openai.error.Timeout):
+            # Whichever of the client's and our own deadline fires first
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            # The losing side of a hedged pair
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_REQUEST_DURATION.observe(time.perf_counter() - started, model=model, mode="complete", outcome=outcome)
+        usage = response.get("usage") or {}
+        for kind in ("prompt", "completion"):
+            if usage.get(f"{kind}_tokens"):
+                LLM_TOKENS.inc(usage[f"{kind}_tokens"], model=model, kind=kind)
+        return response
+
+    async def _hedged_completion(self, messages: List[Dict[str, str]]):
+        """First successful completion of the primary and (possibly delayed) fallback model"""
+        primary = asyncio.ensure_future(self._call_model(self.primary_model, messages))
+        pending = {primary}
+        fallback: Optional[asyncio.Task] = None
+        errors: List[str] = []
+        try:
+            while pending:
+                wait = settings.AI_HEDGE_DELAY if fallback is None and settings.AI_HEDGE_DELAY >= 0 else None
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model = self.primary_model if task is primary else self.fallback_model
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        errors.append(f"{model}: {e}")
+                        logger.warning(f"Model {model} failed: {e}")
+                        continue
+                    return model, response
+                if fallback is None and (not done or primary.done()):
+                    if done:
+                        logger.warning(f"Primary model failed, falling back to {self.fallback_model}")
+                    else:
+                        logger.info(f"Primary model slower than {settings.AI_HEDGE_DELAY}s, hedging with {self.fallback_model}")
+                    fallback = asyncio.ensure_future(self._call_model(self.fallback_model, messages))
+                    pending.add(fallback)
+        finally:
+            for task in (primary, fallback):
+                if task is not None and not task.done():
+                    task.cancel()
+        raise RuntimeError("; ".join(errors))
+
+    async def _generate(self, prompt: str, question_count: int) -> Dict[str, Any]:
+        try:
+            model, response = await self._hedged_completion(self._messages(prompt, question_count))
+        except Exception as e:
+            logger.error(f"Primary and fallback model calls failed: {e}")
+            return {
+                "success": False,
+                "questions": [],
+                "error": f"Both primary and fallback model calls failed: {e}"
+            }
 
         raw_output = response.choices[0].message.content
         logger.info(f"AI raw output: {raw_output[:200]}...")
@@ -75,24 +172,13 @@ Example response:
                     "raw_output": raw_output[:200]
                 }
 
-            validated_questions = []
-            valid_types = ["text", "multiple_choice", "rating", "yes_no", "number", "audio"]
-            for q in questions:
-                if isinstance(q, dict) and 'text' in q and 'type' in q:
-                    vq = {
-                        "text": str(q.get("text", "")).strip(),
-                        "type": str(q.get("type", "text")),
-                        "options": list(q.get("options", [])),
-                        "required": bool(q.get("required", True))
-                    }
-                    if vq["type"] not in valid_types:
-                        vq["type"] = "text"
-                    validated_questions.append(vq)
+            validated_questions = [vq for vq in map(self._validate_question, questions) if vq is not None]
 
             return {
                 "success": True,
                 "questions": validated_questions[:question_count],
-                "count": len(validated_questions)
+                "count": len(validated_questions),
+                "model": model
             }
 
         # fallback if JSON parsing fails
@@ -108,4 +194,183 @@ Example response:
             "raw_output": raw_output[:200]
         }
 
+    @staticmethod
+    def _validate_question(q: Any) -> Optional[Dict[str, Any]]:
+        if not (isinstance(q, dict) and 'text' in q and 'type' in q):
+            return None
+        vq = {
+            "text": str(q.get("text", "")).strip(),
+            "type": str(q.get("type", "text")),
+            "options": list(q.get("options") or []),
+            "required": bool(q.get("required", True))
+        }
+        if vq["type"] not in VALID_TYPES:
+            vq["type"] = "text"
+        return vq
+
+    async def stream_questions(self, prompt: str, question_count: int = 5) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``question`` events as soon as each array element is complete, then ``done`` or ``error``.
+
+        The fallback model is tried only if the primary fails before producing a
+        question, since questions already sent cannot be taken back.
+        """
+        key = self._cache_key(prompt, question_count)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            result = json.loads(cached)
+            for question in result["questions"]:
+                yield {"event": "question", "data": question}
+            yield {"event": "done", "data": {"count": len(result["questions"]), "model": result.get("model"), "cached": True}}
+            return
+
+        messages = self._messages(prompt, question_count)
+        errors: List[str] = []
+        for model in (self.primary_model, self.fallback_model):
+            questions: List[Dict[str, Any]] = []
+            stream = self._stream_model(model, messages, question_count)
+            try:
+                async for question in stream:
+                    questions.append(question)
+                    yield {"event": "question", "data": question}
+            except Exception as e:
+                errors.append(f"{model}: {e}")
+                logger.warning(f"Streaming from {model} failed: {e}")
+                if questions:
+                    yield {"event": "error", "data": {"error": f"Generation stopped early: {e}", "count": len(questions)}}
+                    return
+                continue
+            finally:
+                await stream.aclose()
+            if not questions:
+                errors.append(f"{model}: no valid questions in response")
+                continue
+            await self.cache.set(key, json.dumps({
+                "success": True, "questions": questions, "count": len(questions), "model": model
+            }))
+            yield {"event": "done", "data": {"count": len(questions), "model": model, "cached": False}}
+            return
+        yield {"event": "error", "data": {"error": "; ".join(errors), "count": 0}}
+
+    async def _stream_model(self, model: str, messages: List[Dict[str, str]], limit: int) -> AsyncIterator[Dict[str, Any]]:
+        """Validated questions as they complete, at most ``limit``.
+
+        The stream ends by itself after ``limit`` questions, so a consumer that
+        closes it early really went away (recorded as cancelled).
+        """
+        self.upstream_calls += 1
+        yielded = 0
+        parser = JsonArrayStream()
+        timeout = settings.AI_REQUEST_TIMEOUT
+        started = time.perf_counter()
+        outcome = "error"
+        content_chunks = 0
+        try:
+            chunks = await asyncio.wait_for(
+                openai.ChatCompletion.acreate(
+                    model=model,
+                    messages=messages,
+                    max_tokens=800,
+                    temperature=0.3,
+                    request_timeout=timeout,
+                    stream=True
+                ),
+                timeout=timeout
+            )
+            iterator = chunks.__aiter__()
+            try:
+                while not parser.finished and yielded < limit:
+                    try:
+                        # The timeout bounds each gap between tokens, not the whole stream
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    delta = chunk["choices"][0].get("delta", {}).get("content")
+                    if not delta:
+                        continue
+                    content_chunks += 1
+                    for element in parser.feed(delta):
+                        question = self._validate_question(element)
+                        if question is not None and yielded < limit:
+                            yielded += 1
+                            yield question
+            finally:
+                await chunks.aclose()
+            if not parser.started:
+                raise ValueError("response contained no JSON array")
+            outcome = "ok"
+        except (asyncio.TimeoutError, openai.error.Timeout):
+            # Whichever of the client's and our own deadline fires first
+            outcome = "timeout"
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away mid-stream
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_REQUEST_DURATION.observe(time.perf_counter() - started, model=model, mode="stream", outcome=outcome)
+            if content_chunks:
+                # Streamed chunks carry no usage; each content delta is one token
+                LLM_TOKENS.inc(content_chunks, model=model, kind="completion")
+
+class JsonArrayStream:
+    """Incremental parser for the first JSON array in a text stream.
+
+    ``feed`` takes arbitrary text fragments and returns the array elements
+    completed by them, decoded. Text before the opening bracket (model
+    chatter) is ignored and so is anything after the closing one.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._element: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[Any]:
+        elements = []
+        for char in text:
+            if self.finished:
+                break
+            if not self.started:
+                if char == "[":
+                    self.started = True
+                continue
+            if self._in_string:
+                self._element.append(char)
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0 and char in ",]":
+                self._complete(elements)
+                if char == "]":
+                    self.finished = True
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+            self._element.append(char)
+            if self._depth == 0 and char in "]}":
+                self._complete(elements)
+        return elements
+
+    def _complete(self, elements: List[Any]) -> None:
+        text = "".join(self._element).strip()
+        self._element = []
+        if not text:
+            return
+        try:
+            elements.append(json.loads(text))
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping malformed array element: {text[:80]}")
+
 ai_service = AIService()
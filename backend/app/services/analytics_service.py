@@ -1,23 +1,35 @@
+import math
+import re
 from collections import Counter
 from statistics import mean, median
-from typing import Dict, Any, List
-from app.models.survey import Survey, SurveyResponse
+from typing import Dict, Any, List, Optional
+from app.models.survey import Survey, SurveyResponse, SurveyVersion
+from app.services.survey_schema import survey_schemas
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Optional minus sign, digits with at most one decimal point ("-3", "4.5", ".5", "3.")
+NUMERIC_STRING = re.compile(r"-?([0-9]+\.?[0-9]*|\.[0-9]+)")
+
 class AnalyticsService:
     @staticmethod
-    def compute_survey_analytics(survey: Survey, responses: List[SurveyResponse]) -> Dict[str, Any]:
+    def compute_survey_analytics(
+        survey: Survey, responses: List[SurveyResponse], version: Optional[SurveyVersion] = None
+    ) -> Dict[str, Any]:
+        """Analytics under the current questions, or under ``version``'s when given"""
         if not responses:
             return {"total_responses": 0, "analytics": {}, "message": "No responses yet"}
         analytics = {}
         total_responses = len(responses)
+        schema = survey_schemas.get(survey)
+        names = survey_schemas.get(version) if version else None
+        answer_sets = [schema.decode(r.responses, r.answer_encoding, names) for r in responses]
         try:
-            for question in survey.questions:
+            for question in (version or survey).questions:
                 q_text = question.get("text", "")
                 q_type = question.get("type", "text")
-                answers = [r.responses.get(q_text) for r in responses if r.responses.get(q_text) is not None]
+                answers = [a.get(q_text) for a in answer_sets if a.get(q_text) is not None]
                 if not answers:
                     analytics[q_text] = {"type": q_type, "response_count": 0, "data": "No responses"}
                     continue
@@ -37,10 +49,36 @@ class AnalyticsService:
             logger.error(f"Error: {str(e)}")
         return {"total_responses": total_responses, "analytics": analytics}
 
+    @staticmethod
+    def _parse_number(answer: Any) -> Optional[float]:
+        """JSON numbers are taken as-is; strings must look like a plain decimal"""
+        if isinstance(answer, bool):
+            return None
+        if isinstance(answer, (int, float)):
+            return float(answer) if math.isfinite(answer) else None
+        if isinstance(answer, str) and NUMERIC_STRING.fullmatch(answer):
+            return float(answer)
+        return None
+
+    @staticmethod
+    def _histogram_median(histogram: List[tuple], total: int) -> float:
+        """Median of a sorted (value, count) histogram, matching statistics.median"""
+        lower_rank, upper_rank = (total - 1) // 2, total // 2
+        lower = upper = None
+        seen = 0
+        for value, count in histogram:
+            if lower is None and seen + count > lower_rank:
+                lower = value
+            if seen + count > upper_rank:
+                upper = value
+                break
+            seen += count
+        return (lower + upper) / 2
+
     @staticmethod
     def _analyze_rating(answers: List[Any]) -> Dict[str, Any]:
         try:
-            nums = [float(a) for a in answers if isinstance(a, (int, float, str)) and str(a).replace('.', '', 1).isdigit()]
+            nums = [n for n in (AnalyticsService._parse_number(a) for a in answers) if n is not None]
             if not nums:
                 return {"data": "No valid ratings"}
             return {"data": {
@@ -69,7 +107,7 @@ class AnalyticsService:
     @staticmethod
     def _analyze_numeric(answers: List[Any]) -> Dict[str, Any]:
         try:
-            nums = [float(a) for a in answers if isinstance(a, (int, float, str)) and str(a).replace('.', '', 1).isdigit()]
+            nums = [n for n in (AnalyticsService._parse_number(a) for a in answers) if n is not None]
             if not nums:
                 return {"data": "No valid numbers"}
             return {"data": {
@@ -0,0 +1,312 @@
+import asyncio
+import base64
+import binascii
+import os
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.survey import Survey, SurveyResponse, AudioBlob
+from app.services.survey_schema import survey_schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AudioTooLarge(ValueError):
+    pass
+
+class FilesystemAudioStore:
+    """Blobs as files under ``root``, written to a temporary name and renamed when complete"""
+
+    def __init__(self, root: str, chunk_size: int):
+        self.root = Path(root).resolve()
+        self.chunk_size = chunk_size
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid audio key: {key}")
+        return path
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        path = self._path(key)
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        partial = path.with_name(path.name + ".part")
+        size = 0
+        handle = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                await asyncio.to_thread(handle.write, chunk)
+        except BaseException:
+            handle.close()
+            partial.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(handle.close)
+        await asyncio.to_thread(os.replace, partial, path)
+        return size
+
+    async def read(self, key: str, start: int, length: int) -> AsyncIterator[bytes]:
+        handle = await asyncio.to_thread(open, self._path(key), "rb")
+        try:
+            await asyncio.to_thread(handle.seek, start)
+            while length > 0:
+                chunk = await asyncio.to_thread(handle.read, min(self.chunk_size, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+        finally:
+            handle.close()
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._path(key).unlink, missing_ok=True)
+
+class S3AudioStore:
+    """Blobs in an S3-compatible bucket (AWS, MinIO, LocalStack, moto server).
+
+    ``client`` is a boto3 S3 client. Uploads larger than ``part_size`` use a
+    multipart upload so at most one part is held in memory.
+    """
+
+    def __init__(self, client, bucket: str, prefix: str, part_size: int, chunk_size: int):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        # S3 rejects parts smaller than 5 MiB (except the last one)
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.chunk_size = chunk_size
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        key = self.prefix + key
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts: List[Dict[str, Any]] = []
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                buffer += chunk
+                if len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload = await asyncio.to_thread(self.client.create_multipart_upload, Bucket=self.bucket, Key=key)
+                        upload_id = upload["UploadId"]
+                    parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer.clear()
+            if upload_id is None:
+                await asyncio.to_thread(self.client.put_object, Bucket=self.bucket, Key=key, Body=bytes(buffer))
+                return size
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await asyncio.to_thread(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+            return size
+        except BaseException:
+            if upload_id is not None:
+                await asyncio.to_thread(self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, body: bytes) -> Dict[str, Any]:
+        part = await asyncio.to_thread(
+            self.client.upload_part, Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body
+        )
+        return {"PartNumber": number, "ETag": part["ETag"]}
+
+    async def read(self, key: str, start: int, length: int) -> AsyncIterator[bytes]:
+        if length <= 0:
+            return
+        obj = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self.prefix + key, Range=f"bytes={start}-{start + length - 1}"
+        )
+        body = obj["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self.prefix + key)
+
+class AudioService:
+    """Stores audio answers in a blob store and keeps only references on the response row.
+
+    Answers are keyed by question id (question text for surveys without
+    ids), so they follow a question through renames: ``AudioBlob.question_key``
+    and the keys of ``SurveyResponse.audio_data``, which map to
+    ``{"audio_id": ...}``. The bytes live in the store under
+    ``AudioBlob.storage_key``.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    async def save_stream(
+        self,
+        db: AsyncSession,
+        response: SurveyResponse,
+        question_key: str,
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> AudioBlob:
+        """Stream one answer into the store and reference it from ``response`` (caller commits).
+
+        ``response.audio_data`` must be loaded (it is deferred by default).
+        """
+        storage_key = f"surveys/{response.survey_id}/responses/{response.id}/{uuid.uuid4().hex}"
+        size = await self.store.save(storage_key, self._limited(chunks))
+        try:
+            blob = AudioBlob(
+                survey_id=response.survey_id,
+                response_id=response.id,
+                question_key=question_key,
+                storage_key=storage_key,
+                content_type=content_type or "application/octet-stream",
+                filename=filename,
+                size_bytes=size
+            )
+            db.add(blob)
+            await db.flush()
+            # Assign a fresh dict so SQLAlchemy notices the JSON change
+            references = dict(response.audio_data or {})
+            references[question_key] = {"audio_id": blob.id}
+            response.audio_data = references
+            await db.flush()
+        except Exception:
+            await self.discard([storage_key])
+            raise
+        return blob
+
+    async def save_inline(
+        self, db: AsyncSession, survey: Survey, response: SurveyResponse, audio_data: Optional[Dict[str, str]]
+    ) -> None:
+        """Move base64 answers from a JSON submission, keyed by question text or id, into the store (caller commits)"""
+        for question, encoded in (audio_data or {}).items():
+            content_type, raw = self.decode_inline(question, encoded)
+            question_key = self.question_key(survey, question) or question
+            await self.save_stream(db, response, question_key, self._single(raw), content_type)
+
+    @staticmethod
+    def question_key(survey: Optional[Survey], reference: str) -> Optional[str]:
+        """Storage key of the question whose id or text is ``reference``; None if there is none"""
+        questions = survey_schemas.get(survey).questions if survey else []
+        for q in questions:
+            if q.get("id") and q["id"] == reference:
+                return q["id"]
+        for q in questions:
+            if q.get("text", "") == reference:
+                return q.get("id") or q.get("text", "")
+        return None
+
+    @staticmethod
+    def audio_questions(survey: Survey) -> List[Dict[str, Any]]:
+        return [q for q in survey.questions or [] if q.get("type") == "audio"]
+
+    @classmethod
+    def split_answers(
+        cls, survey: Survey, responses: Dict[str, Any], audio_data: Optional[Dict[str, str]]
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, str]]]:
+        """Move answers to audio questions out of ``responses`` into ``audio_data``.
+
+        The web client records audio as a data URL and submits it as the
+        question's answer; it belongs in the store like ``audio_data``, where
+        an explicit entry for the same question wins.
+        """
+        moved = {}
+        for question in cls.audio_questions(survey):
+            key = question.get("text", "")
+            if isinstance(responses.get(key), str) and responses[key]:
+                moved[key] = responses[key]
+        if not moved:
+            return responses, audio_data
+        remaining = {key: value for key, value in responses.items() if key not in moved}
+        return remaining, {**moved, **(audio_data or {})}
+
+    @classmethod
+    def validate_inline(cls, audio_data: Optional[Dict[str, str]]) -> Optional[str]:
+        """Error message for the first undecodable answer, if any"""
+        try:
+            for question_key, encoded in (audio_data or {}).items():
+                cls.decode_inline(question_key, encoded)
+        except ValueError as e:
+            return str(e)
+        return None
+
+    @staticmethod
+    def decode_inline(question_key: str, encoded: str):
+        """(content type, bytes) of bare base64 or a ``data:audio/webm;base64,...`` URL"""
+        content_type = None
+        if encoded.startswith("data:") and "," in encoded:
+            header, encoded = encoded.split(",", 1)
+            content_type = header[5:].split(";")[0] or None
+        try:
+            raw = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError(f"Audio for '{question_key}' is not valid base64")
+        if len(raw) > settings.AUDIO_MAX_BYTES:
+            raise AudioTooLarge(f"Audio for '{question_key}' exceeds {settings.AUDIO_MAX_BYTES} bytes")
+        return content_type, raw
+
+    async def blobs_for_response(self, db: AsyncSession, response_id: int) -> List[AudioBlob]:
+        return (await db.scalars(
+            select(AudioBlob).where(AudioBlob.response_id == response_id).order_by(AudioBlob.id)
+        )).all()
+
+    def read(self, blob: AudioBlob, start: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        if length is None:
+            length = blob.size_bytes - start
+        return self.store.read(blob.storage_key, start, length)
+
+    async def delete_for_response(self, db: AsyncSession, response_id: int) -> List[str]:
+        """Drop a response's blob rows (caller commits, then discards the returned keys)"""
+        blobs = await self.blobs_for_response(db, response_id)
+        return await self.delete_blobs(db, [blob.id for blob in blobs])
+
+    async def delete_blobs(self, db: AsyncSession, blob_ids: List[int]) -> List[str]:
+        """Drop blob rows (caller commits, then discards the returned keys)"""
+        if not blob_ids:
+            return []
+        keys = (await db.scalars(select(AudioBlob.storage_key).where(AudioBlob.id.in_(blob_ids)))).all()
+        await db.execute(delete(AudioBlob).where(AudioBlob.id.in_(blob_ids)))
+        return list(keys)
+
+    async def discard(self, storage_keys: List[str]) -> None:
+        """Remove stored bytes once nothing references them; failures only leave orphans"""
+        for key in storage_keys:
+            try:
+                await self.store.delete(key)
+            except Exception as e:
+                logger.warning(f"Could not delete audio blob {key}: {str(e)}")
+
+    @staticmethod
+    async def _limited(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        size = 0
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > settings.AUDIO_MAX_BYTES:
+                raise AudioTooLarge(f"Audio exceeds {settings.AUDIO_MAX_BYTES} bytes")
+            yield chunk
+
+    @staticmethod
+    async def _single(raw: bytes) -> AsyncIterator[bytes]:
+        yield raw
+
+def _build_store():
+    if settings.AUDIO_STORAGE_BACKEND == "s3":
+        import boto3
+        client = boto3.client("s3", endpoint_url=settings.AUDIO_S3_ENDPOINT_URL or None)
+        return S3AudioStore(
+            client, settings.AUDIO_S3_BUCKET, settings.AUDIO_S3_PREFIX,
+            settings.AUDIO_S3_PART_SIZE, settings.AUDIO_CHUNK_SIZE
+        )
+    return FilesystemAudioStore(settings.AUDIO_STORAGE_PATH, settings.AUDIO_CHUNK_SIZE)
+
+audio_service = AudioService(_build_store())
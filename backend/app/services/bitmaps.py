@@ -0,0 +1,93 @@
+"""Segmented bitmaps over response ordinals.
+
+Indexed responses are numbered 0, 1, 2, ... per survey. A Bitmap keeps one
+Python int per segment of SEGMENT_SIZE ordinals, so intersections, unions
+and counts are big-integer operations implemented in C, and segments
+without bits take no space.
+"""
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+SEGMENT_SIZE = 1 << 16
+
+class Bitmap:
+    __slots__ = ("segments",)
+
+    def __init__(self, segments: Optional[Dict[int, int]] = None):
+        self.segments: Dict[int, int] = segments if segments is not None else {}
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        segments = {}
+        for segment, bits in self.segments.items():
+            both = bits & other.segments.get(segment, 0)
+            if both:
+                segments[segment] = both
+        return Bitmap(segments)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        segments = dict(self.segments)
+        for segment, bits in other.segments.items():
+            segments[segment] = segments.get(segment, 0) | bits
+        return Bitmap(segments)
+
+    def __bool__(self) -> bool:
+        return bool(self.segments)
+
+    def count(self) -> int:
+        return sum(bits.bit_count() for bits in self.segments.values())
+
+    def count_and(self, other: "Bitmap") -> int:
+        """``(self & other).count()`` without building the intersection"""
+        return sum((bits & other.segments.get(segment, 0)).bit_count() for segment, bits in self.segments.items())
+
+def segment_bits(positions: List[int]) -> int:
+    """The bits of one segment with ``positions`` set"""
+    flags = np.zeros(SEGMENT_SIZE, dtype=np.uint8)
+    flags[positions] = 1
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+def encode_segment(bits: int) -> bytes:
+    # Sparse segments compress to a few dozen bytes
+    return zlib.compress(bits.to_bytes(SEGMENT_SIZE // 8, "little"))
+
+def decode_segment(payload: Optional[bytes]) -> int:
+    return int.from_bytes(zlib.decompress(payload), "little") if payload else 0
+
+def encode_ids(ids: List[int]) -> bytes:
+    """Response ids in indexing order, delta-encoded so runs of close ids compress well"""
+    deltas = array("q", ids)
+    for index in range(len(deltas) - 1, 0, -1):
+        deltas[index] -= deltas[index - 1]
+    return zlib.compress(deltas.tobytes())
+
+def decode_ids(payload: bytes) -> List[int]:
+    deltas = array("q")
+    deltas.frombytes(zlib.decompress(payload))
+    return np.cumsum(np.frombuffer(deltas, dtype=np.int64)).tolist() if deltas else []
+
+def crosstab(base: Bitmap, dimensions: List[Dict[str, Bitmap]]) -> List[Tuple[Tuple[str, ...], int]]:
+    """How many of ``base`` have each combination of one value per dimension.
+
+    Combinations are explored depth first and a branch stops as soon as its
+    intersection is empty, so sparse tables cost far less than the product
+    of the dimensions' sizes. Empty cells are left out.
+    """
+    cells: List[Tuple[Tuple[str, ...], int]] = []
+    last = len(dimensions) - 1
+
+    def walk(mask: Bitmap, depth: int, values: Tuple[str, ...]) -> None:
+        for value, bitmap in dimensions[depth].items():
+            if depth == last:
+                count = mask.count_and(bitmap)
+                if count:
+                    cells.append((values + (value,), count))
+                continue
+            subset = mask & bitmap
+            if subset:
+                walk(subset, depth + 1, values + (value,))
+
+    if dimensions and base:
+        walk(base, 0, ())
+    return cells
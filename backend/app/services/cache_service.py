@@ -0,0 +1,199 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+SURVEY_VIEWS = ("detail", "stats", "analytics", "summary")
+
+class MemoryCache:
+    """Per-process LRU cache with a TTL on every entry"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Generation counters must never be evicted, so they live outside the LRU
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    async def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+class RedisCache:
+    """Shared cache for multi-worker deployments.
+
+    ``client`` is any ``redis.asyncio``-compatible client, which lets a local
+    stand-in such as ``fakeredis.aioredis.FakeRedis`` replace a real server.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "sms:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str) -> None:
+        await self.client.set(self.prefix + key, value, ex=max(1, int(self.ttl)))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+class CacheService:
+    """Caches rendered JSON for read endpoints and serves conditional GETs.
+
+    Entries are keyed per survey so writes can invalidate exactly what they
+    change; survey listings embed a generation number that any survey
+    definition change bumps. The ETag, a hash of the body, is the only
+    validator: a second-resolution Last-Modified cannot tell apart two
+    rebuilds within the same second.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def survey_key(survey_id: int, view: str = "detail") -> str:
+        return f"survey:{survey_id}:{view}"
+
+    async def survey_list_key(self, *parts: Any) -> Optional[str]:
+        if not self.enabled:
+            return None
+        generation = await self.backend.get_counter("surveys:list:generation")
+        return f"surveys:list:{generation}:" + ":".join(str(p) for p in parts)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            raw = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {str(e)}")
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def put(self, key: Optional[str], payload: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Render ``payload`` once and remember it with its validators"""
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":"))
+        entry = {
+            "body": body,
+            "etag": 'W/"' + hashlib.sha1(body.encode()).hexdigest() + '"',
+            "headers": headers or {},
+        }
+        if self.enabled and key is not None:
+            try:
+                await self.backend.set(key, json.dumps(entry))
+            except Exception as e:
+                logger.warning(f"Cache write failed for {key}: {str(e)}")
+        return entry
+
+    def respond(self, request: Request, entry: Dict[str, Any]) -> Response:
+        validators = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+        validators.update(entry.get("headers") or {})
+        if self._not_modified(request, entry):
+            return Response(status_code=304, headers=validators)
+        return Response(content=entry["body"], media_type="application/json", headers=validators)
+
+    async def invalidate_survey(self, survey_id: int) -> None:
+        """A survey's definition changed: drop every view of it and all listings"""
+        if not self.enabled:
+            return
+        await self.invalidate_responses(survey_id)
+        await self._safely(self.backend.incr, "surveys:list:generation")
+
+    async def invalidate_responses(self, survey_id: int) -> None:
+        """Responses were added or removed: drop that survey's views only.
+
+        Listings are left alone so a stream of submissions does not keep
+        emptying them for every survey; their response counters may lag by
+        up to ``CACHE_TTL_SECONDS``.
+        """
+        if not self.enabled:
+            return
+        await self._safely(self.backend.delete, *(self.survey_key(survey_id, view) for view in SURVEY_VIEWS))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": settings.CACHE_BACKEND, "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    async def _safely(operation, *args) -> None:
+        try:
+            await operation(*args)
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed: {str(e)}")
+
+    @staticmethod
+    def _not_modified(request: Request, entry: Dict[str, Any]) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or entry["etag"] in tags or entry["etag"][2:] in tags
+
+def _build_backend():
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+    if settings.CACHE_BACKEND == "redis":
+        import redis.asyncio as redis
+        return RedisCache(redis.Redis.from_url(settings.CACHE_URL), settings.CACHE_TTL_SECONDS)
+    return None
+
+cache_service = CacheService(_build_backend())
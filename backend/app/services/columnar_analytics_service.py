@@ -0,0 +1,126 @@
+from collections import Counter
+from typing import Dict, Any, List, Optional
+import numpy as np
+from app.models.survey import Survey, SurveyVersion
+from app.services.analytics_service import AnalyticsService, NUMERIC_STRING
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.25, 0.75, 0.9)
+_MISSING = object()
+
+class ColumnarAnalyticsService:
+    """NumPy implementation of AnalyticsService over decoded answer dicts.
+
+    Responses are decoded once into one column per question; numeric
+    columns become float64 arrays and every statistic is a vectorized
+    reduction over them.
+    """
+
+    def compute_survey_analytics(
+        self, survey: Survey, answer_sets: List[Dict[str, Any]], version: Optional[SurveyVersion] = None
+    ) -> Dict[str, Any]:
+        """``answer_sets`` must be keyed by the texts of ``version``'s questions when it is given"""
+        if not answer_sets:
+            return {"total_responses": 0, "analytics": {}, "message": "No responses yet"}
+        questions = [(q.get("text", ""), q.get("type", "text")) for q in (version or survey).questions]
+        columns = self._decode(answer_sets, [q_text for q_text, _ in questions])
+        analytics = {}
+        for q_text, q_type in questions:
+            answers = columns[q_text]
+            if not answers:
+                analytics[q_text] = {"type": q_type, "response_count": 0, "data": "No responses"}
+                continue
+            try:
+                if q_type == "rating":
+                    analytics[q_text] = self._numeric(answers, "No valid ratings", with_distribution=True)
+                elif q_type in ["multiple_choice", "yes_no"]:
+                    analytics[q_text] = self._choice(answers)
+                elif q_type == "number":
+                    analytics[q_text] = self._numeric(answers, "No valid numbers", with_distribution=False)
+                elif q_type == "text":
+                    analytics[q_text] = AnalyticsService._analyze_text(answers)
+                else:
+                    analytics[q_text] = {"data": f"{len(answers)} answers"}
+            except Exception as e:
+                logger.error(f"Error analyzing '{q_text}': {str(e)}")
+                analytics[q_text] = {"data": f"Error: {str(e)}"}
+            analytics[q_text]["type"] = q_type
+            analytics[q_text]["response_count"] = len(answers)
+        return {"total_responses": len(answer_sets), "analytics": analytics}
+
+    @staticmethod
+    def _decode(answer_sets: List[Dict[str, Any]], keys: List[str]) -> Dict[str, List[Any]]:
+        """Single pass over the rows, splitting answers into per-question columns"""
+        columns: Dict[str, List[Any]] = {key: [] for key in keys}
+        appenders = [(key, columns[key].append) for key in columns]
+        for answers in answer_sets:
+            get = (answers or {}).get
+            for key, append in appenders:
+                value = get(key, _MISSING)
+                if value is not _MISSING and value is not None:
+                    append(value)
+        return columns
+
+    @staticmethod
+    def to_array(answers: List[Any]) -> np.ndarray:
+        """float64 array of the valid numeric answers (see AnalyticsService._parse_number)"""
+        numbers = [a for a in answers if type(a) is int or type(a) is float]
+        strings = [a for a in answers if type(a) is str]
+        booleans = sum(1 for a in answers if type(a) is bool)
+        if len(numbers) + len(strings) + booleans < len(answers):
+            # Lists, dicts or subclasses: defer to the scalar rule
+            parsed = [AnalyticsService._parse_number(a) for a in answers]
+            return np.array([p for p in parsed if p is not None], dtype=np.float64)
+        match = NUMERIC_STRING.fullmatch
+        values = np.concatenate([
+            np.asarray(numbers, dtype=np.float64),
+            np.asarray([s for s in strings if match(s)], dtype=np.float64),
+        ])
+        return values[np.isfinite(values)]
+
+    @staticmethod
+    def _choice(answers: List[Any]) -> Dict[str, Any]:
+        """Count raw values first (C-level hashing), then normalize the few distinct labels"""
+        try:
+            # Keyed by type too, so True/1/1.0 keep their distinct labels
+            raw = Counter(zip(map(type, answers), answers))
+        except TypeError:
+            return AnalyticsService._analyze_choice(answers)
+        counter = Counter()
+        for (_, value), count in raw.items():
+            if value:
+                counter[str(value).strip()] += count
+        total = sum(counter.values())
+        return {"data": {
+            "responses": dict(counter),
+            "percentages": {k: round((v / total)*100, 1) for k, v in counter.items()},
+            "most_common": counter.most_common(1)[0] if counter else None
+        }}
+
+    def _numeric(self, answers: List[Any], empty_message: str, with_distribution: bool) -> Dict[str, Any]:
+        values = self.to_array(answers)
+        if not values.size:
+            return {"data": empty_message}
+        low, high = float(values.min()), float(values.max())
+        q_values = np.quantile(values, QUANTILES)
+        data = {
+            "average": round(float(values.mean()), 2),
+            "median": round(float(np.median(values)), 2),
+            "min": low,
+            "max": high,
+        }
+        if with_distribution:
+            distinct, counts = np.unique(values, return_counts=True)
+            data["distribution"] = {float(v): int(c) for v, c in zip(distinct, counts)}
+        else:
+            data["range"] = high - low
+        data.update({
+            "std_dev": round(float(values.std()), 2),
+            "quantiles": {f"p{int(q * 100)}": round(float(v), 2) for q, v in zip(QUANTILES, q_values)},
+            "valid_responses": int(values.size),
+        })
+        return {"data": data}
+
+columnar_analytics_service = ColumnarAnalyticsService()
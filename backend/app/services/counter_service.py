@@ -0,0 +1,181 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, update, delete, func, case, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.survey import Survey, SurveyResponse
+from app.models.analytics import ResponseCountBucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+MINUTE = "minute"
+HOUR = "hour"
+DAY = "day"
+GRANULARITIES = (MINUTE, HOUR, DAY)
+STEPS = {MINUTE: timedelta(minutes=1), HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+class CounterService:
+    """Keeps Survey.response_count, Survey.last_response_at and the minute,
+    hour and day response_count_buckets in step with survey_responses.
+
+    Every submission bumps one bucket of each granularity, so any timeline is a
+    range scan over a single granularity. Minute and hour buckets are pruned
+    once older than their retention; day buckets are kept for good.
+    """
+
+    def __init__(self):
+        self._compactor: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def bucket_start(moment: datetime, granularity: str = HOUR) -> datetime:
+        if granularity == MINUTE:
+            return moment.replace(second=0, microsecond=0)
+        if granularity == DAY:
+            return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def retained_from(granularity: str, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Oldest moment whose buckets of ``granularity`` are still kept (None: all of them)"""
+        now = now or datetime.utcnow()
+        if granularity == MINUTE:
+            return CounterService.bucket_start(now - timedelta(hours=settings.ROLLUP_MINUTE_RETENTION_HOURS), MINUTE)
+        if granularity == HOUR:
+            return CounterService.bucket_start(now - timedelta(days=settings.ROLLUP_HOUR_RETENTION_DAYS), HOUR)
+        return None
+
+    def record(self, db: Session, survey_id: int, submitted: List[datetime]) -> None:
+        """Count newly flushed responses (caller commits)"""
+        if not submitted:
+            return
+        latest = max(submitted)
+        db.execute(update(Survey).where(Survey.id == survey_id).values(
+            response_count=Survey.response_count + len(submitted),
+            last_response_at=case(
+                (or_(Survey.last_response_at.is_(None), Survey.last_response_at < latest), latest),
+                else_=Survey.last_response_at
+            )
+        ))
+        for granularity in GRANULARITIES:
+            for start, count in Counter(self.bucket_start(moment, granularity) for moment in submitted).items():
+                self._bump_bucket(db, survey_id, granularity, start, count)
+
+    def retract(self, db: Session, survey_id: int, submitted_at: Optional[datetime]) -> None:
+        """Uncount a response deleted and flushed in this transaction (caller commits)"""
+        latest = select(func.max(SurveyResponse.submitted_at)).where(
+            SurveyResponse.survey_id == survey_id
+        ).scalar_subquery()
+        db.execute(update(Survey).where(Survey.id == survey_id).values(
+            response_count=Survey.response_count - 1,
+            last_response_at=latest
+        ))
+        if submitted_at is None:
+            return
+        for granularity in GRANULARITIES:
+            # A plain update: a bucket already compacted away stays gone
+            db.execute(update(ResponseCountBucket).where(
+                ResponseCountBucket.survey_id == survey_id,
+                ResponseCountBucket.granularity == granularity,
+                ResponseCountBucket.bucket_start == self.bucket_start(submitted_at, granularity)
+            ).values(response_count=ResponseCountBucket.response_count - 1))
+
+    def rebuild_survey(self, db: Session, survey: Survey) -> None:
+        """Recompute a survey's counters from its stored responses (caller commits)"""
+        rows = db.execute(
+            select(SurveyResponse.submitted_at).where(SurveyResponse.survey_id == survey.id)
+        ).scalars()
+        retained = {granularity: self.retained_from(granularity) for granularity in GRANULARITIES}
+        buckets = Counter()
+        total = 0
+        latest = None
+        for submitted_at in rows:
+            total += 1
+            if submitted_at is not None:
+                for granularity, cutoff in retained.items():
+                    if cutoff is None or submitted_at >= cutoff:
+                        buckets[granularity, self.bucket_start(submitted_at, granularity)] += 1
+                latest = submitted_at if latest is None else max(latest, submitted_at)
+        survey.response_count = total
+        survey.last_response_at = latest
+        db.query(ResponseCountBucket).filter(ResponseCountBucket.survey_id == survey.id).delete()
+        db.add_all(
+            ResponseCountBucket(survey_id=survey.id, granularity=granularity, bucket_start=start, response_count=count)
+            for (granularity, start), count in buckets.items()
+        )
+        db.flush()
+        logger.info(f"Rebuilt response counters for survey {survey.id}: {total} responses in {len(buckets)} buckets")
+
+    def compact(self, db: Session) -> Dict[str, int]:
+        """Drop minute and hour buckets past their retention, and emptied buckets (caller commits)"""
+        removed = {}
+        for granularity in (MINUTE, HOUR):
+            removed[granularity] = db.execute(delete(ResponseCountBucket).where(
+                ResponseCountBucket.granularity == granularity,
+                ResponseCountBucket.bucket_start < self.retained_from(granularity)
+            )).rowcount
+        removed["empty"] = db.execute(
+            delete(ResponseCountBucket).where(ResponseCountBucket.response_count <= 0)
+        ).rowcount
+        return removed
+
+    def timeline(self, db: Session, survey_id: int, granularity: str, start: datetime, end: datetime) -> List[Dict[str, object]]:
+        """Counts for every bucket of ``granularity`` from ``start`` (a bucket start) until ``end``, zeros included"""
+        counts = dict(db.execute(
+            select(ResponseCountBucket.bucket_start, ResponseCountBucket.response_count).where(
+                ResponseCountBucket.survey_id == survey_id,
+                ResponseCountBucket.granularity == granularity,
+                ResponseCountBucket.bucket_start >= start,
+                ResponseCountBucket.bucket_start < end
+            ).order_by(ResponseCountBucket.bucket_start)
+        ).all())
+        points = []
+        moment = start
+        while moment < end:
+            points.append({"start": moment, "count": max(counts.get(moment, 0), 0)})
+            moment += STEPS[granularity]
+        return points
+
+    async def start(self) -> None:
+        if settings.ROLLUP_COMPACT_INTERVAL_SECONDS > 0:
+            self._compactor = asyncio.create_task(self._run_compactor())
+
+    async def stop(self) -> None:
+        if self._compactor is None:
+            return
+        self._compactor.cancel()
+        try:
+            await self._compactor
+        except asyncio.CancelledError:
+            pass
+        self._compactor = None
+
+    async def _run_compactor(self) -> None:
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    removed = await db.run_sync(self.compact)
+                    await db.commit()
+                if any(removed.values()):
+                    logger.info(f"Compacted response count buckets: {removed}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Response count bucket compaction failed: {str(e)}")
+            await asyncio.sleep(settings.ROLLUP_COMPACT_INTERVAL_SECONDS)
+
+    def _bump_bucket(self, db: Session, survey_id: int, granularity: str, start: datetime, delta: int) -> None:
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(ResponseCountBucket).values(
+            survey_id=survey_id, granularity=granularity, bucket_start=start, response_count=delta
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["survey_id", "granularity", "bucket_start"],
+            set_={"response_count": ResponseCountBucket.response_count + stmt.excluded.response_count}
+        ))
+
+counter_service = CounterService()
@@ -0,0 +1,317 @@
+import asyncio
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.survey import Survey, SurveyResponse
+from app.models.analytics import AnswerBitmap, AnswerBitmapSegment, AnswerBitmapState
+from app.services.analytics_service import AnalyticsService
+from app.services.survey_schema import SurveySchema, survey_schemas, ENCODING_QUESTION_IDS
+from app.services.response_outbox import ResponseOutbox, ANSWER_BITMAPS
+from app.services.bitmaps import (
+    Bitmap, SEGMENT_SIZE, segment_bits, encode_segment, decode_segment, encode_ids, decode_ids, crosstab
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEXED_TYPES = ("rating", "multiple_choice", "yes_no")
+MAX_DIMENSIONS = 4
+MAX_VALUE_LENGTH = 200
+READ_BATCH_SIZE = 20000
+ROW_COLUMNS = (SurveyResponse.id, SurveyResponse.responses, SurveyResponse.answer_encoding)
+
+Question = Tuple[str, str, str]     # (question text, storage key, type)
+
+class CrosstabService:
+    """Contingency tables and filtered counts from bitmap indexes of answers.
+
+    Responses get an ordinal as they are indexed, and for every rating,
+    multiple choice and yes/no question answer_bitmaps holds, per answer
+    value, the bitmap of the ordinals that gave it. Filters and table cells
+    are then bitmap intersections and never touch the responses. The index
+    is brought up to date on read from the responses waiting in the response
+    outbox; deleting a response sets its bit in its segment's deleted
+    bitmap, which every query masks out.
+    """
+
+    def __init__(self):
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.outbox = ResponseOutbox(ANSWER_BITMAPS, AnswerBitmapState)
+
+    async def refresh(self, db: AsyncSession, survey: Survey) -> int:
+        """Index the responses received since the last refresh (commits); returns how many were read"""
+        plan = self._plan(survey)
+        labels = survey_schemas.get(survey).option_labels
+        lock = self._locks.setdefault(survey.id, asyncio.Lock())
+        async with lock:
+            await self.outbox.track(db, survey.id)
+            ordinal = first_ordinal = await db.scalar(
+                select(AnswerBitmapState.response_count).where(AnswerBitmapState.survey_id == survey.id)
+            ) or 0
+            positions: Dict[Tuple[str, str, int], List[int]] = {}
+            ids: Dict[int, List[int]] = {}
+            taken: List[int] = []
+            while True:
+                rows = await self.outbox.pending(db, survey.id, ROW_COLUMNS, taken[-1] if taken else 0, READ_BATCH_SIZE)
+                if not rows:
+                    break
+                taken.extend(row.id for row in rows)
+                for row in rows:
+                    segment, position = divmod(ordinal, SEGMENT_SIZE)
+                    ordinal += 1
+                    ids.setdefault(segment, []).append(row.id)
+                    for key, value in self._answers(plan, labels, row.responses, row.answer_encoding):
+                        positions.setdefault((key, value, segment), []).append(position)
+            if not taken:
+                return 0
+            await db.run_sync(self._store, survey.id, positions, ids)
+            # Ordinals continue from the count read above; another worker handing them out first makes this a no-op
+            advanced = (await db.execute(update(AnswerBitmapState).where(
+                AnswerBitmapState.survey_id == survey.id,
+                AnswerBitmapState.response_count == first_ordinal
+            ).values(response_count=ordinal))).rowcount == 1
+            if not advanced:
+                await db.rollback()
+                return 0
+            if not await self.outbox.claim(db, taken):
+                return 0
+            logger.info(f"Indexed answers of {len(taken)} new responses for survey {survey.id}")
+            return len(taken)
+
+    def retract_response(self, db: Session, survey: Survey, response: SurveyResponse) -> None:
+        """Mark a deleted response as gone if a refresh already indexed it (caller commits)"""
+        if not self.outbox.withdraw(db, survey.id, response.id):
+            return
+        for row in db.execute(
+            select(AnswerBitmapSegment.id, AnswerBitmapSegment.response_ids, AnswerBitmapSegment.deleted).where(
+                AnswerBitmapSegment.survey_id == survey.id,
+                AnswerBitmapSegment.first_response_id <= response.id,
+                AnswerBitmapSegment.last_response_id >= response.id
+            ).with_for_update()
+        ).all():
+            ids = decode_ids(row.response_ids)
+            if response.id in ids:
+                db.execute(update(AnswerBitmapSegment).where(AnswerBitmapSegment.id == row.id).values(
+                    deleted=encode_segment(decode_segment(row.deleted) | (1 << ids.index(response.id)))
+                ))
+                return
+
+    def reset_survey(self, db: Session, survey_id: int) -> None:
+        """Forget a survey's index so the next refresh rebuilds it (caller commits)"""
+        db.execute(delete(AnswerBitmap).where(AnswerBitmap.survey_id == survey_id))
+        db.execute(delete(AnswerBitmapSegment).where(AnswerBitmapSegment.survey_id == survey_id))
+        self.outbox.reset(db, survey_id)
+
+    def resolve(self, survey: Survey, reference: str) -> Question:
+        """The indexed question whose id or text is ``reference``; raises ValueError otherwise"""
+        for question in self._all_questions(survey):
+            q_text, key, q_type = question
+            if reference in (key, q_text):
+                if q_type not in INDEXED_TYPES:
+                    raise ValueError(
+                        f"'{q_text}' is a {q_type} question; only {', '.join(INDEXED_TYPES)} questions can be used"
+                    )
+                return question
+        raise ValueError(f"Unknown question: {reference}")
+
+    def parse_filters(self, survey: Survey, where: List[str]) -> List[Tuple[Question, List[str]]]:
+        """``question=value`` conditions; values of one question are alternatives, questions must all match"""
+        filters: Dict[str, Tuple[Question, List[str]]] = {}
+        for condition in where:
+            question = value = None
+            # Question texts may contain "=" themselves, so try every split point
+            for index, char in enumerate(condition):
+                if char != "=":
+                    continue
+                try:
+                    question = self.resolve(survey, condition[:index])
+                except ValueError:
+                    if index == condition.rfind("="):
+                        raise
+                    continue
+                value = self._normalize(question[2], condition[index + 1:])
+                break
+            if question is None:
+                raise ValueError(f"Filters look like question=value, got: {condition}")
+            if value is None:
+                raise ValueError(f"Not a valid answer to '{question[0]}': {condition[index + 1:]}")
+            filters.setdefault(question[1], (question, []))[1].append(value)
+        return list(filters.values())
+
+    async def crosstab(
+        self, db: AsyncSession, survey: Survey, dimensions: List[Question], filters: List[Tuple[Question, List[str]]]
+    ) -> Dict[str, Any]:
+        """Responses matching ``filters`` counted by every combination of answers to ``dimensions``"""
+        base, values = await self._load(db, survey.id, filters, [key for _, key, _ in dimensions])
+        cells = crosstab(base, [values[key] for _, key, _ in dimensions])
+        margins: List[Dict[str, int]] = [{} for _ in dimensions]
+        for combination, count in cells:
+            for margin, value in zip(margins, combination):
+                margin[value] = margin.get(value, 0) + count
+        return {
+            "survey_id": survey.id,
+            "dimensions": [q_text for q_text, _, _ in dimensions],
+            "filters": {question[0]: accepted for question, accepted in filters},
+            "base": base.count(),
+            "answered": sum(count for _, count in cells),
+            "cells": [
+                {"values": list(combination), "count": count}
+                for combination, count in sorted(cells, key=lambda cell: (-cell[1], cell[0]))
+            ],
+            "margins": [dict(sorted(margin.items(), key=lambda entry: -entry[1])) for margin in margins],
+        }
+
+    async def filtered_analytics(
+        self, db: AsyncSession, survey: Survey, filters: List[Tuple[Question, List[str]]]
+    ) -> Dict[str, Any]:
+        """Answer counts of every indexed question among the responses matching ``filters``"""
+        plan = self._plan(survey)
+        base, values = await self._load(db, survey.id, filters, [key for _, key, _ in plan])
+        analytics = {}
+        for q_text, key, q_type in plan:
+            counts = {value: base.count_and(bitmap) for value, bitmap in values[key].items()}
+            counts = {value: count for value, count in sorted(counts.items(), key=lambda entry: -entry[1]) if count}
+            total = sum(counts.values())
+            data: Any = "No responses"
+            if total:
+                data = {
+                    "responses": counts,
+                    "percentages": {value: round(count / total * 100, 1) for value, count in counts.items()},
+                    "most_common": next(iter(counts.items())),
+                }
+                if q_type == "rating":
+                    data["average"] = round(sum(float(value) * count for value, count in counts.items()) / total, 2)
+            analytics[q_text] = {"type": q_type, "response_count": total, "data": data}
+        return {
+            "survey_id": survey.id,
+            "filters": {question[0]: accepted for question, accepted in filters},
+            "total_responses": base.count(),
+            "analytics": analytics,
+        }
+
+    async def _load(
+        self, db: AsyncSession, survey_id: int, filters: List[Tuple[Question, List[str]]], keys: List[str]
+    ) -> Tuple[Bitmap, Dict[str, Dict[str, Bitmap]]]:
+        """The live responses matching ``filters``, and the value bitmaps of the questions in ``keys``"""
+        base = Bitmap()
+        for segment, count, deleted in await db.execute(
+            select(AnswerBitmapSegment.segment, AnswerBitmapSegment.response_count, AnswerBitmapSegment.deleted).where(
+                AnswerBitmapSegment.survey_id == survey_id
+            )
+        ):
+            bits = ((1 << count) - 1) & ~decode_segment(deleted)
+            if bits:
+                base.segments[segment] = bits
+        wanted = set(keys) | {question[1] for question, _ in filters}
+        values: Dict[str, Dict[str, Bitmap]] = {key: {} for key in wanted}
+        if wanted:
+            for key, value, segment, payload in await db.execute(
+                select(AnswerBitmap.question_key, AnswerBitmap.value, AnswerBitmap.segment, AnswerBitmap.bitmap).where(
+                    AnswerBitmap.survey_id == survey_id,
+                    AnswerBitmap.question_key.in_(wanted)
+                )
+            ):
+                values[key].setdefault(value, Bitmap()).segments[segment] = decode_segment(payload)
+        for (_, key, _), accepted in filters:
+            matching = Bitmap()
+            for value in accepted:
+                matching = matching | values[key].get(value, Bitmap())
+            base = base & matching
+        return base, values
+
+    @staticmethod
+    def _store(db: Session, survey_id: int, positions: Dict[Tuple[str, str, int], List[int]], ids: Dict[int, List[int]]) -> None:
+        segments = {
+            row.segment: row for row in db.execute(
+                select(AnswerBitmapSegment.id, AnswerBitmapSegment.segment, AnswerBitmapSegment.response_count,
+                       AnswerBitmapSegment.first_response_id, AnswerBitmapSegment.last_response_id,
+                       AnswerBitmapSegment.response_ids).where(
+                    AnswerBitmapSegment.survey_id == survey_id,
+                    AnswerBitmapSegment.segment.in_(list(ids))
+                )
+            )
+        }
+        for segment, segment_ids in ids.items():
+            row = segments.get(segment)
+            if row is None:
+                db.add(AnswerBitmapSegment(
+                    survey_id=survey_id, segment=segment, first_response_id=min(segment_ids),
+                    last_response_id=max(segment_ids), response_count=len(segment_ids),
+                    response_ids=encode_ids(segment_ids)
+                ))
+            else:
+                # Only the columns a refresh owns, so a concurrent delete's bit is kept
+                db.execute(update(AnswerBitmapSegment).where(AnswerBitmapSegment.id == row.id).values(
+                    first_response_id=min(row.first_response_id, min(segment_ids)),
+                    last_response_id=max(row.last_response_id, max(segment_ids)),
+                    response_count=row.response_count + len(segment_ids),
+                    response_ids=encode_ids(decode_ids(row.response_ids) + segment_ids)
+                ))
+        existing = {
+            (key, value, segment): (row_id, payload) for row_id, key, value, segment, payload in db.execute(
+                select(AnswerBitmap.id, AnswerBitmap.question_key, AnswerBitmap.value, AnswerBitmap.segment,
+                       AnswerBitmap.bitmap).where(
+                    AnswerBitmap.survey_id == survey_id,
+                    AnswerBitmap.segment.in_(list(ids))
+                )
+            )
+        }
+        new_rows = []
+        for (key, value, segment), segment_positions in positions.items():
+            bits = segment_bits(segment_positions)
+            stored = existing.get((key, value, segment))
+            if stored is None:
+                new_rows.append({
+                    "survey_id": survey_id, "question_key": key, "value": value,
+                    "segment": segment, "bitmap": encode_segment(bits)
+                })
+            else:
+                db.execute(update(AnswerBitmap).where(AnswerBitmap.id == stored[0]).values(
+                    bitmap=encode_segment(decode_segment(stored[1]) | bits)
+                ))
+        if new_rows:
+            db.execute(insert(AnswerBitmap), new_rows)
+        db.flush()
+
+    @staticmethod
+    def _all_questions(survey: Survey) -> List[Question]:
+        return [
+            (q.get("text", ""), q.get("id") or q.get("text", ""), q.get("type", "text"))
+            for q in survey_schemas.get(survey).questions
+        ]
+
+    def _plan(self, survey: Survey) -> List[Question]:
+        return [question for question in self._all_questions(survey) if question[2] in INDEXED_TYPES]
+
+    @staticmethod
+    def _normalize(q_type: str, answer: Any) -> Optional[str]:
+        """The indexed form of an answer, matching the keys of the regular analytics"""
+        if q_type == "rating":
+            number = AnalyticsService._parse_number(answer)
+            if number is None and isinstance(answer, str):
+                number = AnalyticsService._parse_number(answer.strip())
+            return str(number) if number is not None else None
+        if not answer:
+            return None
+        value = str(answer).strip()[:MAX_VALUE_LENGTH]
+        return value or None
+
+    def _answers(
+        self, plan: List[Question], labels: Dict[str, List[str]], stored: Optional[Dict[str, Any]], encoding: int
+    ) -> Iterator[Tuple[str, str]]:
+        if not stored:
+            return
+        for q_text, key, q_type in plan:
+            if encoding == ENCODING_QUESTION_IDS:
+                value = stored.get(key)
+                if key in labels:
+                    # Indexed by label, which stored answers keep when options are reordered
+                    value = SurveySchema.decode_choice(labels[key], value)
+            else:
+                value = stored.get(q_text)
+            value = self._normalize(q_type, value)
+            if value is not None:
+                yield key, value
+
+crosstab_service = CrosstabService()
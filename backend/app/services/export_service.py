@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, List, Tuple
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.survey import Survey, SurveyResponse
+from app.services.survey_schema import survey_schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands buffered bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class ExportService:
+    @staticmethod
+    def question_columns(survey: Survey) -> List[Tuple[str, str]]:
+        """(question id, column name) per question; repeated texts get a " (2)", " (3)"... suffix"""
+        columns = []
+        taken = set()
+        for q in survey.questions:
+            name = base = f"Q: {q.get('text', '')}"
+            number = 1
+            while name in taken:
+                number += 1
+                name = f"{base} ({number})"
+            taken.add(name)
+            columns.append((q.get("id") or q.get("text", ""), name))
+        return columns
+
+    def column_names(self, survey: Survey) -> List[str]:
+        return ["response_id", "submitted_at", "respondent_ip"] + [name for _, name in self.question_columns(survey)]
+
+    async def iter_rows(self, survey: Survey) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield export rows in keyset-paginated batches using a dedicated session"""
+        columns = self.question_columns(survey)
+        schema = survey_schemas.get(survey)
+        async with AsyncSessionLocal() as db:
+            last_id = 0
+            while True:
+                batch = (await db.execute(select(
+                    SurveyResponse.id,
+                    SurveyResponse.submitted_at,
+                    SurveyResponse.respondent_ip,
+                    SurveyResponse.responses,
+                    SurveyResponse.answer_encoding,
+                ).where(
+                    SurveyResponse.survey_id == survey.id,
+                    SurveyResponse.id > last_id
+                ).order_by(SurveyResponse.id).limit(EXPORT_BATCH_SIZE))).all()
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                rows = []
+                for response in batch:
+                    answers = schema.decode_by_key(response.responses, response.answer_encoding)
+                    row = {
+                        "response_id": response.id,
+                        "submitted_at": response.submitted_at.isoformat() if response.submitted_at else None,
+                        "respondent_ip": response.respondent_ip
+                    }
+                    for key, name in columns:
+                        row[name] = answers.get(key, "")
+                    rows.append(row)
+                yield rows
+
+    def stream(self, survey: Survey, fmt: str) -> AsyncIterator[bytes]:
+        writer = getattr(self, f"_stream_{fmt}")
+        return writer(survey)
+
+    async def _stream_json(self, survey: Survey) -> AsyncIterator[bytes]:
+        batches = self.iter_rows(survey)
+        try:
+            rows = await batches.__anext__()
+        except StopAsyncIteration:
+            yield json.dumps({"message": "No responses to export", "data": []}).encode()
+            return
+        yield (
+            '{"survey_title": ' + json.dumps(survey.title)
+            + ', "export_timestamp": ' + json.dumps(str(datetime.utcnow()))
+            + ', "data": ['
+        ).encode()
+        yield ", ".join(json.dumps(row, default=str) for row in rows).encode()
+        total = len(rows)
+        async for rows in batches:
+            yield (", " + ", ".join(json.dumps(row, default=str) for row in rows)).encode()
+            total += len(rows)
+        yield f'], "total_responses": {total}}}'.encode()
+
+    async def _stream_ndjson(self, survey: Survey) -> AsyncIterator[bytes]:
+        async for rows in self.iter_rows(survey):
+            yield "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+
+    async def _stream_csv(self, survey: Survey) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.column_names(survey))
+        async for rows in self.iter_rows(survey):
+            for row in rows:
+                writer.writerow([self._cell(value) for value in row.values()])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    async def _stream_parquet(self, survey: Survey) -> AsyncIterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = self.column_names(survey)
+        schema = pa.schema(
+            [("response_id", pa.int64()), ("submitted_at", pa.string()), ("respondent_ip", pa.string())]
+            + [(name, pa.string()) for name in columns[3:]]
+        )
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            async for rows in self.iter_rows(survey):
+                table = pa.Table.from_pydict(
+                    {name: [row[name] if i < 3 else self._cell(row[name]) for row in rows] for i, name in enumerate(columns)},
+                    schema=schema
+                )
+                writer.write_table(table)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    def parquet_available() -> bool:
+        try:
+            import pyarrow.parquet  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    @staticmethod
+    def _cell(value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        return str(value)
+
+export_service = ExportService()
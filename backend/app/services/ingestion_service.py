@@ -0,0 +1,276 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, insert
+from sqlalchemy.orm import undefer
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.survey import Survey, SurveyResponse, ResponseIdempotencyKey
+from app.schemas.survey import BatchResponseItem
+from app.services.aggregate_service import aggregate_service
+from app.services.cache_service import cache_service
+from app.services.live_service import live_service
+from app.services.counter_service import counter_service
+from app.services.audio_service import audio_service
+from app.services.search_service import search_service
+from app.services.response_outbox import ResponseOutbox
+from app.services.survey_schema import survey_schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stay well below SQLite's bound-parameter limit when looking keys up
+KEY_LOOKUP_CHUNK = 500
+
+class IngestionService:
+    async def insert_batch(
+        self,
+        db: AsyncSession,
+        survey: Survey,
+        items: List[Optional[BatchResponseItem]],
+        client_ips: List[str],
+        results: List[Dict[str, Any]]
+    ) -> None:
+        """Insert valid, non-duplicate items with one bulk statement (caller commits).
+
+        ``items``, ``client_ips`` and ``results`` are index-aligned; ``None`` items already
+        failed validation and keep their existing result entry.
+        """
+        keys = [item.idempotency_key for item in items if item is not None and item.idempotency_key]
+        known = await self._existing_keys(db, survey.id, keys)
+
+        pending = []
+        first_seen: Dict[str, int] = {}
+        repeats = []
+        for index, item in enumerate(items):
+            if item is None:
+                continue
+            audio_error = audio_service.validate_inline(item.audio_data)
+            if audio_error:
+                results[index].update(status="invalid", errors=[{"loc": ["audio_data"], "msg": audio_error}])
+                continue
+            key = item.idempotency_key
+            if key and key in known:
+                results[index].update(status="duplicate", response_id=known[key])
+            elif key and key in first_seen:
+                # Repeated within this upload: resolved once the first copy is inserted
+                repeats.append((index, first_seen[key]))
+            else:
+                if key:
+                    first_seen[key] = index
+                pending.append(index)
+
+        if not pending:
+            return
+
+        submitted_at = datetime.utcnow()
+        schema = survey_schemas.get(survey)
+        rows = []
+        for index in pending:
+            stored, encoding = schema.encode(items[index].responses)
+            rows.append({
+                "survey_id": survey.id,
+                "responses": stored,
+                "answer_encoding": encoding,
+                "survey_version_id": survey.current_version_id,
+                "audio_data": None,
+                "respondent_ip": client_ips[index],
+                "submitted_at": submitted_at,
+            })
+        new_ids = (await db.scalars(
+            insert(SurveyResponse).returning(SurveyResponse.id, sort_by_parameter_order=True),
+            rows
+        )).all()
+
+        key_rows = []
+        for index, response_id in zip(pending, new_ids):
+            results[index].update(status="created", response_id=response_id)
+            key = items[index].idempotency_key
+            if key:
+                key_rows.append({"survey_id": survey.id, "idempotency_key": key, "response_id": response_id})
+        if key_rows:
+            await db.execute(insert(ResponseIdempotencyKey), key_rows)
+        for index, first in repeats:
+            results[index].update(status="duplicate", response_id=results[first]["response_id"])
+        for index, response_id in zip(pending, new_ids):
+            if items[index].audio_data:
+                response = await db.get(SurveyResponse, response_id, options=[undefer(SurveyResponse.audio_data)])
+                await audio_service.save_inline(db, survey, response, items[index].audio_data)
+
+        await db.run_sync(aggregate_service.apply_responses, survey, [(row["responses"], row["answer_encoding"]) for row in rows])
+        await db.run_sync(counter_service.record, survey.id, [submitted_at] * len(rows))
+        await db.run_sync(ResponseOutbox.publish, survey.id, list(new_ids))
+        await db.run_sync(
+            search_service.index_responses, survey, [(response_id, items[index].responses) for index, response_id in zip(pending, new_ids)]
+        )
+        logger.info(f"Batch inserted {len(new_ids)} responses for survey {survey.id}")
+
+    @staticmethod
+    async def _existing_keys(db: AsyncSession, survey_id: int, keys: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), KEY_LOOKUP_CHUNK):
+            chunk = unique_keys[start:start + KEY_LOOKUP_CHUNK]
+            rows = await db.execute(select(
+                ResponseIdempotencyKey.idempotency_key,
+                ResponseIdempotencyKey.response_id
+            ).where(
+                ResponseIdempotencyKey.survey_id == survey_id,
+                ResponseIdempotencyKey.idempotency_key.in_(chunk)
+            ))
+            found.update({key: response_id for key, response_id in rows})
+        return found
+
+ingestion_service = IngestionService()
+
+class IngestionQueue:
+    """Bounded in-process queue that group-commits submissions from a background writer"""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._accepting = False
+        self._pending: set = set()
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._accepting
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_MAXSIZE)
+        self._accepting = True
+        self._writer = asyncio.create_task(self._run())
+        logger.info(f"Ingestion queue started (max {settings.INGEST_QUEUE_MAXSIZE}, batch {settings.INGEST_BATCH_SIZE})")
+
+    async def stop(self) -> None:
+        """Stop accepting work, flush what is queued, then stop the writer"""
+        if self._writer is None:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.INGEST_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"Ingestion queue drain timed out with {self._queue.qsize()} submissions left")
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        logger.info(f"Ingestion queue stopped after flushing {self.flushed} submissions")
+
+    def submit(self, survey_id: int, item: BatchResponseItem, client_ip: str) -> str:
+        """Queue a validated submission and return its receipt id.
+
+        Raises ``asyncio.QueueFull`` when the queue is full or shutting down.
+        """
+        if not self._accepting:
+            self.rejected += 1
+            raise asyncio.QueueFull()
+        receipt_id = uuid.uuid4().hex
+        # The receipt doubles as idempotency key so it can later be resolved to a response id
+        item = item.model_copy(update={"idempotency_key": receipt_id})
+        try:
+            self._queue.put_nowait((survey_id, item, client_ip))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self._pending.add(receipt_id)
+        self.accepted += 1
+        return receipt_id
+
+    def is_pending(self, receipt_id: str) -> bool:
+        return receipt_id in self._pending
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.INGEST_MODE,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": settings.INGEST_QUEUE_MAXSIZE,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 2) if self.batches else 0.0,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = settings.INGEST_FLUSH_INTERVAL_MS / 1000
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + interval
+            while len(batch) < settings.INGEST_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logger.error(f"Ingestion flush failed: {str(e)}")
+            finally:
+                for survey_id, item, client_ip in batch:
+                    self._pending.discard(item.idempotency_key)
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[int, BatchResponseItem, str]]) -> None:
+        started = time.perf_counter()
+        try:
+            await self._write(batch)
+        except Exception as e:
+            # Isolate the bad submission(s) rather than dropping the whole group
+            logger.warning(f"Group commit of {len(batch)} submissions failed ({str(e)}), retrying one by one")
+            for entry in batch:
+                try:
+                    await self._write([entry])
+                except Exception as item_error:
+                    self.failed += 1
+                    logger.error(f"Dropping queued submission {entry[1].idempotency_key}: {str(item_error)}")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    async def _write(self, batch: List[Tuple[int, BatchResponseItem, str]]) -> None:
+        by_survey: Dict[int, List[Tuple[BatchResponseItem, str]]] = {}
+        for survey_id, item, client_ip in batch:
+            by_survey.setdefault(survey_id, []).append((item, client_ip))
+        async with AsyncSessionLocal() as db:
+            stored = 0
+            for survey_id, entries in by_survey.items():
+                survey = await db.get(Survey, survey_id)
+                if survey is None:
+                    self.failed += len(entries)
+                    logger.error(f"Dropping {len(entries)} queued submissions for missing survey {survey_id}")
+                    continue
+                results = [{"index": i, "status": "invalid"} for i in range(len(entries))]
+                await ingestion_service.insert_batch(
+                    db, survey, [item for item, _ in entries], [ip for _, ip in entries], results
+                )
+                stored += sum(1 for r in results if r["status"] == "created")
+            await db.commit()
+            self.flushed += stored
+        for survey_id in by_survey:
+            await cache_service.invalidate_responses(survey_id)
+            await live_service.notify(survey_id)
+
+ingestion_queue = IngestionQueue()
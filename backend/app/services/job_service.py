@@ -0,0 +1,376 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+from sqlalchemy import select, update, delete, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import JOB_DURATION
+from app.models.job import Job
+from app.services.export_service import export_service, EXPORT_FORMATS
+from app.services.job_tasks import JOB_TASKS, run_job, init_worker
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+JOB_TYPES = ("analytics", "export", "generate_questions")
+# CPU-bound jobs run in the process pool; question generation waits on the API and stays on the event loop
+PROCESS_JOB_TYPES = ("analytics", "export")
+SURVEY_JOB_TYPES = ("analytics", "export")
+CLEANUP_INTERVAL_SECONDS = 3600
+
+class JobService:
+    """Persisted background jobs for work too slow for a request.
+
+    Jobs are rows in the jobs table, so they outlive the process that queued
+    them. Every process running the dispatcher claims queued jobs with a
+    conditional UPDATE, within per-type limits counted over all running
+    jobs, and keeps a heartbeat on the ones it runs. A job whose heartbeat
+    stops (its process died) is queued again, up to JOB_MAX_ATTEMPTS runs.
+    Results are files under JOB_ARTIFACT_DIR.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self.succeeded = 0
+        self.failed = 0
+
+    def normalize(self, job_type: str, survey_id: Optional[int], params: Dict[str, Any]) -> Dict[str, Any]:
+        """Validated params of a new job; raises ValueError"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type {job_type!r}; expected one of {', '.join(JOB_TYPES)}")
+        if job_type in SURVEY_JOB_TYPES and survey_id is None:
+            raise ValueError(f"{job_type} jobs need a survey_id")
+        if job_type == "analytics":
+            version = params.get("version")
+            if version is not None and (not isinstance(version, int) or version < 1):
+                raise ValueError("version must be a positive integer")
+            return {"survey_id": survey_id, "version": version, "exact": bool(params.get("exact", False))}
+        if job_type == "export":
+            fmt = params.get("format", "json")
+            if fmt not in EXPORT_FORMATS:
+                raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+            if fmt == "parquet" and not export_service.parquet_available():
+                raise ValueError("Parquet export requires pyarrow to be installed")
+            return {"survey_id": survey_id, "format": fmt}
+        prompt = params.get("prompt")
+        question_count = params.get("question_count", 5)
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError("prompt is required")
+        if not isinstance(question_count, int) or not 1 <= question_count <= 20:
+            raise ValueError("question_count must be between 1 and 20")
+        return {"prompt": prompt, "question_count": question_count}
+
+    async def create(self, db: AsyncSession, job_type: str, survey_id: Optional[int], params: Dict[str, Any]) -> Job:
+        """Queue a job (commits); raises ValueError for invalid params"""
+        job = Job(
+            id=uuid.uuid4().hex,
+            job_type=job_type,
+            status=QUEUED,
+            params=self.normalize(job_type, survey_id, params),
+            survey_id=survey_id,
+            attempts=0,
+            created_at=datetime.utcnow(),
+        )
+        db.add(job)
+        await db.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        logger.info(f"Queued {job_type} job {job.id}")
+        return job
+
+    async def list_jobs(
+        self,
+        db: AsyncSession,
+        status: Optional[str] = None,
+        job_type: Optional[str] = None,
+        survey_id: Optional[int] = None,
+        limit: int = 50
+    ) -> List[Job]:
+        query = select(Job).order_by(Job.created_at.desc(), Job.id).limit(limit)
+        if status is not None:
+            query = query.where(Job.status == status)
+        if job_type is not None:
+            query = query.where(Job.job_type == job_type)
+        if survey_id is not None:
+            query = query.where(Job.survey_id == survey_id)
+        return (await db.scalars(query)).all()
+
+    async def cancel(self, db: AsyncSession, job: Job) -> bool:
+        """Cancel a job nobody has claimed yet (commits); False once it is running or finished"""
+        cancelled = await db.execute(
+            update(Job).where(Job.id == job.id, Job.status == QUEUED)
+            .values(status=CANCELLED, finished_at=datetime.utcnow())
+        )
+        await db.commit()
+        if cancelled.rowcount:
+            self._notify(job.id)
+        return bool(cancelled.rowcount)
+
+    async def delete(self, db: AsyncSession, job: Job) -> None:
+        """Remove a finished job and its artifact (commits)"""
+        await db.execute(delete(Job).where(Job.id == job.id))
+        await db.commit()
+        if job.artifact_key:
+            self.artifact_path(job.artifact_key).unlink(missing_ok=True)
+
+    def artifact_path(self, key: str) -> Path:
+        return Path(settings.JOB_ARTIFACT_DIR).resolve() / key
+
+    async def watch(self, job_id: str) -> AsyncIterator[Optional[Job]]:
+        """The job each time its status changes, until it finishes; ``None`` as a keep-alive.
+
+        Jobs run by this process wake watchers at once, others are polled.
+        """
+        last_status = None
+        last_sent = time.monotonic()
+        while True:
+            changed = self._changed.setdefault(job_id, asyncio.Event())
+            async with AsyncSessionLocal() as db:
+                job = await db.get(Job, job_id)
+            if job is None:
+                return
+            if job.status != last_status:
+                last_status = job.status
+                last_sent = time.monotonic()
+                yield job
+            if job.status in FINISHED:
+                self._changed.pop(job_id, None)
+                return
+            if time.monotonic() - last_sent >= settings.LIVE_HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield None
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
+
+    async def start(self) -> None:
+        if self._dispatcher is None:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._run_dispatcher())
+
+    async def stop(self) -> None:
+        if self._dispatcher is None:
+            return
+        self._dispatcher.cancel()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._wakeup = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def dispatch(self) -> int:
+        """One dispatcher pass: heartbeat, retry lost jobs and claim queued ones; returns how many were claimed"""
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            if self._tasks:
+                await db.execute(update(Job).where(Job.id.in_(list(self._tasks))).values(heartbeat_at=now))
+            await self._requeue_lost(db, now)
+            claimed = await self._claim(db, now)
+            await db.commit()
+        for job in claimed:
+            # Named after the job type so _claim can count the pool's share
+            self._tasks[job.id] = asyncio.create_task(self._execute(job), name=job.job_type)
+            self._notify(job.id)
+        return len(claimed)
+
+    async def cleanup(self, db: AsyncSession) -> int:
+        """Delete jobs finished more than JOB_RETENTION_HOURS ago and their artifacts (commits)"""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        expired = (await db.execute(
+            select(Job.id, Job.artifact_key).where(Job.status.in_(FINISHED), Job.finished_at < cutoff)
+        )).all()
+        if not expired:
+            return 0
+        await db.execute(delete(Job).where(Job.id.in_([job_id for job_id, _ in expired])))
+        await db.commit()
+        for _, key in expired:
+            if key:
+                self.artifact_path(key).unlink(missing_ok=True)
+        return len(expired)
+
+    async def _run_dispatcher(self) -> None:
+        next_cleanup = 0.0
+        while True:
+            try:
+                self._wakeup.clear()
+                await self.dispatch()
+                if time.monotonic() >= next_cleanup:
+                    async with AsyncSessionLocal() as db:
+                        removed = await self.cleanup(db)
+                    if removed:
+                        logger.info(f"Removed {removed} expired jobs")
+                    next_cleanup = time.monotonic() + CLEANUP_INTERVAL_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job dispatch failed: {str(e)}")
+            # Heartbeats must not wait longer than JOB_HEARTBEAT_SECONDS
+            interval = min(settings.JOB_POLL_INTERVAL_SECONDS, settings.JOB_HEARTBEAT_SECONDS)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _requeue_lost(self, db: AsyncSession, now: datetime) -> None:
+        lost = (Job.status == RUNNING) & or_(
+            Job.heartbeat_at.is_(None), Job.heartbeat_at < now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        )
+        retried = await db.execute(
+            update(Job).where(lost, Job.attempts < settings.JOB_MAX_ATTEMPTS).values(status=QUEUED)
+        )
+        given_up = await db.execute(
+            update(Job).where(lost).values(
+                status=FAILED, finished_at=now, error=f"Worker lost {settings.JOB_MAX_ATTEMPTS} times"
+            )
+        )
+        if retried.rowcount or given_up.rowcount:
+            logger.warning(f"Requeued {retried.rowcount} jobs whose worker was lost, gave up on {given_up.rowcount}")
+
+    async def _claim(self, db: AsyncSession, now: datetime) -> List[Job]:
+        running = dict((await db.execute(
+            select(Job.job_type, func.count()).where(Job.status == RUNNING).group_by(Job.job_type)
+        )).all())
+        # Never hand the pool more jobs than it has workers
+        local_process_slots = settings.JOB_WORKERS - sum(
+            1 for task in self._tasks.values() if task.get_name() in PROCESS_JOB_TYPES
+        )
+        claimed: List[Job] = []
+        for job_type in JOB_TYPES:
+            free = self._limit(job_type) - running.get(job_type, 0)
+            if job_type in PROCESS_JOB_TYPES:
+                free = min(free, local_process_slots)
+            if free <= 0:
+                continue
+            candidates = (await db.scalars(
+                select(Job).where(Job.status == QUEUED, Job.job_type == job_type)
+                .order_by(Job.created_at, Job.id).limit(free)
+            )).all()
+            for job in candidates:
+                # Another process may claim the same row; only one UPDATE matches
+                won = await db.execute(
+                    update(Job).where(Job.id == job.id, Job.status == QUEUED).values(
+                        status=RUNNING, attempts=Job.attempts + 1, started_at=now, heartbeat_at=now
+                    )
+                )
+                if won.rowcount:
+                    claimed.append(job)
+                    if job_type in PROCESS_JOB_TYPES:
+                        local_process_slots -= 1
+        return claimed
+
+    async def _execute(self, job: Job) -> None:
+        key = f"{job.id}.{job.params.get('format', 'json')}"
+        path = self.artifact_path(key)
+        started = time.perf_counter()
+        values: Dict[str, Any]
+        try:
+            await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+            if job.job_type in PROCESS_JOB_TYPES:
+                loop = asyncio.get_running_loop()
+                outcome = await loop.run_in_executor(self._get_pool(), run_job, job.job_type, job.params, str(path))
+            else:
+                outcome = await JOB_TASKS[job.job_type](job.params, str(path))
+            values = {
+                "status": SUCCEEDED,
+                "result": outcome["result"],
+                "artifact_key": key,
+                "artifact_content_type": outcome["content_type"],
+                "artifact_size": (await asyncio.to_thread(os.stat, path)).st_size,
+            }
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back rather than waiting for it to go stale
+            await self._finish(job, {"status": QUEUED, "started_at": None, "heartbeat_at": None}, started, final=False)
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); retry like a lost worker
+            self._reset_pool()
+            retry = job.attempts + 1 < settings.JOB_MAX_ATTEMPTS
+            values = {"status": QUEUED} if retry else {"status": FAILED, "error": "Worker process died"}
+            logger.error(f"Worker process died running job {job.id}")
+            await self._finish(job, values, started, final=not retry)
+            return
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.job_type}) failed: {str(e)}")
+            values = {"status": FAILED, "error": str(e)}
+        await self._finish(job, values, started)
+
+    async def _finish(self, job: Job, values: Dict[str, Any], started: float, final: bool = True) -> None:
+        self._tasks.pop(job.id, None)
+        if final:
+            values["finished_at"] = datetime.utcnow()
+            JOB_DURATION.observe(time.perf_counter() - started, job_type=job.job_type, status=values["status"])
+            if values["status"] == SUCCEEDED:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(Job).where(Job.id == job.id, Job.status == RUNNING).values(**values))
+                await db.commit()
+        except Exception as e:
+            # Left running: the stopped heartbeat gets it retried
+            logger.error(f"Recording the outcome of job {job.id} failed: {str(e)}")
+        self._notify(job.id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _notify(self, job_id: str) -> None:
+        changed = self._changed.pop(job_id, None)
+        if changed is not None:
+            changed.set()
+
+    @staticmethod
+    def _limit(job_type: str) -> int:
+        return {
+            "analytics": settings.JOB_ANALYTICS_CONCURRENCY,
+            "export": settings.JOB_EXPORT_CONCURRENCY,
+            "generate_questions": settings.JOB_QUESTIONS_CONCURRENCY,
+        }[job_type]
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned so workers start clean instead of inheriting the API's engines and event loop
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(settings.JOB_WORKERS, 1),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker
+            )
+        return self._pool
+
+    def _reset_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+job_service = JobService()
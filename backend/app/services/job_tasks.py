@@ -0,0 +1,94 @@
+"""Bodies of background jobs.
+
+Each takes the job's params and the path its artifact goes to, writes the
+artifact and returns ``{"content_type": ..., "result": {...}}``. Jobs in the
+process pool enter through ``run_job`` in a spawned worker, which has its own
+engines and event loop; the others are awaited on the dispatcher's loop.
+"""
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, async_engine
+from app.models.survey import Survey
+from app.services.ai_service import ai_service
+from app.services.export_service import export_service, EXPORT_FORMATS
+from app.services.report_service import report_service
+from app.services.version_service import version_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+def init_worker() -> None:
+    """Pool initializer: a job already holds a worker, so text answers are tokenized in a thread, not another pool"""
+    settings.TEXT_ANALYTICS_WORKERS = 0
+
+def run_job(job_type: str, params: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """Entry point in pool workers"""
+
+    async def run() -> Dict[str, Any]:
+        try:
+            return await JOB_TASKS[job_type](params, path)
+        finally:
+            # Pooled connections belong to this call's event loop
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+async def _write(path: str, chunks: AsyncIterator[bytes]) -> int:
+    """Write to a temporary name and rename when complete, so a partial artifact is never served"""
+    partial = path + ".part"
+    size = 0
+    try:
+        with open(partial, "wb") as handle:
+            async for chunk in chunks:
+                handle.write(chunk)
+                size += len(chunk)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+    return size
+
+async def _chunks(data: Iterable[bytes]) -> AsyncIterator[bytes]:
+    for chunk in data:
+        yield chunk
+
+async def analytics_job(params: Dict[str, Any], path: str) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        survey = await db.get(Survey, params["survey_id"])
+        if survey is None:
+            raise ValueError("Survey not found")
+        snapshot = None
+        if params.get("version") is not None:
+            snapshot = await version_service.get_version(db, survey.id, params["version"])
+            if snapshot is None:
+                raise ValueError("Survey version not found")
+        payload = await report_service.survey_analytics(db, survey, snapshot, params.get("exact", False))
+    await _write(path, _chunks([json.dumps(jsonable_encoder(payload)).encode()]))
+    return {"content_type": "application/json", "result": {"total_responses": payload.total_responses}}
+
+async def export_job(params: Dict[str, Any], path: str) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        survey = await db.get(Survey, params["survey_id"])
+        if survey is None:
+            raise ValueError("Survey not found")
+    fmt = params["format"]
+    size = await _write(path, export_service.stream(survey, fmt))
+    return {"content_type": EXPORT_FORMATS[fmt], "result": {"format": fmt, "bytes": size}}
+
+async def generate_questions_job(params: Dict[str, Any], path: str) -> Dict[str, Any]:
+    result = await ai_service.generate_questions(params["prompt"], params["question_count"])
+    if not result.get("success"):
+        raise ValueError(result.get("error", "Unknown error"))
+    await _write(path, _chunks([json.dumps(result["questions"]).encode()]))
+    return {"content_type": "application/json", "result": {"count": len(result["questions"])}}
+
+JOB_TASKS: Dict[str, Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]]] = {
+    "analytics": analytics_job,
+    "export": export_job,
+    "generate_questions": generate_questions_job,
+}
@@ -0,0 +1,261 @@
+import asyncio
+import copy
+from typing import AsyncIterator, Dict, Any, Optional, Set
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import ANALYTICS_COMPUTE_DURATION
+from app.models.survey import Survey
+from app.services.aggregate_service import aggregate_service
+from app.services.text_analytics_service import text_analytics_service
+from app.services.sketch_service import sketch_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MemoryBroker:
+    """Delivers change notifications to listeners in this process only"""
+
+    def __init__(self):
+        self._listeners: Set[asyncio.Queue] = set()
+
+    async def publish(self, message: str) -> None:
+        for queue in self._listeners:
+            queue.put_nowait(message)
+
+    async def listen(self) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._listeners.discard(queue)
+
+class RedisBroker:
+    """Delivers change notifications to every worker through Redis pub/sub.
+
+    ``client`` is any ``redis.asyncio``-compatible client, which lets a local
+    stand-in such as ``fakeredis.aioredis.FakeRedis`` replace a real server.
+    """
+
+    def __init__(self, client, channel: str = "sms:live"):
+        self.client = client
+        self.channel = channel
+
+    async def publish(self, message: str) -> None:
+        await self.client.publish(self.channel, message)
+
+    async def listen(self) -> AsyncIterator[str]:
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message["data"]
+                yield data.decode() if isinstance(data, bytes) else data
+        finally:
+            await pubsub.unsubscribe(self.channel)
+            await pubsub.close()
+
+class _Viewer:
+    """One open stream; undelivered updates merge into a single pending event"""
+
+    def __init__(self):
+        self.pending: Optional[Dict[str, Any]] = None
+        self.ready = asyncio.Event()
+        self._shared = False
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        if self.pending is None:
+            # Shared with the other viewers until a merge has to modify it
+            self.pending, self._shared = event, True
+        else:
+            if self._shared:
+                self.pending, self._shared = copy.deepcopy(self.pending), False
+            data = self.pending["data"]
+            for key, value in event["data"].items():
+                if key == "analytics":
+                    data.setdefault("analytics", {}).update(value)
+                elif key == "removed":
+                    for q_text in value:
+                        data.get("analytics", {}).pop(q_text, None)
+                    if self.pending["event"] == "update":
+                        data["removed"] = sorted(set(data.get("removed", [])) | set(value))
+                else:
+                    data[key] = value
+        self.ready.set()
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """The pending event, or None if nothing arrived within ``timeout`` seconds"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        event, self.pending = self.pending, None
+        return event
+
+class _Hub:
+    """Recomputes one survey's live view once per change for every local viewer"""
+
+    def __init__(self, survey_id: int, compute):
+        self.survey_id = survey_id
+        self.viewers: Set[_Viewer] = set()
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self._compute = compute
+        self._dirty = asyncio.Event()
+        self._dirty.set()
+        self._task = asyncio.create_task(self._run())
+
+    def join(self) -> _Viewer:
+        viewer = _Viewer()
+        if self.snapshot is not None:
+            viewer.offer({"event": "snapshot", "data": self.snapshot})
+        self.viewers.add(viewer)
+        return viewer
+
+    def changed(self) -> None:
+        self._dirty.set()
+
+    def close(self) -> None:
+        self._task.cancel()
+
+    async def _run(self) -> None:
+        interval = settings.LIVE_MIN_INTERVAL_MS / 1000
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            try:
+                current = await self._compute(self.survey_id)
+            except Exception as e:
+                logger.error(f"Live update for survey {self.survey_id} failed: {str(e)}")
+                current = None
+            if current is not None:
+                event = self._diff(self.snapshot, current)
+                self.snapshot = current
+                if event is not None:
+                    for viewer in self.viewers:
+                        viewer.offer(event)
+            # Changes arriving meanwhile coalesce into the next computation
+            await asyncio.sleep(interval)
+
+    @staticmethod
+    def _diff(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if previous is None:
+            return {"event": "snapshot", "data": current}
+        data = {key: value for key, value in current.items() if key != "analytics" and previous.get(key) != value}
+        before, after = previous.get("analytics", {}), current.get("analytics", {})
+        changed = {q_text: value for q_text, value in after.items() if before.get(q_text) != value}
+        removed = [q_text for q_text in before if q_text not in after]
+        if changed:
+            data["analytics"] = changed
+        if removed:
+            data["removed"] = removed
+        if not data:
+            return None
+        data["survey_id"] = current["survey_id"]
+        return {"event": "update", "data": data}
+
+class LiveService:
+    """Pushes survey counters and analytics to open dashboards.
+
+    Writers call ``notify`` after committing; the broker carries that to every
+    worker, where one hub per watched survey recomputes the view at most once
+    per ``LIVE_MIN_INTERVAL_MS`` and fans the changes out to its viewers.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.published = 0
+        self.computations = 0
+        self._hubs: Dict[int, _Hub] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def notify(self, survey_id: int) -> None:
+        try:
+            await self.broker.publish(str(survey_id))
+            self.published += 1
+        except Exception as e:
+            logger.warning(f"Live notification for survey {survey_id} failed: {str(e)}")
+
+    async def stream(self, survey_id: int) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Events for one viewer: a ``snapshot`` first, then ``update`` deltas.
+
+        Yields None after ``LIVE_HEARTBEAT_SECONDS`` without changes so the
+        caller can keep the connection alive.
+        """
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        hub = self._hubs.get(survey_id)
+        if hub is None:
+            hub = self._hubs[survey_id] = _Hub(survey_id, self._compute)
+        viewer = hub.join()
+        try:
+            while True:
+                yield await viewer.next(settings.LIVE_HEARTBEAT_SECONDS)
+        finally:
+            hub.viewers.discard(viewer)
+            if not hub.viewers and self._hubs.get(survey_id) is hub:
+                hub.close()
+                del self._hubs[survey_id]
+
+    async def stop(self) -> None:
+        for hub in self._hubs.values():
+            hub.close()
+        self._hubs.clear()
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "broker": settings.LIVE_BROKER,
+            "published": self.published,
+            "surveys": len(self._hubs),
+            "viewers": sum(len(hub.viewers) for hub in self._hubs.values()),
+            "computations": self.computations,
+        }
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async for message in self.broker.listen():
+                    hub = self._hubs.get(int(message))
+                    if hub is not None:
+                        hub.changed()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live broker connection lost: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _compute(self, survey_id: int) -> Optional[Dict[str, Any]]:
+        self.computations += 1
+        # Materialized aggregates are maintained incrementally, so a refresh never scans responses
+        async with AsyncSessionLocal() as db:
+            survey = await db.get(Survey, survey_id)
+            if survey is None:
+                return None
+            with ANALYTICS_COMPUTE_DURATION.time(backend="live"):
+                analytics = await db.run_sync(aggregate_service.compute_survey_analytics, survey)
+            await text_analytics_service.attach(db, survey, analytics["analytics"])
+            summary = await sketch_service.attach(db, survey, analytics["analytics"])
+            return jsonable_encoder({
+                "survey_id": survey_id,
+                "title": survey.title,
+                "response_count": survey.response_count,
+                "last_response_at": survey.last_response_at,
+                "total_responses": analytics["total_responses"],
+                "distinct_respondents": summary.get("distinct_respondents"),
+                "analytics": analytics["analytics"],
+            })
+
+def _build_broker():
+    if settings.LIVE_BROKER == "redis":
+        import redis.asyncio as redis
+        return RedisBroker(redis.Redis.from_url(settings.LIVE_BROKER_URL))
+    return MemoryBroker()
+
+live_service = LiveService(_build_broker())
@@ -0,0 +1,64 @@
+from typing import Optional
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import ANALYTICS_COMPUTE_DURATION
+from app.models.survey import Survey, SurveyResponse, SurveyVersion
+from app.schemas.survey import AnalyticsOut
+from app.services.aggregate_service import aggregate_service
+from app.services.analytics_service import analytics_service
+from app.services.sql_analytics_service import sql_analytics_service
+from app.services.columnar_analytics_service import columnar_analytics_service
+from app.services.survey_schema import survey_schemas
+from app.services.text_analytics_service import text_analytics_service
+from app.services.sketch_service import sketch_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ReportService:
+    """Full analytics of a survey, as served by the analytics route and produced by analytics jobs"""
+
+    async def survey_analytics(
+        self,
+        db: AsyncSession,
+        survey: Survey,
+        snapshot: Optional[SurveyVersion] = None,
+        exact: bool = False
+    ) -> AnalyticsOut:
+        """Analytics across versions, or of ``snapshot``'s responses under its own questions"""
+        scope = SurveyResponse.survey_id == survey.id
+        if snapshot is not None:
+            scope = and_(scope, SurveyResponse.survey_version_id == snapshot.id)
+        # Materialized aggregates only exist for the cross-version view
+        backend = "sql" if snapshot and settings.ANALYTICS_BACKEND == "aggregates" else settings.ANALYTICS_BACKEND
+        with ANALYTICS_COMPUTE_DURATION.time(backend=backend):
+            if backend == "sql":
+                analytics_data = await sql_analytics_service.compute_survey_analytics(db, survey, snapshot)
+            elif backend == "columnar":
+                schema = survey_schemas.get(survey)
+                names = survey_schemas.get(snapshot) if snapshot else None
+                rows = await db.execute(select(SurveyResponse.responses, SurveyResponse.answer_encoding).where(scope))
+                answer_sets = [schema.decode(stored, encoding, names) for stored, encoding in rows]
+                analytics_data = columnar_analytics_service.compute_survey_analytics(survey, answer_sets, snapshot)
+            elif backend == "python":
+                responses = (await db.scalars(select(SurveyResponse).where(scope))).all()
+                analytics_data = analytics_service.compute_survey_analytics(survey, responses, snapshot)
+            else:
+                analytics_data = await db.run_sync(aggregate_service.compute_survey_analytics, survey)
+        summary = {}
+        if snapshot is None:
+            # Term counts and sketches are kept per question id, so they only describe the cross-version view
+            await text_analytics_service.attach(db, survey, analytics_data["analytics"])
+            summary = await sketch_service.attach(db, survey, analytics_data["analytics"], exact)
+        return AnalyticsOut(
+            survey_id=survey.id,
+            title=survey.title,
+            version=snapshot.version_number if snapshot else None,
+            total_responses=analytics_data["total_responses"],
+            distinct_respondents=summary.get("distinct_respondents"),
+            approximate=summary.get("approximate"),
+            analytics=analytics_data["analytics"]
+        )
+
+report_service = ReportService()
@@ -0,0 +1,116 @@
+"""Responses waiting to be taken in by the incremental analytics indexes.
+
+A watermark on response ids cannot tell which responses an index has read:
+ids are handed out at insert, so on PostgreSQL a transaction holding id 10
+can commit after one holding id 11, and a refresh in between moves past 10
+for good. Instead, the transaction that inserts a response also inserts one
+outbox entry per index, so an entry becomes visible exactly when its
+response does. A refresh reads the responses whose entries it finds,
+applies them and deletes those entries in one transaction.
+"""
+from typing import Any, List, Sequence
+from sqlalchemy import select, delete, insert, exists, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.survey import SurveyResponse
+from app.models.analytics import ResponseOutboxEntry
+
+TEXT_TERMS = "text_terms"
+SKETCHES = "sketches"
+ANSWER_BITMAPS = "answer_bitmaps"
+# Every index that takes in new responses through the outbox
+CONSUMERS = (TEXT_TERMS, SKETCHES, ANSWER_BITMAPS)
+CLAIM_CHUNK = 500
+
+class ResponseOutbox:
+    """One index's view of the outbox.
+
+    ``state`` is the index's per-survey model: its row exists once the
+    survey's responses from before the index tracked it have been queued
+    as well, so every response is either taken in or has an entry.
+    """
+
+    def __init__(self, consumer: str, state):
+        self.consumer = consumer
+        self.state = state
+
+    @staticmethod
+    def publish(db: Session, survey_id: int, response_ids: List[int]) -> None:
+        """Queue newly flushed responses for every index (caller commits)"""
+        if response_ids:
+            db.execute(insert(ResponseOutboxEntry), [
+                {"consumer": consumer, "survey_id": survey_id, "response_id": response_id}
+                for consumer in CONSUMERS for response_id in response_ids
+            ])
+
+    async def track(self, db: AsyncSession, survey_id: int) -> None:
+        """Queue a survey's responses the first time the index is refreshed for it (commits)"""
+        if await db.scalar(select(self.state.survey_id).where(self.state.survey_id == survey_id)) is not None:
+            return
+        try:
+            await db.execute(insert(ResponseOutboxEntry).from_select(
+                ["consumer", "survey_id", "response_id"],
+                select(literal(self.consumer), SurveyResponse.survey_id, SurveyResponse.id).where(
+                    SurveyResponse.survey_id == survey_id,
+                    ~self.is_pending(SurveyResponse.id)
+                )
+            ))
+            await db.execute(insert(self.state).values(survey_id=survey_id))
+            await db.commit()
+        except IntegrityError:
+            # Another worker started tracking the survey first
+            await db.rollback()
+
+    async def pending(self, db: AsyncSession, survey_id: int, columns: Sequence[Any], after: int, limit: int) -> List[Any]:
+        """``columns`` of up to ``limit`` queued responses with an id above ``after``, in id order"""
+        return (await db.execute(
+            select(*columns).join(ResponseOutboxEntry, ResponseOutboxEntry.response_id == SurveyResponse.id).where(
+                ResponseOutboxEntry.consumer == self.consumer,
+                ResponseOutboxEntry.survey_id == survey_id,
+                ResponseOutboxEntry.response_id > after
+            ).order_by(ResponseOutboxEntry.response_id).limit(limit)
+        )).all()
+
+    async def claim(self, db: AsyncSession, response_ids: List[int]) -> bool:
+        """Dequeue the responses a refresh applied and commit.
+
+        When another worker took any of them first, or one was deleted
+        meanwhile, rolls the refresh back instead and returns False, so no
+        response is ever applied twice.
+        """
+        taken = 0
+        for start in range(0, len(response_ids), CLAIM_CHUNK):
+            taken += (await db.execute(delete(ResponseOutboxEntry).where(
+                ResponseOutboxEntry.consumer == self.consumer,
+                ResponseOutboxEntry.response_id.in_(response_ids[start:start + CLAIM_CHUNK])
+            ))).rowcount
+        if taken != len(response_ids):
+            await db.rollback()
+            return False
+        await db.commit()
+        return True
+
+    def withdraw(self, db: Session, survey_id: int, response_id: int) -> bool:
+        """Dequeue a deleted response; True if the index had already taken it in (caller commits)"""
+        if db.execute(delete(ResponseOutboxEntry).where(
+            ResponseOutboxEntry.consumer == self.consumer,
+            ResponseOutboxEntry.response_id == response_id
+        )).rowcount:
+            return False
+        return db.scalar(select(self.state.survey_id).where(self.state.survey_id == survey_id)) is not None
+
+    def reset(self, db: Session, survey_id: int) -> None:
+        """Forget what was taken in, so the next refresh queues every response again (caller commits)"""
+        db.execute(delete(ResponseOutboxEntry).where(
+            ResponseOutboxEntry.consumer == self.consumer,
+            ResponseOutboxEntry.survey_id == survey_id
+        ))
+        db.execute(delete(self.state).where(self.state.survey_id == survey_id))
+
+    def is_pending(self, response_id):
+        """SQL condition: the response with ``response_id`` is still queued for this index"""
+        return exists().where(
+            ResponseOutboxEntry.consumer == self.consumer,
+            ResponseOutboxEntry.response_id == response_id
+        )
@@ -0,0 +1,174 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, delete, insert, func, literal, text, Integer, Float, Text, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.survey import Survey, SurveyResponse
+from app.models.analytics import ResponseSearchDocument
+from app.services.survey_schema import SurveySchema, survey_schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "response_search_fts"
+SNIPPET_OPEN = "["
+SNIPPET_CLOSE = "]"
+REBUILD_BATCH_SIZE = 1000
+# Words, each optionally ending in * for a prefix search
+SEARCH_TERM = re.compile(r"\w+\*?")
+
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "body, survey_id, question_key, content='response_search_documents', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS response_search_documents_ai AFTER INSERT ON response_search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, body, survey_id, question_key) "
+    "VALUES (new.id, new.body, new.survey_id, new.question_key); END",
+    "CREATE TRIGGER IF NOT EXISTS response_search_documents_ad AFTER DELETE ON response_search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body, survey_id, question_key) "
+    "VALUES ('delete', old.id, old.body, old.survey_id, old.question_key); END",
+)
+
+class SearchService:
+    """Full-text search over free-text answers.
+
+    Every non-empty answer to a ``text`` question becomes a
+    ResponseSearchDocument row when its response is stored and is removed
+    with it. SQLite searches them through an FTS5 index ranked by bm25;
+    PostgreSQL through a GIN tsvector index ranked by ts_rank_cd.
+    """
+
+    def ensure_index(self, connection) -> None:
+        """Create the SQLite FTS5 table and its triggers (PostgreSQL's GIN index comes with the table)"""
+        if connection.dialect.name != "sqlite":
+            return
+        created = not connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+        if created:
+            # Index documents written before the FTS table existed
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+    def index_responses(self, db: Session, survey: Survey, items: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """Add documents for (response id, answers keyed by question text) pairs (caller commits)"""
+        rows = self.documents(survey.id, survey_schemas.get(survey), items)
+        if rows:
+            db.execute(insert(ResponseSearchDocument), rows)
+
+    @staticmethod
+    def documents(survey_id: int, schema: SurveySchema, items: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """ResponseSearchDocument rows for (response id, answers keyed by question text) pairs"""
+        questions = [
+            (q.get("text", ""), q.get("id") or q.get("text", ""))
+            for q in schema.questions if q.get("type", "text") == "text"
+        ]
+        rows = []
+        for response_id, answers in items:
+            for q_text, key in questions:
+                value = answers.get(q_text)
+                if isinstance(value, str) and value.strip():
+                    rows.append({"survey_id": survey_id, "response_id": response_id, "question_key": key, "body": value})
+        return rows
+
+    def remove_responses(self, db: Session, response_ids: List[int]) -> None:
+        """Drop the documents of responses about to be deleted (caller commits)"""
+        if response_ids:
+            db.execute(delete(ResponseSearchDocument).where(ResponseSearchDocument.response_id.in_(response_ids)))
+
+    def rebuild_survey(self, db: Session, survey: Survey) -> int:
+        """Re-create a survey's documents from its stored responses (caller commits)"""
+        db.execute(delete(ResponseSearchDocument).where(ResponseSearchDocument.survey_id == survey.id))
+        schema = survey_schemas.get(survey)
+        last_id = 0
+        indexed = 0
+        while True:
+            batch = db.query(SurveyResponse.id, SurveyResponse.responses, SurveyResponse.answer_encoding).filter(
+                SurveyResponse.survey_id == survey.id,
+                SurveyResponse.id > last_id
+            ).order_by(SurveyResponse.id).limit(REBUILD_BATCH_SIZE).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            self.index_responses(db, survey, [(r.id, schema.decode(r.responses, r.answer_encoding)) for r in batch])
+            indexed += len(batch)
+        return indexed
+
+    @staticmethod
+    def terms(query: str) -> List[str]:
+        return SEARCH_TERM.findall(query)
+
+    async def search(
+        self,
+        db: AsyncSession,
+        survey: Survey,
+        query: str,
+        question_key: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Best matches first; ``terms(query)`` must not be empty"""
+        if db.get_bind().dialect.name == "postgresql":
+            rows = await self._search_postgresql(db, survey.id, query, question_key, offset, limit)
+        else:
+            rows = await self._search_sqlite(db, survey.id, query, question_key, offset, limit)
+        schema = survey_schemas.get(survey)
+        return [{
+            "response_id": row.response_id,
+            "question_id": row.question_key if row.question_key in schema.text_by_id else None,
+            "question": schema.text_by_id.get(row.question_key, row.question_key),
+            "snippet": row.snippet,
+            "score": round(float(row.score), 4),
+            "submitted_at": row.submitted_at,
+        } for row in rows]
+
+    async def _search_sqlite(self, db: AsyncSession, survey_id: int, query: str, question_key, offset: int, limit: int):
+        words = " ".join(
+            f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in self.terms(query)
+        )
+        # Filters are part of the MATCH so FTS5 intersects posting lists instead of filtering afterwards
+        match = f'survey_id : "{survey_id}" AND body : ({words})'
+        if question_key is not None:
+            match += ' AND question_key : "{}"'.format(question_key.replace('"', '""'))
+        # Rank inside the FTS index alone; snippets and joins are only built for the page
+        sql = (
+            "SELECT d.response_id, d.question_key, -page.rank AS score, "
+            f"(SELECT snippet({FTS_TABLE}, 0, :open, :close, '…', 16) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH :match AND rowid = page.doc_id) AS snippet, r.submitted_at "
+            f"FROM (SELECT rowid AS doc_id, bm25({FTS_TABLE}, 1.0, 0.0, 0.0) AS rank FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH :match ORDER BY rank, rowid LIMIT :limit OFFSET :offset) AS page "
+            "JOIN response_search_documents d ON d.id = page.doc_id "
+            "JOIN survey_responses r ON r.id = d.response_id "
+            "ORDER BY page.rank, page.doc_id"
+        )
+        params = {"match": match, "open": SNIPPET_OPEN, "close": SNIPPET_CLOSE, "limit": limit, "offset": offset}
+        statement = text(sql).columns(
+            response_id=Integer, question_key=Text, score=Float, snippet=Text, submitted_at=DateTime
+        )
+        return (await db.execute(statement, params)).all()
+
+    async def _search_postgresql(self, db: AsyncSession, survey_id: int, query: str, question_key, offset: int, limit: int):
+        document = ResponseSearchDocument
+        config = literal("simple")
+        tsquery = func.websearch_to_tsquery(config, query)
+        vector = func.to_tsvector(config, document.body)
+        score = func.ts_rank_cd(vector, tsquery)
+        statement = select(
+            document.response_id,
+            document.question_key,
+            score.label("score"),
+            func.ts_headline(
+                config, document.body, tsquery,
+                f"StartSel={SNIPPET_OPEN}, StopSel={SNIPPET_CLOSE}, MaxWords=24, MinWords=8"
+            ).label("snippet"),
+            SurveyResponse.submitted_at,
+        ).join(SurveyResponse, SurveyResponse.id == document.response_id).where(
+            document.survey_id == survey_id,
+            vector.op("@@")(tsquery)
+        )
+        if question_key is not None:
+            statement = statement.where(document.question_key == question_key)
+        return (await db.execute(statement.order_by(score.desc(), document.id).offset(offset).limit(limit))).all()
+
+search_service = SearchService()
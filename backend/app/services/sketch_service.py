@@ -0,0 +1,304 @@
+import asyncio
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.survey import Survey, SurveyResponse
+from app.models.analytics import QuestionSketch, SketchState
+from app.services.analytics_service import AnalyticsService
+from app.services.response_outbox import ResponseOutbox, SKETCHES
+from app.services.survey_schema import survey_schemas, ENCODING_QUESTION_IDS
+from app.services.sketches import KLLSketch, HyperLogLog, SpaceSaving, SKETCH_TYPES
+import logging
+
+logger = logging.getLogger(__name__)
+
+SURVEY_KEY = ""             # question_key of the survey-wide distinct respondents sketch
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+READ_BATCH_SIZE = 5000
+TOP_ANSWER_MAX_LENGTH = 200
+BUCKET = timedelta(days=1)
+ROW_COLUMNS = (
+    SurveyResponse.id, SurveyResponse.responses, SurveyResponse.answer_encoding,
+    SurveyResponse.respondent_ip, SurveyResponse.submitted_at
+)
+
+SketchKey = Tuple[str, str, datetime]   # (question key, kind, bucket start)
+
+class SketchService:
+    """Constant-memory statistics from mergeable sketches kept per question and day.
+
+    Every question gets a HyperLogLog of the respondent IPs that answered it,
+    rating and number questions a KLL quantile sketch and text questions a
+    Space-Saving summary of their most frequent answers; the survey as a
+    whole gets a HyperLogLog of all respondents. Sketches are stored per
+    daily bucket and refreshed on read from the responses waiting in the
+    response outbox. Sketches cannot un-count, so deleting a response marks
+    its bucket stale and that day is recounted on the next refresh.
+    """
+
+    def __init__(self):
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.outbox = ResponseOutbox(SKETCHES, SketchState)
+
+    @staticmethod
+    def bucket_start(moment: datetime) -> datetime:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    async def refresh(self, db: AsyncSession, survey: Survey) -> int:
+        """Sketch the responses received since the last refresh and recount stale days (commits)"""
+        lock = self._locks.setdefault(survey.id, asyncio.Lock())
+        async with lock:
+            plan = self._plan(survey)
+            await self.outbox.track(db, survey.id)
+            stale = set((await db.scalars(select(QuestionSketch.bucket_start).where(
+                QuestionSketch.survey_id == survey.id,
+                QuestionSketch.is_stale == True
+            ).distinct())).all())
+            fresh: Dict[SketchKey, Any] = {}
+            read = 0
+            for bucket in sorted(stale):
+                await db.execute(delete(QuestionSketch).where(
+                    QuestionSketch.survey_id == survey.id,
+                    QuestionSketch.bucket_start == bucket
+                ))
+                # Queued responses of the day are read below, with the rest of the queue
+                read += await self._read(db, fresh, plan, (
+                    SurveyResponse.survey_id == survey.id,
+                    ~self.outbox.is_pending(SurveyResponse.id),
+                    SurveyResponse.submitted_at >= bucket,
+                    SurveyResponse.submitted_at < bucket + BUCKET
+                ))
+            taken: List[int] = []
+            while True:
+                rows = await self.outbox.pending(db, survey.id, ROW_COLUMNS, taken[-1] if taken else 0, READ_BATCH_SIZE)
+                if not rows:
+                    break
+                taken.extend(row.id for row in rows)
+                self._add_rows(fresh, plan, rows)
+            if not taken and not stale:
+                return 0
+            read += len(taken)
+            await self._store(db, survey.id, fresh, stale)
+            if not await self.outbox.claim(db, taken):
+                return 0
+            logger.info(f"Sketched {read} responses for survey {survey.id} ({len(stale)} stale day(s) recounted)")
+            return read
+
+    def retract_response(self, db: Session, survey: Survey, response: SurveyResponse) -> None:
+        """Mark the day of a deleted response for recounting if it was sketched (caller commits)"""
+        if not self.outbox.withdraw(db, survey.id, response.id) or response.submitted_at is None:
+            return
+        db.execute(update(QuestionSketch).where(
+            QuestionSketch.survey_id == survey.id,
+            QuestionSketch.bucket_start == self.bucket_start(response.submitted_at)
+        ).values(is_stale=True))
+
+    def reset_survey(self, db: Session, survey_id: int) -> None:
+        """Forget a survey's sketches so the next refresh rebuilds them (caller commits)"""
+        db.execute(delete(QuestionSketch).where(QuestionSketch.survey_id == survey_id))
+        self.outbox.reset(db, survey_id)
+
+    async def merged(
+        self, db: AsyncSession, survey_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Dict[Tuple[str, str], Any]:
+        """Sketches of the days in [start, end) merged per (question key, kind)"""
+        query = select(QuestionSketch.question_key, QuestionSketch.kind, QuestionSketch.payload).where(
+            QuestionSketch.survey_id == survey_id
+        )
+        if start is not None:
+            query = query.where(QuestionSketch.bucket_start >= self.bucket_start(start))
+        if end is not None:
+            query = query.where(QuestionSketch.bucket_start < end)
+        sketches: Dict[Tuple[str, str], Any] = {}
+        for key, kind, payload in await db.execute(query):
+            sketch = SKETCH_TYPES[kind].from_bytes(payload)
+            current = sketches.get((key, kind))
+            sketches[(key, kind)] = sketch if current is None else current.merge(sketch)
+        return sketches
+
+    async def attach(self, db: AsyncSession, survey: Survey, analytics: Dict[str, Any], exact: bool = False) -> Dict[str, Any]:
+        """Add percentiles, distinct respondents and top answers to ``analytics``.
+
+        Returns the survey-wide fields. ``exact`` scans every response
+        instead of reading the sketches.
+        """
+        try:
+            if exact:
+                stats = await self._exact(db, survey)
+            else:
+                await self.refresh(db, survey)
+                stats = self._summarize(await self.merged(db, survey.id))
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Sketch statistics for survey {survey.id} failed: {str(e)}")
+            return {}
+        for q_text, key, _ in self._plan(survey):
+            data = analytics.get(q_text, {}).get("data")
+            if isinstance(data, dict) and key in stats:
+                data.update(stats[key])
+        return {"distinct_respondents": stats.get(SURVEY_KEY, {}).get("distinct_respondents", 0), "approximate": not exact}
+
+    @staticmethod
+    def _plan(survey: Survey) -> List[Tuple[str, str, str]]:
+        """(question text, storage key, type) of every question"""
+        return [
+            (q.get("text", ""), q.get("id") or q.get("text", ""), q.get("type", "text"))
+            for q in survey_schemas.get(survey).questions
+        ]
+
+    @staticmethod
+    async def _rows(db: AsyncSession, scope) -> List[Any]:
+        return (await db.execute(
+            select(*ROW_COLUMNS).where(*scope).order_by(SurveyResponse.id).limit(READ_BATCH_SIZE)
+        )).all()
+
+    async def _read(self, db: AsyncSession, fresh: Dict[SketchKey, Any], plan, scope: tuple) -> int:
+        last_id = 0
+        read = 0
+        while True:
+            rows = await self._rows(db, scope + (SurveyResponse.id > last_id,))
+            if not rows:
+                return read
+            last_id = rows[-1].id
+            read += len(rows)
+            self._add_rows(fresh, plan, rows)
+
+    @staticmethod
+    def _answers(plan, stored: Optional[Dict[str, Any]], encoding: int):
+        """(key, type, raw answer) of the answered questions; raw values suffice for every sketch"""
+        if not stored:
+            return
+        for q_text, key, q_type in plan:
+            value = stored.get(key if encoding == ENCODING_QUESTION_IDS else q_text)
+            if value is not None and value != "":
+                yield key, q_type, value
+
+    def _add_rows(self, fresh: Dict[SketchKey, Any], plan, rows) -> None:
+        def sketch(key: str, kind: str, bucket: datetime):
+            current = fresh.get((key, kind, bucket))
+            if current is None:
+                if kind == "kll":
+                    current = KLLSketch(settings.SKETCH_KLL_K)
+                elif kind == "hll":
+                    current = HyperLogLog(settings.SKETCH_HLL_PRECISION)
+                else:
+                    current = SpaceSaving(settings.SKETCH_TOPK_CAPACITY)
+                fresh[(key, kind, bucket)] = current
+            return current
+
+        for row in rows:
+            bucket = self.bucket_start(row.submitted_at or datetime.utcnow())
+            hashed = HyperLogLog.hash(row.respondent_ip) if row.respondent_ip else None
+            if hashed is not None:
+                sketch(SURVEY_KEY, "hll", bucket).add_hash(hashed)
+            for key, q_type, value in self._answers(plan, row.responses, row.answer_encoding):
+                if hashed is not None:
+                    sketch(key, "hll", bucket).add_hash(hashed)
+                if q_type in ("rating", "number"):
+                    number = AnalyticsService._parse_number(value)
+                    if number is not None:
+                        sketch(key, "kll", bucket).add(number)
+                elif q_type == "text":
+                    text = str(value).strip()
+                    if text:
+                        sketch(key, "topk", bucket).add(text[:TOP_ANSWER_MAX_LENGTH])
+
+    async def _store(self, db: AsyncSession, survey_id: int, fresh: Dict[SketchKey, Any], stale: Set[datetime]) -> None:
+        buckets = {bucket for _, _, bucket in fresh}
+        existing = {}
+        if buckets:
+            rows = (await db.scalars(select(QuestionSketch).where(
+                QuestionSketch.survey_id == survey_id,
+                QuestionSketch.bucket_start.in_(buckets)
+            ))).all()
+            existing = {(row.question_key, row.kind, row.bucket_start): row for row in rows}
+        for (key, kind, bucket), sketch in fresh.items():
+            row = existing.get((key, kind, bucket))
+            if row is None:
+                db.add(QuestionSketch(
+                    survey_id=survey_id, question_key=key, kind=kind, bucket_start=bucket,
+                    item_count=self._item_count(sketch), payload=sketch.to_bytes(), is_stale=False
+                ))
+                continue
+            if row.is_stale:
+                # Deleted while this refresh ran; recounted by the next one
+                continue
+            stored = SKETCH_TYPES[kind].from_bytes(row.payload).merge(sketch)
+            row.payload = stored.to_bytes()
+            row.item_count = self._item_count(stored)
+        await db.flush()
+
+    @staticmethod
+    def _item_count(sketch) -> int:
+        if isinstance(sketch, HyperLogLog):
+            return sketch.estimate()
+        return sketch.count
+
+    @staticmethod
+    def _summarize(sketches: Dict[Tuple[str, str], Any]) -> Dict[str, Dict[str, Any]]:
+        stats: Dict[str, Dict[str, Any]] = {}
+        for (key, kind), sketch in sketches.items():
+            entry = stats.setdefault(key, {})
+            if kind == "hll":
+                entry["distinct_respondents"] = sketch.estimate()
+            elif kind == "kll" and sketch.count:
+                entry["percentiles"] = {name: round(sketch.quantile(q), 2) for name, q in PERCENTILES}
+            elif kind == "topk":
+                entry["top_answers"] = dict(sketch.top(settings.SKETCH_TOP_ANSWERS))
+        return stats
+
+    @staticmethod
+    def _quantile(values: List[float], q: float) -> float:
+        """Linear interpolation between the closest ranks of sorted ``values``; p50 is statistics.median"""
+        position = q * (len(values) - 1)
+        lower = math.floor(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    async def _exact(self, db: AsyncSession, survey: Survey) -> Dict[str, Dict[str, Any]]:
+        """The same statistics from every stored response, in memory proportional to them"""
+        plan = self._plan(survey)
+        numbers: Dict[str, List[float]] = {}
+        respondents: Dict[str, Set[str]] = {}
+        answers: Dict[str, Dict[str, int]] = {}
+        last_id = 0
+        while True:
+            rows = await self._rows(db, (SurveyResponse.survey_id == survey.id, SurveyResponse.id > last_id))
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                for key, q_type, value in self._answers(plan, row.responses, row.answer_encoding):
+                    if row.respondent_ip:
+                        respondents.setdefault(key, set()).add(row.respondent_ip)
+                    if q_type in ("rating", "number"):
+                        number = AnalyticsService._parse_number(value)
+                        if number is not None:
+                            numbers.setdefault(key, []).append(number)
+                    elif q_type == "text":
+                        text = str(value).strip()[:TOP_ANSWER_MAX_LENGTH]
+                        if text:
+                            counts = answers.setdefault(key, {})
+                            counts[text] = counts.get(text, 0) + 1
+        stats: Dict[str, Dict[str, Any]] = {
+            SURVEY_KEY: {"distinct_respondents": await db.scalar(
+                select(func.count(func.distinct(SurveyResponse.respondent_ip))).where(SurveyResponse.survey_id == survey.id)
+            ) or 0}
+        }
+        for key, ips in respondents.items():
+            stats.setdefault(key, {})["distinct_respondents"] = len(ips)
+        for key, values in numbers.items():
+            values.sort()
+            stats.setdefault(key, {})["percentiles"] = {
+                name: round(self._quantile(values, q), 2) for name, q in PERCENTILES
+            }
+        for key, counts in answers.items():
+            top = sorted(counts.items(), key=lambda entry: (-entry[1], entry[0]))[:settings.SKETCH_TOP_ANSWERS]
+            stats.setdefault(key, {})["top_answers"] = dict(top)
+        return stats
+
+sketch_service = SketchService()
@@ -0,0 +1,231 @@
+"""Mergeable streaming sketches with compact binary serialization.
+
+KLLSketch answers quantile queries, HyperLogLog counts distinct items and
+SpaceSaving tracks the most frequent ones. Each uses memory bounded by its
+parameters, however many items it has seen, and two sketches of the same
+kind merge into one describing both inputs.
+"""
+import hashlib
+import json
+import math
+import random
+import struct
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+class KLLSketch:
+    """Quantiles with rank error around 1.65 / k (Karnin, Lang and Liberty).
+
+    Exact while fewer than ``k`` values have been added.
+    """
+
+    HEADER = struct.Struct("<HQB")
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.count = 0
+        self.levels: List[List[float]] = [[]]
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._random = random.Random()
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+        self.levels[0].append(value)
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        if other.count == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, values in enumerate(other.levels):
+            self.levels[level].extend(values)
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Smallest retained value whose rank reaches ``q`` (nearest-rank)"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        weighted = sorted((value, 1 << level) for level, values in enumerate(self.levels) for value in values)
+        total = sum(weight for _, weight in weighted)
+        target = math.ceil(q * total)
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return self.max
+
+    def to_bytes(self) -> bytes:
+        parts = [self.HEADER.pack(self.k, self.count, len(self.levels))]
+        if self.count:
+            parts.append(struct.pack("<dd", self.min, self.max))
+        for values in self.levels:
+            parts.append(struct.pack("<I", len(values)))
+            parts.append(array("d", values).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "KLLSketch":
+        k, count, level_count = cls.HEADER.unpack_from(payload)
+        sketch = cls(k)
+        sketch.count = count
+        offset = cls.HEADER.size
+        if count:
+            sketch.min, sketch.max = struct.unpack_from("<dd", payload, offset)
+            offset += 16
+        sketch.levels = []
+        for _ in range(level_count):
+            (size,) = struct.unpack_from("<I", payload, offset)
+            offset += 4
+            values = array("d")
+            values.frombytes(payload[offset:offset + 8 * size])
+            sketch.levels.append(values.tolist())
+            offset += 8 * size
+        return sketch
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self) -> None:
+        while True:
+            for level, values in enumerate(self.levels):
+                if len(values) >= self._capacity(level):
+                    break
+            else:
+                return
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            values.sort()
+            # Every other value moves up a level with twice the weight; odd one out stays
+            keep = [values.pop()] if len(values) % 2 else []
+            self.levels[level + 1].extend(values[self._random.randint(0, 1)::2])
+            self.levels[level] = keep
+
+class HyperLogLog:
+    """Distinct count with standard error around 1.04 / sqrt(2 ** precision)"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @staticmethod
+    def hash(item: str) -> int:
+        return int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, item: str) -> None:
+        self.add_hash(self.hash(item))
+
+    def add_hash(self, hashed: int) -> None:
+        """Add a value from ``hash``; lets one hash feed several sketches"""
+        rest_bits = 64 - self.precision
+        index = hashed >> rest_bits
+        rank = rest_bits - (hashed & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        # Mostly-empty registers compress to a few bytes
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "HyperLogLog":
+        sketch = cls(payload[0])
+        sketch.registers = bytearray(zlib.decompress(payload[1:]))
+        return sketch
+
+class SpaceSaving:
+    """The most frequent items (Metwally et al.); counts overestimate by at most ``error``.
+
+    Any item occurring more than count / capacity times is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.count = 0
+        # item -> [count, maximum overestimate]
+        self.counters: Dict[str, List[int]] = {}
+
+    def add(self, item: str) -> None:
+        self.count += 1
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += 1
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [1, 0]
+        else:
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + 1, floor]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        # Items missing from a full summary may have occurred up to its smallest count
+        own_floor = self._floor()
+        other_floor = other._floor()
+        merged: Dict[str, List[int]] = {}
+        for item in self.counters.keys() | other.counters.keys():
+            mine = self.counters.get(item, [own_floor, own_floor])
+            theirs = other.counters.get(item, [other_floor, other_floor])
+            merged[item] = [mine[0] + theirs[0], mine[1] + theirs[1]]
+        top = sorted(merged.items(), key=lambda entry: (-entry[1][0], entry[0]))[:self.capacity]
+        self.counters = dict(top)
+        self.count += other.count
+        return self
+
+    def top(self, limit: int) -> List[Tuple[str, int]]:
+        return sorted(
+            ((item, counter[0]) for item, counter in self.counters.items()),
+            key=lambda entry: (-entry[1], entry[0])
+        )[:limit]
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(json.dumps(
+            [self.capacity, self.count, self.counters], ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "SpaceSaving":
+        capacity, count, counters = json.loads(zlib.decompress(payload))
+        sketch = cls(capacity)
+        sketch.count = count
+        sketch.counters = counters
+        return sketch
+
+    def _floor(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+SKETCH_TYPES: Dict[str, Any] = {"kll": KLLSketch, "hll": HyperLogLog, "topk": SpaceSaving}
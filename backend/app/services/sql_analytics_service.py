@@ -0,0 +1,291 @@
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, func, case, cast, and_, or_, not_, literal, Float, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.models.survey import Survey, SurveyResponse, SurveyVersion
+from app.services.analytics_service import AnalyticsService, NUMERIC_STRING
+from app.services.survey_schema import ENCODING_QUESTION_IDS, survey_schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 3
+
+class _JsonField:
+    """Dialect-specific SQL expressions for one answer inside SurveyResponse.responses.
+
+    Mirrors the Python rules in AnalyticsService: an answer is *present*
+    when the key exists and is not JSON null, *numeric* when it is a JSON
+    number or a string matching NUMERIC_STRING, and a *choice* when it is truthy. Array
+    and object answers are labelled with their JSON text rather than
+    Python's repr.
+
+    Rows stored with question ids (see SurveySchema.encode) are read under
+    ``qid``; option indices of ``labels`` are mapped back to their label and
+    ``{"v": ...}`` wrappers unwrapped, so both encodings aggregate alike.
+    """
+
+    def __init__(self, dialect: str, key: str, qid: Optional[str] = None, labels: Optional[List[str]] = None):
+        self.dialect = dialect
+        self.labels = labels
+        column = SurveyResponse.responses
+        encoded = SurveyResponse.answer_encoding == ENCODING_QUESTION_IDS
+        if dialect == "postgresql":
+            element = column.op("->")(literal(key, String))
+            self.text = column.op("->>")(literal(key, String))
+            if qid is not None:
+                by_id = column.op("->")(literal(qid, String))
+                by_id_text = column.op("->>")(literal(qid, String))
+                if labels is not None:
+                    raw_type = func.json_typeof(by_id)
+                    wrapped = raw_type == "object"
+                    by_id, by_id_text = (
+                        case((wrapped, by_id.op("->")(literal("v", String))), else_=by_id),
+                        case((wrapped, by_id.op("->>")(literal("v", String))), else_=by_id_text),
+                    )
+                    self._is_index = and_(encoded, raw_type == "number")
+                element = case((encoded, by_id), else_=element)
+                self.text = case((encoded, by_id_text), else_=self.text)
+            self.json_type = func.json_typeof(element)
+            self._number_types = ("number",)
+            self._string_types = ("string",)
+            self._true = and_(self.json_type == "boolean", self.text == "true")
+            self._false = and_(self.json_type == "boolean", self.text == "false")
+        else:
+            path = literal(self._sqlite_path(key))
+            if qid is not None:
+                by_id = self._sqlite_path(qid)
+                if labels is not None:
+                    raw_type = func.json_type(column, by_id)
+                    self._is_index = and_(encoded, raw_type == "integer")
+                    by_id = case((raw_type == "object", literal(by_id + ".v")), else_=literal(by_id))
+                path = case((encoded, by_id), else_=path)
+            self.text = cast(func.json_extract(column, path), String)
+            self.json_type = func.json_type(column, path)
+            self._number_types = ("integer", "real")
+            self._string_types = ("text",)
+            self._true = self.json_type == "true"
+            self._false = self.json_type == "false"
+
+    @staticmethod
+    def _sqlite_path(key: str) -> str:
+        return '$."' + key.replace('"', '\\"') + '"'
+
+    @property
+    def present(self) -> ColumnElement:
+        return and_(self.json_type.isnot(None), self.json_type != "null")
+
+    @property
+    def is_numeric(self) -> ColumnElement:
+        is_number = self.json_type.in_(self._number_types)
+        is_string = self.json_type.in_(self._string_types)
+        if self.dialect == "postgresql":
+            return or_(is_number, and_(is_string, self.text.op("~")(f"^{NUMERIC_STRING.pattern}$")))
+        unsigned = case((func.substr(self.text, 1, 1) == "-", func.substr(self.text, 2)), else_=self.text)
+        return or_(is_number, and_(
+            is_string,
+            unsigned != "",
+            unsigned != ".",
+            not_(unsigned.op("GLOB")("*[^0-9.]*")),
+            func.length(unsigned) - func.length(func.replace(unsigned, ".", "")) <= 1,
+        ))
+
+    @property
+    def number(self) -> ColumnElement:
+        return case((self.is_numeric, cast(self.text, Float)), else_=None)
+
+    @property
+    def label(self) -> ColumnElement:
+        """str(answer).strip() as SQL"""
+        whens = [(self._true, literal("True")), (self._false, literal("False"))]
+        if self.labels is not None:
+            options = case(
+                {str(index): label.strip() for index, label in enumerate(self.labels)},
+                value=self.text, else_=func.trim(self.text)
+            )
+            whens.insert(0, (self._is_index, options))
+        return case(*whens, else_=func.trim(self.text))
+
+    @property
+    def is_truthy(self) -> ColumnElement:
+        truthy = and_(
+            self.present,
+            not_(self._false),
+            or_(self.json_type.notin_(self._string_types), self.text != ""),
+            # CASE rather than OR so PostgreSQL never casts a non-number to FLOAT
+            case((self.json_type.in_(self._number_types), cast(self.text, Float) != 0), else_=True),
+        )
+        if self.labels is None:
+            return truthy
+        # An option index is as truthy as the label it stands for
+        empty = [str(index) for index, label in enumerate(self.labels) if not label]
+        return case((self._is_index, self.text.notin_(empty) if empty else True), else_=truthy)
+
+    @property
+    def word_count(self) -> ColumnElement:
+        label = self.label
+        if self.dialect == "postgresql":
+            return func.array_length(func.regexp_split_to_array(label, r"\s+"), 1)
+        # No regex split in SQLite: fold tabs/newlines to spaces and collapse runs of up to 16 spaces
+        spaced = func.replace(func.replace(func.replace(label, "\t", " "), "\n", " "), "\r", " ")
+        for _ in range(4):
+            spaced = func.replace(spaced, "  ", " ")
+        spaced = func.trim(spaced)
+        return func.length(spaced) - func.length(func.replace(spaced, " ", "")) + 1
+
+class SqlAnalyticsService:
+    """Computes the AnalyticsService payload with aggregate queries over the JSON column"""
+
+    async def compute_survey_analytics(
+        self, db: AsyncSession, survey: Survey, version: Optional[SurveyVersion] = None
+    ) -> Dict[str, Any]:
+        """Analytics of every response under the current questions, or of ``version``'s responses under its own"""
+        dialect = db.get_bind().dialect.name
+        scope = SurveyResponse.survey_id == survey.id
+        if version is not None:
+            scope = and_(scope, SurveyResponse.survey_version_id == version.id)
+        total_responses = await db.scalar(select(func.count(SurveyResponse.id)).where(scope)) or 0
+        if not total_responses:
+            return {"total_responses": 0, "analytics": {}, "message": "No responses yet"}
+
+        # Stored option indices follow the current option codes whatever the version
+        labels = survey_schemas.get(survey).option_labels
+        keyed = survey_schemas.get(version or survey).keyed
+        fields = [(
+            q.get("text", ""),
+            q.get("type", "text"),
+            _JsonField(dialect, q.get("text", ""), q.get("id") if keyed else None, labels.get(q.get("id")))
+        ) for q in (version or survey).questions]
+        summary = await self._summary_row(db, scope, fields, dialect)
+
+        analytics = {}
+        for index, (q_text, q_type, field) in enumerate(fields):
+            stats = summary[index]
+            if not stats["present"]:
+                analytics[q_text] = {"type": q_type, "response_count": 0, "data": "No responses"}
+                continue
+            if q_type == "rating":
+                analytics[q_text] = await self._rating(db, scope, field, stats)
+            elif q_type in ["multiple_choice", "yes_no"]:
+                analytics[q_text] = await self._choice(db, scope, field)
+            elif q_type == "number":
+                analytics[q_text] = await self._numeric(db, scope, field, stats)
+            elif q_type == "text":
+                analytics[q_text] = await self._text(db, scope, field, stats)
+            else:
+                analytics[q_text] = {"data": f"{stats['present']} answers"}
+            analytics[q_text]["type"] = q_type
+            analytics[q_text]["response_count"] = stats["present"]
+        return {"total_responses": total_responses, "analytics": analytics}
+
+    async def _summary_row(self, db: AsyncSession, scope, fields, dialect: str) -> List[Dict[str, Any]]:
+        """One pass over the survey's rows computing every per-question scalar aggregate"""
+        columns = []
+        for q_text, q_type, field in fields:
+            columns.append(func.count(case((field.present, 1), else_=None)))
+            if q_type in ("rating", "number"):
+                number = field.number
+                columns += [func.count(number), func.sum(number), func.min(number), func.max(number)]
+                if dialect == "postgresql":
+                    columns.append(func.percentile_cont(0.5).within_group(number))
+                else:
+                    columns.append(literal(None))
+            elif q_type == "text":
+                non_empty = and_(field.present, field.label != "")
+                columns += [
+                    func.count(case((non_empty, 1), else_=None)),
+                    func.sum(case((non_empty, field.word_count), else_=None)),
+                ]
+        row = (await db.execute(select(*columns).where(scope))).one()
+        values = iter(row)
+        summary = []
+        for q_text, q_type, field in fields:
+            stats = {"present": next(values) or 0}
+            if q_type in ("rating", "number"):
+                stats.update(valid=next(values) or 0, sum=next(values), min=next(values),
+                             max=next(values), median=next(values))
+            elif q_type == "text":
+                stats.update(texts=next(values) or 0, words=next(values) or 0)
+            summary.append(stats)
+        return summary
+
+    async def _rating(self, db: AsyncSession, scope, field: _JsonField, stats: Dict[str, Any]) -> Dict[str, Any]:
+        if not stats["valid"]:
+            return {"data": "No valid ratings"}
+        values = select(field.number.label("value")).where(scope, field.is_numeric).subquery()
+        rows = await db.execute(select(values.c.value, func.count()).group_by(values.c.value))
+        distribution = {float(value): count for value, count in rows}
+        median = stats["median"]
+        if median is None:
+            median = AnalyticsService._histogram_median(sorted(distribution.items()), stats["valid"])
+        return {"data": {
+            "average": round(stats["sum"] / stats["valid"], 2),
+            "median": round(float(median), 2),
+            "min": float(stats["min"]),
+            "max": float(stats["max"]),
+            "distribution": distribution,
+            "valid_responses": stats["valid"]}}
+
+    async def _numeric(self, db: AsyncSession, scope, field: _JsonField, stats: Dict[str, Any]) -> Dict[str, Any]:
+        if not stats["valid"]:
+            return {"data": "No valid numbers"}
+        median = stats["median"]
+        if median is None:
+            median = await self._ordered_median(db, scope, field, stats["valid"])
+        low, high = float(stats["min"]), float(stats["max"])
+        return {"data": {
+            "average": round(stats["sum"] / stats["valid"], 2),
+            "median": round(float(median), 2),
+            "min": low,
+            "max": high,
+            "range": high - low,
+            "valid_responses": stats["valid"]}}
+
+    async def _choice(self, db: AsyncSession, scope, field: _JsonField) -> Dict[str, Any]:
+        labels = select(field.label.label("label"), SurveyResponse.id).where(scope, field.is_truthy).subquery()
+        rows = await db.execute(
+            select(labels.c.label, func.count()).group_by(labels.c.label).order_by(func.min(labels.c.id))
+        )
+        counter = Counter()
+        for value, count in rows:
+            counter[value] += count
+        total = sum(counter.values())
+        return {"data": {
+            "responses": dict(counter),
+            "percentages": {k: round((v / total)*100, 1) for k, v in counter.items()},
+            "most_common": counter.most_common(1)[0] if counter else None
+        }}
+
+    async def _text(self, db: AsyncSession, scope, field: _JsonField, stats: Dict[str, Any]) -> Dict[str, Any]:
+        label = field.label
+        non_empty = and_(scope, field.present, label != "")
+        samples = (await db.scalars(
+            select(label).where(non_empty).order_by(SurveyResponse.id).limit(SAMPLE_SIZE)
+        )).all()
+        longest = await db.scalar(
+            select(label).where(non_empty).order_by(func.length(label).desc(), SurveyResponse.id).limit(1)
+        )
+        shortest = await db.scalar(
+            select(label).where(non_empty).order_by(func.length(label), SurveyResponse.id).limit(1)
+        )
+        texts = stats["texts"]
+        return {"data": {
+            "total_responses": texts,
+            "average_word_count": round(stats["words"]/texts, 1) if texts else 0,
+            "sample_responses": list(samples),
+            "longest_response": longest or "",
+            "shortest_response": shortest or ""
+        }}
+
+    @staticmethod
+    async def _ordered_median(db: AsyncSession, scope, field: _JsonField, count: int) -> float:
+        """Median without percentile_cont: fetch only the middle one or two values"""
+        number = field.number
+        middle = (await db.scalars(
+            select(number).where(scope, field.is_numeric).order_by(number)
+            .offset((count - 1) // 2).limit(2 - count % 2)
+        )).all()
+        return sum(middle) / len(middle)
+
+sql_analytics_service = SqlAnalyticsService()
@@ -0,0 +1,195 @@
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from app.core.config import settings
+from app.models.survey import Survey, SurveyVersion
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SurveyResponse.answer_encoding values
+ENCODING_TEXT_KEYS = 0      # {question text: answer}, as clients send it
+ENCODING_QUESTION_IDS = 1   # {question id: answer}, multiple_choice options stored as indices
+
+EXTRA_KEY = "_extra"        # answers to unknown questions (validation off), kept verbatim
+OPTION_CODES_KEY = "option_codes"  # multiple_choice labels by stored index, when not the options themselves
+
+def assign_question_ids(questions: List[Dict[str, Any]], previous: Iterable[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+    """Give every question a stable id.
+
+    An id sent by the client is kept if the survey already has it; otherwise a
+    question whose text is unchanged keeps its old id. A question whose type
+    changed, or anything else, is a new question and gets a fresh random id,
+    so ids of removed questions are never reused. Questions sharing an id
+    across versions are therefore safe to aggregate together.
+
+    A multiple_choice question also keeps the option codes of its id: stored
+    option indices never change meaning, so reordering or removing options
+    rewrites no responses.
+    """
+    previous = list(previous)
+    types_by_id = {q["id"]: q.get("type", "text") for q in previous if q.get("id")}
+    codes_by_id = {q["id"]: option_codes(q) for q in previous if q.get("id")}
+    ids_by_text = {q.get("text", ""): q["id"] for q in previous if q.get("id")}
+    taken = set()
+    assigned = []
+    for question in questions:
+        question = dict(question)
+        q_type = question.get("type", "text")
+        qid = question.get("id")
+        if qid not in types_by_id or qid in taken:
+            qid = ids_by_text.get(question.get("text", ""))
+        if qid is None or qid in taken or types_by_id[qid] != q_type:
+            qid = _new_question_id(types_by_id.keys() | taken)
+        question["id"] = qid
+        question.pop(OPTION_CODES_KEY, None)
+        if q_type == "multiple_choice":
+            options = question.get("options") or []
+            codes = codes_by_id.get(qid, [])
+            codes = codes + [option for option in options if option not in codes]
+            if codes != options:
+                question[OPTION_CODES_KEY] = codes
+        taken.add(qid)
+        assigned.append(question)
+    return assigned
+
+def option_codes(question: Dict[str, Any]) -> List[str]:
+    """Labels of a multiple_choice question by stored option index.
+
+    Options are appended and never removed, so an index keeps its label
+    whatever later versions do to the options; surveys without codes store
+    indices into their options.
+    """
+    return list(question.get(OPTION_CODES_KEY) or question.get("options") or [])
+
+def _new_question_id(taken) -> str:
+    while True:
+        qid = "q" + secrets.token_hex(4)
+        if qid not in taken:
+            return qid
+
+class SurveySchema:
+    """Parsed question metadata for one survey definition, plus the answer codec"""
+
+    def __init__(self, questions: List[Dict[str, Any]]):
+        self.questions = questions
+        self.keyed = bool(questions) and all(q.get("id") for q in questions)
+        self.id_by_text = {q.get("text", ""): q.get("id") for q in questions}
+        self.text_by_id = {q.get("id"): q.get("text", "") for q in questions if q.get("id")}
+        self.option_labels: Dict[str, List[str]] = {}
+        self.option_index: Dict[str, Dict[str, int]] = {}
+        for q in questions:
+            labels = option_codes(q)
+            if q.get("type") == "multiple_choice" and labels and q.get("id"):
+                self.option_labels[q["id"]] = labels
+                self.option_index[q["id"]] = {option: index for index, option in enumerate(labels)}
+        # Compiled on first use by ValidationService
+        self.validator = None
+
+    def encode(self, answers: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """Client answers -> (stored answers, answer_encoding)"""
+        if not self.keyed:
+            return answers, ENCODING_TEXT_KEYS
+        stored: Dict[str, Any] = {}
+        extra: Dict[str, Any] = {}
+        for text, value in answers.items():
+            qid = self.id_by_text.get(text)
+            if qid is None:
+                extra[text] = value
+                continue
+            index = self.option_index.get(qid)
+            if index is not None:
+                if isinstance(value, str) and value in index:
+                    value = index[value]
+                elif not isinstance(value, str) and value is not None:
+                    # Keeps a raw number from being read back as an option index
+                    value = {"v": value}
+            stored[qid] = value
+        if extra:
+            stored[EXTRA_KEY] = extra
+        return stored, ENCODING_QUESTION_IDS
+
+    def decode(self, stored: Optional[Dict[str, Any]], encoding: int, names: Optional["SurveySchema"] = None) -> Dict[str, Any]:
+        """Stored answers -> answers keyed by question text, as clients sent them.
+
+        Option indices follow the option codes, which only the current version
+        has in full, so ``self`` must be the current schema; ``names`` picks
+        the question texts of another version instead of the current ones.
+        """
+        if not stored:
+            return {}
+        if encoding != ENCODING_QUESTION_IDS:
+            return stored
+        text_by_id = (names or self).text_by_id
+        answers: Dict[str, Any] = {}
+        for qid, value in stored.items():
+            if qid == EXTRA_KEY:
+                answers.update(value)
+                continue
+            labels = self.option_labels.get(qid)
+            if labels is not None:
+                value = self.decode_choice(labels, value)
+            # Answers to questions since removed stay visible under their id
+            answers[text_by_id.get(qid, qid)] = value
+        return answers
+
+    def decode_by_key(self, stored: Optional[Dict[str, Any]], encoding: int) -> Dict[str, Any]:
+        """Stored answers -> answers keyed by question id (text for questions without one).
+
+        Unlike ``decode`` this keeps questions that share a text apart.
+        """
+        if not stored:
+            return {}
+        if encoding != ENCODING_QUESTION_IDS:
+            return {
+                q.get("id") or q.get("text", ""): stored[q.get("text", "")]
+                for q in self.questions if q.get("text", "") in stored
+            }
+        answers: Dict[str, Any] = {}
+        for qid, value in stored.items():
+            if qid == EXTRA_KEY:
+                continue
+            labels = self.option_labels.get(qid)
+            answers[qid] = self.decode_choice(labels, value) if labels is not None else value
+        return answers
+
+    @staticmethod
+    def decode_choice(labels: List[str], value: Any) -> Any:
+        if type(value) is int and 0 <= value < len(labels):
+            return labels[value]
+        if isinstance(value, dict) and "v" in value:
+            return value["v"]
+        return value
+
+class SchemaCache:
+    """SurveySchema per SurveyVersion.
+
+    Versions are immutable, so an entry never goes stale and is only
+    dropped to keep the cache within ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._schemas: "OrderedDict[int, SurveySchema]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: Union[Survey, SurveyVersion]) -> SurveySchema:
+        """Schema of a version, or of a survey's current version"""
+        version_id = source.id if isinstance(source, SurveyVersion) else source.current_version_id
+        if version_id is None:
+            # Survey from before versioning (run the migrations)
+            return SurveySchema(source.questions or [])
+        with self._lock:
+            schema = self._schemas.get(version_id)
+            if schema is not None:
+                self._schemas.move_to_end(version_id)
+                return schema
+        schema = SurveySchema(source.questions or [])
+        with self._lock:
+            self._schemas[version_id] = schema
+            while len(self._schemas) > self.max_entries:
+                self._schemas.popitem(last=False)
+        return schema
+
+survey_schemas = SchemaCache(settings.SCHEMA_CACHE_SIZE)
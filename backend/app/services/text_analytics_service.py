@@ -0,0 +1,224 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.survey import Survey, SurveyResponse
+from app.models.analytics import TextAnalyticsState, TextTermCount
+from app.services.response_outbox import ResponseOutbox, TEXT_TERMS
+from app.services.survey_schema import survey_schemas, ENCODING_QUESTION_IDS
+from app.services.text_terms import TermCounts, count_texts
+import logging
+
+logger = logging.getLogger(__name__)
+
+KIND_WORD = "word"
+KIND_BIGRAM = "bigram"
+KIND_LANGUAGE = "language"
+ALL_LANGUAGES = ""
+READ_BATCH_SIZE = 20000
+UPSERT_BATCH_SIZE = 1000
+
+class TextAnalyticsService:
+    """Top keywords, bigrams and languages of answers to text questions.
+
+    Counts live in text_term_counts and are brought up to date on read: a
+    refresh only reads the responses waiting in the response outbox, tokenizes
+    their answers in a process pool once there are enough of them (map) and
+    sums the per-chunk counters (reduce) into the stored totals. Deleting a
+    counted response subtracts its terms again.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.outbox = ResponseOutbox(TEXT_TERMS, TextAnalyticsState)
+
+    def count(self, texts: List[str]) -> TermCounts:
+        """Count terms, splitting large inputs across the process pool"""
+        chunks = self._chunks(texts)
+        if len(chunks) < 2 or settings.TEXT_ANALYTICS_WORKERS < 1:
+            return count_texts(texts)
+        counts = TermCounts()
+        for partial in self._get_pool().map(count_texts, chunks):
+            counts.merge(partial)
+        return counts
+
+    async def count_async(self, texts: List[str]) -> TermCounts:
+        """``count`` without blocking the event loop on large inputs"""
+        if len(texts) < settings.TEXT_ANALYTICS_PARALLEL_MIN:
+            return count_texts(texts)
+        if settings.TEXT_ANALYTICS_WORKERS < 1:
+            return await asyncio.to_thread(count_texts, texts)
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        counts = TermCounts()
+        for partial in await asyncio.gather(*(
+            loop.run_in_executor(pool, count_texts, chunk) for chunk in self._chunks(texts)
+        )):
+            counts.merge(partial)
+        return counts
+
+    async def refresh(self, db: AsyncSession, survey: Survey) -> int:
+        """Count the responses received since the last refresh (commits); returns how many were read"""
+        # Surveys without text questions still drain their outbox entries
+        questions = self._text_questions(survey)
+        lock = self._locks.setdefault(survey.id, asyncio.Lock())
+        async with lock:
+            await self.outbox.track(db, survey.id)
+            columns = (SurveyResponse.id, SurveyResponse.responses, SurveyResponse.answer_encoding)
+            totals: Dict[str, TermCounts] = {}
+            taken: List[int] = []
+            while True:
+                rows = await self.outbox.pending(db, survey.id, columns, taken[-1] if taken else 0, READ_BATCH_SIZE)
+                if not rows:
+                    break
+                taken.extend(row.id for row in rows)
+                texts: Dict[str, List[str]] = {key: [] for _, key in questions}
+                for row in rows:
+                    for key, text in self._answer_texts(questions, row.responses, row.answer_encoding):
+                        texts[key].append(text)
+                for key, batch in texts.items():
+                    if batch:
+                        counts = await self.count_async(batch)
+                        totals[key] = totals[key].merge(counts) if key in totals else counts
+            if not taken:
+                return 0
+            await db.run_sync(self._apply, survey.id, totals, 1)
+            if not await self.outbox.claim(db, taken):
+                return 0
+            logger.info(f"Counted text answers of {len(taken)} new responses for survey {survey.id}")
+            return len(taken)
+
+    def retract_response(self, db: Session, survey: Survey, response: SurveyResponse) -> None:
+        """Subtract a deleted response's terms if a refresh already counted them (caller commits)"""
+        if not self.outbox.withdraw(db, survey.id, response.id):
+            return
+        questions = self._text_questions(survey)
+        counts = {
+            key: count_texts([text])
+            for key, text in self._answer_texts(questions, response.responses, response.answer_encoding)
+        }
+        self._apply(db, survey.id, counts, -1)
+
+    def reset_survey(self, db: Session, survey_id: int) -> None:
+        """Forget a survey's counts so the next refresh recounts every response (caller commits)"""
+        db.execute(delete(TextTermCount).where(TextTermCount.survey_id == survey_id))
+        self.outbox.reset(db, survey_id)
+
+    async def summarize(self, db: AsyncSession, survey: Survey) -> Dict[str, Dict[str, Any]]:
+        """Top terms per text question, keyed by question text"""
+        limit = settings.TEXT_ANALYTICS_TOP_TERMS
+        summaries = {}
+        for q_text, key in self._text_questions(survey):
+            languages = await self._top(db, survey.id, key, KIND_LANGUAGE, ALL_LANGUAGES, None)
+            if not languages:
+                continue
+            summary = {
+                "top_terms": await self._top(db, survey.id, key, KIND_WORD, ALL_LANGUAGES, limit),
+                "top_bigrams": await self._top(db, survey.id, key, KIND_BIGRAM, ALL_LANGUAGES, limit),
+                "languages": {},
+            }
+            for language, answers in list(languages.items())[:settings.TEXT_ANALYTICS_TOP_LANGUAGES]:
+                summary["languages"][language] = {
+                    "responses": answers,
+                    "top_terms": await self._top(db, survey.id, key, KIND_WORD, language, limit),
+                }
+            summaries[q_text] = summary
+        return summaries
+
+    async def attach(self, db: AsyncSession, survey: Survey, analytics: Dict[str, Any]) -> None:
+        """Refresh the counts and add them to the data of the text questions in ``analytics``"""
+        try:
+            await self.refresh(db, survey)
+            summaries = await self.summarize(db, survey)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Text analytics for survey {survey.id} failed: {str(e)}")
+            return
+        for q_text, summary in summaries.items():
+            data = analytics.get(q_text, {}).get("data")
+            if isinstance(data, dict):
+                data.update(summary)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers only import text_terms, never the app's engines or event loop
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.TEXT_ANALYTICS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    @staticmethod
+    def _chunks(texts: List[str]) -> List[List[str]]:
+        size = settings.TEXT_ANALYTICS_CHUNK_SIZE
+        return [texts[start:start + size] for start in range(0, len(texts), size)]
+
+    @staticmethod
+    def _text_questions(survey: Survey) -> List[Tuple[str, str]]:
+        """(question text, storage key) of every text question"""
+        return [
+            (q.get("text", ""), q.get("id") or q.get("text", ""))
+            for q in survey_schemas.get(survey).questions if q.get("type", "text") == "text"
+        ]
+
+    @staticmethod
+    def _answer_texts(questions: List[Tuple[str, str]], stored: Optional[Dict[str, Any]], encoding: int) -> Iterator[Tuple[str, str]]:
+        # Text answers are stored verbatim, so they are read without decoding the whole response
+        if not stored:
+            return
+        for q_text, key in questions:
+            value = stored.get(key if encoding == ENCODING_QUESTION_IDS else q_text)
+            if isinstance(value, str) and value.strip():
+                yield key, value
+
+    @staticmethod
+    def _apply(db: Session, survey_id: int, counts_by_key: Dict[str, TermCounts], sign: int) -> None:
+        rows = []
+        for key, counts in counts_by_key.items():
+            counters = [
+                (KIND_WORD, ALL_LANGUAGES, counts.words),
+                (KIND_BIGRAM, ALL_LANGUAGES, counts.bigrams),
+                (KIND_LANGUAGE, ALL_LANGUAGES, counts.languages),
+            ] + [(KIND_WORD, language, words) for language, words in counts.language_words.items()]
+            for kind, language, counter in counters:
+                rows.extend(
+                    {"survey_id": survey_id, "question_key": key, "kind": kind, "language": language, "term": term, "count": sign * count}
+                    for term, count in counter.items()
+                )
+        if not rows:
+            return
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(TextTermCount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["survey_id", "question_key", "kind", "language", "term"],
+            set_={"count": TextTermCount.count + stmt.excluded["count"]}
+        )
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            db.execute(stmt, rows[start:start + UPSERT_BATCH_SIZE])
+        if sign < 0:
+            db.execute(delete(TextTermCount).where(TextTermCount.survey_id == survey_id, TextTermCount.count <= 0))
+
+    @staticmethod
+    async def _top(db: AsyncSession, survey_id: int, key: str, kind: str, language: str, limit: Optional[int]) -> Dict[str, int]:
+        query = select(TextTermCount.term, TextTermCount.count).where(
+            TextTermCount.survey_id == survey_id,
+            TextTermCount.question_key == key,
+            TextTermCount.kind == kind,
+            TextTermCount.language == language,
+            TextTermCount.count > 0
+        ).order_by(TextTermCount.count.desc(), TextTermCount.term)
+        if limit is not None:
+            query = query.limit(limit)
+        return {term: count for term, count in await db.execute(query)}
+
+text_analytics_service = TextAnalyticsService()
@@ -0,0 +1,140 @@
+"""Tokenization and term counting for free-text answers.
+
+Kept free of app imports so process-pool workers can load it cheaply.
+"""
+import re
+from collections import Counter
+from typing import Dict, Iterable, List
+
+# Letters only, allowing one inner apostrophe (don't, l'eau)
+TOKEN = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)?")
+UNDETERMINED = "und"
+
+STOPWORDS: Dict[str, frozenset] = {
+    "en": frozenset(
+        "a about after all also am an and any are as at be because been but by can could did do does "
+        "don't for from had has have he her his how i i'm if in into is it it's its just me more most "
+        "my no not of on one only or our out so some than that the their them then there these they "
+        "this to too up us very was we were what when which who will with would you your".split()
+    ),
+    "es": frozenset(
+        "al algo como con de del el ella ellos en era es está esta este esto fue ha han hay la las le les lo los más "
+        "me mi muy no nos o para pero por que se sin sobre son su sus también te tiene todo un una "
+        "uno y ya".split()
+    ),
+    "fr": frozenset(
+        "au aux avec ce ces cette c'est dans de des du elle en est et été il ils je la le les leur "
+        "mais me mes mon ne nous on ou par pas plus pour qui que sa se ses son sont sur très tu un "
+        "une vous y".split()
+    ),
+    "de": frozenset(
+        "aber als auch auf aus bei bin bis das dass dem den der des die doch du ein eine einen er "
+        "es für hat ich ihr im in ist ja mit nicht noch nur oder sehr sich sie sind so und uns von "
+        "war was wir zu zum zur".split()
+    ),
+    "pt": frozenset(
+        "ao aos as com como da das de do dos ela ele em era essa esse está eu foi isso já mais mas "
+        "me meu minha muito na não no nos o os ou para pela pelo por que se sem seu sua também tem "
+        "um uma você".split()
+    ),
+    "it": frozenset(
+        "al alla anche che chi ci come con da del della di è e gli ha ho il in io la le lo ma mi "
+        "molto nel non per più questo se si sono su ti tra un una uno".split()
+    ),
+}
+ALL_STOPWORDS = frozenset().union(*STOPWORDS.values())
+# Stopword -> languages using it, so detection is one lookup per token
+STOPWORD_LANGUAGES: Dict[str, tuple] = {
+    word: tuple(language for language, stopwords in STOPWORDS.items() if word in stopwords)
+    for word in ALL_STOPWORDS
+}
+
+# Scripts that identify a language on their own, checked in order
+SCRIPTS = (
+    ("ja", re.compile(r"[぀-ヿ]")),
+    ("ko", re.compile(r"[가-힯]")),
+    ("zh", re.compile(r"[一-鿿]")),
+    ("ru", re.compile(r"[Ѐ-ӿ]")),
+    ("ar", re.compile(r"[؀-ۿ]")),
+    ("hi", re.compile(r"[ऀ-ॿ]")),
+)
+LATIN = re.compile(r"[A-Za-zÀ-ɏ]")
+
+class TermCounts:
+    """Term frequencies of a set of answers; ``merge`` is the reduce step"""
+
+    __slots__ = ("documents", "words", "bigrams", "languages", "language_words")
+
+    def __init__(self):
+        self.documents = 0
+        self.words: Counter = Counter()
+        self.bigrams: Counter = Counter()
+        # Answers per detected language
+        self.languages: Counter = Counter()
+        self.language_words: Dict[str, Counter] = {}
+
+    def merge(self, other: "TermCounts") -> "TermCounts":
+        self.documents += other.documents
+        self.words.update(other.words)
+        self.bigrams.update(other.bigrams)
+        self.languages.update(other.languages)
+        for language, words in other.language_words.items():
+            current = self.language_words.get(language)
+            if current is None:
+                self.language_words[language] = words
+            else:
+                current.update(words)
+        return self
+
+def detect_language(text: str, tokens: List[str]) -> str:
+    """Cheap guess: a distinctive script, else the most stopwords matched"""
+    if not text.isascii() and not LATIN.search(text):
+        for language, script in SCRIPTS:
+            if script.search(text):
+                return language
+    hits: Dict[str, int] = {}
+    get = STOPWORD_LANGUAGES.get
+    for token in tokens:
+        languages = get(token)
+        if languages:
+            for language in languages:
+                hits[language] = hits.get(language, 0) + 1
+    if not hits:
+        return UNDETERMINED
+    # Ties go to the language listed first in STOPWORDS
+    return max(hits, key=hits.__getitem__)
+
+def count_texts(texts: Iterable[str]) -> TermCounts:
+    """Map step: keywords (stopwords dropped), bigrams of adjacent keywords and languages"""
+    counts = TermCounts()
+    findall = TOKEN.findall
+    # Terms are collected in lists and counted once at the end, which is much cheaper than per-answer updates
+    words: List[str] = []
+    bigrams: List[str] = []
+    languages: List[str] = []
+    language_words: Dict[str, List[str]] = {}
+    for text in texts:
+        tokens = findall(text.lower())
+        if not tokens:
+            continue
+        language = detect_language(text, tokens)
+        languages.append(language)
+        stopwords = STOPWORDS.get(language, ALL_STOPWORDS)
+        keywords = [token if len(token) > 1 and token not in stopwords else None for token in tokens]
+        kept = [token for token in keywords if token is not None]
+        words.extend(kept)
+        if len(kept) > 1:
+            bigrams.extend(
+                f"{first} {second}" for first, second in zip(keywords, keywords[1:])
+                if first is not None and second is not None
+            )
+        target = language_words.get(language)
+        if target is None:
+            target = language_words[language] = []
+        target.extend(kept)
+    counts.documents = len(languages)
+    counts.words.update(words)
+    counts.bigrams.update(bigrams)
+    counts.languages.update(languages)
+    counts.language_words = {language: Counter(terms) for language, terms in language_words.items()}
+    return counts
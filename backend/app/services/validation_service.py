@@ -0,0 +1,119 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.models.survey import Survey
+from app.services.analytics_service import AnalyticsService
+from app.services.survey_schema import survey_schemas
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Used when a rating question does not set its own "min"/"max"
+DEFAULT_RATING_RANGE = (0.0, 10.0)
+YES_NO_VALUES = {"yes", "no", "y", "n", "true", "false"}
+
+Check = Callable[[Any], Optional[str]]
+
+def _numeric_check(low: Optional[float], high: Optional[float], kind: str) -> Check:
+    parse = AnalyticsService._parse_number
+
+    def check(value: Any) -> Optional[str]:
+        number = parse(value)
+        if number is None:
+            return f"Expected a {kind}"
+        if low is not None and number < low:
+            return f"Must be at least {low:g}"
+        if high is not None and number > high:
+            return f"Must be at most {high:g}"
+        return None
+    return check
+
+def _choice_check(options: List[Any]) -> Check:
+    allowed = frozenset(str(option).strip() for option in options)
+
+    def check(value: Any) -> Optional[str]:
+        if isinstance(value, (dict, list)):
+            return "Expected a single option"
+        if allowed and str(value).strip() not in allowed:
+            return "Not one of the question's options"
+        return None
+    return check
+
+def _yes_no_check(value: Any) -> Optional[str]:
+    if isinstance(value, bool) or (isinstance(value, str) and value.strip().lower() in YES_NO_VALUES):
+        return None
+    return "Expected yes or no"
+
+def _text_check(value: Any) -> Optional[str]:
+    if isinstance(value, (dict, list)):
+        return "Expected text"
+    if isinstance(value, str) and len(value) > settings.RESPONSE_TEXT_MAX_LENGTH:
+        return f"Longer than {settings.RESPONSE_TEXT_MAX_LENGTH} characters"
+    return None
+
+def _any_check(value: Any) -> Optional[str]:
+    return None
+
+class CompiledValidator:
+    """A survey's question list turned into one check function per question"""
+
+    def __init__(self, questions: List[Dict[str, Any]]):
+        self.fields: List[Tuple[str, bool, Check]] = []
+        for question in questions:
+            q_type = question.get("type", "text")
+            if q_type == "rating":
+                low, high = DEFAULT_RATING_RANGE
+                if question.get("min") is not None:
+                    low = question["min"]
+                if question.get("max") is not None:
+                    high = question["max"]
+                check = _numeric_check(low, high, "rating")
+            elif q_type == "number":
+                check = _numeric_check(question.get("min"), question.get("max"), "number")
+            elif q_type == "multiple_choice":
+                check = _choice_check(question.get("options") or [])
+            elif q_type == "yes_no":
+                check = _yes_no_check
+            elif q_type == "text":
+                check = _text_check
+            else:
+                check = _any_check
+            self.fields.append((question.get("text", ""), bool(question.get("required", True)), check))
+        self.known = frozenset(key for key, _, _ in self.fields)
+
+    def validate(self, answers: Dict[str, Any], audio_keys=()) -> List[Dict[str, Any]]:
+        """Field-level errors in FastAPI's ``loc``/``msg``/``type`` shape; empty when valid"""
+        errors = []
+        for key, required, check in self.fields:
+            value = answers.get(key)
+            if value is None or value == "":
+                if required and key not in audio_keys:
+                    errors.append({"loc": ["responses", key], "msg": "This question is required", "type": "missing"})
+                continue
+            message = check(value)
+            if message:
+                errors.append({"loc": ["responses", key], "msg": message, "type": "value_error"})
+        if not self.known.issuperset(answers):
+            for key in answers:
+                if key not in self.known:
+                    errors.append({"loc": ["responses", key], "msg": "Not a question of this survey", "type": "extra_forbidden"})
+        return errors
+
+class ValidationService:
+    """Validates answers with the compiled validator cached on each survey's schema"""
+
+    @property
+    def enabled(self) -> bool:
+        return settings.RESPONSE_VALIDATION != "off"
+
+    def validator_for(self, survey: Survey) -> CompiledValidator:
+        schema = survey_schemas.get(survey)
+        if schema.validator is None:
+            schema.validator = CompiledValidator(schema.questions)
+        return schema.validator
+
+    def validate(self, survey: Survey, answers: Dict[str, Any], audio_data: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        if not self.enabled:
+            return []
+        return self.validator_for(survey).validate(answers, audio_data or ())
+
+validation_service = ValidationService()
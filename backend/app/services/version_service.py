@@ -0,0 +1,36 @@
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.survey import Survey, SurveyVersion
+import logging
+
+logger = logging.getLogger(__name__)
+
+class VersionService:
+    """Immutable question snapshots; Survey.questions always mirrors the current one"""
+
+    async def add_version(self, db: AsyncSession, survey: Survey, questions: List[Dict[str, Any]]) -> SurveyVersion:
+        """Snapshot ``questions`` as the survey's next version and make it current (caller commits)"""
+        latest = await db.scalar(
+            select(func.max(SurveyVersion.version_number)).where(SurveyVersion.survey_id == survey.id)
+        )
+        version = SurveyVersion(survey_id=survey.id, version_number=(latest or 0) + 1, questions=questions)
+        db.add(version)
+        await db.flush()
+        survey.questions = questions
+        survey.current_version_id = version.id
+        logger.info(f"Survey {survey.id} is now at version {version.version_number}")
+        return version
+
+    async def get_version(self, db: AsyncSession, survey_id: int, version_number: int) -> Optional[SurveyVersion]:
+        return await db.scalar(select(SurveyVersion).where(
+            SurveyVersion.survey_id == survey_id,
+            SurveyVersion.version_number == version_number
+        ))
+
+    async def list_versions(self, db: AsyncSession, survey_id: int) -> List[SurveyVersion]:
+        return (await db.scalars(
+            select(SurveyVersion).where(SurveyVersion.survey_id == survey_id).order_by(SurveyVersion.version_number)
+        )).all()
+
+version_service = VersionService()
@@ -0,0 +1,62 @@
+"""Compare the reference and NumPy analytics implementations on synthetic answers.
+
+    python -m benchmarks.analytics_columnar --sizes 10000 100000 1000000
+
+No database is involved: responses are generated in memory so the numbers
+reflect analytics compute time only.
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from app.services.analytics_service import analytics_service
+from app.services.columnar_analytics_service import columnar_analytics_service
+
+QUESTIONS = [
+    {"text": "Satisfaction", "type": "rating"},
+    {"text": "Household size", "type": "number"},
+    {"text": "Monthly income", "type": "number"},
+    {"text": "Region", "type": "multiple_choice"},
+    {"text": "Owns a smartphone", "type": "yes_no"},
+]
+
+def make_answers(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    regions = ["North", "South", "East", "West", "Central"]
+    answers = []
+    for _ in range(count):
+        answers.append({
+            "Satisfaction": rng.randint(1, 10),
+            "Household size": str(rng.randint(1, 12)),
+            "Monthly income": round(rng.lognormvariate(10, 0.6), 2),
+            "Region": rng.choice(regions),
+            "Owns a smartphone": rng.choice(["Yes", "No"]),
+        })
+    return answers
+
+def best_of(repeats: int, fn) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    survey = SimpleNamespace(questions=QUESTIONS)
+    print(f"{'responses':>10}{'reference (s)':>16}{'columnar (s)':>16}{'speedup':>10}")
+    for size in args.sizes:
+        answer_sets = make_answers(size)
+        rows = [SimpleNamespace(responses=a) for a in answer_sets]
+        reference = best_of(args.repeats, lambda: analytics_service.compute_survey_analytics(survey, rows))
+        columnar = best_of(args.repeats, lambda: columnar_analytics_service.compute_survey_analytics(survey, answer_sets))
+        print(f"{size:>10}{reference:>16.3f}{columnar:>16.3f}{reference / columnar:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
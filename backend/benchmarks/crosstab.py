@@ -0,0 +1,88 @@
+"""Time bitmap cross-tabulation against a scan of decoded answers.
+
+    python -m benchmarks.crosstab --responses 1000000
+
+Answers are generated in memory and indexed the way CrosstabService stores
+them; "load" is decompressing every stored segment, which a request pays
+on top of the intersections.
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from app.services.bitmaps import Bitmap, SEGMENT_SIZE, segment_bits, encode_segment, decode_segment, crosstab
+
+QUESTIONS = {
+    "region": [f"region {n}" for n in range(12)],
+    "rating": [str(float(n)) for n in range(1, 11)],
+    "plan": ["free", "basic", "pro", "enterprise"],
+    "recommend": ["Yes", "No"],
+}
+
+def timed(fn, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--responses", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    rows = [
+        {key: rng.choice(values) for key, values in QUESTIONS.items() if rng.random() < 0.95}
+        for _ in range(args.responses)
+    ]
+    started = time.perf_counter()
+    positions = {}
+    for ordinal, answers in enumerate(rows):
+        segment, position = divmod(ordinal, SEGMENT_SIZE)
+        for key, value in answers.items():
+            positions.setdefault((key, value, segment), []).append(position)
+    stored = {entry: encode_segment(segment_bits(bits)) for entry, bits in positions.items()}
+    built = time.perf_counter() - started
+    size = sum(len(payload) for payload in stored.values())
+
+    def load():
+        index = {key: {} for key in QUESTIONS}
+        for (key, value, segment), payload in stored.items():
+            index[key].setdefault(value, Bitmap()).segments[segment] = decode_segment(payload)
+        return index
+
+    load_time, index = timed(load)
+    everyone = Bitmap({
+        segment: (1 << min(SEGMENT_SIZE, args.responses - segment * SEGMENT_SIZE)) - 1
+        for segment in range((args.responses + SEGMENT_SIZE - 1) // SEGMENT_SIZE)
+    })
+    print(f"{args.responses} responses indexed in {built:.1f}s, {len(stored)} bitmaps, "
+          f"{size / 1024:.0f} KiB stored, load {load_time * 1000:.0f} ms")
+
+    pro = index["plan"]["pro"] | index["plan"]["enterprise"]
+    cases = [
+        ("rating x region", ["rating", "region"], lambda answers: True, everyone),
+        ("recommend x plan x region", ["recommend", "plan", "region"], lambda answers: True, everyone),
+        ("rating x region | plan in (pro, enterprise)", ["rating", "region"],
+         lambda answers: answers.get("plan") in ("pro", "enterprise"), everyone & pro),
+    ]
+    print(f"{'table':<45}{'cells':>7}{'bitmaps (ms)':>14}{'scan (ms)':>12}")
+    for name, dims, where, base in cases:
+        bitmap_time, cells = timed(lambda: crosstab(base, [index[key] for key in dims]))
+
+        def scan():
+            return Counter(
+                tuple(answers[key] for key in dims) for answers in rows
+                if where(answers) and all(key in answers for key in dims)
+            )
+
+        scan_time, expected = timed(scan, repeat=1)
+        assert dict(cells) == dict(expected), f"{name}: bitmap counts differ from the scan"
+        print(f"{name:<45}{len(cells):>7}{bitmap_time * 1000:>14.1f}{scan_time * 1000:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Mixed read/write load test against a running API.
+
+Start the server (``uvicorn app.main:app --port 8000``) and run:
+
+    python -m benchmarks.load_mixed --base-url http://localhost:8000/api --workers 32 --duration 30
+
+Each worker loops over a weighted mix of analytics reads, survey reads and
+response submissions. Latency percentiles are reported per operation so
+a single slow endpoint blocking the event loop shows up in the p99 of
+every other one.
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+QUESTIONS = [
+    {"text": "How satisfied are you?", "type": "rating", "options": [], "required": True},
+    {"text": "Which region?", "type": "multiple_choice", "options": ["North", "South", "East", "West"], "required": True},
+    {"text": "Household size", "type": "number", "options": [], "required": False},
+    {"text": "Any comments?", "type": "text", "options": [], "required": False},
+]
+
+OPERATIONS = [
+    ("submit_response", 0.4),
+    ("get_analytics", 0.2),
+    ("get_survey", 0.2),
+    ("get_stats", 0.1),
+    ("list_surveys", 0.1),
+]
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def random_answers() -> Dict[str, object]:
+    return {
+        "How satisfied are you?": random.randint(1, 10),
+        "Which region?": random.choice(QUESTIONS[1]["options"]),
+        "Household size": random.randint(1, 9),
+        "Any comments?": random.choice(["Great", "Too long", "Fine overall", "Questions were clear"]),
+    }
+
+def run_operation(session: requests.Session, base_url: str, survey_id: int, name: str) -> int:
+    if name == "submit_response":
+        r = session.post(f"{base_url}/surveys/{survey_id}/responses", json={"responses": random_answers()})
+    elif name == "get_analytics":
+        r = session.get(f"{base_url}/surveys/{survey_id}/analytics")
+    elif name == "get_survey":
+        r = session.get(f"{base_url}/surveys/{survey_id}")
+    elif name == "get_stats":
+        r = session.get(f"{base_url}/surveys/{survey_id}/stats")
+    else:
+        r = session.get(f"{base_url}/surveys", params={"limit": 20})
+    return r.status_code
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--seed-responses", type=int, default=200)
+    args = parser.parse_args()
+
+    setup = requests.Session()
+    survey = setup.post(f"{args.base_url}/surveys", json={
+        "title": "Load test survey",
+        "description": "Created by benchmarks.load_mixed",
+        "questions": QUESTIONS,
+    })
+    survey.raise_for_status()
+    survey_id = survey.json()["id"]
+    for _ in range(args.seed_responses):
+        setup.post(f"{args.base_url}/surveys/{survey_id}/responses", json={"responses": random_answers()})
+
+    names = [name for name, _ in OPERATIONS]
+    weights = [weight for _, weight in OPERATIONS]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker() -> None:
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = run_operation(session, args.base_url, survey_id, name)
+            except requests.RequestException:
+                status = 0
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies[name].append(elapsed)
+                if status >= 400 or status == 0:
+                    errors[name] += 1
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for _ in range(args.workers):
+            pool.submit(worker)
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requests in {args.duration:.0f}s ({total / args.duration:.1f} req/s), {args.workers} workers")
+    print(f"{'operation':<16}{'count':>8}{'errors':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name in names + ["all"]:
+        samples = [s for v in latencies.values() for s in v] if name == "all" else latencies[name]
+        if not samples:
+            continue
+        failed = sum(errors.values()) if name == "all" else errors[name]
+        print(f"{name:<16}{len(samples):>8}{failed:>8}{statistics.mean(samples):>10.1f}"
+              f"{percentile(samples, 50):>10.1f}{percentile(samples, 95):>10.1f}{percentile(samples, 99):>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Seed a database with a synthetic survey and responses for benchmarking.
+
+    python -m benchmarks.seed --database-url sqlite:///./bench.db --responses 1000000
+    python -m benchmarks.seed --database-url postgresql://localhost/bench --responses 5000000
+
+Responses are bulk-inserted in the app's stored encoding, spread over the
+last --days days, then aggregates and counters are rebuilt as
+``python -m app.cli rebuild-aggregates`` would. The same seed gives the
+same answers, so runs against different builds compare like with like.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models import survey as survey_models, analytics
+from app.models.survey import Survey, SurveyResponse, SurveyVersion
+from app.services.aggregate_service import aggregate_service
+from app.services.counter_service import counter_service
+from app.services.survey_schema import SurveySchema, assign_question_ids
+
+SURVEY_TITLE = "Benchmark survey"
+INSERT_BATCH_SIZE = 10000
+
+QUESTIONS = [
+    {"text": "How satisfied are you?", "type": "rating", "options": [], "required": True},
+    {"text": "Which region?", "type": "multiple_choice", "options": ["North", "South", "East", "West", "Central"], "required": True},
+    {"text": "Which plan are you on?", "type": "multiple_choice", "options": ["Free", "Basic", "Pro", "Enterprise"], "required": False},
+    {"text": "Household size", "type": "number", "options": [], "required": False},
+    {"text": "Would you recommend us?", "type": "yes_no", "options": [], "required": False},
+    {"text": "Any comments?", "type": "text", "options": [], "required": False},
+]
+
+COMMENTS = [
+    "Great service", "Delivery was slow", "Too expensive for what it is", "Support team was friendly",
+    "The app keeps crashing", "Fine overall", "Checkout could be simpler", "", "",
+]
+
+def make_answers(rng: random.Random) -> Dict[str, Any]:
+    """One respondent's answers, as a client would submit them"""
+    answers: Dict[str, Any] = {
+        "How satisfied are you?": min(10, max(1, int(rng.gauss(7, 2)))),
+        "Which region?": rng.choice(QUESTIONS[1]["options"]),
+    }
+    if rng.random() < 0.9:
+        answers["Which plan are you on?"] = rng.choices(QUESTIONS[2]["options"], [50, 25, 20, 5])[0]
+    if rng.random() < 0.8:
+        answers["Household size"] = rng.randint(1, 8)
+    if rng.random() < 0.95:
+        answers["Would you recommend us?"] = rng.choice(["Yes", "No"])
+    comment = rng.choice(COMMENTS)
+    if comment:
+        answers["Any comments?"] = comment
+    return answers
+
+def seed(database_url: str, responses: int, days: int = 30, seed_value: int = 7) -> int:
+    """Create a benchmark survey with ``responses`` responses; returns its id"""
+    engine = create_engine(database_url)
+    survey_models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(seed_value)
+    questions = assign_question_ids([dict(q) for q in QUESTIONS])
+    schema = SurveySchema(questions)
+    db = Session()
+    try:
+        survey = Survey(title=SURVEY_TITLE, description=f"{responses} synthetic responses", questions=questions)
+        db.add(survey)
+        db.flush()
+        version = SurveyVersion(survey_id=survey.id, version_number=1, questions=questions)
+        db.add(version)
+        db.flush()
+        survey.current_version_id = version.id
+        db.commit()
+
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        span = days * 86400
+        for offset in range(0, responses, INSERT_BATCH_SIZE):
+            rows: List[Dict[str, Any]] = []
+            for _ in range(min(INSERT_BATCH_SIZE, responses - offset)):
+                stored, encoding = schema.encode(make_answers(rng))
+                rows.append({
+                    "survey_id": survey.id,
+                    "responses": stored,
+                    "answer_encoding": encoding,
+                    "survey_version_id": version.id,
+                    "submitted_at": now - timedelta(seconds=rng.random() * span),
+                    "respondent_ip": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+                })
+            db.execute(insert(SurveyResponse), rows)
+            db.commit()
+            done = offset + len(rows)
+            if done % (INSERT_BATCH_SIZE * 50) == 0 or done == responses:
+                print(f"  {done} responses ({done / (time.perf_counter() - started):.0f}/s)")
+
+        aggregate_service.rebuild_survey(db, survey)
+        counter_service.rebuild_survey(db, survey)
+        db.commit()
+        return survey.id
+    finally:
+        db.close()
+        engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--responses", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=30, help="Spread submissions over this many days")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    survey_id = seed(args.database_url, args.responses, args.days, args.seed)
+    print(f"Seeded survey {survey_id} with {args.responses} responses in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
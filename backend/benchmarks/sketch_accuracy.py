@@ -0,0 +1,63 @@
+"""Compare sketch estimates with exact statistics on synthetic answers.
+
+    python -m benchmarks.sketch_accuracy --count 1000000 --days 30
+
+Values are split into daily sketches and merged back, as SketchService
+does, so the errors include merging.
+"""
+import argparse
+import math
+import random
+import time
+from collections import Counter
+
+from app.core.config import settings
+from app.services.sketches import KLLSketch, HyperLogLog, SpaceSaving
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--respondents", type=int, default=250_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    values = [rng.lognormvariate(10, 0.6) for _ in range(args.count)]
+    ips = [f"10.{rng.randrange(args.respondents) >> 16}.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(args.count)]
+    answers = [f"answer {int(rng.paretovariate(1.1))}" for _ in range(args.count)]
+
+    started = time.perf_counter()
+    days = [(KLLSketch(settings.SKETCH_KLL_K), HyperLogLog(settings.SKETCH_HLL_PRECISION), SpaceSaving(settings.SKETCH_TOPK_CAPACITY))
+            for _ in range(args.days)]
+    for index in range(args.count):
+        kll, hll, topk = days[index % args.days]
+        kll.add(values[index])
+        hll.add(ips[index])
+        topk.add(answers[index])
+    built = time.perf_counter() - started
+    stored = sum(len(sketch.to_bytes()) for day in days for sketch in day)
+
+    started = time.perf_counter()
+    kll, hll, topk = (type(sketch).from_bytes(sketch.to_bytes()) for sketch in days[0])
+    for day in days[1:]:
+        kll.merge(KLLSketch.from_bytes(day[0].to_bytes()))
+        hll.merge(HyperLogLog.from_bytes(day[1].to_bytes()))
+        topk.merge(SpaceSaving.from_bytes(day[2].to_bytes()))
+    merged = time.perf_counter() - started
+
+    print(f"{args.count} answers in {args.days} daily buckets: built in {built:.1f}s, "
+          f"{stored / 1024:.0f} KiB stored, read and merged in {merged * 1000:.0f} ms")
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[math.ceil(q * len(ordered)) - 1]
+        estimate = kll.quantile(q)
+        rank = sum(1 for value in ordered if value <= estimate) / len(ordered)
+        print(f"p{int(q * 100):<3} exact {exact:12.2f}  sketch {estimate:12.2f}  rank error {abs(rank - q):.4f}")
+    distinct = len(set(ips))
+    print(f"distinct exact {distinct}  sketch {hll.estimate()}  error {abs(hll.estimate() - distinct) / distinct:.2%}")
+    exact_top = Counter(answers).most_common(5)
+    print(f"top answers exact  {exact_top}")
+    print(f"top answers sketch {topk.top(5)}")
+
+if __name__ == "__main__":
+    main()
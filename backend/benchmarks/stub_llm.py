@@ -0,0 +1,96 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+    STUB_LLM_LATENCY="gpt-4o-mini=2.5,gpt-4.1-nano=0.2" STUB_LLM_FAIL="" \\
+        uvicorn benchmarks.stub_llm:app --port 9100
+    OPENAI_API_BASE=http://localhost:9100/v1 uvicorn app.main:app
+
+Answers with the number of questions the system prompt asks for after the
+configured per-model latency; models listed in STUB_LLM_FAIL answer 500.
+Streaming requests get the same text as SSE deltas of STUB_LLM_TOKEN_SIZE
+characters, STUB_LLM_TOKEN_DELAY seconds apart; models in STUB_LLM_BREAK_AFTER
+("model=chars") drop the connection after that many characters. GET /stats
+reports how many calls each model received.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+QUESTION_TYPES = ["rating", "multiple_choice", "yes_no", "number", "text"]
+
+def _per_model(value: str) -> dict:
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {model.strip(): float(seconds) for model, seconds in pairs}
+
+LATENCY = _per_model(os.getenv("STUB_LLM_LATENCY", ""))
+DEFAULT_LATENCY = float(os.getenv("STUB_LLM_DEFAULT_LATENCY", 0.05))
+TOKEN_DELAY = float(os.getenv("STUB_LLM_TOKEN_DELAY", 0.01))
+TOKEN_SIZE = int(os.getenv("STUB_LLM_TOKEN_SIZE", 4))
+BREAK_AFTER = _per_model(os.getenv("STUB_LLM_BREAK_AFTER", ""))
+FAILING = {model.strip() for model in os.getenv("STUB_LLM_FAIL", "").split(",") if model.strip()}
+
+app = FastAPI(title="Stub LLM")
+calls: Counter = Counter()
+
+def questions_json(prompt: str, count: int) -> str:
+    """The kind of answer the real model gives: a JSON array wrapped in prose"""
+    items = []
+    for index in range(count):
+        q_type = QUESTION_TYPES[index % len(QUESTION_TYPES)]
+        options = '["Often", "Sometimes", "Never"]' if q_type == "multiple_choice" else "[]"
+        items.append(
+            f'  {{"text": {json.dumps(f"Question {index + 1} about {prompt[:40]}?")}, "type": "{q_type}", '
+            f'"options": {options}, "required": {"true" if index % 2 == 0 else "false"}}}'
+        )
+    return "Here are your questions:\n[\n" + ",\n".join(items) + "\n]"
+
+def _request_details(body: dict):
+    system = next((m["content"] for m in body.get("messages", []) if m.get("role") == "system"), "")
+    count = re.search(r"exactly (\d+)", system)
+    prompt = re.search(r"prompt:\n(.*)\n", system)
+    return (prompt.group(1) if prompt else "your topic"), (int(count.group(1)) if count else 5)
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "")
+    calls[model] += 1
+    await asyncio.sleep(LATENCY.get(model, DEFAULT_LATENCY))
+    if model in FAILING:
+        return JSONResponse(status_code=500, content={"error": {"message": f"{model} is down", "type": "server_error"}})
+    prompt, count = _request_details(body)
+    content = questions_json(prompt, count)
+    if body.get("stream"):
+        return StreamingResponse(_deltas(model, content), media_type="text/event-stream")
+    return {
+        "id": f"chatcmpl-stub-{calls[model]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+async def _deltas(model: str, content: str):
+    for start in range(0, len(content), TOKEN_SIZE):
+        if model in BREAK_AFTER and start >= BREAK_AFTER[model]:
+            raise ConnectionResetError(f"{model} stream broken off")
+        chunk = {
+            "id": f"chatcmpl-stub-{calls[model]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[start:start + TOKEN_SIZE]}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(TOKEN_DELAY)
+    yield "data: [DONE]\n\n"
+
+@app.get("/stats")
+async def stats():
+    return dict(calls)
@@ -0,0 +1,381 @@
+"""Benchmark suite: analytics micro-benchmarks and end-to-end load scenarios.
+
+    python -m benchmarks.suite --responses 100000 --output results.json
+    python -m benchmarks.suite --responses 100000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --responses 100000 --baseline benchmarks/baseline.json
+
+Seeds a fresh survey (see benchmarks.seed) unless --survey-id points at one,
+times the analytics implementations in this process, then starts the API
+with uvicorn on the same database and runs the load scenarios against it:
+
+    submit     every worker submits responses as fast as it can
+    dashboard  workers poll analytics, summary, stats and timeline with
+               If-None-Match while a writer keeps changing the survey
+    export     full CSV exports of the survey, one after another
+
+Each result reports throughput, p50/p95/p99 latency and the peak RSS of the
+process doing the work. With --baseline, results are compared with a stored
+run and the command exits with status 1 when throughput dropped, or p95 or
+peak RSS grew, by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.survey import Survey, SurveyResponse
+from app.services.aggregate_service import aggregate_service
+from app.services.analytics_service import analytics_service
+from app.services.columnar_analytics_service import columnar_analytics_service
+from app.services.survey_schema import survey_schemas
+from benchmarks.load_mixed import percentile
+from benchmarks.seed import seed, make_answers
+
+SCENARIOS = ("micro", "submit", "dashboard", "export")
+# Latencies below this many milliseconds are too small to call a regression on
+MIN_LATENCY_DELTA_MS = 1.0
+
+class RssSampler:
+    """Peak resident set size of a process while the block runs, sampled from /proc (Linux only)"""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.path = f"/proc/{pid}/status"
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "RssSampler":
+        if os.path.exists(self.path):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._sample()
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        return round(self.peak_kb / 1024, 1) if self.peak_kb else None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def _sample(self) -> None:
+        try:
+            with open(self.path) as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        self.peak_kb = max(self.peak_kb, int(line.split()[1]))
+                        return
+        except OSError:
+            pass
+
+def summarize(latencies_ms: List[float], elapsed: float, errors: int, units: float, unit: str, peak_mb: Optional[float]) -> Dict[str, Any]:
+    return {
+        "count": len(latencies_ms),
+        "errors": errors,
+        "throughput": round(units / elapsed, 2) if elapsed else 0.0,
+        "unit": unit,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "peak_rss_mb": peak_mb,
+    }
+
+def run_micro(database_url: str, survey_id: int, repeat: int, sample: int) -> Dict[str, Dict[str, Any]]:
+    """Analytics implementations in this process.
+
+    The in-memory implementations run over the first ``sample`` responses,
+    so the suite does not hold millions of decoded answer sets at once;
+    the aggregates read always covers the whole survey.
+    """
+    engine = create_engine(database_url)
+    db = sessionmaker(bind=engine)()
+    results = {}
+    try:
+        survey = db.get(Survey, survey_id)
+        schema = survey_schemas.get(survey)
+
+        def load_rows():
+            return db.execute(
+                select(SurveyResponse.responses, SurveyResponse.answer_encoding)
+                .where(SurveyResponse.survey_id == survey_id).order_by(SurveyResponse.id).limit(sample)
+            ).all()
+
+        # Rows carry the same .responses/.answer_encoding attributes the Python implementation reads
+        rows = load_rows()
+        answer_sets = [schema.decode(stored, encoding) for stored, encoding in rows]
+        cases: List[tuple] = [
+            ("micro.load_responses", load_rows, len(rows)),
+            ("micro.decode_answers", lambda: [schema.decode(stored, encoding) for stored, encoding in rows], len(rows)),
+            ("micro.analytics_python", lambda: analytics_service.compute_survey_analytics(survey, rows), len(rows)),
+            ("micro.analytics_columnar", lambda: columnar_analytics_service.compute_survey_analytics(survey, answer_sets), len(rows)),
+            ("micro.analytics_aggregates", lambda: aggregate_service.compute_survey_analytics(db, survey), survey.response_count),
+        ]
+        for name, fn, units in cases:
+            latencies = []
+            with RssSampler(os.getpid()) as rss:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    call_started = time.perf_counter()
+                    fn()
+                    latencies.append((time.perf_counter() - call_started) * 1000)
+                elapsed = time.perf_counter() - started
+            results[name] = summarize(latencies, elapsed, 0, units * repeat, "responses/s", rss.peak_mb)
+            print(f"  {name:<32}{results[name]['p50_ms']:>10.1f} ms")
+    finally:
+        db.close()
+        engine.dispose()
+    return results
+
+def run_load(
+    name: str, server_pid: int, workers: int, duration: float,
+    operation: Callable[[requests.Session, Dict[str, Any]], int], background: Optional[Callable[[], None]] = None
+) -> Dict[str, Any]:
+    """Call ``operation`` from ``workers`` threads for ``duration`` seconds; it returns the HTTP status"""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker() -> None:
+        nonlocal errors
+        session = requests.Session()
+        state: Dict[str, Any] = {}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = operation(session, state)
+            except requests.RequestException:
+                status = 0
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if status == 0 or status >= 400:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    if background is not None:
+        threads.append(threading.Thread(target=background, args=(deadline,), daemon=True))
+    with RssSampler(server_pid) as rss:
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    result = summarize(latencies, elapsed, errors, len(latencies), "requests/s", rss.peak_mb)
+    print(f"  {name:<32}{result['throughput']:>10.1f} req/s  p95 {result['p95_ms']:.1f} ms  errors {errors}")
+    return result
+
+def start_server(database_url: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API exited with status {server.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return server
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("API did not become healthy within 60s")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run_scenarios(args: argparse.Namespace, survey_id: int) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    if "micro" in args.scenarios:
+        print("micro-benchmarks")
+        results.update(run_micro(args.database_url, survey_id, args.repeat, args.micro_sample))
+    if not set(args.scenarios) & {"submit", "dashboard", "export"}:
+        return results
+
+    port = free_port()
+    server = start_server(args.database_url, port)
+    base_url = f"http://127.0.0.1:{port}/api"
+    survey_url = f"{base_url}/surveys/{survey_id}"
+    rng_lock = threading.Lock()
+    rng = random.Random(args.seed)
+
+    def answers() -> Dict[str, Any]:
+        with rng_lock:
+            return make_answers(rng)
+
+    def submit(session: requests.Session, state: Dict[str, Any]) -> int:
+        return session.post(f"{survey_url}/responses", json={"responses": answers()}).status_code
+
+    dashboard_paths = ["/analytics", "/summary", "/stats", "/timeline?granularity=hour"]
+
+    def poll(session: requests.Session, state: Dict[str, Any]) -> int:
+        # Dashboards revalidate what they already have, so unchanged views come back as 304
+        index = state.get("next", 0)
+        state["next"] = index + 1
+        path = dashboard_paths[index % len(dashboard_paths)]
+        headers = {"If-None-Match": state[path]} if path in state else {}
+        r = session.get(survey_url + path, headers=headers)
+        if "ETag" in r.headers:
+            state[path] = r.headers["ETag"]
+        return r.status_code
+
+    def writer(deadline: float) -> None:
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            submit(session, {})
+            time.sleep(1 / args.write_rate)
+
+    try:
+        print("load scenarios")
+        if "submit" in args.scenarios:
+            results["submit"] = run_load("submit", server.pid, args.workers, args.duration, submit)
+        if "dashboard" in args.scenarios:
+            results["dashboard"] = run_load(
+                "dashboard", server.pid, args.workers, args.duration, poll,
+                writer if args.write_rate > 0 else None
+            )
+        if "export" in args.scenarios:
+            latencies = []
+            errors = 0
+            rows = 0
+            with RssSampler(server.pid) as rss:
+                started = time.perf_counter()
+                for _ in range(args.export_runs):
+                    call_started = time.perf_counter()
+                    r = requests.get(f"{survey_url}/responses/export", params={"format": "csv"}, stream=True)
+                    lines = sum(chunk.count(b"\n") for chunk in r.iter_content(chunk_size=1 << 16))
+                    latencies.append((time.perf_counter() - call_started) * 1000)
+                    if r.status_code >= 400:
+                        errors += 1
+                    rows += max(lines - 1, 0)
+                elapsed = time.perf_counter() - started
+            results["export"] = summarize(latencies, elapsed, errors, rows, "rows/s", rss.peak_mb)
+            print(f"  {'export':<32}{results['export']['throughput']:>10.0f} rows/s  p95 {results['export']['p95_ms']:.0f} ms")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of ``current`` against ``baseline``, one line each"""
+    regressions = []
+    print(f"\n{'result':<32}{'metric':<14}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        for metric, higher_is_better in (("throughput", True), ("p95_ms", False), ("peak_rss_mb", False)):
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            if metric == "p95_ms" and abs(new - old) < MIN_LATENCY_DELTA_MS:
+                worse = False
+            flag = "  REGRESSION" if worse else ""
+            print(f"{name:<32}{metric:<14}{old:>12.2f}{new:>12.2f}{change:>+10.1%}{flag}")
+            if worse:
+                regressions.append(f"{name} {metric}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./bench.db", help="SQLite file or local PostgreSQL")
+    parser.add_argument("--responses", type=int, default=100_000, help="Responses to seed (10k to 5M)")
+    parser.add_argument("--survey-id", type=int, default=None, help="Benchmark an already seeded survey instead")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each micro-benchmark")
+    parser.add_argument(
+        "--micro-sample", type=int, default=100_000, help="Responses the in-memory micro-benchmarks load at most"
+    )
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per load scenario")
+    parser.add_argument("--write-rate", type=float, default=5.0, help="Submissions per second during dashboard polling")
+    parser.add_argument("--export-runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare with this stored run and fail on regressions")
+    parser.add_argument("--save-baseline", default=None, help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative change before failing")
+    args = parser.parse_args()
+
+    survey_id = args.survey_id
+    if survey_id is None:
+        print(f"seeding {args.responses} responses into {args.database_url}")
+        survey_id = seed(args.database_url, args.responses, seed_value=args.seed)
+    engine = create_engine(args.database_url)
+    with engine.connect() as connection:
+        responses = connection.scalar(select(Survey.response_count).where(Survey.id == survey_id))
+    engine.dispose()
+    if responses is None:
+        sys.exit(f"Survey {survey_id} not found in {args.database_url}")
+
+    run = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "database": args.database_url.split(":", 1)[0],
+            "responses": responses,
+            "micro_sample": args.micro_sample,
+            "workers": args.workers,
+            "duration": args.duration,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                key: os.environ[key] for key in ("ANALYTICS_BACKEND", "INGEST_MODE", "CACHE_BACKEND", "DB_POOL_SIZE")
+                if key in os.environ
+            },
+        },
+        "results": run_scenarios(args, survey_id),
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as output:
+                json.dump(run, output, indent=2)
+            print(f"wrote {path}")
+    if args.baseline:
+        with open(args.baseline) as stored:
+            baseline = json.load(stored)
+        # Load scenarios add responses, so a reused survey drifts a little between runs
+        if abs(baseline["meta"]["responses"] - responses) > 0.1 * responses or baseline["meta"]["database"] != run["meta"]["database"]:
+            sys.exit(
+                f"Baseline was measured on {baseline['meta']['responses']} responses in {baseline['meta']['database']}, "
+                f"this run on {responses} in {run['meta']['database']}; they cannot be compared"
+            )
+        if baseline["meta"].get("micro_sample", args.micro_sample) != args.micro_sample:
+            sys.exit(f"Baseline micro-benchmarks sampled {baseline['meta']['micro_sample']} responses; rerun with that --micro-sample")
+        regressions = compare(run, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Time term counting of short text answers, serially and map-reduced over the process pool.
+
+    python -m benchmarks.text_analytics --answers 1000000 --workers 1 2 4 8
+
+No database is involved: answers are generated in memory so the numbers
+reflect tokenization and counting only. The last column is the cost of an
+incremental refresh that only counts the newest 1% of answers.
+"""
+import argparse
+import random
+import time
+
+from app.core.config import settings
+from app.services.text_analytics_service import text_analytics_service
+from app.services.text_terms import count_texts
+
+OPENERS = ["The", "Our", "My", "Honestly the", "I think the", "La", "El", "Le"]
+SUBJECTS = ["delivery", "support team", "app", "checkout", "price", "courier", "website", "refund process"]
+VERDICTS = ["was slow", "is great", "could be better", "was confusing", "is fast and friendly", "fue excelente", "est trop cher"]
+EXTRAS = ["", "", " again", " this time", " overall", " compared to last year", " thanks"]
+
+def make_answers(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(OPENERS)} {rng.choice(SUBJECTS)} {rng.choice(VERDICTS)}{rng.choice(EXTRAS)}"
+        for _ in range(count)
+    ]
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-size", type=int, default=settings.TEXT_ANALYTICS_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    texts = make_answers(args.answers)
+    delta = texts[-max(1, args.answers // 100):]
+    serial, expected = timed(lambda: count_texts(texts))
+    incremental, _ = timed(lambda: count_texts(delta))
+    print(f"{args.answers} answers, {len(expected.words)} distinct keywords, {len(expected.bigrams)} distinct bigrams")
+    print(f"{'workers':>8}{'full count (s)':>16}{'speedup':>10}{'answers/s':>12}{'1% refresh (s)':>16}")
+    print(f"{'serial':>8}{serial:>16.3f}{1:>9.1f}x{args.answers / serial:>12.0f}{incremental:>16.3f}")
+
+    settings.TEXT_ANALYTICS_CHUNK_SIZE = args.chunk_size
+    for workers in args.workers:
+        settings.TEXT_ANALYTICS_WORKERS = workers
+        text_analytics_service.shutdown()
+        # Start the workers outside the timing
+        text_analytics_service.count(texts[:args.chunk_size * workers * 2])
+        elapsed, counts = timed(lambda: text_analytics_service.count(texts))
+        assert counts.words == expected.words and counts.bigrams == expected.bigrams, "map-reduce result differs"
+        print(f"{workers:>8}{elapsed:>16.3f}{serial / elapsed:>9.1f}x{args.answers / elapsed:>12.0f}{'':>16}")
+    text_analytics_service.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Tests run against a throwaway SQLite database and storage directories.
+
+The environment is set here, before anything imports ``app``, because
+settings and engines are created at import time.
+"""
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix="survey-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["AUDIO_STORAGE_PATH"] = os.path.join(_scratch, "audio")
+os.environ["JOB_ARTIFACT_DIR"] = os.path.join(_scratch, "jobs")
+os.environ["PROFILE_DIR"] = os.path.join(_scratch, "profiles")
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["INGEST_MODE"] = "direct"
+os.environ["LIVE_BROKER"] = "memory"
+# No process pools: tests run in one process
+os.environ["TEXT_ANALYTICS_WORKERS"] = "0"
+os.environ["JOB_RUNNER_ENABLED"] = "false"
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def make_survey(client):
+    """Create a survey through the API and return its id"""
+
+    def make(questions, title="Test survey"):
+        response = client.post("/api/surveys", json={"title": title, "description": "", "questions": questions})
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    return make
+
+@pytest.fixture(scope="session")
+def stub_llm_server():
+    """benchmarks.stub_llm served on a free local port; yields the module to configure it"""
+    import openai
+    import uvicorn
+    from benchmarks import stub_llm
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub_llm.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "stub LLM server did not start"
+        time.sleep(0.02)
+    previous_base = openai.api_base
+    openai.api_base = f"http://127.0.0.1:{port}/v1"
+    yield stub_llm
+    openai.api_base = previous_base
+    server.should_exit = True
+    thread.join(timeout=5)
+
+@pytest.fixture
+def stub_llm(stub_llm_server):
+    """The stub with default behaviour and no recorded calls; tests adjust latency, failures and chunking"""
+    stub = stub_llm_server
+    saved = (stub.DEFAULT_LATENCY, stub.TOKEN_DELAY, stub.TOKEN_SIZE)
+    stub.calls.clear()
+    stub.LATENCY.clear()
+    stub.FAILING.clear()
+    stub.BREAK_AFTER.clear()
+    stub.DEFAULT_LATENCY, stub.TOKEN_DELAY = 0.01, 0.0
+    yield stub
+    stub.DEFAULT_LATENCY, stub.TOKEN_DELAY, stub.TOKEN_SIZE = saved
@@ -0,0 +1,135 @@
+"""Materialized question aggregates: keyed by question id, and safe to repair concurrently"""
+from sqlalchemy import event
+
+from app.core.database import SessionLocal
+from app.models.analytics import QuestionAggregate
+from app.models.survey import Survey, SurveyResponse
+from app.services.aggregate_service import aggregate_service
+from app.services.survey_schema import ENCODING_QUESTION_IDS
+
+QUESTIONS = [
+    {"text": "Score", "type": "rating", "options": [], "required": True},
+    {"text": "Score", "type": "number", "options": [], "required": False},
+    {"text": "Why", "type": "text", "options": [], "required": False},
+]
+
+def _seed(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    for score, why in [(3, "ok"), (7, "good"), (9, "great")]:
+        response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Score": score, "Why": why}})
+        assert response.status_code == 201, response.text
+    return survey_id
+
+def _aggregate_keys(survey_id):
+    db = SessionLocal()
+    try:
+        return sorted(key for key, in db.query(QuestionAggregate.question_key).filter(QuestionAggregate.survey_id == survey_id))
+    finally:
+        db.close()
+
+def test_rows_are_keyed_by_question_id(client, make_survey):
+    survey_id = _seed(client, make_survey)
+    questions = client.get(f"/api/surveys/{survey_id}").json()["questions"]
+    # Two questions share a text yet keep separate rows
+    assert _aggregate_keys(survey_id) == sorted(q["id"] for q in questions)
+
+    renamed = [dict(q) for q in questions]
+    renamed[2]["text"] = "Why so?"
+    assert client.put(f"/api/surveys/{survey_id}", json={"questions": renamed}).status_code == 200
+    assert _aggregate_keys(survey_id) == sorted(q["id"] for q in questions)
+    analytics = client.get(f"/api/surveys/{survey_id}/analytics").json()["analytics"]
+    assert analytics["Why so?"]["response_count"] == 3
+
+def test_concurrent_first_reads_reuse_the_other_rows(client, make_survey, monkeypatch):
+    survey_id = _seed(client, make_survey)
+    db = SessionLocal()
+    try:
+        survey = db.get(Survey, survey_id)
+        expected = aggregate_service.compute_survey_analytics(db, survey)
+        # This read sees no rows yet, while another one has just committed them
+        load_rows = aggregate_service._load_rows
+        calls = []
+
+        def racing_load_rows(session, sid, lock=False):
+            calls.append(sid)
+            return {} if len(calls) == 1 else load_rows(session, sid, lock)
+
+        monkeypatch.setattr(aggregate_service, "_load_rows", racing_load_rows)
+        assert aggregate_service.compute_survey_analytics(db, db.get(Survey, survey_id)) == expected
+        assert len(calls) == 2
+    finally:
+        db.close()
+
+def test_total_comes_from_the_survey_counter(client, make_survey):
+    survey_id = _seed(client, make_survey)
+    first = client.get(f"/api/surveys/{survey_id}/responses").json()[0]["id"]
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{first}").status_code == 200
+    db = SessionLocal()
+    # The deleted answer was a text sample, so the first read rescans that question
+    aggregate_service.compute_survey_analytics(db, db.get(Survey, survey_id))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert aggregate_service.compute_survey_analytics(db, db.get(Survey, survey_id))["total_responses"] == 2
+        assert not any("survey_responses" in statement for statement in statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+
+def test_new_questions_are_rebuilt_by_the_next_read(client, make_survey, monkeypatch):
+    survey_id = _seed(client, make_survey)
+    questions = client.get(f"/api/surveys/{survey_id}").json()["questions"]
+    added = questions + [{"text": "Again?", "type": "yes_no", "options": [], "required": False}]
+    assert client.put(f"/api/surveys/{survey_id}", json={"questions": added}).status_code == 200
+    db = SessionLocal()
+    try:
+        stale = db.query(QuestionAggregate.is_stale).filter(QuestionAggregate.survey_id == survey_id).all()
+        assert sorted(flag for flag, in stale) == [False, False, False, True]
+    finally:
+        db.close()
+
+    rebuild = aggregate_service._rebuild_questions
+
+    def no_scans(*args, **kwargs):
+        raise AssertionError("a submit rescanned the survey's responses")
+
+    monkeypatch.setattr(aggregate_service, "_rebuild_questions", no_scans)
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Score": 5, "Again?": "yes"}})
+    assert response.status_code == 201, response.text
+    monkeypatch.setattr(aggregate_service, "_rebuild_questions", rebuild)
+    analytics = client.get(f"/api/surveys/{survey_id}/analytics").json()["analytics"]
+    assert analytics["Again?"]["response_count"] == 1
+    assert analytics["Why"]["response_count"] == 3
+
+def _row_counts(survey_id):
+    db = SessionLocal()
+    try:
+        return dict(db.query(QuestionAggregate.question_key, QuestionAggregate.response_count).filter(
+            QuestionAggregate.survey_id == survey_id
+        ))
+    finally:
+        db.close()
+
+def test_questions_sharing_a_text_count_their_own_answers(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    rating, number, why = (q["id"] for q in client.get(f"/api/surveys/{survey_id}").json()["questions"])
+    db = SessionLocal()
+    try:
+        survey = db.get(Survey, survey_id)
+        for answers in [{rating: 4, number: 10}, {rating: 5}]:
+            response = SurveyResponse(survey_id=survey_id, responses=answers, answer_encoding=ENCODING_QUESTION_IDS)
+            db.add(response)
+            db.flush()
+            aggregate_service.apply_response(db, survey, response)
+        db.commit()
+        assert _row_counts(survey_id) == {rating: 2, number: 1, why: 0}
+        aggregate_service.rebuild_survey(db, survey)
+        db.commit()
+    finally:
+        db.close()
+    assert _row_counts(survey_id) == {rating: 2, number: 1, why: 0}
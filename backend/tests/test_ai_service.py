@@ -0,0 +1,152 @@
+"""AIService against the local stub LLM server: hedging, timeouts, caching and in-flight sharing"""
+import asyncio
+import json
+import random
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import LLM_REQUEST_DURATION
+from app.services.ai_service import AIService, JsonArrayStream
+from app.services.cache_service import MemoryCache
+
+def _service(monkeypatch, **overrides) -> AIService:
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    return AIService()
+
+def _observed(model: str, mode: str, outcome: str) -> int:
+    for suffix, labels, value in LLM_REQUEST_DURATION.samples():
+        if suffix == "_count" and labels == {"model": model, "mode": mode, "outcome": outcome}:
+            return value
+    return 0
+
+def test_primary_answers_without_hedging(stub_llm, monkeypatch):
+    service = _service(monkeypatch, AI_HEDGE_DELAY=2.0)
+    result = asyncio.run(service.generate_questions("pets", 3))
+    assert result["success"] and result["model"] == service.primary_model
+    assert len(result["questions"]) == 3
+    assert dict(stub_llm.calls) == {service.primary_model: 1}
+
+def test_slow_primary_is_hedged_with_fallback(stub_llm, monkeypatch):
+    service = _service(monkeypatch, AI_HEDGE_DELAY=0.1)
+    stub_llm.LATENCY[service.primary_model] = 3.0
+    started = time.monotonic()
+    result = asyncio.run(service.generate_questions("slow primary", 2))
+    assert result["success"] and result["model"] == service.fallback_model
+    assert time.monotonic() - started < 1.5
+    assert stub_llm.calls[service.primary_model] == 1 and stub_llm.calls[service.fallback_model] == 1
+
+def test_failing_primary_falls_back_before_hedge_delay(stub_llm, monkeypatch):
+    service = _service(monkeypatch, AI_HEDGE_DELAY=5.0)
+    stub_llm.FAILING.add(service.primary_model)
+    started = time.monotonic()
+    result = asyncio.run(service.generate_questions("primary down", 2))
+    assert result["success"] and result["model"] == service.fallback_model
+    assert time.monotonic() - started < 2.0
+
+def test_request_timeout_bounds_each_call(stub_llm, monkeypatch):
+    service = _service(monkeypatch, AI_HEDGE_DELAY=0.05, AI_REQUEST_TIMEOUT=0.3)
+    stub_llm.LATENCY.update({service.primary_model: 3.0, service.fallback_model: 3.0})
+    timeouts = _observed(service.primary_model, "complete", "timeout")
+    started = time.monotonic()
+    result = asyncio.run(service.generate_questions("nobody answers", 2))
+    assert not result["success"] and "failed" in result["error"]
+    assert time.monotonic() - started < 2.0
+    assert _observed(service.primary_model, "complete", "timeout") == timeouts + 1
+
+def test_results_are_cached(stub_llm, monkeypatch):
+    service = _service(monkeypatch)
+
+    async def twice():
+        return await service.generate_questions("cached", 2), await service.generate_questions("cached", 2)
+
+    first, second = asyncio.run(twice())
+    assert first == second
+    assert service.cache_hits == 1 and stub_llm.calls[service.primary_model] == 1
+
+def test_memory_cache_evicts_least_recently_used_and_expires():
+    async def scenario():
+        cache = MemoryCache(max_entries=2, ttl=0.2)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        assert await cache.get("a") == "1"
+        await cache.set("c", "3")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "1" and await cache.get("c") == "3"
+        await asyncio.sleep(0.25)
+        assert await cache.get("a") is None and await cache.get("c") is None
+
+    asyncio.run(scenario())
+
+def test_identical_requests_in_flight_share_one_call(stub_llm, monkeypatch):
+    service = _service(monkeypatch, AI_HEDGE_DELAY=5.0)
+    stub_llm.LATENCY[service.primary_model] = 0.3
+
+    async def scenario():
+        first = asyncio.ensure_future(service.generate_questions("shared", 2))
+        second = asyncio.ensure_future(service.generate_questions("shared", 2))
+        await asyncio.sleep(0.05)
+        assert service.stats()["in_flight"] == 1
+        # One caller giving up must not cancel the call the other waits on
+        first.cancel()
+        result = await second
+        assert first.cancelled()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["success"]
+    assert stub_llm.calls[service.primary_model] == 1
+    assert service.stats()["in_flight"] == 0
+
+def test_completed_stream_is_recorded_as_ok(stub_llm, monkeypatch):
+    service = _service(monkeypatch)
+    ok = _observed(service.primary_model, "stream", "ok")
+    cancelled = _observed(service.primary_model, "stream", "cancelled")
+
+    async def collect():
+        return [event async for event in service.stream_questions("metrics", 3)]
+
+    events = asyncio.run(collect())
+    assert [event["event"] for event in events] == ["question"] * 3 + ["done"]
+    assert _observed(service.primary_model, "stream", "ok") == ok + 1
+    assert _observed(service.primary_model, "stream", "cancelled") == cancelled
+
+ARRAY_TEXT = (
+    'Sure, here they are: [{"text": "Say \\"hi\\" \\\\ then go", "type": "text", "options": ["a]", "{b"]},'
+    ' {"text": "Caf\\u00e9 [draft]", "type": "rating", "options": []}, 7, "x\\"]"] and [1] after'
+)
+
+def _fragments(text, sizes):
+    pieces, start = [], 0
+    for size in sizes:
+        pieces.append(text[start:start + size])
+        start += size
+    pieces.append(text[start:])
+    return pieces
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 13, len(ARRAY_TEXT)])
+def test_json_array_stream_fixed_fragments(size):
+    expected = json.loads(ARRAY_TEXT[ARRAY_TEXT.index("["):ARRAY_TEXT.index("] and") + 1])
+    parser = JsonArrayStream()
+    elements = []
+    for start in range(0, len(ARRAY_TEXT), size):
+        elements.extend(parser.feed(ARRAY_TEXT[start:start + size]))
+    assert elements == expected
+    assert parser.started and parser.finished
+
+def test_json_array_stream_random_splits_inside_strings_and_escapes():
+    expected = json.loads(ARRAY_TEXT[ARRAY_TEXT.index("["):ARRAY_TEXT.index("] and") + 1])
+    rng = random.Random(5)
+    for _ in range(200):
+        parser = JsonArrayStream()
+        elements = []
+        for piece in _fragments(ARRAY_TEXT, [rng.randint(0, 6) for _ in range(60)]):
+            elements.extend(parser.feed(piece))
+        assert elements == expected
+
+def test_json_array_stream_without_array():
+    parser = JsonArrayStream()
+    assert parser.feed("I cannot help with that.") == []
+    assert not parser.started
@@ -0,0 +1,118 @@
+"""Every analytics backend must agree with the reference Python implementation"""
+import random
+
+import pytest
+
+from app.cli import _diff
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.survey import Survey, SurveyResponse
+from app.services.aggregate_service import aggregate_service
+from app.services.counter_service import counter_service
+from app.services.survey_schema import survey_schemas
+
+BACKENDS = ["aggregates", "sql", "columnar"]
+
+QUESTIONS = [
+    {"text": "Rate us", "type": "rating", "options": [], "required": True},
+    {"text": "Plan", "type": "multiple_choice", "options": ["Free", "Basic", "Pro"], "required": False},
+    {"text": "Balance", "type": "number", "options": [], "required": False},
+    {"text": "Recommend?", "type": "yes_no", "options": [], "required": False},
+    {"text": "Comments", "type": "text", "options": [], "required": False},
+]
+
+def _answers(rng, plans):
+    answers = {"Rate us": rng.choice([1, 2, 5, 7.5, "8", 10])}
+    if rng.random() < 0.8:
+        answers["Plan"] = rng.choice(plans)
+    if rng.random() < 0.8:
+        answers["Balance"] = rng.choice([-12, -0.5, 0, 3, "4.25", "-7", 1e3])
+    if rng.random() < 0.8:
+        answers["Recommend?"] = rng.choice([True, False, "Yes", "no", "Y"])
+    if rng.random() < 0.7:
+        answers["Comments"] = rng.choice(["Great", "too slow", "great service", "", "Crashes on login"])
+    return answers
+
+def _insert_legacy(survey_id, answer_sets):
+    """Store answers the API would reject today (e.g. non-numeric numbers), as older data may hold"""
+    db = SessionLocal()
+    try:
+        survey = db.get(Survey, survey_id)
+        schema = survey_schemas.get(survey)
+        for answers in answer_sets:
+            stored, encoding = schema.encode(answers)
+            response = SurveyResponse(
+                survey_id=survey_id, responses=stored, answer_encoding=encoding,
+                survey_version_id=survey.current_version_id
+            )
+            db.add(response)
+            db.flush()
+            aggregate_service.apply_response(db, survey, response)
+            counter_service.record(db, survey_id, [response.submitted_at])
+        db.commit()
+    finally:
+        db.close()
+
+@pytest.fixture(scope="module")
+def mixed_survey(client):
+    rng = random.Random(11)
+    survey_id = client.post(
+        "/api/surveys", json={"title": "Parity", "description": "", "questions": QUESTIONS}
+    ).json()["id"]
+    response_ids = []
+    for _ in range(60):
+        response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": _answers(rng, ["Free", "Basic", "Pro"])})
+        assert response.status_code == 201, response.text
+        response_ids.append(response.json()["id"])
+    _insert_legacy(survey_id, [
+        {"Rate us": 4, "Balance": "n/a", "Recommend?": "maybe"},
+        {"Rate us": 6, "Balance": "", "Plan": "Legacy plan"},
+        {"Rate us": 9, "Balance": "twelve", "Comments": "legacy"},
+    ])
+    # Edit the options: rename one, drop one, add one (version 2)
+    edited = [dict(q) for q in QUESTIONS]
+    edited[1] = {**edited[1], "options": ["Starter", "Pro", "Team"]}
+    survey = client.get(f"/api/surveys/{survey_id}").json()
+    for question, current in zip(edited, survey["questions"]):
+        question["id"] = current["id"]
+    assert client.put(f"/api/surveys/{survey_id}", json={"questions": edited}).status_code == 200
+    for _ in range(40):
+        response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": _answers(rng, ["Starter", "Pro", "Team"])})
+        assert response.status_code == 201, response.text
+        response_ids.append(response.json()["id"])
+    for response_id in response_ids[::7]:
+        assert client.delete(f"/api/surveys/{survey_id}/responses/{response_id}").status_code == 200
+    return survey_id
+
+def _analytics(client, survey_id, backend, version=None):
+    previous = settings.ANALYTICS_BACKEND
+    settings.ANALYTICS_BACKEND = backend
+    try:
+        # exact=true (and any version) bypasses the response cache, so each backend really computes
+        params = {"exact": "true"}
+        if version is not None:
+            params["version"] = version
+        response = client.get(f"/api/surveys/{survey_id}/analytics", params=params)
+        assert response.status_code == 200, response.text
+        return response.json()
+    finally:
+        settings.ANALYTICS_BACKEND = previous
+
+@pytest.mark.parametrize("version", [None, 1, 2])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backend_matches_python(client, mixed_survey, backend, version):
+    expected = _analytics(client, mixed_survey, "python", version)
+    actual = _analytics(client, mixed_survey, backend, version)
+    assert actual["total_responses"] == expected["total_responses"]
+    problems = []
+    _diff(expected["analytics"], actual["analytics"], "analytics", problems)
+    assert not problems, "\n".join(problems)
+
+def test_fixture_covers_deletes_and_versions(client, mixed_survey):
+    everything = _analytics(client, mixed_survey, "python")
+    first = _analytics(client, mixed_survey, "python", 1)
+    second = _analytics(client, mixed_survey, "python", 2)
+    # 103 stored, 15 deleted
+    assert everything["total_responses"] == 88
+    assert first["total_responses"] + second["total_responses"] == 88
+    assert "Starter" in str(second["analytics"]["Plan"]) and "Basic" in str(first["analytics"]["Plan"])
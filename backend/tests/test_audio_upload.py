@@ -0,0 +1,79 @@
+"""Multipart audio uploads and downloads"""
+from urllib.parse import unquote
+
+import pytest
+
+from app.core.database import SessionLocal
+from app.models.survey import AudioBlob
+
+QUESTIONS = [{"text": "Voice", "type": "audio", "options": [], "required": False}]
+
+@pytest.fixture
+def response_url(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {}})
+    assert response.status_code == 201, response.text
+    return f"/api/surveys/{survey_id}/responses/{response.json()['id']}/audio"
+
+def _upload(client, url, question, filename, body=b"webm bytes"):
+    response = client.post(url, data={"question": question}, files={"file": (filename, body, "audio/webm")})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _rename(blob_id, filename):
+    """Set a stored file name directly; HTTP clients percent-encode quotes and line breaks in uploads"""
+    db = SessionLocal()
+    try:
+        db.get(AudioBlob, blob_id).filename = filename
+        db.commit()
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("filename, fallback", [
+    ("запись.webm", "______.webm"),
+    ('say "hi".webm', 'say \\"hi\\".webm'),
+    ("back\\slash.webm", "back\\\\slash.webm"),
+])
+def test_download_names_the_file_safely(client, response_url, filename, fallback):
+    blob = _upload(client, response_url, "Voice", "upload.webm")
+    _rename(blob["id"], filename)
+    download = client.get(f"{response_url}/{blob['id']}")
+    assert download.status_code == 200
+    disposition = download.headers["content-disposition"]
+    assert disposition.startswith(f'inline; filename="{fallback}"; ')
+    assert unquote(disposition.split("filename*=UTF-8''", 1)[1]) == filename
+
+def test_uploaded_non_ascii_name_downloads(client, response_url):
+    blob = _upload(client, response_url, "Voice", "запись.webm")
+    download = client.get(f"{response_url}/{blob['id']}")
+    assert download.status_code == 200 and download.content == b"webm bytes"
+    assert download.headers["content-disposition"].endswith("filename*=UTF-8''%D0%B7%D0%B0%D0%BF%D0%B8%D1%81%D1%8C.webm")
+
+def test_line_breaks_cannot_reach_the_header(client, response_url):
+    blob = _upload(client, response_url, "Voice", "upload.webm")
+    _rename(blob["id"], "a\r\nSet-Cookie: x=1.webm")
+    disposition = client.get(f"{response_url}/{blob['id']}").headers["content-disposition"]
+    assert "\r" not in disposition and "\n" not in disposition
+    assert "set-cookie" not in client.get(f"{response_url}/{blob['id']}").headers
+
+def test_upload_replaces_the_answer_across_renames(client, response_url):
+    survey_url = response_url.split("/responses/")[0]
+    first = _upload(client, response_url, "Voice", "one.webm")
+    questions = client.get(survey_url).json()["questions"]
+    assert first["question_key"] == questions[0]["id"]
+
+    renamed = [dict(questions[0], text="Voice note")]
+    assert client.put(survey_url, json={"questions": renamed}).status_code == 200
+    second = _upload(client, response_url, "Voice note", "two.webm")
+    assert [blob["id"] for blob in client.get(response_url).json()] == [second["id"]]
+    # The question id works as well
+    third = _upload(client, response_url, questions[0]["id"], "three.webm")
+    assert [blob["id"] for blob in client.get(response_url).json()] == [third["id"]]
+    assert client.post(response_url, data={"question": "Voice"}, files={"file": ("x.webm", b"x", "audio/webm")}).status_code == 422
+
+def test_range_requests(client, response_url):
+    blob = _upload(client, response_url, "Voice", "clip.webm", b"0123456789")
+    partial = client.get(f"{response_url}/{blob['id']}", headers={"Range": "bytes=2-5"})
+    assert partial.status_code == 206 and partial.content == b"2345"
+    assert partial.headers["content-range"] == "bytes 2-5/10"
+    assert client.get(f"{response_url}/{blob['id']}", headers={"Range": "bytes=20-"}).status_code == 416
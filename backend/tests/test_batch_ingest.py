@@ -0,0 +1,67 @@
+"""Batch response ingestion: idempotency keys and per-item results"""
+import json
+
+import pytest
+
+QUESTIONS = [
+    {"text": "Name", "type": "text", "options": [], "required": True},
+    {"text": "Score", "type": "rating", "options": [], "required": False},
+]
+
+@pytest.fixture
+def batch_url(make_survey):
+    return f"/api/surveys/{make_survey(QUESTIONS)}/responses:batch"
+
+def _count(client, batch_url):
+    return client.get(batch_url.replace("/responses:batch", "/stats")).json()["response_count"]
+
+def test_batch_stores_every_item(client, batch_url):
+    body = client.post(batch_url, json=[{"responses": {"Name": f"n{i}", "Score": i}} for i in range(5)]).json()
+    assert (body["created"], body["duplicates"], body["failed"]) == (5, 0, 0)
+    assert [r["index"] for r in body["results"]] == list(range(5))
+    assert len({r["response_id"] for r in body["results"]}) == 5
+    assert _count(client, batch_url) == 5
+
+def test_ndjson_body(client, batch_url):
+    lines = "\n".join(json.dumps({"responses": {"Name": name}}) for name in ["a", "b"]) + "\n"
+    response = client.post(batch_url, content=lines, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200 and response.json()["created"] == 2
+
+def test_idempotency_keys_within_and_across_batches(client, batch_url):
+    first = client.post(batch_url, json=[
+        {"responses": {"Name": "a"}, "idempotency_key": "k1"},
+        {"responses": {"Name": "a again"}, "idempotency_key": "k1"},
+        {"responses": {"Name": "b"}, "idempotency_key": "k2"},
+    ]).json()
+    assert [r["status"] for r in first["results"]] == ["created", "duplicate", "created"]
+    assert first["results"][1]["response_id"] == first["results"][0]["response_id"]
+
+    second = client.post(batch_url, json=[
+        {"responses": {"Name": "b"}, "idempotency_key": "k2"},
+        {"responses": {"Name": "c"}, "idempotency_key": "k3"},
+    ]).json()
+    assert [r["status"] for r in second["results"]] == ["duplicate", "created"]
+    assert second["results"][0]["response_id"] == first["results"][2]["response_id"]
+    assert _count(client, batch_url) == 3
+
+def test_invalid_items_fail_alone(client, batch_url):
+    body = client.post(batch_url, json=[
+        {"responses": {"Name": "ok"}},
+        {"responses": {"Score": 3}},
+        "not an object",
+        {"responses": {"Name": "also ok", "Score": 99}},
+        {"responses": {"Name": "fine", "Score": 4}, "idempotency_key": "k"},
+    ]).json()
+    assert [r["status"] for r in body["results"]] == ["created", "invalid", "invalid", "invalid", "created"]
+    assert (body["created"], body["failed"]) == (2, 3)
+    assert all(r["errors"] for r in body["results"] if r["status"] == "invalid")
+    assert body["results"][4]["idempotency_key"] == "k"
+    assert _count(client, batch_url) == 2
+
+def test_malformed_and_oversized_bodies(client, batch_url, monkeypatch):
+    from app.core.config import settings
+
+    assert client.post(batch_url, content=b"{nope", headers={"Content-Type": "application/json"}).status_code == 400
+    assert client.post(batch_url, json={"responses": {}}).status_code == 400
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 2)
+    assert client.post(batch_url, json=[{"responses": {"Name": "x"}}] * 3).status_code == 413
@@ -0,0 +1,91 @@
+"""Response cache: hits, invalidation on writes and conditional GETs, on both backends"""
+import asyncio
+
+import pytest
+
+from app.services.cache_service import CacheService, MemoryCache, RedisCache, cache_service
+
+class FakeRedis:
+    """The handful of ``redis.asyncio`` calls RedisCache makes, kept in a dict"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return value.encode() if isinstance(value, str) else value
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request, monkeypatch):
+    backend = MemoryCache(64, 60) if request.param == "memory" else RedisCache(FakeRedis(), 60)
+    service = CacheService(backend)
+    for name in ("backend", "hits", "misses"):
+        monkeypatch.setattr(cache_service, name, getattr(service, name))
+    return cache_service
+
+@pytest.fixture
+def survey_id(make_survey):
+    return make_survey([{"text": "Rate us", "type": "rating", "options": [], "required": True}])
+
+def _submit(client, survey_id):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Rate us": 4}})
+    assert response.status_code == 201, response.text
+
+def test_second_read_is_a_hit(client, cache, survey_id):
+    first = client.get(f"/api/surveys/{survey_id}/stats")
+    second = client.get(f"/api/surveys/{survey_id}/stats")
+    assert first.json() == second.json()
+    assert first.headers["etag"] == second.headers["etag"]
+    assert (cache.misses, cache.hits) == (1, 1)
+
+def test_matching_etag_gets_304(client, cache, survey_id):
+    etag = client.get(f"/api/surveys/{survey_id}").headers["etag"]
+    cached = client.get(f"/api/surveys/{survey_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["etag"] == etag and not cached.content
+    assert client.get(f"/api/surveys/{survey_id}", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+def test_if_modified_since_alone_never_gets_304(client, cache, survey_id):
+    client.get(f"/api/surveys/{survey_id}/stats")
+    response = client.get(f"/api/surveys/{survey_id}/stats", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
+
+def test_response_invalidates_survey_views(client, cache, survey_id):
+    before = client.get(f"/api/surveys/{survey_id}/stats")
+    _submit(client, survey_id)
+    after = client.get(f"/api/surveys/{survey_id}/stats", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.json()["response_count"] == before.json()["response_count"] + 1
+
+def test_response_leaves_listings_cached(client, cache, survey_id):
+    generation = asyncio.run(cache.backend.get_counter("surveys:list:generation"))
+    listing = client.get("/api/surveys", params={"limit": 500})
+    _submit(client, survey_id)
+    assert asyncio.run(cache.backend.get_counter("surveys:list:generation")) == generation
+    assert client.get("/api/surveys", params={"limit": 500}, headers={"If-None-Match": listing.headers["etag"]}).status_code == 304
+
+def test_survey_edit_invalidates_listings(client, cache, survey_id):
+    listing = client.get("/api/surveys", params={"limit": 500})
+    assert client.put(f"/api/surveys/{survey_id}", json={"title": "Renamed"}).status_code == 200
+    fresh = client.get("/api/surveys", params={"limit": 500}, headers={"If-None-Match": listing.headers["etag"]})
+    assert fresh.status_code == 200
+    assert "Renamed" in [survey["title"] for survey in fresh.json()]
+    assert client.get(f"/api/surveys/{survey_id}").json()["title"] == "Renamed"
+
+def test_disabled_cache_always_renders(client, monkeypatch, survey_id):
+    monkeypatch.setattr(cache_service, "backend", None)
+    assert not cache_service.enabled
+    etag = client.get(f"/api/surveys/{survey_id}").headers["etag"]
+    # Conditional GETs still work, they just cost a query
+    assert client.get(f"/api/surveys/{survey_id}", headers={"If-None-Match": etag}).status_code == 304
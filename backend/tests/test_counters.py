@@ -0,0 +1,71 @@
+"""Response counters and count buckets kept in the submit and delete transactions"""
+from datetime import datetime
+
+from app.core.database import SessionLocal
+from app.models.analytics import ResponseCountBucket
+from app.models.survey import Survey
+from app.services.counter_service import counter_service, GRANULARITIES
+
+QUESTIONS = [{"text": "Name", "type": "text", "options": [], "required": True}]
+
+def _submit(client, survey_id, name):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Name": name}})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _buckets(survey_id):
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            ResponseCountBucket.granularity, ResponseCountBucket.bucket_start, ResponseCountBucket.response_count
+        ).filter(ResponseCountBucket.survey_id == survey_id, ResponseCountBucket.response_count > 0)
+        return sorted((granularity, start, count) for granularity, start, count in rows)
+    finally:
+        db.close()
+
+def _totals(survey_id):
+    totals = dict.fromkeys(GRANULARITIES, 0)
+    for granularity, _, count in _buckets(survey_id):
+        totals[granularity] += count
+    return totals
+
+def test_counters_follow_inserts_and_deletes(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    stats_url = f"/api/surveys/{survey_id}/stats"
+    assert client.get(stats_url).json()["response_count"] == 0
+    submitted = [_submit(client, survey_id, str(i)) for i in range(3)]
+    batch = client.post(f"/api/surveys/{survey_id}/responses:batch", json=[{"responses": {"Name": "b"}}] * 2).json()
+    assert batch["created"] == 2
+
+    assert client.get(stats_url).json()["response_count"] == 5
+    survey = client.get(f"/api/surveys/{survey_id}").json()
+    assert survey["response_count"] == 5
+    assert datetime.fromisoformat(survey["last_response_at"]) >= datetime.fromisoformat(submitted[-1]["submitted_at"])
+    assert _totals(survey_id) == dict.fromkeys(GRANULARITIES, 5)
+    assert client.get(f"/api/surveys/{survey_id}/summary").json()["total_responses"] == 5
+
+    latest = batch["results"][-1]["response_id"]
+    for response_id in (submitted[0]["id"], latest):
+        assert client.delete(f"/api/surveys/{survey_id}/responses/{response_id}").status_code == 200
+    assert client.get(stats_url).json()["response_count"] == 3
+    survey = client.get(f"/api/surveys/{survey_id}").json()
+    assert survey["response_count"] == 3
+    # The newest remaining response is the latest again
+    remaining = client.get(f"/api/surveys/{survey_id}/responses").json()
+    assert survey["last_response_at"] == max(r["submitted_at"] for r in remaining)
+    assert _totals(survey_id) == dict.fromkeys(GRANULARITIES, 3)
+
+def test_rebuild_matches_the_maintained_counters(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    ids = [_submit(client, survey_id, str(i))["id"] for i in range(4)]
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{ids[1]}").status_code == 200
+    maintained = _buckets(survey_id)
+    db = SessionLocal()
+    try:
+        survey = db.get(Survey, survey_id)
+        counter_service.rebuild_survey(db, survey)
+        db.commit()
+        assert survey.response_count == 3
+    finally:
+        db.close()
+    assert _buckets(survey_id) == maintained
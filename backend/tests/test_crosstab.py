@@ -0,0 +1,67 @@
+"""Answer bitmaps: crosstabs and filtered counts stay exact under late commits and deletes"""
+import pytest
+
+from app.core.database import SessionLocal
+from app.models.survey import Survey, SurveyResponse
+from app.services.response_outbox import ResponseOutbox
+from app.services.survey_schema import survey_schemas
+
+QUESTIONS = [
+    {"text": "Plan", "type": "multiple_choice", "options": ["Free", "Pro"], "required": True},
+    {"text": "Happy", "type": "yes_no", "options": [], "required": True},
+]
+
+@pytest.fixture
+def survey_id(make_survey):
+    return make_survey(QUESTIONS)
+
+def _submit(client, survey_id, plan, happy):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Plan": plan, "Happy": happy}})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def _insert_late(survey_id, response_id, plan, happy):
+    """Store a response under an id below ones already indexed, as a transaction committing late would"""
+    db = SessionLocal()
+    try:
+        stored, encoding = survey_schemas.get(db.get(Survey, survey_id)).encode({"Plan": plan, "Happy": happy})
+        db.add(SurveyResponse(id=response_id, survey_id=survey_id, responses=stored, answer_encoding=encoding))
+        db.flush()
+        ResponseOutbox.publish(db, survey_id, [response_id])
+        db.commit()
+    finally:
+        db.close()
+
+def _cells(client, survey_id, *where):
+    response = client.get(f"/api/surveys/{survey_id}/crosstab", params={"by": ["Plan", "Happy"], "where": list(where)})
+    assert response.status_code == 200, response.text
+    return {tuple(cell["values"]): cell["count"] for cell in response.json()["cells"]}
+
+def test_crosstab_and_filters(client, survey_id):
+    for plan, happy in [("Pro", "yes"), ("Pro", "no"), ("Free", "yes"), ("Pro", "yes")]:
+        _submit(client, survey_id, plan, happy)
+    assert _cells(client, survey_id) == {("Pro", "yes"): 2, ("Pro", "no"): 1, ("Free", "yes"): 1}
+    filtered = client.get(f"/api/surveys/{survey_id}/analytics/filtered", params={"where": ["Happy=yes"]}).json()
+    assert filtered["total_responses"] == 3
+    assert filtered["analytics"]["Plan"]["data"]["responses"] == {"Pro": 2, "Free": 1}
+
+def test_response_committed_below_indexed_ids_is_indexed(client, survey_id):
+    first = _submit(client, survey_id, "Pro", "yes")
+    _insert_late(survey_id, first + 50, "Free", "no")
+    assert _cells(client, survey_id) == {("Pro", "yes"): 1, ("Free", "no"): 1}
+    late = first + 20
+    _insert_late(survey_id, late, "Free", "yes")
+    assert _cells(client, survey_id) == {("Pro", "yes"): 1, ("Free", "no"): 1, ("Free", "yes"): 1}
+    # Its ordinal comes after higher ids, and deleting it still clears the right bit
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{late}").status_code == 200
+    assert _cells(client, survey_id) == {("Pro", "yes"): 1, ("Free", "no"): 1}
+
+def test_deletes_are_masked_out(client, survey_id):
+    indexed = _submit(client, survey_id, "Pro", "yes")
+    _submit(client, survey_id, "Free", "no")
+    _cells(client, survey_id)
+    pending = _submit(client, survey_id, "Pro", "no")
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{indexed}").status_code == 200
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{pending}").status_code == 200
+    assert _cells(client, survey_id) == {("Free", "no"): 1}
+    assert _cells(client, survey_id, "Plan=Pro") == {}
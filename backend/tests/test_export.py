@@ -0,0 +1,62 @@
+"""Response exports keep one column per question, even when question texts repeat"""
+import csv
+import io
+import json
+
+import pytest
+
+from app.core.database import SessionLocal
+from app.models.survey import Survey, SurveyResponse
+from app.services.survey_schema import ENCODING_QUESTION_IDS
+
+QUESTIONS = [
+    {"text": "Score", "type": "rating", "options": [], "required": False},
+    {"text": "Score", "type": "number", "options": [], "required": False},
+    {"text": "Plan", "type": "multiple_choice", "options": ["Free", "Pro"], "required": False},
+]
+HEADER = ["response_id", "submitted_at", "respondent_ip", "Q: Score", "Q: Score (2)", "Q: Plan"]
+
+@pytest.fixture
+def survey_id(make_survey):
+    survey_id = make_survey(QUESTIONS)
+    db = SessionLocal()
+    try:
+        first, second, plan = (q["id"] for q in db.get(Survey, survey_id).questions)
+        db.add_all([
+            SurveyResponse(survey_id=survey_id, responses={first: 4, second: 120, plan: 1}, answer_encoding=ENCODING_QUESTION_IDS),
+            SurveyResponse(survey_id=survey_id, responses={first: 9, plan: 0}, answer_encoding=ENCODING_QUESTION_IDS),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return survey_id
+
+def _export(client, survey_id, fmt):
+    response = client.get(f"/api/surveys/{survey_id}/responses/export", params={"format": fmt})
+    assert response.status_code == 200, response.text
+    return response
+
+def test_csv_keeps_questions_with_the_same_text_apart(client, survey_id):
+    rows = list(csv.reader(io.StringIO(_export(client, survey_id, "csv").text)))
+    assert rows[0] == HEADER
+    assert [row[3:] for row in rows[1:]] == [["4", "120", "Pro"], ["9", "", "Free"]]
+
+def test_json_and_ndjson_use_the_same_columns(client, survey_id):
+    data = _export(client, survey_id, "json").json()
+    assert data["total_responses"] == 2
+    assert list(data["data"][0]) == HEADER
+    assert [row["Q: Score (2)"] for row in data["data"]] == [120, ""]
+    lines = [json.loads(line) for line in _export(client, survey_id, "ndjson").text.splitlines()]
+    assert lines == data["data"]
+
+def test_parquet_keeps_questions_with_the_same_text_apart(client, survey_id):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(_export(client, survey_id, "parquet").content))
+    assert table.column_names == HEADER
+    assert table.column("Q: Score").to_pylist() == ["4", "9"]
+    assert table.column("Q: Score (2)").to_pylist() == ["120", ""]
+
+def test_empty_json_export(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    assert _export(client, survey_id, "json").json() == {"message": "No responses to export", "data": []}
+    assert list(csv.reader(io.StringIO(_export(client, survey_id, "csv").text))) == [HEADER]
@@ -0,0 +1,90 @@
+"""Queued ingestion: receipts, backpressure, draining and per-item retries"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.survey import BatchResponseItem
+from app.services.ingestion_service import ingestion_queue, ingestion_service
+
+QUESTIONS = [{"text": "Name", "type": "text", "options": [], "required": True}]
+
+@pytest.fixture
+def queue(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_FLUSH_INTERVAL_MS", 5)
+    client.portal.call(ingestion_queue.start)
+    yield ingestion_queue
+    client.portal.call(ingestion_queue.stop)
+
+def _receipt(client, survey_id, receipt_id):
+    return client.get(f"/api/surveys/{survey_id}/responses/receipts/{receipt_id}")
+
+def test_submission_is_queued_then_stored(client, make_survey, queue):
+    survey_id = make_survey(QUESTIONS)
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Name": "queued"}})
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "queued" and body["survey_id"] == survey_id
+    client.portal.call(queue.stop)
+    stored = _receipt(client, survey_id, body["receipt_id"]).json()
+    assert stored["status"] == "stored"
+    assert client.get(f"/api/surveys/{survey_id}/responses/{stored['response_id']}").json()["responses"] == {"Name": "queued"}
+    # Validation still happens before queueing
+    assert client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {}}).status_code == 422
+
+def test_full_queue_answers_503(client, make_survey, monkeypatch):
+    survey_id = make_survey(QUESTIONS)
+    monkeypatch.setattr(settings, "INGEST_QUEUE_MAXSIZE", 2)
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 1)
+    gate = asyncio.Event()
+    write = ingestion_queue._write
+
+    async def held_write(batch):
+        await gate.wait()
+        await write(batch)
+
+    monkeypatch.setattr(ingestion_queue, "_write", held_write)
+    client.portal.call(ingestion_queue.start)
+    try:
+        statuses = [
+            client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Name": str(i)}}).status_code
+            for i in range(6)
+        ]
+        assert statuses.count(202) <= 3 and statuses[-1] == 503
+        rejected = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Name": "late"}})
+        assert rejected.headers["retry-after"] == "1"
+    finally:
+        client.portal.call(gate.set)
+        client.portal.call(ingestion_queue.stop)
+    assert client.get(f"/api/surveys/{survey_id}/stats").json()["response_count"] == statuses.count(202)
+
+def test_shutdown_drains_the_queue(client, make_survey, queue):
+    survey_id = make_survey(QUESTIONS)
+    receipts = client.portal.call(lambda: [
+        queue.submit(survey_id, BatchResponseItem(responses={"Name": str(i)}), "127.0.0.1") for i in range(20)
+    ])
+    client.portal.call(queue.stop)
+    assert not any(queue.is_pending(receipt) for receipt in receipts)
+    assert {_receipt(client, survey_id, receipt).json()["status"] for receipt in receipts} == {"stored"}
+    with pytest.raises(asyncio.QueueFull):
+        queue.submit(survey_id, BatchResponseItem(responses={"Name": "after"}), "127.0.0.1")
+
+def test_failed_group_is_retried_item_by_item(client, make_survey, queue, monkeypatch):
+    survey_id = make_survey(QUESTIONS)
+    insert_batch = ingestion_service.insert_batch
+
+    async def poisoned_insert(db, survey, items, client_ips, results):
+        if any(item.responses["Name"] == "boom" for item in items):
+            raise RuntimeError("poisoned submission")
+        await insert_batch(db, survey, items, client_ips, results)
+
+    monkeypatch.setattr(ingestion_service, "insert_batch", poisoned_insert)
+    failed, batches = queue.failed, queue.batches
+    receipts = client.portal.call(lambda: [
+        queue.submit(survey_id, BatchResponseItem(responses={"Name": name}), "127.0.0.1") for name in ["a", "boom", "b"]
+    ])
+    client.portal.call(queue.stop)
+    assert (queue.failed - failed, queue.batches - batches) == (1, 1)
+    assert _receipt(client, survey_id, receipts[0]).json()["status"] == "stored"
+    assert _receipt(client, survey_id, receipts[1]).status_code == 404
+    assert _receipt(client, survey_id, receipts[2]).json()["status"] == "stored"
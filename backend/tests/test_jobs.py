@@ -0,0 +1,162 @@
+"""Background jobs: claiming, heartbeats, lost workers, cancelling and cleanup"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.job import Job
+from app.services import job_service as job_service_module
+from app.services.job_service import job_service
+from app.services.job_tasks import JOB_TASKS
+
+QUESTIONS = [{"text": "Score", "type": "rating", "options": [], "required": True}]
+
+@pytest.fixture
+def survey_id(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    for score in (2, 4):
+        assert client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Score": score}}).status_code == 201
+    return survey_id
+
+@pytest.fixture
+def in_loop(monkeypatch):
+    """Run analytics jobs on the event loop instead of the process pool"""
+    monkeypatch.setattr(job_service_module, "PROCESS_JOB_TYPES", ())
+
+@pytest.fixture
+def gate(client, monkeypatch, in_loop):
+    """Analytics jobs that block until the returned callable is called"""
+    state = {}
+
+    async def blocked(params, path):
+        await state.setdefault("event", asyncio.Event()).wait()
+        with open(path, "w") as f:
+            f.write("{}")
+        return {"content_type": "application/json", "result": {}}
+
+    async def release():
+        state.setdefault("event", asyncio.Event()).set()
+        await asyncio.gather(*job_service._tasks.values())
+
+    monkeypatch.setitem(JOB_TASKS, "analytics", blocked)
+    yield lambda: client.portal.call(release)
+    client.portal.call(release)
+
+def _queue(client, survey_id, params=None):
+    response = client.post("/api/jobs", json={"type": "analytics", "survey_id": survey_id, "params": params or {}})
+    assert response.status_code == 202, response.text
+    assert response.headers["location"].endswith(response.json()["id"])
+    return response.json()["id"]
+
+def _job(job_id):
+    db = SessionLocal()
+    try:
+        return db.get(Job, job_id)
+    finally:
+        db.close()
+
+def _insert(survey_id, **values):
+    db = SessionLocal()
+    try:
+        job = Job(id=uuid.uuid4().hex, job_type="analytics", survey_id=survey_id, params={"survey_id": survey_id}, **values)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+def _run_all(client):
+    """Claim queued jobs and wait for them to finish; returns how many were claimed"""
+    async def run():
+        claimed = await job_service.dispatch()
+        await asyncio.gather(*job_service._tasks.values())
+        return claimed
+
+    return client.portal.call(run)
+
+def test_create_validates(client, survey_id):
+    assert client.post("/api/jobs", json={"type": "nope", "survey_id": survey_id, "params": {}}).status_code == 400
+    assert client.post("/api/jobs", json={"type": "analytics", "survey_id": 999999, "params": {}}).status_code == 404
+    assert client.post("/api/jobs", json={"type": "export", "survey_id": survey_id, "params": {"format": "pdf"}}).status_code == 400
+
+def test_claimed_job_runs_and_keeps_its_artifact(client, survey_id, in_loop):
+    job_id = _queue(client, survey_id)
+    assert client.get(f"/api/jobs/{job_id}/artifact").status_code == 409
+    assert _run_all(client) == 1
+    job = client.get(f"/api/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    assert _job(job_id).attempts == 1
+    artifact = client.get(f"/api/jobs/{job_id}/artifact")
+    assert artifact.status_code == 200
+    assert artifact.json()["total_responses"] == 2
+    assert [j["id"] for j in client.get("/api/jobs", params={"survey_id": survey_id, "status": "succeeded"}).json()] == [job_id]
+
+def test_concurrency_limit_and_heartbeat(client, survey_id, gate, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_ANALYTICS_CONCURRENCY", 1)
+    first, second = _queue(client, survey_id), _queue(client, survey_id)
+    assert client.portal.call(job_service.dispatch) == 1
+    running = _job(first)
+    assert (running.status, running.attempts, _job(second).status) == ("running", 1, "queued")
+
+    # Still running: the next pass refreshes its heartbeat and claims nothing
+    assert client.portal.call(job_service.dispatch) == 0
+    assert _job(first).heartbeat_at > running.heartbeat_at
+    assert client.delete(f"/api/jobs/{first}").status_code == 409
+
+    gate()
+    assert _job(first).status == "succeeded"
+    assert client.portal.call(job_service.dispatch) == 1
+    gate()
+    assert _job(second).status == "succeeded"
+
+def test_lost_worker_is_retried_then_given_up(client, survey_id, gate):
+    stale = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_SECONDS + 5)
+    retried = _insert(survey_id, status="running", attempts=1, started_at=stale, heartbeat_at=stale)
+    exhausted = _insert(survey_id, status="running", attempts=settings.JOB_MAX_ATTEMPTS, started_at=stale, heartbeat_at=stale)
+
+    assert client.portal.call(job_service.dispatch) == 1
+    assert (_job(retried).status, _job(retried).attempts) == ("running", 2)
+    given_up = _job(exhausted)
+    assert given_up.status == "failed" and given_up.finished_at is not None
+    assert given_up.error == f"Worker lost {settings.JOB_MAX_ATTEMPTS} times"
+    gate()
+    assert _job(retried).status == "succeeded"
+
+def test_cancel_then_delete(client, survey_id, in_loop):
+    job_id = _queue(client, survey_id)
+    assert client.delete(f"/api/jobs/{job_id}").json()["message"] == "Job cancelled"
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == "cancelled"
+    # A cancelled job is never claimed
+    assert _run_all(client) == 0
+    assert client.delete(f"/api/jobs/{job_id}").json()["message"] == "Job deleted"
+    assert client.get(f"/api/jobs/{job_id}").status_code == 404
+
+def test_delete_removes_the_artifact(client, survey_id, in_loop):
+    job_id = _queue(client, survey_id)
+    _run_all(client)
+    path = job_service.artifact_path(_job(job_id).artifact_key)
+    assert path.exists()
+    assert client.delete(f"/api/jobs/{job_id}").json()["message"] == "Job deleted"
+    assert not path.exists()
+
+def test_cleanup_removes_expired_jobs_and_artifacts(client, survey_id, in_loop):
+    expired, recent = _queue(client, survey_id), _queue(client, survey_id)
+    _run_all(client)
+    paths = {job_id: job_service.artifact_path(_job(job_id).artifact_key) for job_id in (expired, recent)}
+    db = SessionLocal()
+    try:
+        db.get(Job, expired).finished_at = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS + 1)
+        db.commit()
+    finally:
+        db.close()
+
+    async def cleanup():
+        async with AsyncSessionLocal() as db:
+            return await job_service.cleanup(db)
+
+    assert client.portal.call(cleanup) == 1
+    assert _job(expired) is None and not paths[expired].exists()
+    assert _job(recent) is not None and paths[recent].exists()
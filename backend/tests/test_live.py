@@ -0,0 +1,93 @@
+"""Live dashboard updates: snapshot then deltas, coalesced per viewer and per hub"""
+import asyncio
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.survey import Survey
+from app.schemas.survey import BatchResponseItem
+from app.services.ingestion_service import ingestion_service
+from app.services.live_service import live_service, _Hub, _Viewer
+
+QUESTIONS = [
+    {"text": "Rate", "type": "rating", "options": [], "required": True},
+    {"text": "Plan", "type": "multiple_choice", "options": ["Free", "Pro"], "required": False},
+]
+
+def _snapshot(analytics, count=1):
+    return {"survey_id": 1, "response_count": count, "analytics": analytics}
+
+def test_diff_sends_only_what_changed():
+    before = _snapshot({"Rate": {"n": 1}, "Plan": {"n": 1}, "Old": {"n": 1}})
+    after = _snapshot({"Rate": {"n": 2}, "Plan": {"n": 1}}, count=2)
+    assert _Hub._diff(None, before) == {"event": "snapshot", "data": before}
+    assert _Hub._diff(before, after) == {"event": "update", "data": {
+        "survey_id": 1, "response_count": 2, "analytics": {"Rate": {"n": 2}}, "removed": ["Old"]
+    }}
+    assert _Hub._diff(after, after) is None
+
+def test_viewer_merges_undelivered_events():
+    async def run():
+        viewer = _Viewer()
+        snapshot = {"event": "snapshot", "data": _snapshot({"Rate": {"n": 1}, "Plan": {"n": 1}})}
+        viewer.offer(snapshot)
+        viewer.offer({"event": "update", "data": {"response_count": 2, "analytics": {"Rate": {"n": 2}}}})
+        viewer.offer({"event": "update", "data": {"removed": ["Plan"]}})
+        merged = await viewer.next(1)
+        # Still one snapshot, now current; the shared snapshot itself is untouched
+        assert merged == {"event": "snapshot", "data": _snapshot({"Rate": {"n": 2}}, count=2)}
+        assert snapshot["data"]["analytics"] == {"Rate": {"n": 1}, "Plan": {"n": 1}}
+
+        viewer.offer({"event": "update", "data": {"analytics": {"Rate": {"n": 3}}, "removed": ["Old"]}})
+        viewer.offer({"event": "update", "data": {"analytics": {"Plan": {"n": 1}}, "removed": ["Gone"]}})
+        assert await viewer.next(1) == {"event": "update", "data": {
+            "analytics": {"Rate": {"n": 3}, "Plan": {"n": 1}}, "removed": ["Gone", "Old"]
+        }}
+        assert await viewer.next(0.01) is None
+
+    asyncio.run(run())
+
+def test_stream_sends_a_snapshot_then_coalesced_updates(client, make_survey, monkeypatch):
+    survey_id = make_survey(QUESTIONS)
+    assert client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Rate": 5}}).status_code == 201
+    monkeypatch.setattr(settings, "LIVE_MIN_INTERVAL_MS", 50)
+    monkeypatch.setattr(settings, "LIVE_HEARTBEAT_SECONDS", 2)
+
+    async def run():
+        events = live_service.stream(survey_id)
+        try:
+            first = await events.__anext__()
+            assert first["event"] == "snapshot" and first["data"]["response_count"] == 1
+            computations = live_service.computations
+            async with AsyncSessionLocal() as db:
+                survey = await db.get(Survey, survey_id)
+                for rate, plan in [(7, "Pro"), (9, "Pro")]:
+                    results = [{"index": 0, "status": "invalid"}]
+                    item = BatchResponseItem(responses={"Rate": rate, "Plan": plan})
+                    await ingestion_service.insert_batch(db, survey, [item], ["127.0.0.1"], results)
+                await db.commit()
+            for _ in range(3):
+                await live_service.notify(survey_id)
+            update = await events.__anext__()
+            assert update["event"] == "update"
+            assert update["data"]["response_count"] == 3
+            assert set(update["data"]["analytics"]) == {"Rate", "Plan"}
+            assert live_service.computations - computations == 1
+        finally:
+            await events.aclose()
+
+    client.portal.call(run)
+    assert live_service.stats()["viewers"] == 0
+
+def test_stream_yields_heartbeats_when_idle(client, make_survey, monkeypatch):
+    survey_id = make_survey(QUESTIONS)
+    monkeypatch.setattr(settings, "LIVE_HEARTBEAT_SECONDS", 0.05)
+
+    async def run():
+        events = live_service.stream(survey_id)
+        try:
+            assert (await events.__anext__())["event"] == "snapshot"
+            assert await events.__anext__() is None
+        finally:
+            await events.aclose()
+
+    client.portal.call(run)
@@ -0,0 +1,63 @@
+"""/metrics labels and opt-in request profiling"""
+import os
+import pstats
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware
+
+def _metric_lines(client, name):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    return [line for line in response.text.splitlines() if line.startswith(name)]
+
+def test_request_metrics_use_route_templates(client, make_survey):
+    survey_id = make_survey([{"text": "Name", "type": "text", "options": [], "required": False}])
+    assert client.get(f"/api/surveys/{survey_id}").status_code == 200
+    assert client.get("/no/such/page/12345").status_code == 404
+    lines = _metric_lines(client, "http_request_duration_seconds_count")
+    assert any('route="/api/surveys/{survey_id}"' in line and 'method="GET"' in line and 'status="200"' in line for line in lines)
+    assert any('route="unmatched"' in line and 'status="404"' in line for line in lines)
+    assert not any(f"/api/surveys/{survey_id}" in line or "12345" in line for line in lines)
+
+@pytest.fixture
+def profiled_client():
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        return {"total": sum(range(10000))}
+
+    app.add_middleware(ProfilingMiddleware)
+    with TestClient(app) as test_client:
+        yield test_client
+
+def _profile_file(response):
+    name = response.headers.get("x-profile-file")
+    return os.path.join(settings.PROFILE_DIR, name) if name else None
+
+def test_only_requests_asking_are_profiled(profiled_client):
+    response = profiled_client.get("/work")
+    assert response.status_code == 200 and _profile_file(response) is None
+    assert _profile_file(profiled_client.get("/work", headers={"X-Profile": "flame"})) is None
+
+def test_profile_modes_write_their_files(profiled_client):
+    sampled = profiled_client.get("/work", headers={"X-Profile": "sample"})
+    assert sampled.json() == {"total": 49995000}
+    assert _profile_file(sampled).endswith(".folded") and os.path.exists(_profile_file(sampled))
+
+    profiled = profiled_client.get("/work", headers={"X-Profile": "cprofile"})
+    path = _profile_file(profiled)
+    assert path.endswith(".prof")
+    assert pstats.Stats(path).total_calls > 0
+
+def test_profile_token_is_required_when_set(profiled_client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", "secret")
+    assert _profile_file(profiled_client.get("/work", headers={"X-Profile": "cprofile"})) is None
+    wrong = {"X-Profile": "cprofile", "X-Profile-Token": "guess"}
+    assert _profile_file(profiled_client.get("/work", headers=wrong)) is None
+    right = {"X-Profile": "cprofile", "X-Profile-Token": "secret"}
+    assert _profile_file(profiled_client.get("/work", headers=right)) is not None
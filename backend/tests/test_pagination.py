@@ -0,0 +1,53 @@
+"""Keyset pagination of responses and surveys"""
+from app.core.pagination import NEXT_CURSOR_HEADER
+
+QUESTIONS = [{"text": "Name", "type": "text", "options": [], "required": True}]
+
+def _submit(client, survey_id, name):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Name": name}})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def _page(client, url, **params):
+    response = client.get(url, params=params)
+    assert response.status_code == 200, response.text
+    return [item["id"] for item in response.json()], response.headers.get(NEXT_CURSOR_HEADER)
+
+def test_response_cursor_survives_inserts_and_deletes(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    url = f"/api/surveys/{survey_id}/responses"
+    ids = [_submit(client, survey_id, str(i)) for i in range(5)]
+
+    first, cursor = _page(client, url, limit=2)
+    assert first == ids[:2] and cursor
+    # Rows removed from an earlier page would shift an OFFSET page; a cursor is unaffected
+    assert client.delete(f"{url}/{ids[0]}").status_code == 200
+    ids.append(_submit(client, survey_id, "late"))
+    second, cursor = _page(client, url, limit=2, after=cursor)
+    assert second == ids[2:4]
+    rest, cursor = _page(client, url, limit=2, after=cursor)
+    assert rest == ids[4:6] and cursor
+    assert _page(client, url, limit=2, after=cursor) == ([], None)
+
+def test_last_short_page_has_no_cursor(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    ids = [_submit(client, survey_id, str(i)) for i in range(3)]
+    assert _page(client, f"/api/surveys/{survey_id}/responses", limit=5) == (ids, None)
+
+def test_survey_cursor_survives_inserts(client, make_survey):
+    created = [make_survey(QUESTIONS, title=f"Paged {i}") for i in range(3)]
+    ids, cursor = _page(client, "/api/surveys", limit=1, active_only=False)
+    seen = list(ids)
+    while cursor:
+        if len(seen) == 1:
+            created.append(make_survey(QUESTIONS, title="Added while paging"))
+        ids, cursor = _page(client, "/api/surveys", limit=1, active_only=False, after=cursor)
+        seen += ids
+    assert seen == sorted(set(seen))
+    assert set(created) <= set(seen)
+
+def test_malformed_cursors_are_rejected(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    for cursor in ["not-base64!", "e30", "eyJpZCI6IDF9"]:
+        assert client.get(f"/api/surveys/{survey_id}/responses", params={"after": cursor}).status_code == 400
+    assert client.get("/api/surveys", params={"after": "e30"}).status_code == 400
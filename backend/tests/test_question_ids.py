@@ -0,0 +1,77 @@
+"""Stable question ids and option codes across survey edits"""
+from app.core.database import SessionLocal
+from app.models.survey import SurveyResponse
+
+QUESTIONS = [{"text": "Plan", "type": "multiple_choice", "options": ["Free", "Basic", "Pro"], "required": True}]
+
+def _stored(survey_id):
+    db = SessionLocal()
+    try:
+        return dict(db.query(SurveyResponse.id, SurveyResponse.responses).filter(SurveyResponse.survey_id == survey_id))
+    finally:
+        db.close()
+
+def _plans(client, survey_id):
+    analytics = client.get(f"/api/surveys/{survey_id}/analytics", params={"exact": "true"}).json()["analytics"]
+    return analytics["Plan"]["data"]["responses"]
+
+def test_editing_options_rewrites_no_responses(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    for plan in ["Free", "Basic", "Pro", "Basic"]:
+        assert client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Plan": plan}}).status_code == 201
+    before = _stored(survey_id)
+    survey_url = f"/api/surveys/{survey_id}"
+
+    question = client.get(survey_url).json()["questions"][0]
+    reordered = [dict(question, options=["Pro", "Team", "Basic"])]
+    assert client.put(survey_url, json={"questions": reordered}).status_code == 200
+    assert _stored(survey_id) == before
+    assert client.get(survey_url).json()["questions"][0]["option_codes"] == ["Free", "Basic", "Pro", "Team"]
+    assert _plans(client, survey_id) == {"Free": 1, "Basic": 2, "Pro": 1}
+
+    response = client.post(f"{survey_url}/responses", json={"responses": {"Plan": "Team"}})
+    assert response.status_code == 201
+    assert client.get(f"{survey_url}/responses/{response.json()['id']}").json()["responses"] == {"Plan": "Team"}
+    # A removed option that comes back keeps its old answers
+    restored = [dict(question, options=["Free", "Pro"])]
+    assert client.put(survey_url, json={"questions": restored}).status_code == 200
+    assert _plans(client, survey_id) == {"Free": 1, "Basic": 2, "Pro": 1, "Team": 1}
+    assert client.post(f"{survey_url}/responses", json={"responses": {"Plan": "Free"}}).status_code == 201
+    assert _plans(client, survey_id) == {"Free": 2, "Basic": 2, "Pro": 1, "Team": 1}
+
+def test_ids_are_assigned_and_kept(client, make_survey):
+    survey_id = make_survey([
+        {"text": "Name", "type": "text", "options": [], "required": True},
+        {"text": "Score", "type": "rating", "options": [], "required": False},
+    ])
+    survey_url = f"/api/surveys/{survey_id}"
+    questions = client.get(survey_url).json()["questions"]
+    ids = [q["id"] for q in questions]
+    assert all(ids) and len(set(ids)) == 2
+
+    # Without ids, unchanged texts keep theirs; a changed type is a new question
+    edited = [
+        {"text": "Name", "type": "text", "options": [], "required": True},
+        {"text": "Score", "type": "number", "options": [], "required": False},
+    ]
+    assert client.put(survey_url, json={"questions": edited}).status_code == 200
+    current = client.get(survey_url).json()["questions"]
+    assert current[0]["id"] in ids
+    assert current[1]["id"] not in ids
+    # An unknown id is replaced, never trusted
+    forged = [dict(current[0]), dict(current[1], id="qforged")]
+    assert client.put(survey_url, json={"questions": forged}).status_code == 200
+    assert client.get(survey_url).json()["questions"][1]["id"] == current[1]["id"]
+
+def test_renamed_question_keeps_its_answers(client, make_survey):
+    survey_id = make_survey([{"text": "Comment", "type": "text", "options": [], "required": True}])
+    survey_url = f"/api/surveys/{survey_id}"
+    response_id = client.post(f"{survey_url}/responses", json={"responses": {"Comment": "tasty"}}).json()["id"]
+    question = client.get(survey_url).json()["questions"][0]
+    assert client.put(survey_url, json={"questions": [dict(question, text="Anything else?")]}).status_code == 200
+
+    assert client.get(f"{survey_url}/responses/{response_id}").json()["responses"] == {"Anything else?": "tasty"}
+    analytics = client.get(f"{survey_url}/analytics").json()["analytics"]
+    assert analytics["Anything else?"]["response_count"] == 1
+    assert client.post(f"{survey_url}/responses", json={"responses": {"Anything else?": "more"}}).status_code == 201
+    assert client.get(f"{survey_url}/analytics").json()["analytics"]["Anything else?"]["response_count"] == 2
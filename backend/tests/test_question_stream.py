@@ -0,0 +1,75 @@
+"""Question streaming against the stub LLM: incremental events and when the fallback may run"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+
+# Quotes, a backslash and non-ASCII text, so fragments split escapes and multi-byte characters
+PROMPT = 'Café "regulars" \\ weekend'
+
+def _collect(service, prompt, count):
+    async def run():
+        events = []
+        started = time.monotonic()
+        async for event in service.stream_questions(prompt, count):
+            events.append((time.monotonic() - started, event))
+        return events
+
+    return asyncio.run(run())
+
+@pytest.fixture
+def service(stub_llm, monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_DELAY", 5.0)
+    return AIService()
+
+@pytest.mark.parametrize("token_size", [1, 3, 7, 500])
+def test_questions_arrive_as_fragments_complete(stub_llm, service, token_size):
+    stub_llm.TOKEN_SIZE = token_size
+    events = _collect(service, PROMPT, 3)
+    assert [event["event"] for _, event in events] == ["question"] * 3 + ["done"]
+    for index, (_, event) in enumerate(events[:3]):
+        assert event["data"]["text"] == f"Question {index + 1} about {PROMPT}?"
+    assert events[-1][1]["data"] == {"count": 3, "model": service.primary_model, "cached": False}
+
+def test_first_question_is_sent_before_the_array_ends(stub_llm, service):
+    stub_llm.TOKEN_SIZE = 5
+    stub_llm.TOKEN_DELAY = 0.01
+    events = _collect(service, PROMPT, 3)
+    first_question, done = events[0][0], events[-1][0]
+    # ~420 characters at 5 per 10ms: the whole array takes ~0.8s, the first element a third of that
+    assert done - first_question > 0.2
+    assert events[1][0] > first_question and events[2][0] > events[1][0]
+
+def test_fallback_runs_when_primary_fails_before_first_question(stub_llm, service):
+    stub_llm.FAILING.add(service.primary_model)
+    events = _collect(service, PROMPT, 2)
+    assert [event["event"] for _, event in events] == ["question", "question", "done"]
+    assert events[-1][1]["data"]["model"] == service.fallback_model
+
+def test_fallback_runs_when_primary_breaks_off_before_first_question(stub_llm, service):
+    stub_llm.BREAK_AFTER[service.primary_model] = 20
+    events = _collect(service, PROMPT, 2)
+    assert [event["event"] for _, event in events] == ["question", "question", "done"]
+    assert events[-1][1]["data"]["model"] == service.fallback_model
+    assert stub_llm.calls[service.primary_model] == 1
+
+def test_no_fallback_once_a_question_was_sent(stub_llm, service):
+    # The first element ends at character 142; the second never completes
+    stub_llm.BREAK_AFTER[service.primary_model] = 160
+    events = _collect(service, PROMPT, 3)
+    assert [event["event"] for _, event in events] == ["question", "error"]
+    assert events[-1][1]["data"]["count"] == 1
+    assert stub_llm.calls[service.fallback_model] == 0
+
+def test_stream_route_sends_server_sent_events(stub_llm, client):
+    response = client.get("/api/generate-questions/stream", params={"prompt": "route " + PROMPT, "question_count": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    names = [block.split("\n")[0] for block in blocks]
+    assert names == ["event: question", "event: question", "event: done"]
+    assert json.loads(blocks[0].split("data: ", 1)[1])["text"] == f"Question 1 about {('route ' + PROMPT)[:40]}?"
@@ -0,0 +1,70 @@
+"""Full-text search over free-text answers"""
+import pytest
+
+from app.core.database import SessionLocal
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.models.analytics import ResponseSearchDocument
+
+QUESTIONS = [
+    {"text": "Why", "type": "text", "options": [], "required": False},
+    {"text": "Anything else?", "type": "text", "options": [], "required": False},
+    {"text": "Rate", "type": "rating", "options": [], "required": False},
+]
+
+@pytest.fixture
+def survey_id(make_survey):
+    return make_survey(QUESTIONS)
+
+def _submit(client, survey_id, answers):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": answers})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def _search(client, survey_id, q, **params):
+    response = client.get(f"/api/surveys/{survey_id}/responses/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response
+
+def _found(client, survey_id, q, **params):
+    return sorted(hit["response_id"] for hit in _search(client, survey_id, q, **params).json())
+
+def test_answers_are_searchable_once_stored(client, survey_id):
+    late = _submit(client, survey_id, {"Why": "The delivery was late", "Rate": 2})
+    fast = _submit(client, survey_id, {"Why": "Fast delivery", "Anything else?": "Friendly courier"})
+    _submit(client, survey_id, {"Why": "", "Rate": 9})
+    assert _found(client, survey_id, "delivery") == sorted([late, fast])
+    assert _found(client, survey_id, "deliv*") == sorted([late, fast])
+    hit = _search(client, survey_id, "courier").json()[0]
+    assert (hit["response_id"], hit["question"], hit["snippet"]) == (fast, "Anything else?", "Friendly [courier]")
+    # Only text answers, and only non-empty ones, become documents
+    db = SessionLocal()
+    try:
+        assert db.query(ResponseSearchDocument).filter(ResponseSearchDocument.survey_id == survey_id).count() == 3
+    finally:
+        db.close()
+
+def test_question_filter_by_text_or_id(client, survey_id):
+    why = _submit(client, survey_id, {"Why": "great coffee"})
+    other = _submit(client, survey_id, {"Anything else?": "coffee was cold"})
+    question_id = client.get(f"/api/surveys/{survey_id}").json()["questions"][1]["id"]
+    assert _found(client, survey_id, "coffee", question="Why") == [why]
+    assert _found(client, survey_id, "coffee", question=question_id) == [other]
+
+def test_deleted_responses_leave_the_index(client, survey_id):
+    kept = _submit(client, survey_id, {"Why": "parcel arrived"})
+    deleted = _submit(client, survey_id, {"Why": "parcel lost"})
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{deleted}").status_code == 200
+    assert _found(client, survey_id, "parcel") == [kept]
+    assert _found(client, survey_id, "lost") == []
+
+def test_results_page_with_a_cursor(client, survey_id):
+    ids = [_submit(client, survey_id, {"Why": f"slow app {i}"}) for i in range(3)]
+    first = _search(client, survey_id, "slow", limit=2)
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+    rest = _search(client, survey_id, "slow", limit=2, after=cursor)
+    assert NEXT_CURSOR_HEADER not in rest.headers
+    assert sorted(hit["response_id"] for hit in first.json() + rest.json()) == ids
+
+def test_queries_without_words_are_rejected(client, survey_id):
+    assert client.get(f"/api/surveys/{survey_id}/responses/search", params={"q": "*** ?"}).status_code == 400
+    assert client.get(f"/api/surveys/{survey_id}/responses/search", params={"q": "x", "after": "e30"}).status_code == 400
@@ -0,0 +1,89 @@
+"""Question sketches: incremental refresh, late commits and deletes"""
+import pytest
+
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.analytics import QuestionSketch
+from app.models.survey import Survey, SurveyResponse
+from app.services.response_outbox import ResponseOutbox
+from app.services.sketch_service import sketch_service
+from app.services.survey_schema import survey_schemas
+
+QUESTIONS = [{"text": "Spend", "type": "number", "options": [], "required": True}]
+
+@pytest.fixture
+def survey_id(make_survey):
+    return make_survey(QUESTIONS)
+
+def _submit(client, survey_id, spend):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Spend": spend}})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def _insert_late(survey_id, response_id, spend):
+    """Store a response under an id below ones already sketched, as a transaction committing late would"""
+    db = SessionLocal()
+    try:
+        stored, encoding = survey_schemas.get(db.get(Survey, survey_id)).encode({"Spend": spend})
+        db.add(SurveyResponse(id=response_id, survey_id=survey_id, responses=stored, answer_encoding=encoding))
+        db.flush()
+        ResponseOutbox.publish(db, survey_id, [response_id])
+        db.commit()
+    finally:
+        db.close()
+
+def _sketched(client, survey_id):
+    """Refresh, then return the merged quantile sketch of the question"""
+    async def run():
+        async with AsyncSessionLocal() as db:
+            survey = await db.get(Survey, survey_id)
+            await sketch_service.refresh(db, survey)
+            key = survey.questions[0]["id"]
+            return (await sketch_service.merged(db, survey_id)).get((key, "kll"))
+
+    return client.portal.call(run)
+
+def _stale_buckets(survey_id):
+    db = SessionLocal()
+    try:
+        return db.query(QuestionSketch).filter(QuestionSketch.survey_id == survey_id, QuestionSketch.is_stale == True).count()
+    finally:
+        db.close()
+
+def test_refresh_adds_only_new_responses(client, survey_id):
+    _submit(client, survey_id, 10)
+    assert _sketched(client, survey_id).count == 1
+    _submit(client, survey_id, 20)
+    _submit(client, survey_id, 30)
+    sketch = _sketched(client, survey_id)
+    assert sketch.count == 3 and sketch.quantile(0.5) == 20
+
+def test_response_committed_below_sketched_ids_is_sketched(client, survey_id):
+    first = _submit(client, survey_id, 5)
+    _insert_late(survey_id, first + 50, 7)
+    assert _sketched(client, survey_id).count == 2
+    _insert_late(survey_id, first + 20, 9)
+    assert _sketched(client, survey_id).count == 3
+
+def test_delete_recounts_the_day_of_a_sketched_response(client, survey_id):
+    _submit(client, survey_id, 1)
+    deleted = _submit(client, survey_id, 100)
+    _sketched(client, survey_id)
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{deleted}").status_code == 200
+    assert _stale_buckets(survey_id) > 0
+    sketch = _sketched(client, survey_id)
+    assert (sketch.count, sketch.quantile(1.0)) == (1, 1)
+    assert _stale_buckets(survey_id) == 0
+    # A response deleted before it was sketched leaves the sketches alone
+    pending = _submit(client, survey_id, 50)
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{pending}").status_code == 200
+    assert _stale_buckets(survey_id) == 0
+    assert _sketched(client, survey_id).count == 1
+
+@pytest.mark.parametrize("q_type, answers, median", [("number", [-3, 10], 3.5), ("rating", [5, 3, 4, 5], 4.5), ("number", [1, 2, 9], 2)])
+def test_exact_p50_is_the_median(client, make_survey, q_type, answers, median):
+    survey_id = make_survey([{"text": "Value", "type": q_type, "options": [], "required": True}])
+    for answer in answers:
+        assert client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Value": answer}}).status_code == 201
+    data = client.get(f"/api/surveys/{survey_id}/analytics", params={"exact": "true"}).json()["analytics"]["Value"]["data"]
+    assert data["median"] == data["percentiles"]["p50"] == median
+    assert data["percentiles"]["p99"] <= max(answers)
@@ -0,0 +1,74 @@
+"""Incremental text term counts: responses are counted once each, whatever order they commit in"""
+import pytest
+
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.survey import Survey, SurveyResponse
+from app.services.response_outbox import ResponseOutbox
+from app.services.survey_schema import survey_schemas
+from app.services.text_analytics_service import text_analytics_service
+
+QUESTIONS = [{"text": "Comment", "type": "text", "options": [], "required": True}]
+
+@pytest.fixture
+def survey_id(make_survey):
+    return make_survey(QUESTIONS)
+
+def _submit(client, survey_id, text):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": {"Comment": text}})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def _insert_late(survey_id, response_id, text):
+    """Store a response under an id below ones already counted, as a transaction committing late would"""
+    db = SessionLocal()
+    try:
+        stored, encoding = survey_schemas.get(db.get(Survey, survey_id)).encode({"Comment": text})
+        db.add(SurveyResponse(id=response_id, survey_id=survey_id, responses=stored, answer_encoding=encoding))
+        db.flush()
+        ResponseOutbox.publish(db, survey_id, [response_id])
+        db.commit()
+    finally:
+        db.close()
+
+def _terms(client, survey_id):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            survey = await db.get(Survey, survey_id)
+            await text_analytics_service.refresh(db, survey)
+            return await text_analytics_service.summarize(db, survey)
+
+    summary = client.portal.call(run).get("Comment")
+    return summary["top_terms"] if summary else {}
+
+def test_only_new_responses_are_read(client, survey_id):
+    _submit(client, survey_id, "coffee tasty")
+    assert _terms(client, survey_id) == {"coffee": 1, "tasty": 1}
+    _submit(client, survey_id, "coffee cold")
+    assert _terms(client, survey_id) == {"coffee": 2, "cold": 1, "tasty": 1}
+
+def test_response_committed_below_counted_ids_is_counted(client, survey_id):
+    first = _submit(client, survey_id, "espresso")
+    _insert_late(survey_id, first + 50, "latte")
+    assert _terms(client, survey_id) == {"espresso": 1, "latte": 1}
+    _insert_late(survey_id, first + 20, "mocha")
+    assert _terms(client, survey_id) == {"espresso": 1, "latte": 1, "mocha": 1}
+
+def test_delete_retracts_only_counted_responses(client, survey_id):
+    counted = _submit(client, survey_id, "espresso bitter")
+    _terms(client, survey_id)
+    pending = _submit(client, survey_id, "espresso smooth")
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{counted}").status_code == 200
+    assert client.delete(f"/api/surveys/{survey_id}/responses/{pending}").status_code == 200
+    assert _terms(client, survey_id) == {}
+
+def test_rebuild_recounts_every_response(client, survey_id):
+    _submit(client, survey_id, "tea")
+    _submit(client, survey_id, "tea green")
+    _terms(client, survey_id)
+    db = SessionLocal()
+    try:
+        text_analytics_service.reset_survey(db, survey_id)
+        db.commit()
+    finally:
+        db.close()
+    assert _terms(client, survey_id) == {"tea": 2, "green": 1}
@@ -0,0 +1,75 @@
+"""Response timelines from the minute, hour and day count buckets"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.counter_service import counter_service
+
+QUESTIONS = [{"text": "Name", "type": "text", "options": [], "required": False}]
+# Recent enough that compaction keeps the hour buckets
+DAY = (datetime.utcnow() - timedelta(days=3)).replace(hour=0, minute=0, second=0, microsecond=0)
+NEXT_DAY = DAY + timedelta(days=1)
+
+def _at(day, clock):
+    return f"{day.date().isoformat()}T{clock}"
+
+@pytest.fixture
+def survey_id(make_survey):
+    survey_id = make_survey(QUESTIONS)
+    db = SessionLocal()
+    try:
+        counter_service.record(db, survey_id, [
+            DAY.replace(hour=9, minute=59, second=59),
+            DAY.replace(hour=10),
+            DAY.replace(hour=10, minute=30),
+            DAY.replace(hour=23, minute=59),
+            NEXT_DAY,
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return survey_id
+
+def _timeline(client, survey_id, **params):
+    response = client.get(f"/api/surveys/{survey_id}/timeline", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _counts(body):
+    return {bucket["start"]: bucket["count"] for bucket in body["buckets"] if bucket["count"]}
+
+def test_bucket_boundaries(client, survey_id):
+    days = _timeline(client, survey_id, granularity="day", **{"from": DAY.isoformat(), "to": (NEXT_DAY + timedelta(days=1)).isoformat()})
+    assert [bucket["count"] for bucket in days["buckets"]] == [4, 1]
+    assert days["total"] == 5
+
+    hours = _timeline(client, survey_id, granularity="hour", **{"from": _at(DAY, "09:00:00"), "to": _at(NEXT_DAY, "01:00:00")})
+    assert len(hours["buckets"]) == 16
+    assert _counts(hours) == {
+        _at(DAY, "09:00:00"): 1, _at(DAY, "10:00:00"): 2, _at(DAY, "23:00:00"): 1, _at(NEXT_DAY, "00:00:00"): 1
+    }
+
+def test_from_rounds_down_and_to_is_exclusive(client, survey_id):
+    hours = _timeline(client, survey_id, granularity="hour", **{"from": _at(DAY, "10:45:00"), "to": _at(DAY, "23:59:00")})
+    assert hours["from"] == _at(DAY, "10:00:00")
+    assert _counts(hours) == {_at(DAY, "10:00:00"): 2, _at(DAY, "23:00:00"): 1}
+    # UTC offsets are converted
+    shifted = _timeline(client, survey_id, granularity="hour", **{"from": _at(DAY, "11:00:00+01:00"), "to": _at(DAY, "11:00:00Z")})
+    assert shifted["from"] == _at(DAY, "10:00:00") and shifted["total"] == 2
+
+def test_range_validation(client, survey_id, monkeypatch):
+    url = f"/api/surveys/{survey_id}/timeline"
+    assert client.get(url, params={"from": _at(NEXT_DAY, "00:00:00"), "to": _at(DAY, "00:00:00")}).status_code == 400
+    assert client.get(url, params={"from": _at(DAY, "00:00:00"), "to": _at(DAY, "00:00:00")}).status_code == 400
+    assert client.get(url, params={"granularity": "week"}).status_code == 422
+    monkeypatch.setattr(settings, "ROLLUP_MAX_POINTS", 10)
+    too_many = client.get(url, params={"granularity": "hour", "from": _at(DAY, "00:00:00"), "to": _at(NEXT_DAY, "00:00:00")})
+    assert too_many.status_code == 400
+    assert client.get("/api/surveys/999999/timeline").status_code == 404
+
+def test_default_window_ends_now(client, survey_id):
+    body = _timeline(client, survey_id, granularity="minute")
+    assert len(body["buckets"]) == 120
+    assert datetime.fromisoformat(body["to"]) <= datetime.utcnow()
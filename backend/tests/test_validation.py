@@ -0,0 +1,59 @@
+"""Answer validation: field-level 422s from the compiled per-version validator"""
+import pytest
+
+from app.core.config import settings
+
+QUESTIONS = [
+    {"text": "Name", "type": "text", "options": [], "required": True},
+    {"text": "Rate", "type": "rating", "options": [], "required": False},
+    {"text": "Age", "type": "number", "options": [], "required": False, "min": 0, "max": 120},
+    {"text": "Plan", "type": "multiple_choice", "options": ["Free", "Pro"], "required": False},
+    {"text": "Again?", "type": "yes_no", "options": [], "required": False},
+]
+
+@pytest.fixture
+def responses_url(make_survey):
+    return f"/api/surveys/{make_survey(QUESTIONS)}/responses"
+
+def _errors(client, url, answers):
+    response = client.post(url, json={"responses": answers})
+    assert response.status_code == 422, response.text
+    return {tuple(error["loc"]): (error["type"], error["msg"]) for error in response.json()["detail"]}
+
+def test_every_bad_field_is_reported(client, responses_url):
+    errors = _errors(client, responses_url, {
+        "Rate": 11, "Age": "old", "Plan": "Team", "Again?": "maybe", "Colour": "red"
+    })
+    assert errors == {
+        ("responses", "Name"): ("missing", "This question is required"),
+        ("responses", "Rate"): ("value_error", "Must be at most 10"),
+        ("responses", "Age"): ("value_error", "Expected a number"),
+        ("responses", "Plan"): ("value_error", "Not one of the question's options"),
+        ("responses", "Again?"): ("value_error", "Expected yes or no"),
+        ("responses", "Colour"): ("extra_forbidden", "Not a question of this survey"),
+    }
+
+def test_valid_answers_pass(client, responses_url):
+    answers = {"Name": "Ann", "Rate": "7", "Age": 0, "Plan": " Pro ", "Again?": True}
+    assert client.post(responses_url, json={"responses": answers}).status_code == 201
+
+def test_text_length_limit(client, responses_url, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_TEXT_MAX_LENGTH", 5)
+    assert _errors(client, responses_url, {"Name": "too long"}) == {
+        ("responses", "Name"): ("value_error", "Longer than 5 characters")
+    }
+
+def test_validation_can_be_turned_off(client, responses_url, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_VALIDATION", "off")
+    assert client.post(responses_url, json={"responses": {"Rate": 99}}).status_code == 201
+
+def test_update_survey_replaces_the_cached_validator(client, responses_url):
+    survey_url = responses_url.rsplit("/responses", 1)[0]
+    assert _errors(client, responses_url, {"Name": "Ann", "Plan": "Team"}) == {
+        ("responses", "Plan"): ("value_error", "Not one of the question's options")
+    }
+    questions = client.get(survey_url).json()["questions"]
+    questions[3]["options"] = ["Free", "Pro", "Team"]
+    questions[0]["required"] = False
+    assert client.put(survey_url, json={"questions": questions}).status_code == 200
+    assert client.post(responses_url, json={"responses": {"Plan": "Team"}}).status_code == 201
@@ -0,0 +1,55 @@
+"""Survey versions: question snapshots and per-version analytics"""
+QUESTIONS = [
+    {"text": "Rate us", "type": "rating", "options": [], "required": True},
+    {"text": "Comment", "type": "text", "options": [], "required": False},
+]
+
+def _submit(client, survey_id, answers):
+    response = client.post(f"/api/surveys/{survey_id}/responses", json={"responses": answers})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def _versions(client, survey_id):
+    return [v["version_number"] for v in client.get(f"/api/surveys/{survey_id}/versions").json()]
+
+def test_question_edits_add_snapshots(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    survey_url = f"/api/surveys/{survey_id}"
+    first = client.get(survey_url).json()
+    assert _versions(client, survey_id) == [1]
+
+    # Title edits and unchanged questions keep the version
+    assert client.put(survey_url, json={"title": "Renamed"}).status_code == 200
+    assert client.put(survey_url, json={"questions": first["questions"]}).status_code == 200
+    assert _versions(client, survey_id) == [1]
+
+    renamed = [dict(first["questions"][0], text="How did we do?"), first["questions"][1]]
+    updated = client.put(survey_url, json={"questions": renamed}).json()
+    assert _versions(client, survey_id) == [1, 2]
+    assert updated["current_version_id"] != first["current_version_id"]
+    assert client.get(f"{survey_url}/versions/1").json()["questions"][0]["text"] == "Rate us"
+    assert client.get(f"{survey_url}/versions/2").json()["questions"][0]["text"] == "How did we do?"
+    assert client.get(f"{survey_url}/versions/3").status_code == 404
+
+def test_responses_are_stamped_and_analysed_by_version(client, make_survey):
+    survey_id = make_survey(QUESTIONS)
+    survey_url = f"/api/surveys/{survey_id}"
+    first = client.get(survey_url).json()
+    assert _submit(client, survey_id, {"Rate us": 4})["survey_version_id"] == first["current_version_id"]
+    _submit(client, survey_id, {"Rate us": 6, "Comment": "fine"})
+
+    renamed = [dict(first["questions"][0], text="How did we do?"), first["questions"][1]]
+    second = client.put(survey_url, json={"questions": renamed}).json()
+    assert _submit(client, survey_id, {"How did we do?": 10})["survey_version_id"] == second["current_version_id"]
+
+    pooled = client.get(f"{survey_url}/analytics").json()
+    assert pooled["total_responses"] == 3
+    assert pooled["analytics"]["How did we do?"]["data"]["average"] == 6.67
+    old = client.get(f"{survey_url}/analytics", params={"version": 1}).json()
+    assert old["total_responses"] == 2
+    assert old["analytics"]["Rate us"]["data"]["average"] == 5
+    assert old["analytics"]["Comment"]["response_count"] == 1
+    new = client.get(f"{survey_url}/analytics", params={"version": 2}).json()
+    assert new["total_responses"] == 1
+    assert new["analytics"]["How did we do?"]["data"]["average"] == 10
+    assert client.get(f"{survey_url}/analytics", params={"version": 9}).status_code == 404
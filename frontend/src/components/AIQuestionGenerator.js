@@ -16,15 +16,23 @@ const AIQuestionGenerator = ({ onQuestionsGenerated }) => {
     setLoading(true);
     setError('');
 
+    let received = 0;
     try {
-      const result = await surveyService.generateQuestions(prompt, questionCount);
-      if (result.questions && result.questions.length > 0) {
-        onQuestionsGenerated(result.questions);
+      // Questions are added to the form one by one as the model writes them
+      await surveyService.streamQuestions(prompt, questionCount, (question) => {
+        received += 1;
+        onQuestionsGenerated([question]);
+      });
+      if (received > 0) {
         setPrompt('');
       } else {
         setError('No questions were generated. Please try a different prompt.');
       }
     } catch (err) {
+      if (received > 0) {
+        setError(`Generation stopped after ${received} question(s). You can generate more.`);
+        return;
+      }
       setError('Failed to generate questions. Please try again.');
       console.error('AI generation error:', err);
     } finally {
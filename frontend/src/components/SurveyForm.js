@@ -26,6 +26,8 @@ const SurveyForm = ({ initialData = {}, onSubmit, isEditing = false }) => {
     e.preventDefault();
     // Each question must have all required fields!
     const prepared = questions.map(q => ({
+      // Kept so the server can tell a reworded question from a new one
+      id: q && q.id,
       text: (q && q.text) != null ? q.text : '',
       type: (q && q.type) != null ? q.type : 'text',
       options: Array.isArray(q && q.options) ? q.options : [],
@@ -39,7 +41,8 @@ const SurveyForm = ({ initialData = {}, onSubmit, isEditing = false }) => {
   };
 
   const handleGenerated = (genQuestions) => {
-    setQuestions([...questions, ...genQuestions]);
+    // Functional update: streamed questions arrive in several calls before a re-render
+    setQuestions((current) => [...current, ...genQuestions]);
   };
 
   return (
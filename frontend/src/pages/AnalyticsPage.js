@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
 import { surveyService } from '../services/surveyService';
+import { analyticsService } from '../services/analyticsService';
 import Analytics from '../components/Analytics'; // This is just the visualizer
 
 const AnalyticsPage = () => {
@@ -15,6 +16,7 @@ const AnalyticsPage = () => {
       .then(setAnalyticsData)
       .catch(err => setError(err.message || "Error loading analytics."))
       .finally(() => setLoading(false));
+    return analyticsService.subscribe(id, setAnalyticsData);
   }, [id]);
 
   if (loading) return <div style={{ textAlign: 'center', marginTop: 50 }}>Loading analytics...</div>;
@@ -10,6 +10,7 @@ const Dashboard = () => {
 
   useEffect(() => {
     loadAnalytics();
+    return analyticsService.subscribe(id, setAnalyticsData);
   }, [id]);
 
   const loadAnalytics = async () => {
@@ -4,5 +4,25 @@ export const analyticsService = {
   getAnalytics: async (surveyId) => {
     const response = await api.get(`/surveys/${surveyId}/analytics`);
     return response.data;
+  },
+
+  // Server-pushed updates instead of polling. onUpdate receives the full, merged
+  // analytics after every push; call the returned function to stop listening.
+  subscribe: (surveyId, onUpdate) => {
+    const source = new EventSource(`${api.defaults.baseURL}/surveys/${surveyId}/live`);
+    let current = null;
+    source.addEventListener('snapshot', (e) => {
+      current = JSON.parse(e.data);
+      onUpdate(current);
+    });
+    source.addEventListener('update', (e) => {
+      if (!current) return;
+      const { removed = [], ...delta } = JSON.parse(e.data);
+      const analytics = { ...current.analytics, ...(delta.analytics || {}) };
+      removed.forEach((question) => delete analytics[question]);
+      current = { ...current, ...delta, analytics };
+      onUpdate(current);
+    });
+    return () => source.close();
   }
 };
@@ -106,6 +106,43 @@ export const surveyService = {
     return response.data;
   },
 
+  // Streams questions over Server-Sent Events, calling onQuestion as each one arrives.
+  // Resolves with the final "done" payload; rejects on an "error" event.
+  async streamQuestions(prompt, questionCount = 5, onQuestion = () => {}) {
+    const response = await fetch(`${API_BASE_URL}/generate-questions/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+      body: JSON.stringify({ prompt, question_count: questionCount }),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Streaming failed with status ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = 'message';
+        let data = '';
+        block.split('\n').forEach((line) => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        const payload = data ? JSON.parse(data) : {};
+        if (event === 'question') onQuestion(payload);
+        else if (event === 'done') return payload;
+        else if (event === 'error') throw new Error(payload.error || 'Generation failed');
+      }
+    }
+    throw new Error('Stream ended unexpectedly');
+  },
+
   // Health check
   async healthCheck() {
     const response = await api.get('/health');